@@ -32,6 +32,8 @@ namespace htm_ext
     void init_TemporalMemory(py::module&);
     void init_SDR_Classifier(py::module&);
     void init_Spatial_Pooler(py::module&);
+    void init_ModelPool(py::module&);
+    void init_AnomalyLikelihood(py::module&);
 
 } // namespace htm_ext
 
@@ -44,4 +46,6 @@ PYBIND11_MODULE(algorithms, m) {
     init_TemporalMemory(m);
     init_SDR_Classifier(m);
     init_Spatial_Pooler(m);
+    init_ModelPool(m);
+    init_AnomalyLikelihood(m);
 }
@@ -0,0 +1,213 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+PyBind11 bindings for AnomalyLikelihood classes
+*/
+
+#include <bindings/suppress_register.hpp>  //include before pybind11.h
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <pybind11/operators.h>
+#include <pybind11/stl.h>
+
+#include <limits>
+#include <sstream>
+
+#include <htm/algorithms/AnomalyLikelihood.hpp>
+
+namespace htm_ext
+{
+    namespace py = pybind11;
+    using namespace std;
+    using namespace htm;
+
+    void init_AnomalyLikelihood(py::module& m)
+    {
+        py::class_<MultiMetricAnomalyLikelihood> py_Multi(m, "MultiMetricAnomalyLikelihood",
+R"(Anomaly likelihood of many independent metrics, which all receive one record
+per call to compute().  This gives the same results as one
+htm.algorithms.anomaly_likelihood.AnomalyLikelihood per metric, but the cost per
+record does not depend on the historicWindowSize.
+
+Example Usage:
+    likelihood = MultiMetricAnomalyLikelihood( 20000 )
+    # One anomaly score and (optional) one raw input value per metric.
+    probabilities = likelihood.compute( anomalyScores, values )
+)");
+
+        py_Multi.def(py::init<UInt, UInt, UInt, UInt, UInt, UInt>(),
+R"(Argument numMetrics is the number of independent metrics.
+
+See AnomalyLikelihood for the other arguments.)",
+            py::arg("numMetrics"),
+            py::arg("learningPeriod")     = 288u,
+            py::arg("estimationSamples")  = 100u,
+            py::arg("historicWindowSize") = 8640u,
+            py::arg("reestimationPeriod") = 100u,
+            py::arg("aggregationWindow")  = 10u);
+
+        py_Multi.def("compute", [](MultiMetricAnomalyLikelihood &self,
+                py::array_t<Real, py::array::c_style | py::array::forcecast> anomalyScores,
+                py::object values)
+        {
+            const size_t numMetrics = self.size();
+            NTA_CHECK( anomalyScores.ndim() == 1 and static_cast<size_t>(anomalyScores.size()) == numMetrics )
+                << "MultiMetricAnomalyLikelihood.compute: expected one anomaly score per metric.";
+
+            py::array_t<Real, py::array::c_style | py::array::forcecast> valuesArray;
+            if( not values.is_none() ) {
+                valuesArray = values.cast<py::array_t<Real, py::array::c_style | py::array::forcecast>>();
+                NTA_CHECK( valuesArray.ndim() == 1 and static_cast<size_t>(valuesArray.size()) == numMetrics )
+                    << "MultiMetricAnomalyLikelihood.compute: expected one value per metric.";
+            }
+            const Real *scoresPtr = anomalyScores.data();
+            const Real *valuesPtr = values.is_none() ? nullptr : valuesArray.data();
+
+            py::array_t<Real> likelihoods( numMetrics );
+            Real *likelihoodsPtr = likelihoods.mutable_data();
+            {
+                py::gil_scoped_release release;
+                self.compute( scoresPtr, valuesPtr, likelihoodsPtr );
+            }
+            return likelihoods;
+        },
+R"(Compute the anomaly likelihood of the next record of every metric.
+
+Argument anomalyScores is a 1-D array with the current anomaly score of each metric.
+
+Argument values (optional) is a 1-D array with the current raw input value of
+each metric, or NaN if it is not numeric.  It is used to detect metrics which
+have a flat value: these are reported as not anomalous.
+
+Returns a float32 numpy array with the anomaly likelihood of each metric.)",
+            py::arg("anomalyScores"),
+            py::arg("values") = py::none());
+
+        py_Multi.def("reset", &MultiMetricAnomalyLikelihood::reset,
+R"(Forget the history of every metric, and start over with the learning period.)");
+
+        py_Multi.def("size",                  &MultiMetricAnomalyLikelihood::size);
+        py_Multi.def("__len__",               &MultiMetricAnomalyLikelihood::size);
+        py_Multi.def("getIteration",          &MultiMetricAnomalyLikelihood::getIteration);
+        py_Multi.def("getLearningPeriod",     &MultiMetricAnomalyLikelihood::getLearningPeriod);
+        py_Multi.def("getProbationaryPeriod", &MultiMetricAnomalyLikelihood::getProbationaryPeriod);
+        py_Multi.def("getHistoricWindowSize", &MultiMetricAnomalyLikelihood::getHistoricWindowSize);
+        py_Multi.def("getReestimationPeriod", &MultiMetricAnomalyLikelihood::getReestimationPeriod);
+        py_Multi.def("getAggregationWindow",  &MultiMetricAnomalyLikelihood::getAggregationWindow);
+
+        py_Multi.def_static("computeLogLikelihood", &MultiMetricAnomalyLikelihood::computeLogLikelihood,
+            py::arg("likelihood"));
+
+        py_Multi.def(py::self == py::self);
+        py_Multi.def(py::self != py::self);
+
+        py_Multi.def(py::pickle(
+            [](const MultiMetricAnomalyLikelihood& self) // __getstate__
+        {
+            std::stringstream ss;
+            self.save(ss);
+            return py::bytes( ss.str() );
+        },
+            [](py::bytes &s)   // __setstate__
+        {
+            std::stringstream ss( s.cast<std::string>() );
+            std::unique_ptr<MultiMetricAnomalyLikelihood> self(new MultiMetricAnomalyLikelihood( 1u ));
+            self->load(ss);
+            return self;
+        }));
+
+
+        py::class_<AnomalyLikelihood, MultiMetricAnomalyLikelihood> py_AnomalyLikelihood(m, "AnomalyLikelihood",
+R"(C++ implementation of htm.algorithms.anomaly_likelihood.AnomalyLikelihood, for
+a single metric.  The results are the same as those of the python class, but
+the cost per record does not depend on the historicWindowSize.
+
+Example Usage:
+    anomalyLikelihood = AnomalyLikelihood()
+    while still_have_data:
+      # Compute probability that an anomaly has ocurred
+      anomalyProbability = anomalyLikelihood.anomalyProbability( value, anomalyScore )
+)");
+
+        py_AnomalyLikelihood.def(py::init<UInt, UInt, UInt, UInt, UInt>(),
+R"(NOTE: Anomaly likelihood scores are reported at a flat 0.5 for
+learningPeriod + estimationSamples iterations.
+
+Argument learningPeriod is the number of iterations required for the algorithm
+to learn the basic patterns in the dataset and for the anomaly score to 'settle
+down'.
+
+Argument estimationSamples is the number of reasonable anomaly scores required
+for the initial estimate of the Gaussian.
+
+Argument historicWindowSize is the size of sliding window of historical data
+points to maintain for periodic reestimation of the Gaussian.
+
+Argument reestimationPeriod is how often we re-estimate the Gaussian distribution.
+
+Argument aggregationWindow is the number of anomaly scores in the moving
+average, which is what the distribution is estimated from.)",
+            py::arg("learningPeriod")     = 288u,
+            py::arg("estimationSamples")  = 100u,
+            py::arg("historicWindowSize") = 8640u,
+            py::arg("reestimationPeriod") = 100u,
+            py::arg("aggregationWindow")  = 10u);
+
+        py_AnomalyLikelihood.def("anomalyProbability", [](AnomalyLikelihood &self,
+                py::object value, Real anomalyScore, py::object timestamp)
+        {
+            (void) timestamp;
+            Real numeric = std::numeric_limits<Real>::quiet_NaN();
+            if( py::isinstance( value, py::module::import("numbers").attr("Number") )) {
+                numeric = py::float_( value ).cast<Real>();
+            }
+            return self.anomalyProbability( anomalyScore, -1, numeric );
+        },
+R"(Compute the probability that the current value plus anomaly score represents
+an anomaly given the historical distribution of anomaly scores. The closer the
+number is to 1, the higher the chance it is an anomaly.
+
+Argument value is the current metric ("raw") input value, eg. "orange", or
+'21.2' (deg. Celsius), ...  Numeric values are used to detect a flat metric.
+
+Argument anomalyScore is the current anomaly score.
+
+Argument timestamp is unused, it is accepted for compatibility with the python
+implementation.
+
+Returns the anomalyLikelihood for this record.)",
+            py::arg("value"),
+            py::arg("anomalyScore"),
+            py::arg("timestamp") = py::none());
+
+        py_AnomalyLikelihood.def(py::pickle(
+            [](const AnomalyLikelihood& self) // __getstate__
+        {
+            std::stringstream ss;
+            self.save(ss);
+            return py::bytes( ss.str() );
+        },
+            [](py::bytes &s)   // __setstate__
+        {
+            std::stringstream ss( s.cast<std::string>() );
+            std::unique_ptr<AnomalyLikelihood> self(new AnomalyLikelihood());
+            self->load(ss);
+            return self;
+        }));
+    }
+} // namespace htm_ext
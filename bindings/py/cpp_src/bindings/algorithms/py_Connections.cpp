@@ -40,13 +40,17 @@ namespace htm_ext
     py::class_<Connections> py_Connections(m, "Connections",
 R"(Compatibility Warning: This classes API is unstable and may change without warning.)");
 
-    py_Connections.def(py::init<UInt, Permanence, bool>(),
+    py_Connections.def(py::init<UInt, Permanence, bool, UInt>(),
         py::arg("numCells"),
         py::arg("connectedThreshold"),
-        py::arg("timeseries") = false);
+        py::arg("timeseries") = false,
+        py::arg("permanenceBits") = 0u);
 
     py_Connections.def_property_readonly("connectedThreshold", &Connections::getConnectedThreshold);
 
+    py_Connections.def_property_readonly("permanenceBits", &Connections::getPermanenceBits,
+R"(0 for 32-bit float permanences, else the number of bits of the quantized permanences.)");
+
     py_Connections.def("createSegment", &Connections::createSegment,
         py::arg("cell"),
 	py::arg("maxSegmentsPerCell") = 0
@@ -61,6 +65,26 @@ R"(Compatibility Warning: This classes API is unstable and may change without wa
         py::arg("presynaticCell"),
         py::arg("permanence"));
 
+    py_Connections.def("createSynapses",
+        [](Connections &self, Segment segment,
+           const py::array_t<CellIdx, py::array::c_style | py::array::forcecast> &presynapticCells,
+           Permanence permanence, size_t maxNewSynapses) {
+            const CellIdx *cells = presynapticCells.data();
+            const std::vector<CellIdx> cellsVector( cells, cells + presynapticCells.size() );
+            return self.createSynapses( segment, cellsVector, permanence, maxNewSynapses );
+        },
+R"(Create synapses on the segment to all of the presynaptic cells, which are not
+yet synapsed on by the segment.  This has the same effect as calling
+createSynapse for each of the cells, but it is faster for large segments.
+
+Argument maxNewSynapses (optional) stops after creating this many new synapses.
+
+Returns the number of new synapses.)",
+        py::arg("segment"),
+        py::arg("presynapticCells"),
+        py::arg("permanence"),
+        py::arg("maxNewSynapses") = std::numeric_limits<size_t>::max());
+
     py_Connections.def("destroySynapse", &Connections::destroySynapse);
 
     py_Connections.def("updateSynapsePermanence", &Connections::updateSynapsePermanence,
@@ -87,6 +111,17 @@ R"(Compatibility Warning: This classes API is unstable and may change without wa
             auto &synData = self.dataForSynapse( idx );
             return synData.presynapticCell; });
 
+    py_Connections.def("presynapticCellsForSegment",
+        [](Connections &self, Segment segment) {
+            const auto &synapses = self.synapsesForSegment( segment );
+            py::array_t<CellIdx> cells( synapses.size() );
+            CellIdx *ptr = cells.mutable_data();
+            for( const auto syn : synapses ) {
+                *ptr++ = self.dataForSynapse( syn ).presynapticCell;
+            }
+            return cells; },
+R"(Returns a numpy array with the presynaptic cell of each synapse on the segment.)");
+
     py_Connections.def("getSegment", &Connections::getSegment);
 
     py_Connections.def("segmentFlatListLength", &Connections::segmentFlatListLength);
@@ -105,6 +140,79 @@ R"(Compatibility Warning: This classes API is unstable and may change without wa
         },
 R"(Returns numActiveConnectedSynapsesForSegment)");
 
+    py_Connections.def("freeze", &Connections::freeze,
+R"(Compile the presynaptic maps into a compact, read-only (CSR) snapshot which
+makes computeActivity faster.  This is intended for models which are only used
+for inference (learn = False).  The snapshot is dropped automatically when the
+synapses change.  Freezing Connections which are already frozen, including
+ones mapped by loadFrozen, does nothing.)");
+
+    py_Connections.def("unfreeze", &Connections::unfreeze,
+R"(Drop the snapshot made by freeze().)");
+
+    py_Connections.def("isFrozen", &Connections::isFrozen);
+
+    py_Connections.def("saveFrozen",
+        [](const Connections &self, const std::string &path) { self.saveFrozen( path ); },
+R"(Write the frozen model to a flat file, which loadFrozen() maps into memory
+instead of deserializing it.  Destroyed segments are left out, and the remaining
+segments are renumbered as by compact().)",
+        py::arg("path"));
+
+    py_Connections.def("loadFrozen",
+        [](Connections &self, const std::string &path) { self.loadFrozen( path ); },
+R"(Replace the Connections with a model written by saveFrozen().  The presynaptic
+maps are used in place in the memory-mapped file, which is shared by all the
+processes that load it.  The loaded Connections are read-only and can only be
+used for inference (learn = False).)",
+        py::arg("path"));
+
+    py_Connections.def("isMapped", &Connections::isMapped);
+
+    py_Connections.def("beginDeltas", &Connections::beginDeltas,
+R"(Start recording the changes for saveDelta().  Compaction is recorded as
+a full snapshot.)");
+
+    py_Connections.def("endDeltas", &Connections::endDeltas);
+
+    py_Connections.def("isRecordingDeltas", &Connections::isRecordingDeltas);
+
+    py_Connections.def("saveDelta",
+        [](Connections &self) {
+            std::stringstream buf;
+            self.saveDelta( buf );
+            return py::bytes( buf.str() ); },
+R"(Returns the changes since beginDeltas() or the previous saveDelta(), as bytes.)");
+
+    py_Connections.def("loadDelta",
+        [](Connections &self, const py::bytes &data) {
+            std::stringstream buf( data.cast<std::string>() );
+            self.loadDelta( buf ); },
+R"(Apply the bytes returned by saveDelta().  The deltas must be applied in order,
+starting from the state in which beginDeltas() was called.)",
+        py::arg("delta"));
+
+    py_Connections.def("compact", &Connections::compact,
+R"(Garbage collect the destroyed segments and synapses.  The remaining segments
+and synapses are renumbered, so all Segment & Synapse indices obtained before
+this call are invalidated.)");
+
+    py_Connections.def("setCompactionThreshold", &Connections::setCompactionThreshold,
+R"(Call compact() automatically in computeActivity(), when the fraction of
+destroyed segments or synapses exceeds the threshold.  Zero disables it.)",
+        py::arg("threshold"));
+
+    py_Connections.def("getCompactionThreshold", &Connections::getCompactionThreshold);
+
+    py_Connections.def("setNumThreads", &Connections::setNumThreads,
+R"(Use several threads in computeActivity, which pays off for dense inputs.
+The active presynaptic cells are split between the threads, and their counts
+are added up, so the results do not depend on the number of threads.  Zero
+means all hardware threads.  This is not serialized.)",
+        py::arg("numThreads"));
+
+    py_Connections.def("getNumThreads", &Connections::getNumThreads);
+
     py_Connections.def("computeActivityFull",
         [](Connections &self, SDR &activePresynapticCells, bool learn=true) {
             // Allocate buffer to return & make a python destructor object for it.
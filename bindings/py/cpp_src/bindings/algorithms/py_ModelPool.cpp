@@ -0,0 +1,155 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+PyBind11 bindings for ModelPool class
+*/
+
+#include <bindings/suppress_register.hpp>  //include before pybind11.h
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <pybind11/stl.h>
+
+#include <htm/algorithms/ModelPool.hpp>
+
+namespace htm_ext
+{
+    namespace py = pybind11;
+    using namespace std;
+    using namespace htm;
+
+    void init_ModelPool(py::module& m)
+    {
+        py::class_<ModelPool> py_ModelPool(m, "ModelPool",
+R"(The ModelPool owns many small, independent models and advances all of them by
+one timestep in a single call.
+
+Each model is a SpatialPooler, TemporalMemory, AnomalyLikelihood and (optional)
+Predictor, like in the hotgym.py example.  This is for the "one model per
+metric" use case, where there are thousands of small models and the per-record
+python overhead dominates.  The models are stepped in parallel by a pool of
+C++ worker threads, the GIL is released meanwhile.
+
+All models are copies of the given SpatialPooler & TemporalMemory, so they
+start in an identical state.
+
+Example Usage:
+    sp   = SpatialPooler( [1000], [1638], ... )
+    tm   = TemporalMemory( [1638], 13, ... )
+    pool = ModelPool( 20000, sp, tm, steps=[1] )
+
+    # One row of encoded input per model, eg. from an encoder's SDR.dense
+    inputs  = numpy.zeros( (pool.size(), pool.getInputSize()), dtype=numpy.uint8 )
+    buckets = numpy.zeros( pool.size(), dtype=numpy.uint32 )
+
+    anomaly, likelihood, predictions = pool.compute( inputs, True, buckets )
+    # predictions[model, i] is the predicted bucket for pool.getSteps()[i]
+)");
+
+        py_ModelPool.def(py::init<UInt, const SpatialPooler&, const TemporalMemory&,
+                                  const vector<UInt>&, Real, UInt>(),
+R"(Argument numModels is the number of independent models in the pool.
+
+Arguments sp and tm are the prototype SpatialPooler & TemporalMemory, every
+model starts as a copy of them.
+
+Argument steps is the list of prediction steps of the Predictors.  If empty
+then no predictions are made.
+
+Argument alpha is the learning rate of the Predictors.
+
+Argument numThreads is the number of worker threads.  0 means use all
+hardware threads.)",
+            py::arg("numModels"),
+            py::arg("sp"),
+            py::arg("tm"),
+            py::arg("steps")      = vector<UInt>({ 1u }),
+            py::arg("alpha")      = 0.001f,
+            py::arg("numThreads") = 0u);
+
+        py_ModelPool.def("compute", [](ModelPool &self,
+                py::array_t<Byte, py::array::c_style | py::array::forcecast> inputs,
+                bool learn,
+                py::object classifications)
+        {
+            const UInt numModels = self.size();
+            NTA_CHECK( inputs.ndim() == 2 and
+                       static_cast<UInt>(inputs.shape(0)) == numModels and
+                       static_cast<UInt>(inputs.shape(1)) == self.getInputSize() )
+                << "ModelPool.compute: inputs must have shape (size(), getInputSize()).";
+
+            py::array_t<UInt, py::array::c_style | py::array::forcecast> buckets;
+            if( not classifications.is_none() ) {
+                buckets = classifications.cast<py::array_t<UInt, py::array::c_style | py::array::forcecast>>();
+                NTA_CHECK( buckets.ndim() == 1 and static_cast<UInt>(buckets.shape(0)) == numModels )
+                    << "ModelPool.compute: classifications must have one entry per model.";
+            }
+            const UInt *bucketsPtr = classifications.is_none() ? nullptr : buckets.data();
+
+            const size_t numSteps = self.getSteps().size();
+            py::array_t<Real> anomaly( numModels );
+            py::array_t<Real> likelihood( numModels );
+            py::array_t<Int>  predictions( vector<size_t>({ numModels, numSteps }) );
+
+            const Byte *in   = inputs.data();
+            Real *anomalyPtr    = anomaly.mutable_data();
+            Real *likelihoodPtr = likelihood.mutable_data();
+            Int  *predictPtr    = predictions.mutable_data();
+            {
+                py::gil_scoped_release release;
+                self.compute( in, bucketsPtr, learn, anomalyPtr, likelihoodPtr, predictPtr );
+            }
+            return py::make_tuple( anomaly, likelihood, predictions );
+        },
+R"(Advance all models by one timestep.
+
+Argument inputs is a 2-D array of shape (size(), getInputSize()).  Row i is the
+dense encoded input for model i.  Nonzero values are active bits.
+
+Argument learn, whether the models learn from this timestep.
+
+Argument classifications (optional) is a 1-D array with one bucket index per
+model.  It is used to train the Predictors, when learn is True.
+
+Returns a tuple of numpy arrays (anomaly, likelihood, predictions):
+    anomaly     - float32, shape (size(),), the raw anomaly scores.
+    likelihood  - float32, shape (size(),), the anomaly likelihoods.
+    predictions - int32, shape (size(), len(getSteps())), the most likely bucket
+                  for each prediction step, or -1 while the Predictor has not
+                  learned that step yet, see Predictor.hasLearned.)",
+            py::arg("inputs"),
+            py::arg("learn") = true,
+            py::arg("classifications") = py::none());
+
+        py_ModelPool.def("reset", &ModelPool::reset,
+R"(Reset the sequence state of all models.  The anomaly likelihood also starts over,
+with its learning period.)");
+
+        py_ModelPool.def("size",          &ModelPool::size);
+        py_ModelPool.def("__len__",       &ModelPool::size);
+        py_ModelPool.def("getInputSize",  &ModelPool::getInputSize);
+        py_ModelPool.def("getSteps",      &ModelPool::getSteps);
+        py_ModelPool.def("getNumThreads", &ModelPool::getNumThreads);
+
+        py_ModelPool.def("getSpatialPooler", &ModelPool::getSpatialPooler,
+            py::return_value_policy::reference_internal, py::arg("model"));
+        py_ModelPool.def("getTemporalMemory", &ModelPool::getTemporalMemory,
+            py::return_value_policy::reference_internal, py::arg("model"));
+        py_ModelPool.def("getPredictor", &ModelPool::getPredictor,
+            py::return_value_policy::reference_internal, py::arg("model"));
+    }
+} // namespace htm_ext
@@ -23,8 +23,11 @@
 
 #include <bindings/suppress_register.hpp>  //include before pybind11.h
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
 
+#include <algorithm> // copy
+
 #include <htm/algorithms/SDRClassifier.hpp>
 
 namespace htm_ext
@@ -75,12 +78,28 @@ References:
     - In F. Fogleman-Soulie and J.Herault, editors, Neurocomputing: Algorithms,
      Architectures and Applications, pp 227-236, Springer-Verlag, 1990)");
 
-        py_Classifier.def(py::init<Real>(),
+        py_Classifier.def(py::init<Real, bool>(),
 R"(Argument alpha is used to adapt the weight matrix during learning.
-A larger alpha results in faster adaptation to the data.)",
-            py::arg("alpha") = 0.001);
-
-        py_Classifier.def("infer", &Classifier::infer,
+A larger alpha results in faster adaptation to the data.
+
+Argument float32, if True the weights are stored in single precision, which
+halves the memory usage at the cost of some precision.)",
+            py::arg("alpha") = 0.001,
+            py::arg("float32") = false);
+
+        py_Classifier.def("isFloat32", &Classifier::isFloat32);
+
+        py_Classifier.def("hasLearned", &Classifier::hasLearned,
+R"(Returns whether learn has been called, ie whether infer returns a meaningful PDF.)");
+
+        py_Classifier.def("infer", [](const Classifier &self, const SDR &pattern) {
+            pattern.getSparse(); // pin the input before releasing the GIL
+            PDF pdf;
+            {
+              py::gil_scoped_release release;
+              pdf = self.infer( pattern );
+            }
+            return pdf; },
 R"(Compute the likelihoods for each category / bucket.
 
 Argument pattern is the SDR containing the active input bits.
@@ -88,11 +107,17 @@ Argument pattern is the SDR containing the active input bits.
 Returns the Probablility Distribution Function (PDF) of the categories.
 The PDF is a list of probablilities which sums to 1.  Each index in this list is
 a category label, and each value is the likelihood of the that category.
-Use "numpy.argmax" to find the category with the greatest probablility.)",
+Use "numpy.argmax" to find the category with the greatest probablility.
+
+The GIL is released while the computation runs, so independent Classifiers can
+be used concurrently from multiple python threads.)",
 
             py::arg("pattern"));
 
-        py_Classifier.def("learn", &Classifier::learn,
+        py_Classifier.def("learn", [](Classifier &self, const SDR &pattern, const vector<UInt> &classification) {
+            pattern.getSparse(); // pin the input before releasing the GIL
+            py::gil_scoped_release release;
+            self.learn( pattern, classification ); },
 R"(Learn from example data.
 
 Argument pattern is the SDR containing the active input bits.
@@ -103,10 +128,124 @@ This may also be a list for when the input has multiple categories.)",
                 py::arg("classification"));
 
         py_Classifier.def("learn", [](Classifier &self, const SDR &pattern, UInt categoryIdx)
-            { self.learn( pattern, {categoryIdx} ); },
+            {
+              pattern.getSparse(); // pin the input before releasing the GIL
+              py::gil_scoped_release release;
+              self.learn( pattern, {categoryIdx} );
+            },
                 py::arg("pattern"),
                 py::arg("classification"));
 
+        // Batch methods.  The patterns are given either as a list of SDRs, or as
+        // a sparse matrix in compressed sparse row format (indptr, indices),
+        // like the output of SpatialPooler.computeBatch.
+        const auto fromCSR = [](
+                const py::array_t<UInt, py::array::c_style | py::array::forcecast> &indptr,
+                const py::array_t<UInt, py::array::c_style | py::array::forcecast> &indices) {
+            NTA_CHECK( indptr.ndim() == 1 and indptr.size() > 0 and indices.ndim() == 1 )
+                << "Classifier: indptr and indices must be 1-D arrays.";
+            const auto ptr = indptr.data();
+            const size_t n = static_cast<size_t>(indptr.size()) - 1u;
+            NTA_CHECK( ptr[0] == 0u and ptr[n] == static_cast<UInt>(indices.size()) )
+                << "Classifier: indptr does not match indices.";
+            vector<SDR_sparse_t> patterns( n );
+            for( size_t i = 0; i < n; i++ ) {
+                NTA_CHECK( ptr[i] <= ptr[i + 1] ) << "Classifier: indptr must be non-decreasing.";
+                patterns[i].assign( indices.data() + ptr[i], indices.data() + ptr[i + 1] );
+            }
+            return patterns;
+        };
+        const auto fromSDRs = [](const vector<const SDR*> &sdrs) {
+            vector<SDR_sparse_t> patterns;
+            for( const auto sdr : sdrs ) {
+                patterns.push_back( sdr->getSparse() );
+            }
+            return patterns;
+        };
+        // The classifications are either one category per pattern, or a list of
+        // categories per pattern.
+        const auto toCategoryLists = [](const py::object &classifications) {
+            vector<vector<UInt>> categories;
+            try {
+                for( const auto category : classifications.cast<vector<UInt>>() ) {
+                    categories.push_back({ category });
+                }
+            } catch( const py::cast_error & ) {
+                categories = classifications.cast<vector<vector<UInt>>>();
+            }
+            return categories;
+        };
+        const auto inferBatch = [](const Classifier &self, const vector<SDR_sparse_t> &patterns) {
+            vector<PDF> pdfs;
+            {
+              py::gil_scoped_release release;
+              pdfs = self.inferBatch( patterns );
+            }
+            const size_t numCategories = pdfs.empty() ? 0u : pdfs[0].size();
+            py::array_t<Real64> result( vector<size_t>({ pdfs.size(), numCategories }) );
+            auto out = result.mutable_data();
+            for( const auto &pdf : pdfs ) {
+                out = std::copy( pdf.begin(), pdf.end(), out );
+            }
+            return result;
+        };
+        const auto learnBatch = [](Classifier &self, UInt inputSize, const vector<SDR_sparse_t> &patterns,
+                                   const vector<vector<UInt>> &categories) {
+            py::gil_scoped_release release;
+            self.learnBatch( inputSize, patterns, categories );
+        };
+
+        py_Classifier.def("inferBatch", [=](const Classifier &self, const vector<const SDR*> &patterns)
+            { return inferBatch( self, fromSDRs( patterns )); },
+R"(Compute the likelihoods for many patterns at once.
+
+Argument patterns is a list of SDRs.  Alternatively, the patterns can be given
+as two arguments (indptr, indices) which are a sparse matrix in compressed
+sparse row format, such as is returned by SpatialPooler.computeBatch.
+
+Returns a 2-D numpy array, row i is the PDF for pattern i, see infer().)",
+            py::arg("patterns"));
+
+        py_Classifier.def("inferBatch", [=](const Classifier &self,
+                py::array_t<UInt, py::array::c_style | py::array::forcecast> indptr,
+                py::array_t<UInt, py::array::c_style | py::array::forcecast> indices)
+            { return inferBatch( self, fromCSR( indptr, indices )); },
+            py::arg("indptr"),
+            py::arg("indices"));
+
+        py_Classifier.def("learnBatch", [=](Classifier &self, const vector<const SDR*> &patterns,
+                                            const py::object &classifications)
+            {
+              NTA_CHECK( not patterns.empty() ) << "Classifier: no patterns given.";
+              learnBatch( self, static_cast<UInt>(patterns[0]->size), fromSDRs( patterns ),
+                          toCategoryLists( classifications ));
+            },
+R"(Learn from many examples at once, this is the same as calling learn() for each
+pattern in order.
+
+Argument patterns is a list of SDRs.  Alternatively, the patterns can be given
+as three arguments (indptr, indices, inputSize), where (indptr, indices) is a
+sparse matrix in compressed sparse row format, such as is returned by
+SpatialPooler.computeBatch, and inputSize is the size of the input SDRs.
+
+Argument classifications is a list with one category per pattern, or with a
+list of categories per pattern.)",
+            py::arg("patterns"),
+            py::arg("classifications"));
+
+        py_Classifier.def("learnBatch", [=](Classifier &self,
+                py::array_t<UInt, py::array::c_style | py::array::forcecast> indptr,
+                py::array_t<UInt, py::array::c_style | py::array::forcecast> indices,
+                UInt inputSize,
+                const py::object &classifications)
+            {
+              learnBatch( self, inputSize, fromCSR( indptr, indices ), toCategoryLists( classifications ));
+            },
+            py::arg("indptr"),
+            py::arg("indices"),
+            py::arg("inputSize"),
+            py::arg("classifications"));
+
         // TODO: Pickle support
 
 
@@ -159,7 +298,18 @@ A larger alpha results in faster adaptation to the data.)",
         py_Predictor.def("reset", &Predictor::reset,
 R"(For use with time series datasets.)");
 
-        py_Predictor.def("infer", &Predictor::infer,
+        py_Predictor.def("hasLearned", &Predictor::hasLearned,
+R"(Returns whether the Classifier of the given prediction step has learned yet.)",
+            py::arg("step"));
+
+        py_Predictor.def("infer", [](const Predictor &self, const SDR &pattern) {
+            pattern.getSparse(); // pin the input before releasing the GIL
+            Predictions result;
+            {
+              py::gil_scoped_release release;
+              result = self.infer( pattern );
+            }
+            return result; },
 R"(Compute the likelihoods.
 
 Argument pattern is the SDR containing the active input bits.
@@ -168,7 +318,10 @@ Returns a dictionary whos keys are prediction steps, and values are PDFs.
 See help(Classifier.infer) for details about PDFs.)",
             py::arg("pattern"));
 
-        py_Predictor.def("learn", &Predictor::learn,
+        py_Predictor.def("learn", [](Predictor &self, UInt recordNum, const SDR &pattern, const vector<UInt> &classification) {
+            pattern.getSparse(); // pin the input before releasing the GIL
+            py::gil_scoped_release release;
+            self.learn( recordNum, pattern, classification ); },
 R"(Learn from example data.
 
 Argument recordNum is an incrementing integer for each record.
@@ -183,7 +336,11 @@ This may also be a list for when the input has multiple categories.)",
             py::arg("classification"));
 
         py_Predictor.def("learn", [](Predictor &self, UInt recordNum, const SDR &pattern, UInt categoryIdx)
-            { self.learn( recordNum, pattern, {categoryIdx} ); },
+            {
+              pattern.getSparse(); // pin the input before releasing the GIL
+              py::gil_scoped_release release;
+              self.learn( recordNum, pattern, {categoryIdx} );
+            },
                 py::arg("recordNum"),
                 py::arg("pattern"),
                 py::arg("classification"));
@@ -62,7 +62,8 @@ using namespace htm;
             , Real
             , Int
             , UInt
-            , bool>()
+            , bool
+            , UInt>()
             , py::call_guard<py::scoped_ostream_redirect,
                              py::scoped_estream_redirect>(),
 R"(
@@ -182,6 +183,15 @@ Argument spVerbosity spVerbosity level: 0, 1, 2, or 3
 Argument wrapAround boolean value that determines whether or not inputs
         at the beginning and end of an input dimension are considered
         neighbors for the purpose of mapping inputs to columns.
+
+Argument initThreads Number of threads used to sample the potential pools
+        and initial permanences of the columns.  The default (1) draws them
+        all from the SP's random number generator, one column after
+        another.  Any other value draws each column from its own random
+        number generator and samples the columns in parallel.  The result
+        does not depend on the number of threads, but it is different from
+        the result with initThreads = 1.  Zero means one thread per
+        hardware thread.
 )"
             , py::arg("inputDimensions") = vector<UInt>({ 32, 32 })
             , py::arg("columnDimensions") = vector<UInt>({ 64, 64 })
@@ -200,6 +210,7 @@ Argument wrapAround boolean value that determines whether or not inputs
             , py::arg("seed") = 1
             , py::arg("spVerbosity") = 0
             , py::arg("wrapAround") = true
+            , py::arg("initThreads") = 1
         );
 
         py_SpatialPooler.def("getColumnDimensions", &SpatialPooler::getColumnDimensions);
@@ -219,6 +230,32 @@ Argument wrapAround boolean value that determines whether or not inputs
         py_SpatialPooler.def("setLocalAreaDensity", &SpatialPooler::setLocalAreaDensity);
         py_SpatialPooler.def("getStimulusThreshold", &SpatialPooler::getStimulusThreshold);
         py_SpatialPooler.def("setStimulusThreshold", &SpatialPooler::setStimulusThreshold);
+        py_SpatialPooler.def("getNumThreads", &SpatialPooler::getNumThreads);
+        py_SpatialPooler.def("setNumThreads", &SpatialPooler::setNumThreads,
+R"(Number of threads which compute the overlaps, including the calling thread.
+Zero means all hardware threads.  The results do not depend on it.)",
+            py::arg("numThreads"));
+        py_SpatialPooler.def("beginDeltas", &SpatialPooler::beginDeltas,
+R"(Start recording the changes for saveDelta().)");
+
+        py_SpatialPooler.def("endDeltas", &SpatialPooler::endDeltas);
+
+        py_SpatialPooler.def("isRecordingDeltas", &SpatialPooler::isRecordingDeltas);
+
+        py_SpatialPooler.def("saveDelta",
+            [](SpatialPooler &self) {
+                std::stringstream buf;
+                self.saveDelta( buf );
+                return py::bytes( buf.str() ); },
+R"(Returns the changes since beginDeltas() or the previous saveDelta(), as bytes.)");
+
+        py_SpatialPooler.def("loadDelta",
+            [](SpatialPooler &self, const py::bytes &data) {
+                std::stringstream buf( data.cast<std::string>() );
+                self.loadDelta( buf ); },
+R"(Apply the bytes returned by saveDelta().  The deltas must be applied in order,
+starting from the state in which beginDeltas() was called.)",
+            py::arg("delta"));
         py_SpatialPooler.def("getInhibitionRadius", &SpatialPooler::getInhibitionRadius);
         py_SpatialPooler.def("setInhibitionRadius", &SpatialPooler::setInhibitionRadius);
         py_SpatialPooler.def("getDutyCyclePeriod", &SpatialPooler::getDutyCyclePeriod);
@@ -276,7 +313,15 @@ Argument wrapAround boolean value that determines whether or not inputs
         // compute
         py_SpatialPooler.def("compute", [](SpatialPooler& self, const SDR& input, const bool learn, SDR& output)
             { 
-	      const auto& overlaps = self.compute( input, learn, output ); 
+	      // Pin the input while we still hold the GIL: reshape & materialize its sparse
+	      // cache now, so the GIL-free compute below only reads from the input SDR.
+	      input.reshape( self.getInputDimensions() );
+	      input.getSparse();
+	      vector<SynapseIdx> overlaps;
+	      {
+	        py::gil_scoped_release release; // other python threads can run their models meanwhile
+	        overlaps = self.compute( input, learn, output ); 
+	      }
 	      return py::array_t<SynapseIdx>( overlaps.size(), overlaps.data());  
 	    },
 R"(
@@ -301,12 +346,78 @@ Argument learn A boolean value indicating whether learning should be
 Argument output An SDR representing the winning columns after
         inhibition. The size of the SDR is equal to the number of
         columns (also returned by the method getNumColumns).
+
+The GIL is released while the computation runs, so independent SpatialPoolers
+can be run concurrently from multiple python threads. Do not share one SP
+(or one output SDR) between threads.
 )",
         py::arg("input"),
         py::arg("learn") = true,
         py::arg("output")
         ); 
 
+        // computeBatch
+        py_SpatialPooler.def("computeBatch", [](SpatialPooler& self,
+                py::array_t<Byte, py::array::c_style | py::array::forcecast> inputs,
+                const bool learn,
+                const UInt numThreads)
+            {
+              NTA_CHECK( inputs.ndim() >= 2 and
+                         static_cast<UInt>(inputs.size() / inputs.shape(0)) == self.getNumInputs() )
+                << "SpatialPooler.computeBatch: inputs must have shape (N, getNumInputs()), "
+                << "or (N, *getInputDimensions()).";
+              const UInt numInputs = static_cast<UInt>( inputs.shape(0) );
+              const Byte *data = inputs.data();
+
+              vector<SDR_sparse_t> active;
+              {
+                py::gil_scoped_release release;
+                active = self.computeBatch( data, numInputs, learn, numThreads );
+              }
+
+              // Pack the results as a sparse matrix in compressed sparse row format.
+              py::array_t<UInt> indptr( numInputs + 1u );
+              auto ptr = indptr.mutable_data();
+              ptr[0] = 0u;
+              for(UInt i = 0; i < numInputs; i++) {
+                ptr[i + 1u] = ptr[i] + static_cast<UInt>( active[i].size() );
+              }
+              py::array_t<UInt> indices( ptr[numInputs] );
+              auto out = indices.mutable_data();
+              for(const auto &row : active) {
+                out = std::copy( row.begin(), row.end(), out );
+              }
+              return py::make_tuple( indptr, indices );
+            },
+R"(
+Compute a batch of inputs, which are given as the rows of a numpy array.  This
+is intended for evaluating a trained SpatialPooler on a dataset, without making
+an SDR for every input.
+
+Argument inputs is an array with shape (N, getNumInputs()), or with shape
+        (N, *getInputDimensions()).  Nonzero values are active input bits.
+
+Argument learn, whether to learn.  With learn=False the inputs are independent
+        and they are computed in parallel, the results are the same as from
+        calling compute(input, False, output) for each row.  With learn=True
+        the rows are computed in order, by a single thread.
+
+Argument numThreads, number of threads used when learn=False.  Zero means use
+        all hardware threads.
+
+Returns a tuple (indptr, indices), the active columns as a sparse matrix in
+        compressed sparse row format: the active columns of row i are
+        indices[indptr[i] : indptr[i+1]], sorted.  To make a scipy matrix:
+        scipy.sparse.csr_matrix((numpy.ones(len(indices)), indices, indptr),
+                                shape=(N, sp.getNumColumns()))
+
+The GIL is released while the computation runs.
+)",
+        py::arg("inputs"),
+        py::arg("learn") = false,
+        py::arg("numThreads") = 0u
+        );
+
         // setBoostFactors
         py_SpatialPooler.def("setBoostFactors", [](SpatialPooler& self, py::array& x)
         {
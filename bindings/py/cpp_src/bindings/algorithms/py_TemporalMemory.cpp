@@ -70,7 +70,8 @@ Example usage:
                 , SynapseIdx
                 , bool
                 , UInt
-		, TemporalMemory::ANMode>(),
+		, TemporalMemory::ANMode
+                , UInt>(),
 R"(Initialize the temporal memory (TM) using the given parameters.
 
 Argument columnDimensions
@@ -135,6 +136,10 @@ Argument externalPredictiveInputs
 Argument anomalyMode (optional, default ANMode::RAW) selects mode for `TM.anomaly`.
     Options are ANMode {DISABLED, RAW, LIKELIHOOD, LOGLIKELIHOOD}
 
+Argument permanenceBits (optional, default 0) selects the storage of the synapses.
+    0 stores 32-bit float permanences.  8 or 16 quantizes the permanences to
+    that many bits and packs the synapses, which uses less memory.
+
 )"
                 , py::arg("columnDimensions")
                 , py::arg("cellsPerColumn") = 32
@@ -152,6 +157,7 @@ Argument anomalyMode (optional, default ANMode::RAW) selects mode for `TM.anomal
                 , py::arg("checkInputs") = true
                 , py::arg("externalPredictiveInputs") = 0u
 		, py::arg("anomalyMode") = TemporalMemory::ANMode::RAW
+                , py::arg("permanenceBits") = 0u
 		);
 
     py_HTM.def("getColumnDimensions", &TemporalMemory::getColumnDimensions);
@@ -166,6 +172,17 @@ Argument anomalyMode (optional, default ANMode::RAW) selects mode for `TM.anomal
     py_HTM.def("getPredictedSegmentDecrement", &TemporalMemory::getPredictedSegmentDecrement);
     py_HTM.def("getMaxSegmentsPerCell", &TemporalMemory::getMaxSegmentsPerCell);
     py_HTM.def("getMaxSynapsesPerSegment", &TemporalMemory::getMaxSynapsesPerSegment);
+    py_HTM.def("getNumThreads", &TemporalMemory::getNumThreads);
+    py_HTM.def("setNumThreads", &TemporalMemory::setNumThreads,
+R"(Number of threads which compute the segment activity, including the calling
+thread.  Zero means all hardware threads.  The results do not depend on it.)",
+        py::arg("numThreads"));
+    py_HTM.def("getCompactionThreshold", &TemporalMemory::getCompactionThreshold);
+    py_HTM.def("setCompactionThreshold", &TemporalMemory::setCompactionThreshold,
+R"(Garbage collect the destroyed segments and synapses when their fraction
+exceeds the threshold.  Zero (default) disables it.  This renumbers the
+segments and is not serialized.)",
+        py::arg("threshold"));
     py_HTM.def("getCheckInputs", &TemporalMemory::getCheckInputs);
 
         py_HTM.def("printParameters",
@@ -181,6 +198,39 @@ Argument anomalyMode (optional, default ANMode::RAW) selects mode for `TM.anomal
         py_HTM.def("loadFromFile",
 				    [](TemporalMemory &self, const std::string& filename) { return self.loadFromFile(filename,SerializableFormat::BINARY); });
 
+        py_HTM.def("saveFrozen", &HTM_t::saveFrozen,
+R"(Save a model for inference to a file, which loadFrozen() maps into memory
+instead of deserializing it.  The current state (active cells etc.) is not saved.)",
+            py::arg("path"));
+
+        py_HTM.def("loadFrozen", &HTM_t::loadFrozen,
+R"(Load a model written by saveFrozen().  The synapses are used in place in the
+memory-mapped file, which is shared by all the processes that load it.  The
+loaded model is read-only: call compute() with learn = False.)",
+            py::arg("path"));
+
+        py_HTM.def("beginDeltas", &HTM_t::beginDeltas,
+R"(Start recording the changes for saveDelta().)");
+
+        py_HTM.def("endDeltas", &HTM_t::endDeltas);
+
+        py_HTM.def("isRecordingDeltas", &HTM_t::isRecordingDeltas);
+
+        py_HTM.def("saveDelta",
+            [](HTM_t &self) {
+                std::stringstream buf;
+                self.saveDelta( buf );
+                return py::bytes( buf.str() ); },
+R"(Returns the changes since beginDeltas() or the previous saveDelta(), as bytes.)");
+
+        py_HTM.def("loadDelta",
+            [](HTM_t &self, const py::bytes &data) {
+                std::stringstream buf( data.cast<std::string>() );
+                self.loadDelta( buf ); },
+R"(Apply the bytes returned by saveDelta().  The deltas must be applied in order,
+starting from the state in which beginDeltas() was called.)",
+            py::arg("delta"));
+
         // writeToString, save TM to a JSON encoded string usable by loadFromString()
         py_HTM.def("writeToString", [](const TemporalMemory& self)
         {
@@ -232,6 +282,8 @@ Argument anomalyMode (optional, default ANMode::RAW) selects mode for `TM.anomal
 
         py_HTM.def("activateCells", [](HTM_t& self, const SDR& activeColumns, bool learn)
         {
+            activeColumns.getSparse(); // pin the input before releasing the GIL
+            py::gil_scoped_release release;
             self.activateCells(activeColumns, learn);
         },
 R"(Calculate the active cells, using the current active columns and
@@ -239,13 +291,23 @@ dendrite segments.  Grow and reinforce synapses.)"
             , py::arg("activeColumns"), py::arg("learn") = true);
 
         py_HTM.def("compute", [](HTM_t& self, const SDR &activeColumns, bool learn)
-            { self.compute(activeColumns, learn); },
+            {
+              activeColumns.getSparse(); // pin the input before releasing the GIL
+              py::gil_scoped_release release;
+              self.compute(activeColumns, learn);
+            },
                 py::arg("activeColumns"),
                 py::arg("learn") = true);
 
         py_HTM.def("compute", [](HTM_t& self, const SDR &activeColumns, bool learn,
                                  const SDR &externalPredictiveInputsActive, const SDR &externalPredictiveInputsWinners)
-            { self.compute(activeColumns, learn, externalPredictiveInputsActive, externalPredictiveInputsWinners); },
+            {
+              activeColumns.getSparse(); // pin the inputs before releasing the GIL
+              externalPredictiveInputsActive.getSparse();
+              externalPredictiveInputsWinners.getSparse();
+              py::gil_scoped_release release;
+              self.compute(activeColumns, learn, externalPredictiveInputsActive, externalPredictiveInputsWinners);
+            },
 R"(Perform one time step of the Temporal Memory algorithm.
 
 This method calls activateDendrites, then calls activateCells. Using
@@ -266,6 +328,10 @@ Argument externalPredictiveInputsWinners
     (optional) SDR of winning external predictive inputs.  When learning, only these
     inputs are considered active.
     externalPredictiveInputsWinners must be a subset of externalPredictiveInputsActive.
+
+The GIL is released while the computation runs, so independent TemporalMemories
+can be run concurrently from multiple python threads. Do not share one TM
+between threads.
 )",
                 py::arg("activeColumns"),
                 py::arg("learn") = true,
@@ -285,15 +351,25 @@ Resets sequence state of the TM.)");
             return cells;
         });
 
+        py_HTM.def("getActiveCells", [](const HTM_t& self, SDR &activeCells)
+            { self.getActiveCells(activeCells); },
+R"(Write the active cells into the given SDR, which can be reused for every time step.)",
+            py::arg("activeCells"));
+
         py_HTM.def("activateDendrites", [](HTM_t &self, bool learn) {
-            SDR externalPredictiveInputs({ self.externalPredictiveInputs });
-            self.activateDendrites(learn, externalPredictiveInputs, externalPredictiveInputs);
+            py::gil_scoped_release release;
+            self.activateDendrites(learn);
         },
             py::arg("learn"));
 
         py_HTM.def("activateDendrites",
             [](HTM_t &self, bool learn,const SDR &externalPredictiveInputsActive, const SDR &externalPredictiveInputsWinners)
-                { self.activateDendrites(learn, externalPredictiveInputsActive, externalPredictiveInputsWinners); },
+                {
+                  externalPredictiveInputsActive.getSparse(); // pin the inputs before releasing the GIL
+                  externalPredictiveInputsWinners.getSparse();
+                  py::gil_scoped_release release;
+                  self.activateDendrites(learn, externalPredictiveInputsActive, externalPredictiveInputsWinners);
+                },
 R"(Calculate dendrite segment activity, using the current active cells.  Call
 this method before calling getPredictiveCells, getActiveSegments, or
 getMatchingSegments.  In each time step, only the first call to this
@@ -321,6 +397,11 @@ See TM.compute() for details of the parameters.)",
             { return self.getPredictiveCells();},
 R"()");
 
+        py_HTM.def("getPredictiveCells", [](const HTM_t& self, SDR &predictiveCells)
+            { self.getPredictiveCells(predictiveCells); },
+R"(Write the predictive cells into the given SDR, which can be reused for every time step.)",
+            py::arg("predictiveCells"));
+
         py_HTM.def("getWinnerCells", [](const HTM_t& self)
         {
             auto dims = self.getColumnDimensions();
@@ -331,6 +412,11 @@ R"()");
         },
 R"()");
 
+        py_HTM.def("getWinnerCells", [](const HTM_t& self, SDR &winnerCells)
+            { self.getWinnerCells(winnerCells); },
+R"(Write the winner cells into the given SDR, which can be reused for every time step.)",
+            py::arg("winnerCells"));
+
         py_HTM.def("getActiveSegments", [](const HTM_t& self)
             { return self.getActiveSegments(); },
 R"()");
@@ -381,8 +467,8 @@ R"(Returns the number of cells in this TemporalMemory.)");
         py_HTM.def("numberOfColumns", &HTM_t::numberOfColumns,
 R"(Returns the total number of mini-columns.)");
 
-        py_HTM.def_property_readonly("connections", [](const HTM_t &self)
-            { return self.connections; },
+        py_HTM.def_property_readonly("connections", [](const HTM_t &self) -> const Connections&
+            { return self.connections; }, py::return_value_policy::reference_internal,
 R"(Internal Connections object. Danger!
 Modifying this may detrimentally effect the TM.
 The Connections class API is subject to change.)");
@@ -440,7 +440,30 @@ namespace htm_ext
             .def("getMinEnabledPhase", &htm::Network::getMinPhase)
             .def("getMaxEnabledPhase", &htm::Network::getMaxPhase)
             .def("setPhases",          &htm::Network::setPhases)
-            .def("run",                &htm::Network::run);
+            .def("run",                &htm::Network::run)
+            .def("setNumThreads",      &htm::Network::setNumThreads,
+                R"(Set the number of threads used by run(). 1 (default) runs the regions
+sequentially, 0 uses all hardware threads. Independent regions of the same phase
+are then computed concurrently, with results identical to a sequential run.)",
+                py::arg("numThreads"))
+            .def("getNumThreads",      &htm::Network::getNumThreads);
+
+        py_Network.def("enableProfiling", &htm::Network::enableProfiling,
+                R"(Start profiling the regions, links, phases and callbacks of run().
+If maxTraceEvents is not 0, also record up to that many timed events, see getProfilingTrace().)",
+                py::arg("maxTraceEvents") = 0u)
+            .def("disableProfiling", &htm::Network::disableProfiling)
+            .def("resetProfiling",   &htm::Network::resetProfiling)
+            .def("getProfilingReport", [](const htm::Network &self) {
+                    return py::module::import("json").attr("loads")(self.getProfilingReport());
+                },
+                R"(Returns the profiling statistics as a dict, with the durations in seconds
+(count, total, mean, min, max, p50, p90, p99) of the iterations, phases, callbacks,
+of prepareInputs and compute for each region and of each link, with its bytesCopied.)")
+            .def("getProfilingReportJSON", &htm::Network::getProfilingReport)
+            .def("getProfilingTrace", &htm::Network::getProfilingTrace,
+                R"(Returns the recorded events in the Chrome trace event format (JSON), which
+can be loaded in chrome://tracing or https://ui.perfetto.dev)");
 
         py_Network.def("initialize", &htm::Network::initialize);
 
@@ -59,6 +59,8 @@ namespace py = pybind11;
         case NTA_BasicType_UInt64: { return py::array({ a.getCount() }, { sizeof(UInt64) }, (UInt64*)a.getBuffer(), py::capsule(a.getBuffer())); }
         case NTA_BasicType_Real32: { return py::array({ a.getCount() }, { sizeof(Real32) }, (Real32*)a.getBuffer(), py::capsule(a.getBuffer())); }
         case NTA_BasicType_Real64: { return py::array({ a.getCount() }, { sizeof(Real64) }, (Real64*)a.getBuffer(), py::capsule(a.getBuffer())); }
+        // The dense buffer of the SDR, see ArrayBase::getSDR().
+        case NTA_BasicType_SDR: { return py::array({ a.getCount() }, { sizeof(Byte) }, (Byte*)a.getBuffer(), py::capsule(a.getBuffer())); }
 
         default:
             throw Exception(__FILE__, __LINE__, "Data type not implemented");
@@ -595,41 +597,139 @@ namespace py = pybind11;
         return s;
     }
 
+    // A read only view of the indices of the non-zero elements of an input.
+    static py::array create_sparse_view(const UInt32 *indices, size_t count)
+    {
+        py::array view;
+        if (count == 0)
+            view = py::array_t<UInt32>(0);  // the indices may be null
+        else
+            view = py::array({ count }, { sizeof(UInt32) }, indices, py::capsule(indices));
+        py::detail::array_proxy(view.ptr())->flags &= ~py::detail::npy_api::NPY_ARRAY_WRITEABLE_;
+        return view;
+    }
+
+    template<typename T>
+    static void nonzero(const T *data, size_t count, std::vector<UInt32> &indices)
+    {
+        indices.clear();
+        for (size_t i = 0; i < count; ++i)
+        {
+            if (data[i] != (T)0)
+                indices.push_back(static_cast<UInt32>(i));
+        }
+    }
+
+    // The indices of the non-zero elements of a dense input.
+    static void nonzero(const Array &a, std::vector<UInt32> &indices)
+    {
+        switch (a.getType())
+        {
+        case NTA_BasicType_Bool:   nonzero((const bool *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_Byte:   nonzero((const Byte *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_Int16:  nonzero((const Int16 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_UInt16: nonzero((const UInt16 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_Int32:  nonzero((const Int32 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_UInt32: nonzero((const UInt32 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_Int64:  nonzero((const Int64 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_UInt64: nonzero((const UInt64 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_Real32: nonzero((const Real32 *)a.getBuffer(), a.getCount(), indices); break;
+        case NTA_BasicType_Real64: nonzero((const Real64 *)a.getBuffer(), a.getCount(), indices); break;
+        default:
+            throw Exception(__FILE__, __LINE__, "Data type not implemented");
+        }
+    }
+
+    void PyBindRegion::createPortViews_()
+    {
+        const Spec& ns = nodeSpec_;
+
+        // Inputs with "sparse": True in the Python spec are passed to compute()
+        // as the indices of their non-zero elements.
+        inputViews_.clear();
+        inputViews_.resize(ns.inputs.getCount());
+        if (ns.inputs.getCount() > 0)
+        {
+            auto pyNodeSpec = node_.attr("getSpec")();
+            auto pyInputs = pyNodeSpec["inputs"];
+            for (size_t i = 0; i < ns.inputs.getCount(); ++i)
+            {
+                auto input = pyInputs[ns.inputs.getByIndex(i).first.c_str()];
+                inputViews_[i].sparse = input.contains("sparse") && input["sparse"].cast<bool>();
+            }
+        }
+        outputViews_.clear();
+        outputViews_.resize(ns.outputs.getCount());
+    }
+
     void PyBindRegion::compute()
     {
         const Spec& ns = nodeSpec_;
+        if (inputViews_.size() != ns.inputs.getCount() || outputViews_.size() != ns.outputs.getCount())
+            createPortViews_();
 
-        // Prepare the inputs dict
+        // Prepare the inputs dict.  The dicts are new at each call, so that a
+        // region may replace their entries, but the views in them are kept
+        // from one compute to the next and only recreated when the buffer
+        // moves or changes size.
         py::dict inputs;
         for (size_t i = 0; i < ns.inputs.getCount(); ++i)
         {
             const std::pair<std::string, InputSpec> & p = ns.inputs.getByIndex(i);
+            PortView_ & port = inputViews_[i];
 
             // Get the corresponding input buffer
             auto inp = region_->getInput(p.first);
             NTA_CHECK(inp);
-
-            // Set pa to point to the original input array
-            const htm::Array * pa = &(inp->getData());
+            const htm::Array & a = inp->getData();
 
             // Skip unlinked inputs of size 0
-    		    if (pa->getCount() == 0)
+            if (a.getCount() == 0)
+            {
+                port.view = py::object();
                 continue;
+            }
 
-
-            // Create a numpy array from pa, which wil be either
-            // the original input array or a stored input array copy
-            // (if a splitter map is needed)
-            inputs[p.first.c_str()] = create_numpy_view(*pa);
+            if (port.sparse)
+            {
+                const UInt32 * indices;
+                size_t count;
+                if (a.getType() == NTA_BasicType_SDR)
+                {
+                    const SDR_sparse_t & sparse = a.getSDR().getSparse();
+                    indices = sparse.data();
+                    count = sparse.size();
+                }
+                else
+                {
+                    nonzero(a, port.indices);
+                    indices = port.indices.data();
+                    count = port.indices.size();
+                }
+                if (!port.view || indices != port.buffer || count != port.count)
+                {
+                    port.view = create_sparse_view(indices, count);
+                    port.buffer = indices;
+                    port.count = count;
+                }
+            }
+            else if (!port.view || a.getBuffer() != port.buffer || a.getCount() != port.count)
+            {
+                // A numpy view of the input array, no data is copied.
+                port.view = create_numpy_view(a);
+                port.buffer = a.getBuffer();
+                port.count = a.getCount();
+            }
+            inputs[p.first.c_str()] = port.view;
         }
 
         // Prepare the outputs dict
         py::dict outputs;
-
         for (size_t i = 0; i < ns.outputs.getCount(); ++i)
         {
             // Get the current OutputSpec object
             const std::pair<std::string, OutputSpec> & p = ns.outputs.getByIndex(i);
+            PortView_ & port = outputViews_[i];
 
             // Get the corresponding output buffer
             auto out = region_->getOutput(p.first);
@@ -638,11 +738,26 @@ namespace py = pybind11;
                 continue;
 
             const Array & data = out->getData();
-            outputs[p.first.c_str()] = create_numpy_view(data);
+            if (!port.view || data.getBuffer() != port.buffer || data.getCount() != port.count)
+            {
+                port.view = create_numpy_view(data);
+                port.buffer = data.getBuffer();
+                port.count = data.getCount();
+            }
+            outputs[p.first.c_str()] = port.view;
         }
 
         py::args args = py::make_tuple(inputs, outputs);
         node_.attr("guardedCompute")(*args);
+
+        // The Python region wrote the dense buffer of its SDR outputs, which
+        // invalidates the sparse format cached by the SDR.
+        for (size_t i = 0; i < ns.outputs.getCount(); ++i)
+        {
+            auto out = region_->getOutput(ns.outputs.getByIndex(i).first);
+            if (out && out->getData().getType() == NTA_BasicType_SDR)
+                out->getData().getSDR();
+        }
     }
 
 
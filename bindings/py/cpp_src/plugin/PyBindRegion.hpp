@@ -27,6 +27,7 @@ Definition of the PyBindRegion class.  The base class for all Python Region impl
 
 #include <bindings/suppress_register.hpp>  //include before pybind11.h
 #include <pybind11/pybind11.h>
+#include <vector>
 
 #include <htm/types/Types.hpp>
 #include <htm/engine/RegionImpl.hpp>
@@ -140,6 +141,19 @@ namespace htm
 
         Spec nodeSpec_;   // locally cached version of spec.
 
+        // The numpy views of an input or output passed to compute(), which are
+        // reused while the buffer does not move.
+        struct PortView_ {
+            const void * buffer = nullptr;
+            size_t count = 0u;
+            bool sparse = false;            // pass the indices of the non-zero elements
+            std::vector<UInt32> indices;    // the indices, for inputs which are not SDRs
+            pybind11::object view;
+        };
+        std::vector<PortView_> inputViews_;
+        std::vector<PortView_> outputViews_;
+        void createPortViews_();
+
         std::string pickleSerialize() const;
         std::string extraSerialize() const;
 				void pickleDeserialize(std::string p);
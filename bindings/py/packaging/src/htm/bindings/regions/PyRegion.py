@@ -130,6 +130,9 @@ class PyRegion(_PyRegionMeta):
            - ``count`` (int) items in the input. 0 means unspecified.
            - ``required`` (bool) whether the input is must be connected
            - ``isDefaultInput`` (bool) must be True for exactly one input
+           - ``sparse`` (bool, optional) if True, compute() receives the
+             indices of the non-zero elements of this input, as a read only
+             ``uint32`` array, instead of the dense array
 
       - ``outputs`` (dict) similar structure to inputs. The keys
         are:
@@ -180,6 +183,11 @@ class PyRegion(_PyRegionMeta):
     C++ implementations already have access to the inputs and outputs.
     These inputs and outputs are dictionaries containing numpy arrays indexed
     by the name of the input or output.  They are not Array objects.
+    The arrays are views of the network's buffers, no data is copied, and the
+    same arrays are passed to every call while the buffers do not change.  The
+    dictionaries are new at each call, so replacing an entry only affects that
+    call.  A sparse input (see getSpec) may get a new array at each call, a
+    region which keeps it after compute() must copy it.
     
     The compute method should call the algorithm that it is implementing
     passing in the inputs and then populating the outputs with the results.
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# HTM Community Edition of NuPIC
+# Copyright (C) 2019, Numenta, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+# ----------------------------------------------------------------------
+
+"""Multi-threaded compute performance test.
+
+Runs several independent SpatialPooler + TemporalMemory models (hotgym sized)
+from python threads. The compute bindings release the GIL, so the throughput
+should scale with the number of threads (up to the number of cores).
+"""
+
+import sys
+import threading
+import time
+
+from htm.bindings.sdr import SDR
+from htm.algorithms import SpatialPooler as SP
+from htm.algorithms import TemporalMemory as TM
+
+
+
+_INPUT_SIZE = 1000
+_COLUMNS    = 1638
+_ITERATIONS = 200
+
+
+
+def _createModel(seed):
+  sp = SP(inputDimensions            = [_INPUT_SIZE],
+          columnDimensions           = [_COLUMNS],
+          potentialRadius            = _INPUT_SIZE,
+          potentialPct               = 0.85,
+          globalInhibition           = True,
+          localAreaDensity           = 0.04395604395604396,
+          synPermInactiveDec         = 0.006,
+          synPermActiveInc           = 0.04,
+          synPermConnected           = 0.14,
+          boostStrength              = 3.0,
+          wrapAround                 = True,
+          seed                       = seed)
+  tm = TM(columnDimensions          = [_COLUMNS],
+          cellsPerColumn            = 13,
+          activationThreshold       = 17,
+          initialPermanence         = 0.21,
+          connectedPermanence       = 0.14,
+          minThreshold              = 10,
+          maxNewSynapseCount        = 32,
+          permanenceIncrement       = 0.1,
+          permanenceDecrement       = 0.1,
+          maxSegmentsPerCell        = 128,
+          maxSynapsesPerSegment     = 64,
+          seed                      = seed)
+  return sp, tm
+
+
+
+def _runModel(model, inputs):
+  sp, tm = model
+  active = SDR( sp.getColumnDimensions() )
+  for inp in inputs:
+    sp.compute( inp, True, active )
+    tm.compute( active, True )
+
+
+
+def _runTest(numThreads, inputs):
+  models  = [ _createModel(seed) for seed in range(1, numThreads + 1) ]
+  threads = [ threading.Thread(target=_runModel, args=(m, inputs)) for m in models ]
+
+  start = time.time()
+  for t in threads: t.start()
+  for t in threads: t.join()
+  elapsed = time.time() - start
+
+  steps = numThreads * len(inputs)
+  print(numThreads, "thread(s):", steps, "model steps in", elapsed, "seconds.")
+  print("\t", steps / elapsed, "model steps per second.")
+  return steps / elapsed
+
+
+
+def main(maxThreads = 4):
+  """Measure throughput of 1..maxThreads independent models, each running in
+  its own python thread.
+  """
+  inputs = [ SDR( _INPUT_SIZE ).randomize( 0.05, seed ) for seed in range(_ITERATIONS) ]
+
+  baseline = _runTest(1, inputs)
+  for n in range(2, maxThreads + 1):
+    speed = _runTest(n, inputs)
+    print("\t speedup over 1 thread:", speed / baseline)
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
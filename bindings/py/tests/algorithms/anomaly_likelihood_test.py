@@ -0,0 +1,101 @@
+# ----------------------------------------------------------------------
+# HTM Community Edition of NuPIC
+# Copyright (C) 2020, Numenta, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+# ----------------------------------------------------------------------
+
+"""Equivalence tests of the C++ and python AnomalyLikelihood."""
+
+import pickle
+import unittest
+import numpy as np
+
+from htm.bindings.algorithms import AnomalyLikelihood, MultiMetricAnomalyLikelihood
+from htm.algorithms import anomaly_likelihood as py_an
+
+PARAMS = dict( learningPeriod = 30, estimationSamples = 50, historicWindowSize = 200,
+               reestimationPeriod = 20 )
+
+def _makeData(numRecords, seed):
+  """ Anomaly scores (float32, like TM.anomaly) and metric values, with a noisy
+  part, a calm part, and a stretch where the metric value is flat. """
+  rng    = np.random.RandomState( seed )
+  scores = rng.uniform( size=numRecords ).astype( np.float32 )
+  scores[ 300 : 500 ] *= np.float32( 0.05 )
+  values = rng.normal( 10.0, 2.0, size=numRecords ).astype( np.float32 )
+  values[ 600 : 800 ] = 10.0
+  return scores, values
+
+
+class AnomalyLikelihoodTest(unittest.TestCase):
+
+  def testMatchesPython(self):
+    scores, values = _makeData( 1000, 42 )
+    cpp = AnomalyLikelihood( **PARAMS )
+    py  = py_an.AnomalyLikelihood( **PARAMS )
+    for i, (score, value) in enumerate(zip(scores, values)):
+      expected = py.anomalyProbability( float(value), float(score) )
+      actual   = cpp.anomalyProbability( float(value), float(score) )
+      self.assertAlmostEqual( actual, expected, places=5, msg="record %d" % i )
+    self.assertEqual( cpp.getIteration(), 1000 )
+
+  def testNonNumericValues(self):
+    scores, _ = _makeData( 500, 1 )
+    cpp = AnomalyLikelihood( **PARAMS )
+    py  = py_an.AnomalyLikelihood( **PARAMS )
+    for score in scores:
+      self.assertAlmostEqual( cpp.anomalyProbability( "orange", float(score) ),
+                              py.anomalyProbability(  "orange", float(score) ), places=5 )
+
+  def testMultiMetric(self):
+    numMetrics = 5
+    data  = [ _makeData( 1000, seed ) for seed in range(numMetrics) ]
+    multi = MultiMetricAnomalyLikelihood( numMetrics, **PARAMS )
+    self.assertEqual( len(multi), numMetrics )
+    py    = [ py_an.AnomalyLikelihood( **PARAMS ) for _ in range(numMetrics) ]
+    for i in range(1000):
+      scores = np.array([ d[0][i] for d in data ])
+      values = np.array([ d[1][i] for d in data ])
+      likelihoods = multi.compute( scores, values )
+      self.assertEqual( likelihoods.shape, (numMetrics,) )
+      for m in range(numMetrics):
+        expected = py[m].anomalyProbability( float(values[m]), float(scores[m]) )
+        self.assertAlmostEqual( likelihoods[m], expected, places=5 )
+
+    with self.assertRaises( RuntimeError ):
+      multi.compute( np.zeros( numMetrics + 1 ))
+
+  def testReset(self):
+    scores, values = _makeData( 400, 5 )
+    cpp = AnomalyLikelihood( **PARAMS )
+    for score, value in zip(scores, values):
+      cpp.anomalyProbability( float(value), float(score) )
+    cpp.reset()
+    self.assertEqual( cpp.getIteration(), 0 )
+    self.assertEqual( cpp, AnomalyLikelihood( **PARAMS ))
+
+  def testPickle(self):
+    scores, values = _makeData( 400, 3 )
+    cpp = AnomalyLikelihood( **PARAMS )
+    for score, value in zip(scores[:300], values[:300]):
+      cpp.anomalyProbability( float(value), float(score) )
+    clone = pickle.loads( pickle.dumps( cpp ))
+    self.assertEqual( cpp, clone )
+    for score, value in zip(scores[300:], values[300:]):
+      self.assertEqual( cpp.anomalyProbability( float(value), float(score) ),
+                        clone.anomalyProbability( float(value), float(score) ))
+
+
+if __name__ == "__main__":
+  unittest.main()
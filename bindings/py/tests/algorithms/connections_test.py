@@ -15,9 +15,11 @@
 # along with this program.  If not, see http://www.gnu.org/licenses.
 # ----------------------------------------------------------------------
 
+import os
 import unittest
 import pytest
 import sys
+import tempfile
 
 from htm.bindings.sdr import SDR
 from htm.bindings.math import Random
@@ -206,6 +208,22 @@ class ConnectionsTest(unittest.TestCase):
 
 
 
+  def testCreateSynapses(self):
+    co = Connections(NUM_CELLS, 0.51)
+    seg = co.createSegment(NUM_CELLS-1, 1)
+    syn = co.createSynapse(seg, 7, 0.1)
+
+    # Duplicates, both among the candidates and with the existing synapse.
+    numNew = co.createSynapses(seg, np.array([3, 7, 5, 3, 9]), 0.6)
+    self.assertEqual(numNew, 3)
+    self.assertEqual(co.numSynapses(seg), 4)
+    self.assertEqual(list(co.presynapticCellsForSegment(seg)), [7, 3, 5, 9])
+    self.assertEqual(pytest.approx(co.permanenceForSynapse(syn)), 0.6, "update keeps the larger value")
+    self.assertEqual(co.numConnectedSynapses(seg), 4)
+
+    self.assertEqual(co.createSynapses(seg, np.arange(20), 0.2, maxNewSynapses=2), 2)
+    self.assertEqual(list(co.presynapticCellsForSegment(seg)), [7, 3, 5, 9, 0, 1])
+
   def testDestroySynapse(self):
     # empty connections, create segment seg and a synapse syn
     co = Connections(NUM_CELLS, 0.51)
@@ -408,6 +426,16 @@ class ConnectionsTest(unittest.TestCase):
     conn = Connections(1024, 0.123, False)
     self.assertAlmostEqual(conn.connectedThreshold,  0.123, places=4)
 
+  def testPermanenceBits(self):
+    self.assertEqual(Connections(NUM_CELLS, 0.51).permanenceBits, 0)
+    co = Connections(NUM_CELLS, 0.51, permanenceBits=8)
+    self.assertEqual(co.permanenceBits, 8)
+    seg = co.createSegment(1, 1)
+    syn = co.createSynapse(seg, 7, 0.3)
+    self.assertAlmostEqual(co.permanenceForSynapse(syn), round(0.3 * 255) / 255, places=6)
+    with pytest.raises(RuntimeError):
+      Connections(NUM_CELLS, 0.51, permanenceBits=12)
+
   def testCreateSegment(self):
     co = Connections(NUM_CELLS, 0.51)
     self.assertEqual(co.numSegments(), 0, "there are zero segments yet")
@@ -448,7 +476,63 @@ class ConnectionsTest(unittest.TestCase):
     self.assertEqual(co.numSegments(), 0, "segment should have been removed")
     with pytest.raises(RuntimeError):
       n2 = co.numConnectedSynapses(seg)
-    
+
+
+  def testCompact(self):
+    co = Connections(NUM_CELLS, 0.51)
+    segments = [co.createSegment(cell) for cell in range(10)]
+    for seg in segments:
+      co.createSynapse(seg, 42, 0.6)
+    for seg in segments[:5]:
+      co.destroySegment(seg)
+    self.assertEqual(co.segmentFlatListLength(), 10)
+
+    co.compact()
+    self.assertEqual(co.segmentFlatListLength(), 5)
+    self.assertEqual(co.numSegments(), 5)
+    self.assertEqual(co.numSynapses(), 5)
+    self.assertEqual(co.segmentsForCell(9), [4])
+
+    active = SDR(NUM_CELLS)
+    active.sparse = [42]
+    self.assertEqual(list(co.computeActivity(active, False)), [1] * 5)
+
+    # automatic
+    self.assertEqual(co.getCompactionThreshold(), 0)
+    co.setCompactionThreshold(0.5)
+    for cell in range(7, 10):
+      co.destroySegment(co.segmentsForCell(cell)[0])
+    self.assertEqual(co.segmentFlatListLength(), 5)
+    self.assertEqual(list(co.computeActivity(active, False)), [1] * 2)
+    self.assertEqual(co.segmentFlatListLength(), 2)
+
+
+  def testSaveFrozen(self):
+    co = Connections(NUM_CELLS, 0.51)
+    segments = [co.createSegment(cell) for cell in range(10)]
+    for seg in segments:
+      co.createSynapse(seg, 42, 0.6)
+      co.createSynapse(seg, 43, 0.2)
+    co.destroySegment(segments[0])
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, "connections.frozen")
+      co.saveFrozen(path)
+      mapped = Connections(NUM_CELLS, 0.51)
+      mapped.loadFrozen(path)
+      self.assertTrue(mapped.isMapped())
+      self.assertEqual(mapped.numSegments(), 9)
+
+      active = SDR(NUM_CELLS)
+      active.sparse = [42, 43]
+      connected, potential = mapped.computeActivityFull(active, False)
+      self.assertEqual(list(connected), [1] * 9)
+      self.assertEqual(list(potential), [2] * 9)
+
+      with pytest.raises(RuntimeError):
+        mapped.createSegment(20)
+      del mapped
+
 
 
 
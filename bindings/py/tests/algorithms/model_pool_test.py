@@ -0,0 +1,94 @@
+# ----------------------------------------------------------------------
+# HTM Community Edition of NuPIC
+# Copyright (C) 2020, Numenta, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU Affero Public License for more details.
+#
+# You should have received a copy of the GNU Affero Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+# ----------------------------------------------------------------------
+
+import unittest
+import numpy as np
+
+from htm.bindings.sdr import SDR
+from htm.algorithms import SpatialPooler as SP
+from htm.algorithms import TemporalMemory as TM
+from htm.algorithms import ModelPool
+
+INPUT_SIZE = 200
+COLUMNS    = 256
+
+def _makeModel():
+  sp = SP( [INPUT_SIZE], [COLUMNS], potentialRadius = INPUT_SIZE, globalInhibition = True )
+  tm = TM( [COLUMNS], cellsPerColumn = 4, activationThreshold = 6, minThreshold = 4,
+           maxNewSynapseCount = 10 )
+  return sp, tm
+
+def _makeInputs(numModels, step):
+  """ One repeating (period 5) random sequence per model. """
+  return np.array([ SDR( INPUT_SIZE ).randomize( .1, m * 1000 + step % 5 ).dense
+                    for m in range(numModels) ])
+
+
+class ModelPoolTest(unittest.TestCase):
+
+  def testCompute(self):
+    """ Results have the documented shapes and match a standalone model. """
+    sp, tm = _makeModel()
+    pool = ModelPool( 5, sp, tm, steps=[1, 2], numThreads=2 )
+    self.assertEqual( len(pool), 5 )
+    self.assertEqual( pool.getInputSize(), INPUT_SIZE )
+    self.assertEqual( pool.getSteps(), [1, 2] )
+
+    active = SDR( COLUMNS )
+    for step in range(20):
+      inputs = _makeInputs( 5, step )
+      anomaly, likelihood, predictions = pool.compute( inputs, True, np.arange(5) )
+      self.assertEqual( anomaly.shape,     (5,) )
+      self.assertEqual( likelihood.shape,  (5,) )
+      self.assertEqual( predictions.shape, (5, 2) )
+
+      sp.compute( _toSDR( inputs[3] ), True, active )
+      tm.compute( active, True )
+      self.assertAlmostEqual( anomaly[3], tm.anomaly, places=6 )
+
+    self.assertEqual( str(pool.getTemporalMemory(3)), str(tm) )
+
+  def testPredictions(self):
+    sp, tm = _makeModel()
+    pool = ModelPool( 3, sp, tm, steps=[1] )
+
+    bucket = lambda m, step: step % 5 + 10 * m
+    for step in range(100):
+      buckets = np.array([ bucket(m, step) for m in range(3) ])
+      anomaly, likelihood, predictions = pool.compute( _makeInputs( 3, step ), True, buckets )
+      if step == 0:
+        self.assertTrue( (predictions == -1).all() )
+
+    for m in range(3):
+      self.assertEqual( predictions[m, 0], bucket(m, 100) )
+
+  def testBadInputShape(self):
+    sp, tm = _makeModel()
+    pool = ModelPool( 2, sp, tm, steps=[] )
+    with self.assertRaises( RuntimeError ):
+      pool.compute( np.zeros( (3, INPUT_SIZE) ) )
+    with self.assertRaises( RuntimeError ):
+      pool.compute( np.zeros( (2, INPUT_SIZE) ), True, [1, 2, 3] )
+
+
+def _toSDR(dense):
+  sdr = SDR( dense.shape )
+  sdr.dense = dense
+  return sdr
+
+if __name__ == "__main__":
+  unittest.main()
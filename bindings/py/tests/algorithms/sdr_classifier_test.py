@@ -560,6 +560,58 @@ class ClassifierTest(unittest.TestCase):
     self.assertAlmostEqual(result2[0][1], 1.0, places=1)
 
 
+  def testBatch(self):
+    """ The batch methods match calling learn & infer for each pattern. """
+    patterns = [SDR(100).randomize(.1, seed) for seed in range(20)]
+    labels   = [seed % 4 for seed in range(20)]
+    sequential = Classifier()
+    for inp, label in zip(patterns, labels):
+      sequential.learn(inp, label)
+
+    batch = Classifier()
+    batch.learnBatch(patterns, labels)
+    pdfs = batch.inferBatch(patterns)
+    self.assertEqual(pdfs.shape, (20, 4))
+    for row, inp in zip(pdfs, patterns):
+      numpy.testing.assert_allclose(row, sequential.infer(inp))
+
+    # Same again, with the patterns as a sparse matrix in CSR format.
+    indptr  = numpy.cumsum([0] + [len(inp.sparse) for inp in patterns])
+    indices = numpy.concatenate([inp.sparse for inp in patterns])
+    csr = Classifier()
+    csr.learnBatch(indptr, indices, 100, [[label] for label in labels])
+    numpy.testing.assert_allclose(csr.inferBatch(indptr, indices), pdfs)
+
+    with self.assertRaises(RuntimeError):
+      batch.learnBatch(patterns, labels[:-1])
+
+
+  def testFloat32(self):
+    c = Classifier(alpha=0.1, float32=True)
+    self.assertTrue(c.isFloat32())
+    self.assertFalse(Classifier().isFloat32())
+    inp = SDR(100).randomize(.1)
+    for _ in range(10):
+      c.learn(inp, 3)
+    self.assertEqual(numpy.argmax(c.infer(inp)), 3)
+
+
+  def testHasLearned(self):
+    c = Classifier()
+    self.assertFalse(c.hasLearned())
+    inp = SDR(100).randomize(.1)
+    c.learn(inp, 3)
+    self.assertTrue(c.hasLearned())
+
+    pred = Predictor([1, 2])
+    pred.learn(0, inp, 3)
+    pred.learn(1, inp, 4)
+    self.assertTrue(pred.hasLearned(1))
+    self.assertFalse(pred.hasLearned(2))
+    with self.assertRaises(RuntimeError):
+      pred.hasLearned(3)
+
+
   @unittest.skip("TODO: Pickle unimpemented!")
   def testSerialization(self):
     c = Predictor([1], 1.0)
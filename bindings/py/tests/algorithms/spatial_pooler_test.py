@@ -38,6 +38,57 @@ class SpatialPoolerTest(unittest.TestCase):
     assert( active.getSum() > 0 )
 
 
+  def testComputeThreaded(self):
+    """ Independent SPs run from several threads (GIL released) must produce
+    the same results as when they run sequentially. """
+    import threading
+    NUM_MODELS = 4
+    ITERS      = 20
+    inputs = [ SDR( 100 ).randomize( .05, seed ) for seed in range(ITERS) ]
+
+    def run(sp, out):
+      active = SDR( 100 )
+      for inp in inputs:
+        sp.compute( inp, True, active )
+        out.append( active.sparse.tolist() )
+
+    expected = []
+    run( SP( [100], [100], stimulusThreshold = 1, seed = 7 ), expected )
+
+    results = [ [] for _ in range(NUM_MODELS) ]
+    threads = [ threading.Thread( target=run, args=(SP( [100], [100], stimulusThreshold = 1, seed = 7 ), results[i]) )
+                for i in range(NUM_MODELS) ]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    for res in results:
+      assert( res == expected )
+
+
+  def testComputeBatch(self):
+    sp = SP( [10, 10], [200], potentialRadius = 100, stimulusThreshold = 1, boostStrength = 2.0 )
+    inputs = np.array([ SDR( [10, 10] ).randomize( .1, seed ).dense for seed in range(1, 31) ])
+
+    expected = pickle.loads( pickle.dumps( sp ))
+    active   = SDR( 200 )
+    for learn in (True, False):
+      indptr, indices = sp.computeBatch( inputs, learn, numThreads = 2 )
+      self.assertEqual( indptr.shape, (len(inputs) + 1,) )
+      for row, dense in enumerate( inputs ):
+        inp = SDR( [10, 10] )
+        inp.dense = dense
+        expected.compute( inp, learn, active )
+        self.assertEqual( list(indices[ indptr[row] : indptr[row + 1] ]), list(active.sparse) )
+
+    # The rows may also be flattened.
+    indptr2, indices2 = sp.computeBatch( inputs.reshape( len(inputs), 100 ) )
+    self.assertTrue( (indptr2 == indptr).all() )
+    self.assertTrue( (indices2 == indices).all() )
+
+    with self.assertRaises( RuntimeError ):
+      sp.computeBatch( np.zeros( (5, 99) ) )
+
+
   def _runGetPermanenceTrial(self, float_type):
     """ 
     Check that getPermanence() returns values for a given float_type. 
@@ -60,6 +60,47 @@ class TemporalMemoryBindingsTest(unittest.TestCase):
     self.assertTrue( active.getSum() > 0 )
 
 
+  def testComputeThreaded(self):
+    """ Independent TMs run from several threads (GIL released) must produce
+    the same results as when they run sequentially. """
+    import threading
+    NUM_MODELS = 4
+    ITERS      = 20
+    inputs = [ SDR( 200 ).randomize( .05, seed ) for seed in range(ITERS) ]
+
+    def run(tm, out):
+      for inp in inputs:
+        tm.compute( inp, True )
+        out.append( tm.getActiveCells().sparse.tolist() )
+
+    expected = []
+    run( TM( [200], seed=7 ), expected )
+
+    results = [ [] for _ in range(NUM_MODELS) ]
+    threads = [ threading.Thread( target=run, args=(TM( [200], seed=7 ), results[i]) )
+                for i in range(NUM_MODELS) ]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    for res in results:
+      self.assertEqual( expected, res )
+
+
+  def testCompactionThreshold(self):
+    """ Compaction is off unless it is enabled, and it does not change the
+    results. """
+    inputs = [ SDR( 100 ).randomize( .1, seed ) for seed in range(200) ]
+    plain     = TM( [100], cellsPerColumn=1, maxSegmentsPerCell=2, seed=7 )
+    compacted = TM( [100], cellsPerColumn=1, maxSegmentsPerCell=2, seed=7 )
+    self.assertEqual( plain.getCompactionThreshold(), 0 )
+    compacted.setCompactionThreshold( 0.5 )
+    self.assertEqual( compacted.getCompactionThreshold(), 0.5 )
+    for inp in inputs:
+      plain.compute( inp, True )
+      compacted.compute( inp, True )
+      self.assertEqual( plain.getActiveCells(), compacted.getActiveCells() )
+
+
   def testPerformanceLarge(self):
     LARGE = 9000
     ITERS = 100 # This is lowered for unittest. Try 1000, 5000,...
@@ -190,6 +231,16 @@ class TemporalMemoryBindingsTest(unittest.TestCase):
     predictiveCellsSDR = tm.getPredictiveCells()
     tm.activateCells(activeColumnsA,True)
 
+    # The same, written into reusable SDRs.
+    cells = SDR( predictiveCellsSDR.dimensions )
+    tm.getActiveCells( cells )
+    self.assertEqual( cells, tm.getActiveCells() )
+    tm.getWinnerCells( cells )
+    self.assertEqual( cells, tm.getWinnerCells() )
+    tm.activateDendrites(True)
+    tm.getPredictiveCells( cells )
+    self.assertEqual( cells, tm.getPredictiveCells() )
+
     _print("\nColumnsA")
     _print("activeCols:"+str(len(activeColumnsA.sparse)))
     _print("activeCells:"+str(len(tm.getActiveCells().sparse)))
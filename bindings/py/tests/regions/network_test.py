@@ -93,6 +93,68 @@ class LinkRegion(PyRegion):
       "parameters": { }
     }
 
+class SparseInputRegion(PyRegion):
+  """
+  Test region used to test the sparse inputs and the SDR outputs
+  """
+  instances = []
+  def __init__(self):
+    self.calls = []
+    SparseInputRegion.instances.append(self)
+  def initialize(self): pass
+  def compute(self, inputs, outputs):
+    self.calls.append((inputs, outputs, dict(inputs)))
+    outputs["sdr"][:] = 0
+    if "sparse" in inputs:
+      outputs["sdr"][inputs["sparse"]] = 1
+    # Replacing an entry must not affect the next call.
+    inputs["dense"] = None
+    outputs["sdr"] = None
+
+  def getOutputElementCount(self, name):
+    return 5
+
+  @classmethod
+  def getSpec(cls):
+    return {
+      "description": SparseInputRegion.__doc__,
+      "inputs": {
+        "dense": {
+          "description": "Real32 Data",
+          "dataType": "Real32",
+          "isDefaultInput": True,
+          "required": False,
+          "count": 0
+        },
+        "sparse": {
+          "description": "Real32 Data, as indices",
+          "dataType": "Real32",
+          "isDefaultInput": False,
+          "required": False,
+          "count": 0,
+          "sparse": True
+        },
+        "sdr": {
+          "description": "SDR, as indices",
+          "dataType": "SDR",
+          "isDefaultInput": False,
+          "required": False,
+          "count": 0,
+          "sparse": True
+        },
+      },
+      "outputs": {
+        "sdr": {
+          "description": "SDR",
+          "dataType": "SDR",
+          "isDefaultOutput": True,
+          "required": False,
+          "count": 0
+        },
+      },
+      "parameters": { }
+    }
+
 class NetworkTest(unittest.TestCase):
 
   def setUp(self):
@@ -321,6 +383,122 @@ class NetworkTest(unittest.TestCase):
     #print(EXPECTED_RESULT3)
     self.assertTrue(np.array_equal(sdr.sparse, EXPECTED_RESULT3))
 
+  def testParallelRun(self):
+    """
+    Independent regions of the same phase run concurrently, with the same
+    results as a sequential run.
+    """
+    def build(numThreads):
+      net = engine.Network()
+      for c in range(3):
+        net.addRegion("encoder%d" % c, "ScalarSensor", "{n: 60, w: 5}")
+        net.addRegion("sp%d" % c, "SPRegion", "{columnCount: 200}")
+        net.addRegion("tm%d" % c, "TMRegion", "")
+        net.link("encoder%d" % c, "sp%d" % c)
+        net.link("sp%d" % c, "tm%d" % c)
+      for c in range(3):
+        net.setPhases("encoder%d" % c, {0})
+        net.setPhases("sp%d" % c, {1})
+        net.setPhases("tm%d" % c, {2})
+      net.setNumThreads(numThreads)
+      net.initialize()
+      return net
+
+    serial   = build(1)
+    parallel = build(3)
+    self.assertEqual(parallel.getNumThreads(), 3)
+    for i in range(20):
+      for c in range(3):
+        value = ((i * (c + 1)) % 10) / 10.0
+        serial.getRegion("encoder%d" % c).setParameterReal64("sensedValue", value)
+        parallel.getRegion("encoder%d" % c).setParameterReal64("sensedValue", value)
+      serial.run(1)
+      parallel.run(1)
+
+      for c in range(3):
+        for name in ("sp%d" % c, "tm%d" % c):
+          self.assertTrue(np.array_equal(
+                serial.getRegion(name).getOutputArray("bottomUpOut"),
+                parallel.getRegion(name).getOutputArray("bottomUpOut")))
+
+  def testProfiling(self):
+    """
+    The profiling report has the durations of each region and link, and the
+    trace is in the Chrome trace event format.
+    """
+    net = engine.Network()
+    net.addRegion("encoder", "ScalarSensor", "{n: 60, w: 5}")
+    net.addRegion("sp", "SPRegion", "{columnCount: 200}")
+    net.link("encoder", "sp")
+    net.enableProfiling(maxTraceEvents=100)
+    for i in range(10):
+      net.getRegion("encoder").setParameterReal64("sensedValue", i / 10.0)
+      net.run(1)
+
+    report = net.getProfilingReport()
+    self.assertEqual(report["iterations"]["count"], 10)
+    self.assertEqual(report["regions"]["sp"]["type"], "SPRegion")
+    self.assertEqual(report["regions"]["sp"]["compute"]["count"], 10)
+    sp = report["regions"]["sp"]["compute"]
+    self.assertLessEqual(sp["min"], sp["p50"])
+    self.assertLessEqual(sp["p50"], sp["p99"])
+    self.assertLessEqual(sp["p99"], sp["max"])
+    self.assertEqual(len(report["links"]), 1)
+    self.assertEqual(report["links"][0]["compute"]["count"], 10)
+    self.assertEqual(json.loads(net.getProfilingReportJSON()), report)
+
+    trace = json.loads(net.getProfilingTrace())
+    self.assertEqual(len(trace["traceEvents"]), 100)
+    self.assertTrue(all(e["ph"] == "X" for e in trace["traceEvents"]))
+    self.assertGreater(trace["otherData"]["droppedEvents"], 0)
+
+    net.resetProfiling()
+    net.disableProfiling()
+    net.run(1)
+    self.assertEqual(net.getProfilingReport()["iterations"]["count"], 0)
+
+  def testPortViews(self):
+    """
+    compute() gets the same zero-copy views at each call, in new dicts, and
+    the indices of the sparse inputs.  The SDR outputs written by Python are seen by links.
+    """
+    engine.Network.registerPyRegion(SparseInputRegion.__module__, SparseInputRegion.__name__)
+    SparseInputRegion.instances = []
+    try:
+      network = engine.Network()
+      r_from = network.addRegion("from", "py.LinkRegion", "")
+      a1 = network.addRegion("a1", "py.SparseInputRegion", "")
+      a2 = network.addRegion("a2", "py.SparseInputRegion", "")
+      b = network.addRegion("b", "py.SparseInputRegion", "")
+      network.link("from", "a1", "", "", "Real32", "dense")
+      network.link("from", "a1", "", "", "Real32", "sparse")
+      network.link("from", "a2", "", "", "Real32", "sparse")
+      network.link("a1", "b", "", "", "sdr", "sdr")
+      network.link("a2", "b", "", "", "sdr", "sdr")
+      network.initialize()
+
+      r_from.setInputArray("Real32", np.array([0, 2, 0, 1, 0], dtype=np.float32))
+      network.run(1)
+      r_from.setInputArray("Real32", np.array([4, 0, 0, 0, 0], dtype=np.float32))
+      network.run(1)
+
+      calls = SparseInputRegion.instances[0].calls
+      self.assertEqual(len(calls), 2)
+      (inputs1, outputs1, items1), (inputs2, outputs2, items2) = calls
+      self.assertIsNot(inputs1, inputs2)
+      self.assertIsNot(outputs1, outputs2)
+      self.assertIs(items1["dense"], items2["dense"])
+      self.assertTrue(np.array_equal(items2["dense"], [4, 0, 0, 0, 0]))
+      self.assertEqual(items1["sparse"].dtype, np.uint32)
+      self.assertFalse(items1["sparse"].flags.writeable)
+      self.assertEqual(list(items2["sparse"]), [0])
+
+      sdr = SparseInputRegion.instances[2].calls[-1][2]["sdr"]
+      self.assertEqual(list(sdr), [0, 5])
+      self.assertTrue(np.array_equal(b.getInputArray("sdr"), [1, 0, 0, 0, 0, 1, 0, 0, 0, 0]))
+    finally:
+      engine.Network.unregisterPyRegion(SparseInputRegion.__name__)
+
   def testExecuteCommand1(self):
     """
     Check to confirm that the ExecuteCommand( ) funtion works.
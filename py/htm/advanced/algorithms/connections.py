@@ -110,11 +110,10 @@ class Connections(CPPConnections):
         @param initialPermanence
         The permanence for each added synapse
         """
-        presynamptic_cells = [self.presynapticCellForSynapse(synapse) for synapse in self.synapsesForSegment(segment)]
-        active_cells_without_synapses = growthCandidates[np.isin(growthCandidates, presynamptic_cells, invert=True)]
+        presynaptic_cells = self.presynapticCellsForSegment(segment)
+        active_cells_without_synapses = growthCandidates[np.isin(growthCandidates, presynaptic_cells, invert=True)]
         
-        for c in active_cells_without_synapses:
-            self.createSynapse(segment, c, initialPermanence)
+        self.createSynapses(segment, active_cells_without_synapses, initialPermanence)
     
     def growSynapsesToSample(self, segment, growthCandidates, maxNew, initialPermanence, rng):
         """
@@ -136,13 +135,12 @@ class Connections(CPPConnections):
         @param rng
         Random number generator
         """
-        presynamptic_cells = [self.presynapticCellForSynapse(synapse) for synapse in self.synapsesForSegment(segment)]
-        active_cells_without_synapses = growthCandidates[np.isin(growthCandidates, presynamptic_cells, invert=True)]
+        presynaptic_cells = self.presynapticCellsForSegment(segment)
+        active_cells_without_synapses = growthCandidates[np.isin(growthCandidates, presynaptic_cells, invert=True)]
         if len(active_cells_without_synapses) > maxNew:
             active_cells_without_synapses = rng.sample(np.asarray(active_cells_without_synapses, dtype="uint32"), maxNew)
         
-        for c in active_cells_without_synapses:
-            self.createSynapse(segment, c, initialPermanence)
+        self.createSynapses(segment, active_cells_without_synapses, initialPermanence)
     
     def getSegmentCounts(self, cells):
         """
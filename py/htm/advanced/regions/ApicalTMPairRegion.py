@@ -24,6 +24,7 @@ Region for Temporal Memory with various apical implementations.
 import numpy as np
 
 from htm.bindings.regions.PyRegion import PyRegion
+from htm.advanced.support.numpy_helpers import activeIndices
 from htm.advanced.algorithms.apical_tiebreak_temporal_memory import ApicalTiebreakPairMemory
 
 
@@ -51,7 +52,8 @@ class ApicalTMPairRegion(PyRegion):
                     "required": True,
                     "regionLevel": True,
                     "isDefaultInput": True,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
                 "resetIn": {
                     "description": ("A boolean flag that indicates whether"
@@ -72,7 +74,8 @@ class ApicalTMPairRegion(PyRegion):
                     "required": False,
                     "regionLevel": True,
                     "isDefaultInput": False,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
                 "basalGrowthCandidates": {
                     "description": ("An array of 0's and 1's representing basal input " +
@@ -84,7 +87,8 @@ class ApicalTMPairRegion(PyRegion):
                     "required": False,
                     "regionLevel": True,
                     "isDefaultInput": False,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
                 "apicalInput": {
                     "description": "An array of 0's and 1's representing top down input."
@@ -94,7 +98,8 @@ class ApicalTMPairRegion(PyRegion):
                     "required": False,
                     "regionLevel": True,
                     "isDefaultInput": False,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
                 "apicalGrowthCandidates": {
                     "description": ("An array of 0's and 1's representing apical input " +
@@ -106,7 +111,8 @@ class ApicalTMPairRegion(PyRegion):
                     "required": False,
                     "regionLevel": True,
                     "isDefaultInput": False,
-                    "requireSplitterMap": False},
+                    "requireSplitterMap": False,
+                    "sparse": True},
             },
             "outputs": {
                 "predictedCells": {
@@ -444,25 +450,25 @@ class ApicalTMPairRegion(PyRegion):
                 outputs["winnerCells"][:] = 0
                 return
 
-        activeColumns = inputs["activeColumns"].nonzero()[0]
+        activeColumns = activeIndices(inputs["activeColumns"])
 
         if "basalInput" in inputs:
-            basalInput = inputs["basalInput"].nonzero()[0]
+            basalInput = activeIndices(inputs["basalInput"])
         else:
             basalInput = np.empty(0, dtype="uint32")
 
         if "apicalInput" in inputs:
-            apicalInput = inputs["apicalInput"].nonzero()[0]
+            apicalInput = activeIndices(inputs["apicalInput"])
         else:
             apicalInput = np.empty(0, dtype="uint32")
 
         if "basalGrowthCandidates" in inputs:
-            basalGrowthCandidates = inputs["basalGrowthCandidates"].nonzero()[0]
+            basalGrowthCandidates = activeIndices(inputs["basalGrowthCandidates"])
         else:
             basalGrowthCandidates = basalInput
 
         if "apicalGrowthCandidates" in inputs:
-            apicalGrowthCandidates = inputs["apicalGrowthCandidates"].nonzero()[0]
+            apicalGrowthCandidates = activeIndices(inputs["apicalGrowthCandidates"])
         else:
             apicalGrowthCandidates = apicalInput
 
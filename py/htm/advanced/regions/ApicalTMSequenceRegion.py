@@ -24,6 +24,7 @@ Region for Temporal Memory with various apical implementations.
 import numpy as np
 
 from htm.bindings.regions.PyRegion import PyRegion
+from htm.advanced.support.numpy_helpers import activeIndices
 from htm.advanced.algorithms.apical_tiebreak_temporal_memory import ApicalTiebreakSequenceMemory
 
 
@@ -52,7 +53,8 @@ class ApicalTMSequenceRegion(PyRegion):
                     "required": True,
                     "regionLevel": True,
                     "isDefaultInput": True,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
                 "resetIn": {
                     "description": ("A boolean flag that indicates whether"
@@ -74,7 +76,8 @@ class ApicalTMSequenceRegion(PyRegion):
                     "required": False,
                     "regionLevel": True,
                     "isDefaultInput": False,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
                 "apicalGrowthCandidates": {
                     "description": ("An array of 0's and 1's representing apical input "
@@ -86,7 +89,8 @@ class ApicalTMSequenceRegion(PyRegion):
                     "required": False,
                     "regionLevel": True,
                     "isDefaultInput": False,
-                    "requireSplitterMap": False
+                    "requireSplitterMap": False,
+                    "sparse": True
                 },
             },
             "outputs": {
@@ -394,15 +398,15 @@ class ApicalTMSequenceRegion(PyRegion):
                 outputs["winnerCells"][:] = 0
                 return
 
-        activeColumns = inputs["activeColumns"].nonzero()[0]
+        activeColumns = activeIndices(inputs["activeColumns"])
 
         if "apicalInput" in inputs:
-            apicalInput = inputs["apicalInput"].nonzero()[0]
+            apicalInput = activeIndices(inputs["apicalInput"])
         else:
             apicalInput = np.empty(0, dtype="uint32")
 
         if "apicalGrowthCandidates" in inputs:
-            apicalGrowthCandidates = inputs["apicalGrowthCandidates"].nonzero()[0]
+            apicalGrowthCandidates = activeIndices(inputs["apicalGrowthCandidates"])
         else:
             apicalGrowthCandidates = apicalInput
 
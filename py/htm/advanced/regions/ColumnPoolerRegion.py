@@ -21,6 +21,7 @@ import numpy
 import inspect
 
 from htm.bindings.regions.PyRegion import PyRegion
+from htm.advanced.support.numpy_helpers import activeIndices
 from htm.advanced.algorithms.column_pooler import ColumnPooler
 
 
@@ -61,7 +62,8 @@ class ColumnPoolerRegion(PyRegion):
                     required=True,
                     regionLevel=True,
                     isDefaultInput=True,
-                    requireSplitterMap=False),
+                    requireSplitterMap=False,
+                    sparse=True),
 
                 feedforwardGrowthCandidates=dict(
                     description=("An array of 0's and 1's representing feedforward input " +
@@ -73,7 +75,8 @@ class ColumnPoolerRegion(PyRegion):
                     required=False,
                     regionLevel=True,
                     isDefaultInput=False,
-                    requireSplitterMap=False),
+                    requireSplitterMap=False,
+                    sparse=True),
 
                 predictedInput=dict(
                     description=("An array of 0s and 1s representing input cells that " +
@@ -85,7 +88,8 @@ class ColumnPoolerRegion(PyRegion):
                     required=False,
                     regionLevel=True,
                     isDefaultInput=False,
-                    requireSplitterMap=False),
+                    requireSplitterMap=False,
+                    sparse=True),
 
                 lateralInput=dict(
                     description="Lateral binary input into this column, presumably from"
@@ -459,10 +463,12 @@ class ColumnPoolerRegion(PyRegion):
                 outputs["activeCells"][:] = 0
                 return
 
-        feedforwardInput = numpy.asarray(inputs["feedforwardInput"].nonzero()[0], dtype="uint32")
+        # The sparse inputs are uint32 arrays of the active indices, or dense
+        # arrays from older bindings, see activeIndices().
+        feedforwardInput = activeIndices(inputs["feedforwardInput"])
 
         if "feedforwardGrowthCandidates" in inputs:
-            feedforwardGrowthCandidates = numpy.asarray(inputs["feedforwardGrowthCandidates"].nonzero()[0], dtype="uint32")
+            feedforwardGrowthCandidates = activeIndices(inputs["feedforwardGrowthCandidates"])
         else:
             feedforwardGrowthCandidates = feedforwardInput
 
@@ -474,8 +480,7 @@ class ColumnPoolerRegion(PyRegion):
             lateralInputs = ()
 
         if "predictedInput" in inputs:
-            predictedInput = numpy.asarray(
-                inputs["predictedInput"].nonzero()[0], dtype="uint32")
+            predictedInput = activeIndices(inputs["predictedInput"])
         else:
             predictedInput = None
 
@@ -153,3 +153,21 @@ def getAllCellsInColumns(columns, cellsPerColumn):
     #        ...]
     # then flatten it.
     return ((columns * cellsPerColumn).reshape((-1, 1)) + np.arange(cellsPerColumn, dtype="uint32")).flatten()
+
+
+def activeIndices(values):
+    """
+    Get the indices of the active bits of a region input.
+
+    @param values (numpy array)
+    An input with "sparse": True in the region spec is passed to compute() as
+    a uint32 array of the active indices. Any other dtype is taken to be a
+    dense array of 0s and 1s, as passed by bindings without sparse inputs or
+    by a direct call to compute().
+
+    @return (numpy array)
+    The uint32 indices of the non-zero elements.
+    """
+    if values.dtype == np.uint32:
+        return values
+    return values.nonzero()[0].astype("uint32")
@@ -5,4 +5,7 @@ __all__ = [
     'Connections',
     'Classifier',
     'Predictor',
+    'ModelPool',
+    'AnomalyLikelihood',
+    'MultiMetricAnomalyLikelihood',
 ]
@@ -123,10 +123,15 @@ def main(parameters=default_parameters, argv=None, verbose=True):
     print(str(columns_stats))
 
     # Testing Loop
-    score = 0
+    # The SP is not learning, so it can compute all test images at once, in parallel.
+    test_inputs = []
     for img, lbl in test_data:
         encode(img, enc)
-        sp.compute( enc, False, columns )
+        test_inputs.append( enc.dense.copy() )
+    indptr, indices = sp.computeBatch( np.array(test_inputs), learn=False )
+    score = 0
+    for i, (img, lbl) in enumerate(test_data):
+        columns.sparse = indices[ indptr[i] : indptr[i+1] ]
         if lbl == np.argmax( sdrc.infer( columns ) ):
             score += 1
     score = score / len(test_data)
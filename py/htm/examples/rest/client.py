@@ -31,6 +31,7 @@ import requests
 import sys
 import json
 import math
+import struct
 
 verbose = True
 
@@ -104,6 +105,32 @@ def main(argv):
   #Note: Anomaly score will be 1 until there have been enough iterations to 'learn' the pattern.
 
 
+  # The same thing for the next EPOCHS records, in one batch message.
+  # Each record field is a UInt32 count followed by the values, see docs/NetworkAPI_REST.md.
+  body = b''
+  for e in range(EPOCHS):
+    x += 0.01
+    body += struct.pack('<Id', 1, math.sin(x))
+  message = URL+"/network/{}/batch?records={}&inputs=encoder.sensedValue:Real64&outputs=tm.anomaly".format(id, EPOCHS)
+  if verbose: print('POST ' + message)
+  res = requests.post(message, data=body)
+  if res.status_code != requests.codes.ok or res.content[0:6] == b'ERROR:':
+    print('Batch failed.')
+    print(res.text)
+    sys.exit(6)
+
+  records, outputs = struct.unpack_from('<II', res.content, 0)
+  pos = 8
+  for i in range(outputs):
+    length, = struct.unpack_from('<I', res.content, pos)
+    pos += 4 + length          # skip the type name, "Real32"
+  for i in range(records):
+    count, = struct.unpack_from('<I', res.content, pos)
+    scores = struct.unpack_from('<{}f'.format(count), res.content, pos + 4)
+    pos += 4 + 4 * count
+    print('Anomaly Score: {}'.format(scores[0]))
+
+
 if __name__ == "__main__":
    main(sys.argv)
       
\ No newline at end of file
@@ -20,8 +20,11 @@
 import json
 import unittest
 
+import numpy as np
+
 from htm.bindings.engine_internal import Network
 from htm.advanced.support.register_regions import registerAllAdvancedRegions
+from htm.advanced.regions.ColumnPoolerRegion import ColumnPoolerRegion
 
 
 class ColumnPoolerRegionTest(unittest.TestCase):
@@ -70,6 +73,29 @@ class ColumnPoolerRegionTest(unittest.TestCase):
         net.run(3)
 
 
+    def testDenseInputs(self):
+        """The region accepts dense inputs as well as the sparse indices."""
+        sparseRegion = ColumnPoolerRegion(cellCount=1024, inputWidth=512, sdrSize=20)
+        denseRegion = ColumnPoolerRegion(cellCount=1024, inputWidth=512, sdrSize=20)
+        sparseRegion.initialize()
+        denseRegion.initialize()
+
+        rng = np.random.RandomState(42)
+        for _ in range(5):
+            active = np.sort(rng.choice(512, 30, replace=False)).astype("uint32")
+            dense = np.zeros(512, dtype="float32")
+            dense[active] = 1
+
+            sparseOutputs = {"activeCells": np.zeros(1024, dtype="float32"),
+                             "feedForwardOutput": np.zeros(1024, dtype="float32")}
+            denseOutputs = {"activeCells": np.zeros(1024, dtype="float32"),
+                            "feedForwardOutput": np.zeros(1024, dtype="float32")}
+            sparseRegion.compute({"feedforwardInput": active}, sparseOutputs)
+            denseRegion.compute({"feedforwardInput": dense}, denseOutputs)
+            self.assertTrue(np.array_equal(sparseOutputs["activeCells"], denseOutputs["activeCells"]))
+            self.assertGreater(denseOutputs["activeCells"].sum(), 0)
+
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -168,8 +168,8 @@ class TestCommand(BaseTestCommand):
     cwd = os.getcwd()
     errno = 0
     # run c++ tests (from python)
-    cpp_tests = os.path.join(REPO_DIR, "build", "Release", "bin", "unit_tests")
-    subprocess.check_call([cpp_tests])
+    for cpp_tests in ("unit_tests", "allocation_tests"):
+      subprocess.check_call([os.path.join(REPO_DIR, "build", "Release", "bin", cpp_tests)])
     os.chdir(cwd)
     
 
@@ -49,6 +49,10 @@
 //       Execute a predefined command on a region. <command> must start with the
 //       command name followed by the arguments.
 //       The data could also be in the body.
+//  POST /network/<id>/batch?records=<N>&inputs=<fields>&outputs=<fields>
+//       Execute N iterations, one per binary record in the body, and return the
+//       listed outputs of every iteration in one binary response.
+//       See RESTapi::batch_run_request() for the encoding.
 //
 //  GET  /hi
 //       Respond with "Hello World\n" as a way to check client to server connection.
@@ -227,6 +231,31 @@ public:
       res.set_content(result+"\n", "text/plain");
     });
 
+    //  POST /network/<id>/batch?records=<N>&inputs=<fields>&outputs=<fields>
+    //       Execute N iterations with the binary records in the body.
+    //       Returns the binary outputs of all iterations, or an error message as text.
+    svr.Post("/network/.*/batch", [](const Request &req, Response &res) {
+      std::vector<std::string> flds = split(req.path, '/');
+      std::string id = flds[2];
+      std::string records, inputs, outputs;
+      auto ix = req.params.find("records");
+      if (ix != req.params.end())
+        records = ix->second;
+      ix = req.params.find("inputs");
+      if (ix != req.params.end())
+        inputs = ix->second;
+      ix = req.params.find("outputs");
+      if (ix != req.params.end())
+        outputs = ix->second;
+
+      RESTapi *interface = RESTapi::getInstance();
+      std::string result = interface->batch_run_request(id, records, inputs, outputs, req.body);
+      if (result.compare(0, 7, "ERROR: ") == 0)
+        res.set_content(result + "\n", "text/plain");
+      else
+        res.set_content(result, "application/octet-stream");
+    });
+
     //  GET  /network/<id>/region/<region name>/command?data=<command>
     //       Execute a predefined command on a region. <command> must start with the
     //       command name followed by the arguments.
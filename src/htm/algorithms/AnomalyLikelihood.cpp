@@ -1,7 +1,6 @@
 #include <htm/algorithms/AnomalyLikelihood.hpp>
 
-#include <iostream>
-#include <numeric> //accumulate, inner_product
+#include <algorithm> // min, max
 
 #include <htm/utils/Log.hpp> // NTA_CHECK
 
@@ -10,325 +9,361 @@ using namespace htm;
 
 namespace htm {
 
-static Real compute_mean(const vector<Real>& v); //forward declaration
-static Real compute_var(const vector<Real>& v, Real mean);
-static UInt calcSkipRecords_(UInt numIngested, UInt windowSize, UInt learningPeriod);
-
-
-AnomalyLikelihood::AnomalyLikelihood(UInt learningPeriod, UInt estimationSamples, UInt historicWindowSize, UInt reestimationPeriod, UInt aggregationWindow) :
-    learningPeriod(learningPeriod),
-    reestimationPeriod(reestimationPeriod),
-    probationaryPeriod(learningPeriod+estimationSamples),
-    averagedAnomaly_(aggregationWindow),
-    runningLikelihoods_(historicWindowSize),
-    runningRawAnomalyScores_(historicWindowSize),
-    runningAverageAnomalies_(historicWindowSize)
-    { //FIXME discuss aggregationWindow (python aggregates 20(window5)->4, here 20(w5)->20smooth
-        iteration_ = 0;
-        NTA_CHECK(historicWindowSize >= estimationSamples); // cerr << "estimationSamples exceeds historicWindowSize";
-        NTA_CHECK(aggregationWindow < reestimationPeriod && reestimationPeriod < historicWindowSize);
-	NTA_WARN << "C++ AnomalyLikelihood may still need some testing.";
+/** Likelihood filter, see _filterLikelihoods in the python implementation. */
+static const Real64 RED_THRESHOLD    = 1.0 - 0.99999;
+static const Real64 YELLOW_THRESHOLD = 1.0 - 0.999;
+
+/** The very broad distribution, which makes every anomaly score pretty likely. */
+static const Real64 NULL_MEAN  = 0.5;
+static const Real64 NULL_STDEV = 1e3;
+
+/** Relative rounding error of one update of the running statistics, with a margin. */
+static const Real64 ROUNDING = 16.0 * numeric_limits<Real64>::epsilon();
+
+
+MultiMetricAnomalyLikelihood::MultiMetricAnomalyLikelihood(UInt numMetrics, UInt learningPeriod, UInt estimationSamples,
+                                                           UInt historicWindowSize, UInt reestimationPeriod, UInt aggregationWindow) :
+    numMetrics_(numMetrics),
+    learningPeriod_(learningPeriod),
+    probationaryPeriod_(learningPeriod+estimationSamples),
+    historicWindowSize_(historicWindowSize),
+    reestimationPeriod_(reestimationPeriod),
+    aggregationWindow_(aggregationWindow)
+    {
+        NTA_CHECK(numMetrics > 0u) << "AnomalyLikelihood needs at least one metric.";
+        NTA_CHECK(historicWindowSize >= estimationSamples) << "estimationSamples exceeds historicWindowSize";
+        NTA_CHECK(probationaryPeriod_ > 0u) << "AnomalyLikelihood needs learningPeriod + estimationSamples > 0";
+        NTA_CHECK(reestimationPeriod > 0u);
+        NTA_CHECK(aggregationWindow > 0u && aggregationWindow <= historicWindowSize)
+          << "aggregationWindow must be in range [1, historicWindowSize]";
+
+        reset();
     }
 
 
-Real AnomalyLikelihood::anomalyProbability(Real anomalyScore, int timestamp) {
-    Real likelihood = DEFAULT_ANOMALY;
-
-    //time handling:
-    if (timestamp <0) { //use iterations
-      timestamp = this->iteration_;
-    } else { //use time
-      NTA_ASSERT(timestamp > lastTimestamp_); //monotonic time!
-      lastTimestamp_ = timestamp;//lastTimestamp_ is used just for this check
-    }
-    if(initialTimestamp_ == -1) { // (re)set first,initial timestamp
-      initialTimestamp_ = timestamp;
-    }
-    //if timestamp is not used (-1), this is iteration_
-    const UInt timeElapsed = (UInt)(timestamp - initialTimestamp_);  //this will be used, relative time since first timestamp (the "first" can be reseted)
-
-    // store into relevant variables
-    this->runningRawAnomalyScores_.append(anomalyScore);
-    auto newAvg = this->averagedAnomaly_.compute(anomalyScore);
-    this->runningAverageAnomalies_.append(newAvg);
-    this->iteration_++;
-
-    // We ignore the first probationaryPeriod data points - as we cannot reliably compute distribution statistics for estimating likelihood
-    if (timeElapsed < this->probationaryPeriod) {
-      this->runningLikelihoods_.append(likelihood); //after that, pushed below with real likelihood; here just 0.5
-      return DEFAULT_ANOMALY;
-    } //else {
-
-    const auto anomalies = this->runningAverageAnomalies_.getData();
-
-      // On a rolling basis we re-estimate the distribution
-      if ((timeElapsed >= initialTimestamp_ + reestimationPeriod)   || distribution_.name == "unknown" ) {
-        auto numSkipRecords = calcSkipRecords_(this->iteration_, (UInt)this->runningAverageAnomalies_.size(), this->learningPeriod); //FIXME this erase (numSkipRecords) is a problem when we use sliding window (as opposed to vector)! - should we skip only once on beginning, or on each call of this fn?
-        estimateAnomalyLikelihoods_(anomalies, numSkipRecords);  // called to update this->distribution_;
-        if  (timeElapsed >= initialTimestamp_ + reestimationPeriod)  { initialTimestamp_ = -1; } //reset init T
-      }
-
-    const auto likelihoods = updateAnomalyLikelihoods_(anomalies);
-
-      NTA_ASSERT(likelihoods.size() > 0);
-      likelihood = 1.0f - likelihoods[0];
-      NTA_ASSERT(likelihood >= 0.0 && likelihood <= 1.0);
-
-    this->runningLikelihoods_.append(likelihood);
-    NTA_ASSERT(runningLikelihoods_.size()==runningRawAnomalyScores_.size() &&
-             runningLikelihoods_.size()==runningAverageAnomalies_.size());
+void MultiMetricAnomalyLikelihood::reset() {
+  iteration_       = 0u;
+  hasDistribution_ = false;
+  refreshed_       = 0u;
+  scores_.clear();
+  averages_.clear();
+  values_.clear();
+  numNotNumeric_.assign(numMetrics_, 0u);
+  averageMean_.assign(numMetrics_, 0.0);
+  averageM2_.assign(numMetrics_, 0.0);
+  numValues_.assign(numMetrics_, 0u);
+  valueMean_.assign(numMetrics_, 0.0);
+  valueM2_.assign(numMetrics_, 0.0);
+  valueError_.assign(numMetrics_, 0.0);
+  mean_.assign(numMetrics_, NULL_MEAN);
+  stdev_.assign(numMetrics_, NULL_STDEV);
+  prevLikelihood_.assign(numMetrics_, 1.0);
+  average_.assign(numMetrics_, 0.0);
+}
 
-    return likelihood;
-    }
 
+/** Welford's update of the mean and the sum of squared deviations (m2) of a
+ * window, when x enters it and the window then holds n samples.  Returns a
+ * bound of the rounding error which this adds to m2. */
+static Real64 enterWindow(Real64 x, UInt n, Real64 &mean, Real64 &m2) {
+  const Real64 d = x - mean;
+  mean += d / n;
+  const Real64 e = x - mean;
+  m2 += d * e;
+  return ROUNDING * (m2 + fabs(d * e) + fabs(mean) * (fabs(d) + fabs(e)));
+}
 
-/**
-#
-# USAGE FOR LOW-LEVEL FUNCTIONS
-# -----------------------------
-#
-# There are two primary interface routines:
-#
-# estimateAnomalyLikelihoods_: batch routine, called initially and once in a
-#                                while
-# updateAnomalyLikelihoods: online routine, called for every new data point
-#
-# 1. Initially::
-#
-#    likelihoods, avgRecordList, estimatorParams = \
-# estimateAnomalyLikelihoods_(metric_data)
-#
-# 2. Whenever you get new data::
-#
-#    likelihoods, avgRecordList, estimatorParams = \
-# updateAnomalyLikelihoods(data2, estimatorParams)
-#
-# 3. And again (make sure you use the new estimatorParams returned in the above
-#   call to updateAnomalyLikelihoods!)::
-#
-#    likelihoods, avgRecordList, estimatorParams = \
-# updateAnomalyLikelihoods(data3, estimatorParams)
-#
-# 4. Every once in a while update estimator with a lot of recent data::
-#
-#    likelihoods, avgRecordList, estimatorParams = \
-# estimateAnomalyLikelihoods_(lots_of_metric_data)
-#
-**/
-
-Real AnomalyLikelihood::tailProbability_(Real x) const {
-     NTA_CHECK(distribution_.name != "unknown" && distribution_.stdev > 0);
-
-  if (x < distribution_.mean) {
-    // Gaussian is symmetrical around mean, so flip to get the tail probability
-    Real xp = 2 * distribution_.mean - x;
-    NTA_ASSERT(xp != x);
-    return tailProbability_(xp);
+/** The inverse of enterWindow(), x leaves a window which then holds n samples. */
+static Real64 leaveWindow(Real64 x, UInt n, Real64 &mean, Real64 &m2) {
+  if (n == 0u) {
+    mean = 0.0;
+    m2   = 0.0;
+    return 0.0;
   }
+  const Real64 d = x - mean;
+  mean -= d / n;
+  const Real64 e = x - mean;
+  m2 = max(0.0, m2 - d * e);
+  return ROUNDING * (m2 + fabs(d * e) + fabs(mean) * (fabs(d) + fabs(e)));
+}
 
-  // Calculate the Q function with the complementary error function, explained
-  // here: http://www.gaussianwaves.com/2012/07/q-function-and-error-functions
-  Real z = (x - distribution_.mean) / distribution_.stdev;
-  return (Real)(0.5 * erfc(z/1.4142));
+
+vector<Real> MultiMetricAnomalyLikelihood::compute(const vector<Real> &anomalyScores, const vector<Real> &values) {
+  NTA_CHECK(anomalyScores.size() == numMetrics_) << "AnomalyLikelihood: expected one anomaly score per metric.";
+  NTA_CHECK(values.empty() || values.size() == numMetrics_) << "AnomalyLikelihood: expected one value per metric.";
+  vector<Real> likelihoods(numMetrics_);
+  compute(anomalyScores.data(), values.empty() ? nullptr : values.data(), likelihoods.data());
+  return likelihoods;
 }
 
 
-DistributionParams AnomalyLikelihood::estimateNormal_(const vector<Real>& anomalyScores, bool performLowerBoundCheck) {
-    auto mean = compute_mean(anomalyScores);
-    auto var = compute_var(anomalyScores, mean);
-  DistributionParams params = DistributionParams("normal", mean, var, 0.0);
+void MultiMetricAnomalyLikelihood::compute(const Real *anomalyScores, const Real *values, Real *likelihoods) {
+  NTA_CHECK(anomalyScores != nullptr && likelihoods != nullptr);
+  const size_t M   = numMetrics_;
+  const UInt   t   = iteration_;
+  const UInt   W   = historicWindowSize_;
+  const size_t row = (t % W) * M;
 
-  if (performLowerBoundCheck) {
-    /* Handle edge case of almost no deviations and super low anomaly scores. We
-     find that such low anomaly means can happen, but then the slightest blip
-     of anomaly score can cause the likelihood to jump up to red.
-     */
-    if (params.mean < THRESHOLD_MEAN) { //TODO make these magic numbers a constructor parameter, or at least a const variable
-      params.mean= THRESHOLD_MEAN;
+  // Moving average of the anomaly scores, including the new one.
+  const UInt first = t + 1u >= aggregationWindow_ ? t + 1u - aggregationWindow_ : 0u;
+  for(size_t m = 0; m < M; m++) {
+    average_[m] = 0.0;
+  }
+  for(UInt i = first; i < t; i++) {
+    const Real *scores = &scores_[(i % W) * M];
+    for(size_t m = 0; m < M; m++) {
+      average_[m] += scores[m];
     }
+  }
+  const Real64 count = static_cast<Real64>(t + 1u - first);
+  for(size_t m = 0; m < M; m++) {
+    average_[m] = (average_[m] + anomalyScores[m]) / count;
+  }
 
-    // Catch all for super low variance to handle numerical precision issues
-    if (params.variance < THRESHOLD_VARIANCE) {
-      params.variance = THRESHOLD_VARIANCE;
+  // We ignore the first probationaryPeriod data points - as we cannot reliably compute distribution statistics for estimating likelihood
+  if (t < probationaryPeriod_) {
+    fill(likelihoods, likelihoods + M, DEFAULT_ANOMALY);
+  }
+  else {
+    // On a rolling basis we re-estimate the distribution
+    if (!hasDistribution_ || t % reestimationPeriod_ == 0u) {
+      estimateNormal_();
+    }
+    for(size_t m = 0; m < M; m++) {
+      const Real64 likelihood = tailProbability_(average_[m], mean_[m], stdev_[m]);
+      // Filter the likelihood values, so that we only preserve sharp increases in likelihood.
+      Real64 filtered = likelihood;
+      if (likelihood <= RED_THRESHOLD && prevLikelihood_[m] <= RED_THRESHOLD) {
+        filtered = YELLOW_THRESHOLD;
+      }
+      prevLikelihood_[m] = likelihood;
+      likelihoods[m] = static_cast<Real>(1.0 - filtered);
     }
   }
 
-  // Compute standard deviation
-  if (params.variance > 0) {
-    params.stdev = sqrt(params.variance);
-  } else{
-    params.stdev = 0;
+  // Update the history: drop the oldest record and store the new one.  The
+  // running statistics cover the records from learningPeriod on, so the new
+  // record enters them after the learning period, and the dropped one leaves
+  // them if it had entered them.
+  if (scores_.size() == row) {
+    scores_.resize(row + M);
+    averages_.resize(row + M);
+    values_.resize(row + M);
   }
-
-  return params;
-}
-
-  /**
-  Filter the list of raw (pre-filtered) likelihoods so that we only preserve
-  sharp increases in likelihood. 'likelihoods' can be a numpy array of floats or
-  a list of floats.
-
-  :returns: A new list of floats likelihoods containing the filtered values.
-  **/
-static vector<Real> filterLikelihoods_(const vector<Real>& likelihoods, Real redThreshold=0.99999, Real yellowThreshold=0.999){ //TODO make the redThreshold params of AnomalyLikelihood constructor()
-  redThreshold    = 1.0f - redThreshold;  //TODO maybe we could use the true meaning already in the parameters
-  yellowThreshold = 1.0f - yellowThreshold;
-
-  NTA_CHECK(redThreshold > 0.0 && redThreshold < 1.0);
-  NTA_CHECK(yellowThreshold > 0.0 && yellowThreshold < 1.0);
-  NTA_CHECK(yellowThreshold >= redThreshold);
-
-  NTA_ASSERT(likelihoods.size() >= 1);
-  // The first value is untouched
-  vector<Real> filteredLikelihoods(likelihoods);
-
-  for (size_t i=1; i< likelihoods.size(); i++) {
-    // value is in the redzone & so was previous
-    if (likelihoods[i] <= redThreshold && filteredLikelihoods[i-1] <= redThreshold) { //TODO review the (original) IFs
-      filteredLikelihoods[i] = yellowThreshold;
+  const UInt start   = t > W ? t - W : 0u;
+  const UInt skip    = max(start, learningPeriod_);
+  UInt numAverages   = t > skip ? t - skip : 0u;
+  const bool dropped = t >= W && t - W >= learningPeriod_;
+  const bool added   = t >= learningPeriod_;
+  if (dropped) numAverages--;
+  for(size_t m = 0; m < M; m++) {
+    const Real value = values == nullptr ? numeric_limits<Real>::quiet_NaN() : values[m];
+    if (dropped) {
+      leaveWindow(averages_[row + m], numAverages, averageMean_[m], averageM2_[m]);
+      if (!std::isnan(values_[row + m])) {
+        numValues_[m]--;
+        valueError_[m] += leaveWindow(values_[row + m], numValues_[m], valueMean_[m], valueM2_[m]);
+        if (numValues_[m] == 0u) valueError_[m] = 0.0;
+      }
+    }
+    if (added) {
+      enterWindow(average_[m], numAverages + 1u, averageMean_[m], averageM2_[m]);
+      if (!std::isnan(value)) {
+        numValues_[m]++;
+        valueError_[m] += enterWindow(value, numValues_[m], valueMean_[m], valueM2_[m]);
+      }
     }
+    if (t >= W && std::isnan(values_[row + m])) {
+      numNotNumeric_[m]--;
+    }
+    if (std::isnan(value)) {
+      numNotNumeric_[m]++;
+    }
+    scores_[row + m]   = anomalyScores[m];
+    averages_[row + m] = average_[m];
+    values_[row + m]   = value;
   }
-
-  NTA_ASSERT(filteredLikelihoods.size()==likelihoods.size());
-  return filteredLikelihoods;
+  iteration_++;
 }
 
 
-vector<Real>  AnomalyLikelihood::updateAnomalyLikelihoods_(const vector<Real>& anomalyScores, UInt verbosity) {
-  if (verbosity > 3) {
-    cout << "In updateAnomalyLikelihoods."<< endl;
-    cout << "Number of anomaly scores: "<<  anomalyScores.size() << endl;
-//    cout << "First 20:", anomalyScores[0:min(20, len(anomalyScores))])
-    cout << "Params: name=" <<  distribution_.name << " mean="<<distribution_.mean <<" var="<<distribution_.variance <<" stdev="<<distribution_.stdev <<endl;
-  }
-
- NTA_CHECK(anomalyScores.size() > 0); // "Must have at least one anomalyScore"
-
-  // Compute moving averages of these new scores using the previous values
-  // as well as likelihood for these scores using the old estimator
-  vector<Real> likelihoods;
-  likelihoods.reserve(runningAverageAnomalies_.size());
-  for (size_t i = 0; i < runningAverageAnomalies_.size(); i++) { //TODO we could use transform() here (? or would it be less clear?)
-    auto newAverage = runningAverageAnomalies_[(UInt)i];
-    likelihoods.push_back(tailProbability_(newAverage));
+void MultiMetricAnomalyLikelihood::refreshStatistics_(size_t m) {
+  const size_t M = numMetrics_;
+  const UInt   t = iteration_;
+  const UInt   W = historicWindowSize_;
+  const UInt start = t > W ? t - W : 0u;
+  const UInt skip  = max(start, learningPeriod_);
+
+  // Two passes over the history, the means and then the squared deviations.
+  Real64 averageSum = 0.0, valueSum = 0.0;
+  UInt   numValues  = 0u;
+  for(UInt i = skip; i < t; i++) {
+    const size_t idx = (i % W) * M + m;
+    averageSum += averages_[idx];
+    if (!std::isnan(values_[idx])) {
+      valueSum += values_[idx];
+      numValues++;
+    }
   }
-
-/*
-  // Filter the likelihood values. First we prepend the historical likelihoods
-  // to the current set. Then we filter the values.  We peel off the likelihoods
-  // to return and the last windowSize values to store for later.
-  UInt toCrop = min((UInt)this->averagedAnomaly_.getMaxWindowSize(), (UInt)runningLikelihoods_.size());
-  this->runningLikelihoods_.insert(runningLikelihoods_.end() - toCrop, likelihoods.begin(),likelihoods.end()); //append & crop //We only update runningLikelihoods in the main loop, not here
-*/
-  auto filteredLikelihoods = filterLikelihoods_(likelihoods);
-
-  if (verbosity > 3) {
-    cout << "Number of likelihoods:"<< likelihoods.size() << endl;
-//    print("First 20 likelihoods:", likelihoods[0:min(20, len(likelihoods))])
-    cout << "Leaving updateAnomalyLikelihoods."<< endl;
+  const Real64 averageMean = t > skip ? averageSum / static_cast<Real64>(t - skip) : 0.0;
+  const Real64 valueMean   = numValues > 0u ? valueSum / static_cast<Real64>(numValues) : 0.0;
+  Real64 averageM2 = 0.0, valueM2 = 0.0;
+  for(UInt i = skip; i < t; i++) {
+    const size_t idx = (i % W) * M + m;
+    const Real64 deviation = averages_[idx] - averageMean;
+    averageM2 += deviation * deviation;
+    if (!std::isnan(values_[idx])) {
+      const Real64 valueDeviation = values_[idx] - valueMean;
+      valueM2 += valueDeviation * valueDeviation;
+    }
   }
-
-  return filteredLikelihoods;
+  averageMean_[m] = averageMean;
+  averageM2_[m]   = averageM2;
+  numValues_[m]   = numValues;
+  valueMean_[m]   = valueMean;
+  valueM2_[m]     = valueM2;
+  valueError_[m]  = ROUNDING * static_cast<Real64>(numValues) * valueM2;
 }
 
 
-vector<Real> AnomalyLikelihood::estimateAnomalyLikelihoods_(const vector<Real>& anomalyScores, UInt skipRecords, UInt verbosity) { //FIXME averagingWindow not used, I guess it's not a sliding window, but aggregating window (discrete steps)!
-  if (verbosity > 1) {
-    cout << "In estimateAnomalyLikelihoods_."<<endl;
-    cout << "Number of anomaly scores:" <<  anomalyScores.size() << endl;
-    cout << "Skip records="<<  skipRecords << endl;
-//    print("First 20:", anomalyScores[0:min(20, len(anomalyScores))])
-  }
-
-  NTA_CHECK(anomalyScores.size() > 0); // "Must have at least one anomalyScore"
-  auto dataValues = anomalyScores; //FIXME the "data" should be anomaly scores, or raw values?
+void MultiMetricAnomalyLikelihood::estimateNormal_() {
+  const size_t M = numMetrics_;
+  const UInt   t = iteration_;
+  const UInt   W = historicWindowSize_;
+  // The history contains the records [start, t), of which the records
+  // [skip, t) are used to estimate the distribution.
+  const UInt start = t > W ? t - W : 0u;
+  const UInt skip  = max(start, learningPeriod_);
+  hasDistribution_ = true;
 
-  // Estimate the distribution of anomaly scores based on aggregated records
-  if (dataValues.size()  <= skipRecords) {
-    this->distribution_ =  DistributionParams("normal", 0.5, 1e6, 1e3); //null distribution
-  } else {
-    dataValues.erase(dataValues.begin(), dataValues.begin() + skipRecords);// remove first skipRecords
-    this->distribution_ = estimateNormal_(dataValues);
+  if (skip >= t) {
+    fill(mean_.begin(),  mean_.end(),  NULL_MEAN);
+    fill(stdev_.begin(), stdev_.end(), NULL_STDEV);
   }
+  else {
+    // The running statistics accumulate rounding errors, so they are
+    // recomputed from the history once per historicWindowSize records.
+    if (t - refreshed_ >= W) {
+      for(size_t m = 0; m < M; m++) {
+        refreshStatistics_(m);
+      }
+      refreshed_ = t;
+    }
 
-  // Estimate likelihoods based on this distribution
-  vector<Real> likelihoods;
-  likelihoods.reserve(dataValues.size());
-  for (auto s : dataValues) {
-    likelihoods.push_back(tailProbability_(s));
-  }
-  // Filter likelihood values
-  auto filteredLikelihoods = filterLikelihoods_(likelihoods);
-
-
-/*  if verbosity > 1:
-    print("Discovered params=")
-    print(params)
-    print("Number of likelihoods:", len(likelihoods))
-    print("First 20 likelihoods:", (
-      filteredLikelihoods[0:min(20, len(filteredLikelihoods))] ))
-    print("leaving estimateAnomalyLikelihoods_")
-*/
+    const UInt   n      = t - skip;
+    const Real64 weight = static_cast<Real64>(n);
+    // The python implementation re-averages the history starting from its
+    // first record, so the first few moving averages in the history are
+    // taken over fewer than aggregationWindow anomaly scores.
+    const UInt numPartial = start > 0u ? aggregationWindow_ - 1u : 0u;
+    for(size_t m = 0; m < M; m++) {
+      // HACK ALERT! The TM currently does not handle constant metric values
+      // very well, so we explicitly detect and handle completely flat metric
+      // values by reporting them as not anomalous.  A metric whose running
+      // variance is within its rounding error of the threshold is
+      // recomputed, so that the check does not depend on the rounding.
+      const bool checkFlat = numNotNumeric_[m] == 0u;
+      if (checkFlat && fabs(valueM2_[m] - THRESHOLD_FLAT_METRIC * weight) <= valueError_[m]) {
+        refreshStatistics_(m);
+      }
 
-  return filteredLikelihoods;
-}
+      // Replace the moving averages of the partial records by the re-averaged ones.
+      Real64 mean  = averageMean_[m];
+      Real64 m2    = averageM2_[m];
+      Real64 total = 0.0;
+      for(UInt i = start; i < start + numPartial; i++) {
+        const size_t idx = (i % W) * M + m;
+        total += scores_[idx];
+        if (i < skip) continue;
+        const Real64 partial = total / static_cast<Real64>(i - start + 1u);
+        const Real64 delta   = partial - averages_[idx];
+        const Real64 newMean = mean + delta / weight;
+        m2  += delta * ((partial - newMean) + (averages_[idx] - mean));
+        mean = newMean;
+      }
+      Real64 variance = max(0.0, m2) / weight;
+
+      /* Handle edge case of almost no deviations and super low anomaly scores. We
+       find that such low anomaly means can happen, but then the slightest blip
+       of anomaly score can cause the likelihood to jump up to red.
+       */
+      if (mean < THRESHOLD_MEAN) {
+        mean = THRESHOLD_MEAN;
+      }
+      // Catch all for super low variance to handle numerical precision issues
+      if (variance < THRESHOLD_VARIANCE) {
+        variance = THRESHOLD_VARIANCE;
+      }
+      mean_[m]  = mean;
+      stdev_[m] = sqrt(variance);
 
+      if (checkFlat && valueM2_[m] / weight < THRESHOLD_FLAT_METRIC) {
+        stdev_[m] = NULL_STDEV;
+      }
+    }
+  }
 
-/// HELPER methods (only used internaly in this cpp file)
-static Real compute_mean(const vector<Real>& v)  { //TODO do we have a (more comp. stable) implementation of mean/variance?
-  NTA_ASSERT(v.size() > 0); //avoid division by zero!
-    Real sum = (Real)(std::accumulate(v.begin(), v.end(), 0.0));
-    return sum / v.size();
+  // The likelihood of the previous record, for the likelihood filter.
+  const size_t last = ((t - 1u) % W) * M;
+  for(size_t m = 0; m < M; m++) {
+    prevLikelihood_[m] = tailProbability_(averages_[last + m], mean_[m], stdev_[m]);
+  }
 }
 
 
-static Real compute_var(const vector<Real>& v, Real mean)  {
-  NTA_ASSERT(v.size() > 0); //avoid division by zero!
-    Real sq_sum = (Real)(std::inner_product(v.begin(), v.end(), v.begin(), 0.0));
-    return (sq_sum / v.size()) - (mean * mean);
+Real64 MultiMetricAnomalyLikelihood::tailProbability_(Real64 x, Real64 mean, Real64 stdev) {
+  if (x < mean) {
+    // Gaussian is symmetrical around mean, so flip to get the tail probability
+    x = 2.0 * mean - x;
+  }
+  // Calculate the Q function with the complementary error function, explained
+  // here: http://www.gaussianwaves.com/2012/07/q-function-and-error-functions
+  const Real64 z = (x - mean) / stdev;
+  return 0.5 * erfc(z / 1.4142);
 }
 
 
-static UInt calcSkipRecords_(UInt numIngested, UInt windowSize, UInt learningPeriod)  {
-    /** Return the value of skipRecords for passing to estimateAnomalyLikelihoods
-
-    If `windowSize` is very large (bigger than the amount of data) then this
-    could just return `learningPeriod`. But when some values have fallen out of
-    the historical sliding window of anomaly records, then we have to take those
-    into account as well so we return the `learningPeriod` minus the number
-    shifted out.
-
-    @param numIngested - (int) number of data points that have been added to the
-      sliding window of historical data points.
-    @param windowSize - (int) size of sliding window of historical data points.
-    @param learningPeriod - (int) the number of iterations required for the
-      algorithm to learn the basic patterns in the dataset and for the anomaly
-      score to 'settle down'.
-    **/
-    int diff = numIngested - (int)windowSize;
-    UInt numShiftedOut = max(0, diff);
-    return min(numIngested, max((UInt)0, learningPeriod - numShiftedOut));
+bool MultiMetricAnomalyLikelihood::operator==(const MultiMetricAnomalyLikelihood &a) const {
+  if (numMetrics_ != a.numMetrics_) return false;
+  if (learningPeriod_ != a.learningPeriod_) return false;
+  if (probationaryPeriod_ != a.probationaryPeriod_) return false;
+  if (historicWindowSize_ != a.historicWindowSize_) return false;
+  if (reestimationPeriod_ != a.reestimationPeriod_) return false;
+  if (aggregationWindow_ != a.aggregationWindow_) return false;
+  if (iteration_ != a.iteration_) return false;
+  if (hasDistribution_ != a.hasDistribution_) return false;
+  if (scores_ != a.scores_) return false;
+  if (averages_ != a.averages_) return false;
+  if (mean_ != a.mean_) return false;
+  if (stdev_ != a.stdev_) return false;
+  if (prevLikelihood_ != a.prevLikelihood_) return false;
+  if (numNotNumeric_ != a.numNotNumeric_) return false;
+  if (refreshed_ != a.refreshed_) return false;
+  if (averageMean_ != a.averageMean_) return false;
+  if (averageM2_ != a.averageM2_) return false;
+  if (numValues_ != a.numValues_) return false;
+  if (valueMean_ != a.valueMean_) return false;
+  if (valueM2_ != a.valueM2_) return false;
+  if (valueError_ != a.valueError_) return false;
+  // The values may be NaN, which is never equal to itself.
+  if (values_.size() != a.values_.size()) return false;
+  for (size_t i = 0; i < values_.size(); i++) {
+    if (values_[i] != a.values_[i] && !(std::isnan(values_[i]) && std::isnan(a.values_[i]))) return false;
+  }
+  return true;
 }
 
 
+AnomalyLikelihood::AnomalyLikelihood(UInt learningPeriod, UInt estimationSamples, UInt historicWindowSize, UInt reestimationPeriod, UInt aggregationWindow) :
+    MultiMetricAnomalyLikelihood(1u, learningPeriod, estimationSamples, historicWindowSize, reestimationPeriod, aggregationWindow)
+    {}
 
 
-bool AnomalyLikelihood::operator==(const AnomalyLikelihood &a) const {
-  if (learningPeriod != a.learningPeriod) return false;
-  if (reestimationPeriod != a.reestimationPeriod) return false;
-  if (probationaryPeriod != a.probationaryPeriod) return false;
-  if (distribution_.name != a.distribution_.name) return false;
-  if (distribution_.mean != a.distribution_.mean) return false;
-  if (distribution_.variance != a.distribution_.variance) return false;
-  if (distribution_.stdev != a.distribution_.stdev) return false;
-  if (iteration_ != a.iteration_) return false;
-  if (lastTimestamp_ != a.lastTimestamp_) return false;
-  if (initialTimestamp_ != a.initialTimestamp_) return false;
-  if (averagedAnomaly_ != a.averagedAnomaly_) return false;
-  if (runningLikelihoods_ != a.runningLikelihoods_) return false;
-  if (runningRawAnomalyScores_ != a.runningRawAnomalyScores_) return false;
-  return true;
+Real AnomalyLikelihood::anomalyProbability(Real anomalyScore, int timestamp, Real value) {
+  (void) timestamp;
+  Real likelihood;
+  compute(&anomalyScore, &value, &likelihood);
+  return likelihood;
 }
 
-
 } //ns
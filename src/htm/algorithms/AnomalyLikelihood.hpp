@@ -3,13 +3,15 @@
 
 #include <htm/types/Serializable.hpp>
 #include <htm/types/Types.hpp>
+#include <htm/utils/Log.hpp>
 #include <htm/utils/MovingAverage.hpp>
 #include <htm/utils/SlidingWindow.hpp>
-#include <htm/utils/Log.hpp>
 
+#include <algorithm>
+#include <cmath>
+#include <limits>
 #include <string>
 #include <vector>
-#include <cmath>
 
 /**
 Note: this implementation was converted from python repository https://github.com/numenta/nupic
@@ -30,14 +32,26 @@ USAGE
 There are 3 ways to use the code:
 - using the convenience Anomaly class with `mode=LIKELIHOOD` (method `compute()`),
 - using the AnomalyLikelihood helper class (method `anomalyProbability()`), or
-- using the raw individual functions.
+- using the MultiMetricAnomalyLikelihood class, which advances many independent
+  metrics by one record per call (method `compute()`).
 
 STATUS
 ------
-Our AnomalyLikelihood C++ code is not tested and proven correct. There are also no 
-Python bindings. For python code you can use `htm.algorithms.AnomalyLikelihood` 
-in pure python, which is located under the `py/` path. 
-
+The results are the same as those of the python class
+`htm.algorithms.anomaly_likelihood.AnomalyLikelihood` (up to floating point
+rounding).
+
+The python implementation re-estimates the distribution by re-averaging the
+whole history of anomaly scores every reestimationPeriod records.  This
+implementation keeps the moving averages in the history, and running
+statistics (Welford's mean and sum of squared deviations) of the moving
+averages and of the metric values in the history.  A re-estimation only
+corrects the few records at the start of the history which the python code
+averages from fewer than aggregationWindow scores, so every record costs a
+constant time.  The running statistics are recomputed from the history once per
+historicWindowSize records, which bounds their rounding errors, and whenever
+the flat metric check is closer to its threshold than the rounding error.  The
+history is kept in ring buffers.
 **/
 
 
@@ -45,16 +59,13 @@ namespace htm {
 
 using namespace std;
 
-struct DistributionParams {
-  DistributionParams(std::string name, Real mean, Real variance, Real stdev) :
-    name(name),mean(mean), variance(variance), stdev(stdev) {}
-  std::string name;
-  Real mean;
-  Real variance;
-  Real stdev;
-};
-
-class AnomalyLikelihood : public Serializable {
+/**
+ * Anomaly likelihood of many independent metrics, which all receive one record
+ * per call to compute().  The state of all metrics is stored in flat arrays,
+ * indexed by [record * size() + metric], so that each step is a few tight loops
+ * over the metrics.
+ */
+class MultiMetricAnomalyLikelihood : public Serializable {
 
   public:
 
@@ -62,10 +73,9 @@ class AnomalyLikelihood : public Serializable {
       NOTE: Anomaly likelihood scores are reported at a flat 0.5 for
     learningPeriod + estimationSamples iterations.
 
-    claLearningPeriod and learningPeriod are specifying the same variable,
-    although claLearningPeriod is a deprecated name for it.
+    @param numMetrics - (int) the number of independent metrics.
 
-    @param learningPeriod (claLearningPeriod: deprecated) - (int) the number of
+    @param learningPeriod - (int) the number of
       iterations required for the algorithm to learn the basic patterns in the
       dataset and for the anomaly score to 'settle down'. The default is based
       on empirical observations but in reality this could be larger for more
@@ -89,23 +99,32 @@ class AnomalyLikelihood : public Serializable {
       number as long as it is small relative to the total number of records
       processed.
 
+    @param aggregationWindow - (int) the number of anomaly scores in the moving
+      average, which is what the distribution is estimated from.
   **/
-    AnomalyLikelihood(UInt learningPeriod=288, UInt estimationSamples=100, UInt historicWindowSize=8640, UInt reestimationPeriod=100, UInt aggregationWindow=10);
+    MultiMetricAnomalyLikelihood(UInt numMetrics, UInt learningPeriod=288, UInt estimationSamples=100,
+                                 UInt historicWindowSize=8640, UInt reestimationPeriod=100, UInt aggregationWindow=10);
 
 
     /**
-    This is the main "compute" method.
+    Compute the anomaly likelihood of the next record of every metric.
 
-    Compute the probability that the current anomaly score represents
-    an anomaly given the historical distribution of anomaly scores. The closer
-    the number is to 1, the higher the chance it is an anomaly.
+    @param anomalyScores - Input, size(). The current anomaly score of each metric.
+    @param values - Input, size(), or nullptr. The current raw input value of
+      each metric, or NaN if it is not numeric.  It is used to detect metrics
+      which have a flat value: these are reported as not anomalous.
+    @param likelihoods - Output, size(). The anomaly likelihood of each metric.
+    **/
+    void compute(const Real *anomalyScores, const Real *values, Real *likelihoods);
 
-    @param anomalyScore - the current anomaly score
-    @param timestamp - (optional) timestamp of the ocurrence,
-                       default (-1) results in using iteration step.
-    @return the anomalyLikelihood for this record.
+    std::vector<Real> compute(const std::vector<Real> &anomalyScores,
+                              const std::vector<Real> &values = {});
+
+    /**
+    Forget the history of every metric, and start over with the learning period,
+    as a newly constructed instance.
     **/
-    Real anomalyProbability(Real anomalyScore, int timestamp=-1);
+    void reset();
 
 
   /**
@@ -120,46 +139,89 @@ class AnomalyLikelihood : public Serializable {
     return log(1.0000000001f - likelihood) / -23.02585084720009f;
   }
 
+    UInt size() const { return numMetrics_; }
+    UInt getIteration() const { return iteration_; }
+    UInt getLearningPeriod() const { return learningPeriod_; }
+    UInt getProbationaryPeriod() const { return probationaryPeriod_; }
+    UInt getHistoricWindowSize() const { return historicWindowSize_; }
+    UInt getReestimationPeriod() const { return reestimationPeriod_; }
+    UInt getAggregationWindow() const { return aggregationWindow_; }
+
 
   CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const {
-    std::string name("AnomalyLikelhood");
+    const std::string name("MultiMetricAnomalyLikelihood");
+    const UInt version = SERIALIZED_VERSION;
     ar(CEREAL_NVP(name),
-       CEREAL_NVP(distribution_.name),
-       CEREAL_NVP(distribution_.mean),
-       CEREAL_NVP(distribution_.variance),
-       CEREAL_NVP(distribution_.stdev),
+       CEREAL_NVP(version));
+    ar(CEREAL_NVP(numMetrics_),
+       CEREAL_NVP(learningPeriod_),
+       CEREAL_NVP(probationaryPeriod_),
+       CEREAL_NVP(historicWindowSize_),
+       CEREAL_NVP(reestimationPeriod_),
+       CEREAL_NVP(aggregationWindow_),
        CEREAL_NVP(iteration_),
-       CEREAL_NVP(lastTimestamp_),
-       CEREAL_NVP(initialTimestamp_),
-       CEREAL_NVP(averagedAnomaly_),
-       CEREAL_NVP(runningLikelihoods_),
-       CEREAL_NVP(runningRawAnomalyScores_),
-       CEREAL_NVP(runningAverageAnomalies_)
-    );
+       CEREAL_NVP(hasDistribution_),
+       CEREAL_NVP(scores_),
+       CEREAL_NVP(averages_),
+       CEREAL_NVP(values_),
+       CEREAL_NVP(numNotNumeric_),
+       CEREAL_NVP(refreshed_),
+       CEREAL_NVP(averageMean_),
+       CEREAL_NVP(averageM2_),
+       CEREAL_NVP(numValues_),
+       CEREAL_NVP(valueMean_),
+       CEREAL_NVP(valueM2_),
+       CEREAL_NVP(valueError_),
+       CEREAL_NVP(mean_),
+       CEREAL_NVP(stdev_),
+       CEREAL_NVP(prevLikelihood_));
   }
   template<class Archive>
   void load_ar(Archive & ar) {
-    std::string name; // for debugging
-    ar(CEREAL_NVP(name),
-       CEREAL_NVP(distribution_.name),
-       CEREAL_NVP(distribution_.mean),
-       CEREAL_NVP(distribution_.variance),
-       CEREAL_NVP(distribution_.stdev),
+    // Archives of the AnomalyLikelihood written before the multi-metric
+    // implementation start with the name "AnomalyLikelhood".
+    std::string name;
+    ar(CEREAL_NVP(name));
+    if (name == "AnomalyLikelhood") {
+      loadVersion1_(ar);
+      return;
+    }
+    NTA_CHECK(name == "MultiMetricAnomalyLikelihood")
+      << "AnomalyLikelihood: unknown serialized format " << name;
+    UInt version;
+    ar(CEREAL_NVP(version));
+    NTA_CHECK(version <= SERIALIZED_VERSION)
+      << "AnomalyLikelihood: unknown serialized format version " << version;
+    ar(CEREAL_NVP(numMetrics_),
+       CEREAL_NVP(learningPeriod_),
+       CEREAL_NVP(probationaryPeriod_),
+       CEREAL_NVP(historicWindowSize_),
+       CEREAL_NVP(reestimationPeriod_),
+       CEREAL_NVP(aggregationWindow_),
        CEREAL_NVP(iteration_),
-       CEREAL_NVP(lastTimestamp_),
-       CEREAL_NVP(initialTimestamp_));
-    ar(CEREAL_NVP(averagedAnomaly_));
-    ar(CEREAL_NVP(runningLikelihoods_));
-    ar(CEREAL_NVP(runningRawAnomalyScores_));
-    ar(CEREAL_NVP(runningAverageAnomalies_));
-    // Note: learningPeriod, reestimationPeriod, probationaryPeriod already set by constructor.
+       CEREAL_NVP(hasDistribution_),
+       CEREAL_NVP(scores_),
+       CEREAL_NVP(averages_),
+       CEREAL_NVP(values_),
+       CEREAL_NVP(numNotNumeric_),
+       CEREAL_NVP(refreshed_),
+       CEREAL_NVP(averageMean_),
+       CEREAL_NVP(averageM2_),
+       CEREAL_NVP(numValues_),
+       CEREAL_NVP(valueMean_),
+       CEREAL_NVP(valueM2_),
+       CEREAL_NVP(valueError_),
+       CEREAL_NVP(mean_),
+       CEREAL_NVP(stdev_),
+       CEREAL_NVP(prevLikelihood_));
+    average_.assign(numMetrics_, 0.0);
   }
 
 
-  bool operator==(const AnomalyLikelihood &a) const;
-  inline bool operator!=(const AnomalyLikelihood &a) const
+  bool operator==(const MultiMetricAnomalyLikelihood &a) const;
+  inline bool operator!=(const MultiMetricAnomalyLikelihood &a) const
       { return not ((*this) == a); }
 
 
@@ -174,84 +236,172 @@ class AnomalyLikelihood : public Serializable {
      * minimal thresholds of standard distribution, if values get lower (rounding err, constant values)
      * we round to these minimal defaults
      */
-    const Real THRESHOLD_MEAN = 0.03f;
-    const Real THRESHOLD_VARIANCE = 0.0003f;
+    const Real64 THRESHOLD_MEAN = 0.03;
+    const Real64 THRESHOLD_VARIANCE = 0.0003;
 
-    const UInt learningPeriod; //these 3 are from constructor
-    const UInt reestimationPeriod;
-    const UInt probationaryPeriod;
+    /**
+     * metrics whose values have a lower variance than this are considered flat
+     */
+    const Real64 THRESHOLD_FLAT_METRIC = 1.5e-5;
 
   private:
-    //methods:
+
+  // Version 1 is the format of the single metric AnomalyLikelihood, which had no version.
+  static const UInt SERIALIZED_VERSION = 2u;
 
   /**
-  Given a series of anomaly scores, compute the likelihood for each score. This
-  function should be called once on a bunch of historical anomaly scores for an
-  initial estimate of the distribution. It should be called again every so often
-  (say every 50 records) to update the estimate.
-
-  :param anomalyScores: a list of anomaly scores
-
-                        For best results, the list should be between 1000
-                        and 10,000 records
-  :param averagingWindow: integer number of records to average over
-  :param skipRecords: integer specifying number of records to skip when
-                      estimating distributions. If skip records are >=
-                      len(anomalyScores), a very broad distribution is returned
-                      that makes everything pretty likely.
-  :param verbosity: integer controlling extent of printouts for debugging
-
-                      0 = none
-                      1 = occasional information
-                      2 = print every record
-
-  :returns: vector of lilelihoods: , one for each aggregated point
+  Load an archive of version 1, which follows its name.  It contains the last
+  historicWindowSize raw anomaly scores and their moving averages, which
+  become the history.  It has no metric values, so they are not numeric.  The
+  parameters are those of this instance, they were not saved.
   **/
-    vector<Real> estimateAnomalyLikelihoods_(const vector<Real>& anomalyScores, UInt skipRecords=0, UInt verbosity=0);
-
+  template<class Archive>
+  void loadVersion1_(Archive & ar) {
+    NTA_CHECK(numMetrics_ == 1u)
+      << "AnomalyLikelihood: an archive of a single metric can not be loaded into " << numMetrics_ << " metrics";
+    std::string distributionName;
+    Real distributionMean, distributionVariance, distributionStdev;
+    UInt iteration;
+    int lastTimestamp, initialTimestamp;
+    MovingAverage averagedAnomaly(aggregationWindow_);
+    SlidingWindow<Real> likelihoods(historicWindowSize_);
+    SlidingWindow<Real> rawScores(historicWindowSize_);
+    SlidingWindow<Real> averages(historicWindowSize_);
+    ar(cereal::make_nvp("distribution_.name",       distributionName),
+       cereal::make_nvp("distribution_.mean",       distributionMean),
+       cereal::make_nvp("distribution_.variance",   distributionVariance),
+       cereal::make_nvp("distribution_.stdev",      distributionStdev),
+       cereal::make_nvp("iteration_",               iteration),
+       cereal::make_nvp("lastTimestamp_",           lastTimestamp),
+       cereal::make_nvp("initialTimestamp_",        initialTimestamp),
+       cereal::make_nvp("averagedAnomaly_",         averagedAnomaly),
+       cereal::make_nvp("runningLikelihoods_",      likelihoods),
+       cereal::make_nvp("runningRawAnomalyScores_", rawScores),
+       cereal::make_nvp("runningAverageAnomalies_", averages));
+    // Only the history and the distribution are used, the rest of the state
+    // is rebuilt from the history.
+    UNUSED(distributionVariance);
+    UNUSED(lastTimestamp);
+    UNUSED(initialTimestamp);
+
+    const std::vector<Real> scores   = rawScores.getLinearizedData();
+    const std::vector<Real> averaged = averages.getLinearizedData();
+    const UInt W = historicWindowSize_;
+    NTA_CHECK(scores.size() == std::min(iteration, W) && averaged.size() == scores.size())
+      << "AnomalyLikelihood: the archive holds " << scores.size() << " records of "
+      << iteration << ", expected a historicWindowSize of " << W;
+    const UInt t = iteration;
+    reset();
+    iteration_ = t;
+    scores_.resize(scores.size());
+    averages_.resize(scores.size());
+    values_.assign(scores.size(), std::numeric_limits<Real>::quiet_NaN());
+    numNotNumeric_[0] = static_cast<UInt>(scores.size());
+    for(UInt i = t - static_cast<UInt>(scores.size()), j = 0u; i < t; i++, j++) {
+      scores_[i % W]   = scores[j];
+      averages_[i % W] = averaged[j];
+    }
+    for(size_t m = 0; m < numMetrics_; m++) {
+      refreshStatistics_(m);
+    }
+    refreshed_ = t;
+    if (distributionName != "unknown") {
+      hasDistribution_   = true;
+      mean_[0]           = distributionMean;
+      stdev_[0]          = distributionStdev;
+      prevLikelihood_[0] = t > 0u ? tailProbability_(averages_[(t - 1u) % W], mean_[0], stdev_[0]) : 1.0;
+    }
+  }
 
   /**
-  Compute updated probabilities for anomalyScores using the given params.
-  :param anomalyScores: a list of records. Each record is a list with the
-  :param verbosity: integer controlling extent of printouts for debugging
-  :type verbosity: UInt
-  :returns: a vector of likelihoods, one for each aggregated point
+  Re-estimate the normal distribution of the averaged anomaly scores in the
+  history, skipping the first learningPeriod records.  A very broad distribution
+  is used while there are no records to estimate from, or if the metric value
+  is flat.
   **/
-    vector<Real>  updateAnomalyLikelihoods_(const vector<Real>& anomalyScores, UInt verbosity=0);
+    void estimateNormal_();
 
+  /**
+  Recompute the running statistics of metric m from the history, see estimateNormal_().
+  **/
+    void refreshStatistics_(size_t m);
 
- /**
-  Given the normal distribution specified by the mean and standard deviation
-  in distributionParams (the distribution is an instance member of the class),
+  /**
+  Given the normal distribution specified by the mean and standard deviation,
   return the probability of getting samples further from the mean.
   For values above the mean, this is the probability of getting
   samples > x and for values below the mean, the probability of getting
   samples < x. This is the Q-function: the tail probability of the normal distribution.
   **/
-    Real tailProbability_(Real x) const;
+    static Real64 tailProbability_(Real64 x, Real64 mean, Real64 stdev);
+
+    UInt numMetrics_;
+    UInt learningPeriod_;
+    UInt probationaryPeriod_;
+    UInt historicWindowSize_;
+    UInt reestimationPeriod_;
+    UInt aggregationWindow_;
+
+    UInt iteration_ = 0u;
+    bool hasDistribution_ = false;
+
+    // Ring buffers of the history, the record at iteration i is stored at row
+    // (i % historicWindowSize_).  They grow up to historicWindowSize_ rows.
+    std::vector<Real>   scores_;   // raw anomaly scores
+    std::vector<Real64> averages_; // moving averages of the anomaly scores
+    std::vector<Real>   values_;   // raw metric values
+
+    std::vector<UInt>   numNotNumeric_; // NaN values in the history
+
+    // Running statistics of the records which estimateNormal_() uses: the
+    // mean and the sum of squared deviations of the moving averages and of
+    // the numeric values, and a bound of the rounding error of valueM2_.
+    UInt refreshed_ = 0u; // iteration of the last recomputation from the history
+    std::vector<Real64> averageMean_;
+    std::vector<Real64> averageM2_;
+    std::vector<UInt>   numValues_;
+    std::vector<Real64> valueMean_;
+    std::vector<Real64> valueM2_;
+    std::vector<Real64> valueError_;
+
+    // The estimated distribution, and the unfiltered likelihood of the previous record.
+    std::vector<Real64> mean_;
+    std::vector<Real64> stdev_;
+    std::vector<Real64> prevLikelihood_;
+
+    std::vector<Real64> average_; // scratch space for compute
+};
+
+
+/**
+ * Anomaly likelihood of a single metric.
+ */
+class AnomalyLikelihood : public MultiMetricAnomalyLikelihood {
 
+  public:
 
   /**
-  :param anomalyScores: vector of (raw) anomaly scores
-  :param performLowerBoundCheck (bool)
-  :returns: A DistributionParams (struct) containing the parameters of a normal distribution based on
-      the ``anomalyScores``.
+    See MultiMetricAnomalyLikelihood for the parameters.
   **/
-    DistributionParams estimateNormal_(const vector<Real>& anomalyScores, bool performLowerBoundCheck=true);
-
+    AnomalyLikelihood(UInt learningPeriod=288, UInt estimationSamples=100, UInt historicWindowSize=8640, UInt reestimationPeriod=100, UInt aggregationWindow=10);
 
-    //private variables
-    DistributionParams distribution_ ={ "unknown", 0.0, 0.0, 0.0}; //distribution passed around the class
 
-    UInt iteration_;
-    int lastTimestamp_ = -1;  //helper for time measurements
-    int initialTimestamp_ = -1;
+    /**
+    This is the main "compute" method.
 
-    htm::MovingAverage averagedAnomaly_; // running average of anomaly scores
-    htm::SlidingWindow<Real> runningLikelihoods_; // sliding window of the likelihoods
-    htm::SlidingWindow<Real> runningRawAnomalyScores_;
-    htm::SlidingWindow<Real> runningAverageAnomalies_; //sliding window of running averages of anomaly scores
+    Compute the probability that the current anomaly score represents
+    an anomaly given the historical distribution of anomaly scores. The closer
+    the number is to 1, the higher the chance it is an anomaly.
 
+    @param anomalyScore - the current anomaly score
+    @param timestamp - (optional) timestamp of the ocurrence, unused.  It is
+                       kept for compatibility with the python API.
+    @param value - (optional) the current raw input value of the metric, used
+                   to detect a flat metric.  Default (NaN) disables this check.
+    @return the anomalyLikelihood for this record.
+    **/
+    Real anomalyProbability(Real anomalyScore, int timestamp=-1,
+                            Real value=std::numeric_limits<Real>::quiet_NaN());
 };
 
 } //end-ns
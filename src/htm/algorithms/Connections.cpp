@@ -21,8 +21,13 @@
 
 #include <algorithm> // nth_element
 #include <climits>
+#include <cstring> // memcmp, memcpy
+#include <fstream>
 #include <iomanip>
 #include <iostream>
+#include <numeric> // partial_sum
+#include <set>
+#include <thread>
 
 #include <htm/algorithms/Connections.hpp>
 
@@ -33,22 +38,35 @@ using namespace htm;
 
 Connections::Connections(const CellIdx numCells, 
 		         const Permanence connectedThreshold, 
-			 const bool timeseries) {
-  initialize(numCells, connectedThreshold, timeseries);
+			 const bool timeseries,
+			 const UInt permanenceBits) {
+  initialize(numCells, connectedThreshold, timeseries, permanenceBits);
 }
 
-void Connections::initialize(CellIdx numCells, Permanence connectedThreshold, bool timeseries) {
+void Connections::initialize(CellIdx numCells, Permanence connectedThreshold, bool timeseries,
+                             UInt permanenceBits) {
+  endDeltas();
+  unmap_();
   cells_ = vector<CellData>(numCells);
   segments_.clear();
   synapses_.clear();
+  packedSynapses_.clear();
   potentialSynapsesForPresynapticCell_.clear();
   connectedSynapsesForPresynapticCell_.clear();
   potentialSegmentsForPresynapticCell_.clear();
   connectedSegmentsForPresynapticCell_.clear();
+  unfreeze();
   eventHandlers_.clear();
   NTA_CHECK(connectedThreshold >= minPermanence);
   NTA_CHECK(connectedThreshold <= maxPermanence);
   connectedThreshold_ = connectedThreshold - htm::Epsilon;
+  NTA_CHECK( permanenceBits == 0u or permanenceBits == 8u or permanenceBits == 16u )
+    << "Connections: permanenceBits must be 0, 8 or 16, got " << permanenceBits;
+  // New synapses of the quantized storage start at permanence 0, which must
+  // be disconnected.
+  NTA_CHECK( permanenceBits == 0u or connectedThreshold_ > minPermanence )
+    << "Connections: the quantized permanences need a connectedThreshold above 0";
+  permanenceBits_ = static_cast<UInt32>( permanenceBits );
   iteration_ = 0;
 
   nextEventToken_ = 0;
@@ -69,6 +87,262 @@ void Connections::unsubscribe(UInt32 token) {
 }
 
 
+class Connections::DeltaRecorder_ : public ConnectionsEventHandler {
+public:
+  // The indices of the changed segments & synapses since the previous
+  // checkpoint.  Only the indices are recorded, the rest is looked up by
+  // saveDelta().
+  std::set<Segment> segments;
+  std::set<Synapse> synapses;
+  bool compacted = false;
+  // The state of the previous checkpoint, to check the order of the deltas.
+  UInt64 baseSegments  = 0u;
+  UInt64 baseSynapses  = 0u;
+  UInt32 baseIteration = 0u;
+
+  void onCreateSegment(Segment segment) override { segments.insert( segment ); }
+  void onDestroySegment(Segment segment) override { segments.insert( segment ); }
+  void onCreateSynapse(Synapse synapse) override { synapses.insert( synapse ); }
+  void onDestroySynapse(Synapse synapse) override { synapses.insert( synapse ); }
+  void onUpdateSynapsePermanence(Synapse synapse, Permanence) override { synapses.insert( synapse ); }
+  void onUpdatePermanences(Segment segment) override { segments.insert( segment ); }
+  void onCompact(const vector<Segment> &, const vector<Synapse> &) override { compacted = true; }
+};
+
+
+void Connections::beginDeltas() {
+  checkWritable_();
+  if( not deltas_.active ) {
+    deltas_.recorder = std::make_shared<DeltaRecorder_>();
+    deltas_.token    = subscribe( deltas_.recorder.get() );
+    deltas_.active   = true;
+  }
+  restartDeltas_();
+}
+
+
+void Connections::restartDeltas_() {
+  DeltaRecorder_ &recorder = *deltas_.recorder;
+  recorder.segments.clear();
+  recorder.synapses.clear();
+  recorder.compacted     = false;
+  recorder.baseSegments  = segments_.size();
+  recorder.baseSynapses  = numSynapseRecords_();
+  recorder.baseIteration = iteration_;
+}
+
+
+void Connections::endDeltas() {
+  if( not deltas_.active ) return;
+  // Not unsubscribe(), the recorder is owned by deltas_.
+  eventHandlers_.erase( deltas_.token );
+  deltas_ = DeltaRecording_();
+}
+
+
+namespace {
+  const UInt32 DELTA_VERSION = 1u;
+
+  // The presynaptic maps of one presynaptic cell.  A cell can be missing from
+  // each of the maps, which is not the same as an empty entry, so bit i of
+  // present tells whether the cell is in the i-th map.
+  struct PresynapticDelta {
+    CellIdx cell;
+    UInt16  present;
+    vector<Synapse> potentialSynapses;
+    vector<Synapse> connectedSynapses;
+    vector<Segment> potentialSegments;
+    vector<Segment> connectedSegments;
+
+    template<class Archive>
+    void save_ar(Archive & ar) const {
+      ar(cell, present, potentialSynapses, connectedSynapses, potentialSegments, connectedSegments);
+    }
+    template<class Archive>
+    void load_ar(Archive & ar) {
+      ar(cell, present, potentialSynapses, connectedSynapses, potentialSegments, connectedSegments);
+    }
+  };
+
+  template<typename Map, typename T>
+  bool findEntry(const Map &map, const CellIdx cell, vector<T> &entry) {
+    const auto it = map.find( cell );
+    if( it == map.end() ) return false;
+    entry = it->second;
+    return true;
+  }
+
+  template<typename Map, typename T>
+  void setEntry(Map &map, const CellIdx cell, const bool present, vector<T> &entry) {
+    if( present ) map[cell].swap( entry );
+    else          map.erase( cell );
+  }
+} // end anonymous namespace
+
+
+void Connections::saveDelta(std::ostream &outStream) {
+  NTA_CHECK( deltas_.active ) << "Connections::saveDelta: call beginDeltas() first";
+  const DeltaRecorder_ &recorder = *deltas_.recorder;
+  cereal::BinaryOutputArchive ar( outStream );
+  ar( DELTA_VERSION, recorder.compacted, recorder.baseSegments,
+      recorder.baseSynapses, recorder.baseIteration );
+  if( recorder.compacted ) {
+    save_ar( ar );
+    restartDeltas_();
+    return;
+  }
+
+  // The changed segments, with all of their synapses, and the changed
+  // synapses, with their presynaptic cells.  Copies of this Connections share
+  // the recorder, so the indices are checked.
+  std::set<Segment> segmentSet;
+  std::set<Synapse> synapseSet;
+  std::set<CellIdx> presynapticSet;
+  for( const auto synapse : recorder.synapses ) {
+    if( synapse >= numSynapseRecords_() ) continue;
+    synapseSet.insert( synapse );
+    segmentSet.insert( synapseSegment_( synapse ));
+    presynapticSet.insert( presynapticCell_( synapse ));
+  }
+  for( const auto segment : recorder.segments ) {
+    if( segment < segments_.size() ) segmentSet.insert( segment );
+  }
+  vector<Segment>     segmentIds;
+  vector<SegmentData> segmentData;
+  std::set<CellIdx>   cellSet;
+  for( const auto segment : segmentSet ) {
+    segmentIds.push_back( segment );
+    segmentData.push_back( segments_[segment] );
+    synapseSet.insert( segments_[segment].synapses.begin(), segments_[segment].synapses.end() );
+    cellSet.insert( segments_[segment].cell );
+  }
+  vector<Synapse>     synapseIds;
+  vector<SynapseData> synapseData;
+  for( const auto synapse : synapseSet ) {
+    synapseIds.push_back( synapse );
+    synapseData.push_back( synapseData_( synapse ));
+  }
+  vector<CellIdx>         cellIds;
+  vector<vector<Segment>> cellSegments;
+  for( const auto cell : cellSet ) {
+    cellIds.push_back( cell );
+    cellSegments.push_back( cells_[cell].segments );
+  }
+  vector<PresynapticDelta> presynapticCells;
+  for( const auto cell : presynapticSet ) {
+    PresynapticDelta presyn;
+    presyn.cell    = cell;
+    presyn.present = 0u;
+    presyn.present |= (UInt16) findEntry( potentialSynapsesForPresynapticCell_, cell, presyn.potentialSynapses ) << 0u;
+    presyn.present |= (UInt16) findEntry( connectedSynapsesForPresynapticCell_, cell, presyn.connectedSynapses ) << 1u;
+    presyn.present |= (UInt16) findEntry( potentialSegmentsForPresynapticCell_, cell, presyn.potentialSegments ) << 2u;
+    presyn.present |= (UInt16) findEntry( connectedSegmentsForPresynapticCell_, cell, presyn.connectedSegments ) << 3u;
+    presynapticCells.push_back( std::move(presyn) );
+  }
+  // The segments' lastUsed are written by the algorithms directly, so they
+  // are saved for all segments.
+  vector<UInt32> lastUsed( segments_.size() );
+  for( size_t segment = 0u; segment < segments_.size(); segment++ ) {
+    lastUsed[segment] = segments_[segment].lastUsed;
+  }
+
+  const UInt64 numSegments = segments_.size();
+  const UInt64 numSynapses = numSynapseRecords_();
+  const UInt64 destroyedSegments = destroyedSegments_;
+  const UInt64 destroyedSynapses = destroyedSynapses_;
+  ar( numSegments, numSynapses, destroyedSegments, destroyedSynapses,
+      iteration_, nextSegmentOrdinal_, nextSynapseOrdinal_, prunedSyns_, prunedSegs_ );
+  ar( segmentIds, segmentData, synapseIds, synapseData, cellIds, cellSegments,
+      presynapticCells, lastUsed );
+  ar( timeseries_ );
+  if( timeseries_ ) {
+    ar( previousUpdates_, currentUpdates_ );
+  }
+  restartDeltas_();
+}
+
+
+void Connections::loadDelta(std::istream &inStream) {
+  checkWritable_();
+  endDeltas();
+  cereal::BinaryInputArchive ar( inStream );
+  UInt32 version;
+  bool   full;
+  UInt64 baseSegments, baseSynapses;
+  UInt32 baseIteration;
+  ar( version, full, baseSegments, baseSynapses, baseIteration );
+  NTA_CHECK( version == DELTA_VERSION ) << "Connections::loadDelta: unsupported version " << version;
+  if( full ) {
+    load_ar( ar );
+    return;
+  }
+  NTA_CHECK( baseSegments == segments_.size() and baseSynapses == numSynapseRecords_() and
+             baseIteration == iteration_ )
+    << "Connections::loadDelta: the delta does not follow the current state of the Connections";
+
+  UInt64 numSegments, numSynapses, destroyedSegments, destroyedSynapses;
+  ar( numSegments, numSynapses, destroyedSegments, destroyedSynapses,
+      iteration_, nextSegmentOrdinal_, nextSynapseOrdinal_, prunedSyns_, prunedSegs_ );
+  destroyedSegments_ = static_cast<size_t>( destroyedSegments );
+  destroyedSynapses_ = static_cast<size_t>( destroyedSynapses );
+
+  vector<Segment>          segmentIds;
+  vector<SegmentData>      segmentData;
+  vector<Synapse>          synapseIds;
+  vector<SynapseData>      synapseData;
+  vector<CellIdx>          cellIds;
+  vector<vector<Segment>>  cellSegments;
+  vector<PresynapticDelta> presynapticCells;
+  vector<UInt32>           lastUsed;
+  ar( segmentIds, segmentData, synapseIds, synapseData, cellIds, cellSegments,
+      presynapticCells, lastUsed );
+  ar( timeseries_ );
+  if( timeseries_ ) {
+    ar( previousUpdates_, currentUpdates_ );
+  }
+
+  segments_.resize( static_cast<size_t>( numSegments ));
+  if( permanenceBits_ == 0u ) {
+    synapses_.resize( static_cast<size_t>( numSynapses ));
+  } else {
+    packedSynapses_.resize( static_cast<size_t>( numSynapses ));
+  }
+  for( size_t i = 0u; i < segmentIds.size(); i++ ) {
+    segments_[segmentIds[i]] = std::move( segmentData[i] );
+  }
+  for( size_t segment = 0u; segment < segments_.size(); segment++ ) {
+    segments_[segment].lastUsed = lastUsed[segment];
+  }
+  for( size_t i = 0u; i < synapseIds.size(); i++ ) {
+    setSynapseData_( synapseIds[i], synapseData[i] );
+  }
+  for( size_t i = 0u; i < cellIds.size(); i++ ) {
+    cells_[cellIds[i]].segments.swap( cellSegments[i] );
+  }
+  for( auto &presyn : presynapticCells ) {
+    setEntry( potentialSynapsesForPresynapticCell_, presyn.cell, presyn.present & 1u, presyn.potentialSynapses );
+    setEntry( connectedSynapsesForPresynapticCell_, presyn.cell, presyn.present & 2u, presyn.connectedSynapses );
+    setEntry( potentialSegmentsForPresynapticCell_, presyn.cell, presyn.present & 4u, presyn.potentialSegments );
+    setEntry( connectedSegmentsForPresynapticCell_, presyn.cell, presyn.present & 8u, presyn.connectedSegments );
+    // Removing a synapse from a presynaptic map moves another one into its
+    // place, which changes the moved synapse's presynapticMapIndex_.
+    for( const auto *presynapticMap : {&potentialSynapsesForPresynapticCell_,
+                                       &connectedSynapsesForPresynapticCell_} ) {
+      const auto entry = presynapticMap->find( presyn.cell );
+      if( entry == presynapticMap->end() ) continue;
+      for( size_t index = 0u; index < entry->second.size(); index++ ) {
+        setMapIndex_( entry->second[index], static_cast<Synapse>( index ));
+      }
+    }
+  }
+
+  if( frozen_ ) {
+    unfreeze();
+    freeze();
+  }
+}
+
+
 void Connections::pruneLRUSegment_(const CellIdx& cell) {
   const auto& destroyCandidates = segmentsForCell(cell);
 #ifdef NTA_ASSERTIONS_ON
@@ -98,6 +372,7 @@ void Connections::pruneLRUSegment_(const CellIdx& cell) {
 Segment Connections::createSegment(const CellIdx cell, 
 	                           const SegmentIdx maxSegmentsPerCell) {
 
+  checkWritable_();
   //limit number of segmets per cell. If exceeded, remove the least recently used ones.
   NTA_CHECK(maxSegmentsPerCell > 0);
   NTA_CHECK(cell < numCells());
@@ -149,31 +424,107 @@ Synapse Connections::createSynapse(Segment segment,
       //3. create a duplicit new synapse -- NO. This is the only choice that is incorrect! HTM works on binary synapses, duplicates would break that.
       //4. update to the max of the permanences (default)
 
-      auto& synData = synapses_[syn];
-      if(permanence > synData.permanence) updateSynapsePermanence(syn, permanence);
+      if(permanence > permanence_(syn)) updateSynapsePermanence(syn, permanence);
       return syn;
     }
   } //else: the new synapse is not duplicit, so keep creating it. 
 
+  return createSynapse_(segment, presynapticCell, permanence);
+}
+
+
+size_t Connections::createSynapses(const Segment segment,
+                                   const vector<CellIdx> &presynapticCells,
+                                   const Permanence permanence,
+                                   const size_t maxNewSynapses) {
+  return createSynapses_(segment, presynapticCells, nullptr, permanence, maxNewSynapses);
+}
+
+
+size_t Connections::createSynapses(const Segment segment,
+                                   const vector<CellIdx> &presynapticCells,
+                                   const vector<Permanence> &permanences) {
+  NTA_CHECK(presynapticCells.size() == permanences.size())
+    << "createSynapses: need one permanence per presynaptic cell.";
+  return createSynapses_(segment, presynapticCells, permanences.data(), 0.0f,
+                         std::numeric_limits<size_t>::max());
+}
+
 
+size_t Connections::createSynapses_(const Segment segment,
+                                    const vector<CellIdx> &presynapticCells,
+                                    const Permanence *permanences,
+                                    const Permanence sharedPermanence,
+                                    const size_t maxNewSynapses) {
+  NTA_ASSERT(segment < segments_.size()) << "Segment out of bounds! " << segment;
 
+  // Index the existing synapses of the segment by their presynaptic cell.
+  auto &index = growIndex_;
+  index.clear();
+  for (const Synapse syn : segments_[segment].synapses) {
+    index.emplace_back(presynapticCell_(syn), syn);
+  }
+  std::sort(index.begin(), index.end());
+
+  size_t numNew = 0;
+  for (size_t i = 0; i < presynapticCells.size(); i++) {
+    if (numNew == maxNewSynapses) break;
+    const CellIdx    presynapticCell = presynapticCells[i];
+    const Permanence permanence      = permanences == nullptr ? sharedPermanence : permanences[i];
+    const auto it = std::lower_bound(index.begin(), index.end(), presynapticCell,
+        [](const std::pair<CellIdx, Synapse> &entry, const CellIdx cell) { return entry.first < cell; });
+
+    if (it != index.end() and it->first == presynapticCell) {
+      // Duplicate synapse, keep the higher permanence as createSynapse() does.
+      if (permanence > permanence_(it->second)) {
+        updateSynapsePermanence(it->second, permanence);
+      }
+      continue;
+    }
+    const Synapse syn = createSynapse_(segment, presynapticCell, permanence);
+    index.emplace(it, presynapticCell, syn);
+    numNew++;
+  }
+  return numNew;
+}
+
+
+Synapse Connections::createSynapse_(const Segment segment,
+                                    const CellIdx presynapticCell,
+                                    const Permanence permanence) {
+  checkWritable_();
   // Get an index into the synapses_ list, for the new synapse to reside at.
-  NTA_ASSERT(synapses_.size() < std::numeric_limits<Synapse>::max()) << "Add synapse failed: Range of Synapse (data-type) insufficient size."
-	    << synapses_.size() << " < " << (size_t)std::numeric_limits<Synapse>::max();
-  const Synapse synapse = static_cast<Synapse>(synapses_.size()); //TODO work on cache locality. Have all Synapse, SynapseData on Segment in continuous mem block ?
-  synapses_.emplace_back(SynapseData());
+  NTA_ASSERT(numSynapseRecords_() < std::numeric_limits<Synapse>::max()) << "Add synapse failed: Range of Synapse (data-type) insufficient size."
+	    << numSynapseRecords_() << " < " << (size_t)std::numeric_limits<Synapse>::max();
+  const Synapse synapse = static_cast<Synapse>(numSynapseRecords_()); //TODO work on cache locality. Have all Synapse, SynapseData on Segment in continuous mem block ?
+  const Synapse mapIndex = 
+    (Synapse)potentialSynapsesForPresynapticCell_[presynapticCell].size();
 
   // Fill in the new synapse's data
-  SynapseData &synapseData    = synapses_[synapse];
-  synapseData.presynapticCell = presynapticCell;
-  synapseData.segment         = segment;
-  synapseData.id              = nextSynapseOrdinal_++; //TODO move these to SynData constructor
-  // Start in disconnected state.
-  synapseData.permanence           = connectedThreshold_ - 1.0f;
-  synapseData.presynapticMapIndex_ = 
-    (Synapse)potentialSynapsesForPresynapticCell_[presynapticCell].size();
+  if( permanenceBits_ == 0u ) {
+    synapses_.emplace_back(SynapseData());
+    SynapseData &synapseData    = synapses_[synapse];
+    synapseData.presynapticCell = presynapticCell;
+    synapseData.segment         = segment;
+    synapseData.id              = nextSynapseOrdinal_; //TODO move these to SynData constructor
+    // Start in disconnected state.
+    synapseData.permanence           = connectedThreshold_ - 1.0f;
+    synapseData.presynapticMapIndex_ = mapIndex;
+  }
+  else {
+    // Start in disconnected state, at permanence 0.
+    packedSynapses_.push_back({ presynapticCell, segment, 0u });
+    try {
+      setMapIndex_( synapse, mapIndex );
+    } catch( const htm::Exception & ) {
+      packedSynapses_.pop_back();
+      throw;
+    }
+  }
+  nextSynapseOrdinal_++;
   potentialSynapsesForPresynapticCell_[presynapticCell].push_back(synapse);
   potentialSegmentsForPresynapticCell_[presynapticCell].push_back(segment);
+  unfreeze();
 
   SegmentData &segmentData = segments_[segment];
   segmentData.synapses.push_back(synapse);
@@ -197,27 +548,26 @@ bool Connections::segmentExists_(const Segment segment) const {
 }
 
 bool Connections::synapseExists_(const Synapse synapse, bool fast) const {
-  if(synapse >= synapses_.size()) return false; //out of bounds. Can happen after serialization, where only existing synapses are stored.
+  if(synapse >= numSynapseRecords_()) return false; //out of bounds. Can happen after serialization, where only existing synapses are stored.
 
 #ifdef NTA_ASSERTIONS_ON
   fast = false; //in Debug, do the proper, slow check always
 #endif
   if(!fast) {
   //proper but slow method to check for valid, existing synapse
-  const SynapseData &synapseData = synapses_[synapse];
   const vector<Synapse> &synapsesOnSegment =
-      segments_[synapseData.segment].synapses;
+      segments_[synapseSegment_(synapse)].synapses;
   const bool found = (std::find(synapsesOnSegment.begin(), synapsesOnSegment.end(), synapse) != synapsesOnSegment.end());
   //validate the fast & slow methods for same result:
 #ifdef NTA_ASSERTIONS_ON
-  const bool removed = synapses_[synapse].permanence == -1;
+  const bool removed = synapseRemoved_(synapse);
   NTA_ASSERT( (removed and not found) or (not removed and found) );
 #endif
   return found;
 
   } else {
   //quick method. Relies on hack in destroySynapse() where we set synapseData.permanence == -1
-  return synapses_[synapse].permanence != -1;
+  return not synapseRemoved_(synapse);
   }
 }
 
@@ -235,7 +585,7 @@ void Connections::removeSynapseFromPresynapticMap_(
   NTA_ASSERT( preSynapses.size() == preSegments.size() );
 
   const auto move = preSynapses.back();
-  synapses_[move].presynapticMapIndex_ = index;
+  setMapIndex_(move, index);
   preSynapses[index] = move;
   preSynapses.pop_back();
 
@@ -244,7 +594,61 @@ void Connections::removeSynapseFromPresynapticMap_(
 }
 
 
+void Connections::setMapIndex_(const Synapse synapse, const Synapse index) {
+  if( permanenceBits_ == 0u ) {
+    synapses_[synapse].presynapticMapIndex_ = index;
+    return;
+  }
+  NTA_CHECK( index < removedMapIndex_() )
+    << "Connections: more than " << removedMapIndex_() - 1u
+    << " synapses on a presynaptic cell do not fit the "
+    << permanenceBits_ << " bit permanences";
+  auto &packed = packedSynapses_[synapse].packed;
+  packed = (index << permanenceBits_) | (packed & permanenceLevels_());
+}
+
+
+void Connections::markRemoved_(const Synapse synapse) {
+  if( permanenceBits_ == 0u ) {
+    synapses_[synapse].permanence = -1;
+    return;
+  }
+  auto &packed = packedSynapses_[synapse].packed;
+  packed = (removedMapIndex_() << permanenceBits_) | (packed & permanenceLevels_());
+}
+
+
+SynapseData Connections::synapseData_(const Synapse synapse) const {
+  if( permanenceBits_ == 0u ) return synapses_[synapse];
+  SynapseData data;
+  data.presynapticCell      = presynapticCell_( synapse );
+  data.segment              = synapseSegment_( synapse );
+  data.id                   = synapse;
+  data.presynapticMapIndex_ = mapIndex_( synapse );
+  data.permanence           = synapseRemoved_( synapse ) ? -1 : permanence_( synapse );
+  return data;
+}
+
+
+void Connections::setSynapseData_(const Synapse synapse, const SynapseData &data) {
+  if( permanenceBits_ == 0u ) {
+    synapses_[synapse] = data;
+    return;
+  }
+  auto &record = packedSynapses_[synapse];
+  record.presynapticCell = data.presynapticCell;
+  record.segment         = data.segment;
+  if( data.permanence == -1 ) {
+    markRemoved_( synapse );
+  } else {
+    setPermanence_( synapse, data.permanence );
+    setMapIndex_( synapse, data.presynapticMapIndex_ );
+  }
+}
+
+
 void Connections::destroySegment(const Segment segment) {
+  checkWritable_();
   if(not segmentExists_(segment)) return;
 
   for (auto h : eventHandlers_) {
@@ -272,21 +676,22 @@ void Connections::destroySegment(const Segment segment) {
 
 
 void Connections::destroySynapse(const Synapse synapse) {
+  checkWritable_();
   if(not synapseExists_(synapse, true)) return;
 
   for (auto h : eventHandlers_) {
     h.second->onDestroySynapse(synapse);
   }
 
-  SynapseData& synapseData = synapses_[synapse]; //like dataForSynapse() but here we need writeable access
-  SegmentData &segmentData = segments_[synapseData.segment];
-  const auto   presynCell  = synapseData.presynapticCell;
+  unfreeze(); // the presynaptic maps change
+  SegmentData &segmentData = segments_[synapseSegment_(synapse)];
+  const auto   presynCell  = presynapticCell_(synapse);
 
-  if( synapseData.permanence >= connectedThreshold_ ) {
+  if( permanence_(synapse) >= connectedThreshold_ ) {
     segmentData.numConnected--;
 
     removeSynapseFromPresynapticMap_(
-      synapseData.presynapticMapIndex_,
+      mapIndex_(synapse),
       connectedSynapsesForPresynapticCell_.at( presynCell ),
       connectedSegmentsForPresynapticCell_.at( presynCell ));
 
@@ -297,7 +702,7 @@ void Connections::destroySynapse(const Synapse synapse) {
   }
   else {
     removeSynapseFromPresynapticMap_(
-      synapseData.presynapticMapIndex_,
+      mapIndex_(synapse),
       potentialSynapsesForPresynapticCell_.at( presynCell ),
       potentialSegmentsForPresynapticCell_.at( presynCell ));
 
@@ -310,7 +715,7 @@ void Connections::destroySynapse(const Synapse synapse) {
   const auto synapseOnSegment = std::lower_bound(segmentData.synapses.cbegin(), 
 		                          segmentData.synapses.cend(),
 					  synapse,
-					  [&](const Synapse a, const Synapse b) -> bool { return dataForSynapse(a).id < dataForSynapse(b).id;}
+					  [&](const Synapse a, const Synapse b) -> bool { return synapseOrdinal_(a) < synapseOrdinal_(b);}
 					  ); 
 
   NTA_ASSERT(synapseOnSegment != segmentData.synapses.cend());
@@ -319,7 +724,7 @@ void Connections::destroySynapse(const Synapse synapse) {
   segmentData.synapses.erase(synapseOnSegment);
   //Note: dataForSynapse(synapse) are not deleted, unfortunately. And are still accessible. 
   //To mark them as "removed", we set SynapseData.permanence = -1, this can be used for a quick check later
-  synapseData.permanence = -1; //marking as "removed"
+  markRemoved_(synapse); //marking as "removed"
   destroyedSynapses_++;
   NTA_ASSERT(not synapseExists_(synapse));
 }
@@ -327,37 +732,42 @@ void Connections::destroySynapse(const Synapse synapse) {
 
 void Connections::updateSynapsePermanence(const Synapse synapse,
                                           Permanence permanence) {
+  checkWritable_();
   permanence = std::min(permanence, maxPermanence );
   permanence = std::max(permanence, minPermanence );
+  permanence = quantize_(permanence);
 
-  auto &synData = synapses_[synapse];
-  
-  const bool before = synData.permanence >= connectedThreshold_;
-  const bool after  = permanence         >= connectedThreshold_;
+  const bool before = permanence_(synapse) >= connectedThreshold_;
+  const bool after  = permanence           >= connectedThreshold_;
 
   // update the permanence
-  synData.permanence = permanence;
+  setPermanence_(synapse, permanence);
+
+  for (auto h : eventHandlers_) {
+    h.second->onUpdatePermanences(synapseSegment_(synapse));
+  }
 
   if( before == after ) { //no change in dis/connected status
       return;
   }
-    const auto &presyn    = synData.presynapticCell;
+    unfreeze(); // the presynaptic maps change
+    const auto presyn     = presynapticCell_(synapse);
     auto &potentialPresyn = potentialSynapsesForPresynapticCell_[presyn];
     auto &potentialPreseg = potentialSegmentsForPresynapticCell_[presyn];
     auto &connectedPresyn = connectedSynapsesForPresynapticCell_[presyn];
     auto &connectedPreseg = connectedSegmentsForPresynapticCell_[presyn];
-    const auto &segment   = synData.segment;
+    const auto segment    = synapseSegment_(synapse);
     auto &segmentData     = segments_[segment];
     
     if( after ) { //connect
       segmentData.numConnected++;
 
       // Remove this synapse from presynaptic potential synapses.
-      removeSynapseFromPresynapticMap_( synData.presynapticMapIndex_,
+      removeSynapseFromPresynapticMap_( mapIndex_(synapse),
                                         potentialPresyn, potentialPreseg );
 
       // Add this synapse to the presynaptic connected synapses.
-      synData.presynapticMapIndex_ = (Synapse)connectedPresyn.size();
+      setMapIndex_(synapse, (Synapse)connectedPresyn.size());
       connectedPresyn.push_back( synapse );
       connectedPreseg.push_back( segment );
     }
@@ -365,11 +775,11 @@ void Connections::updateSynapsePermanence(const Synapse synapse,
       segmentData.numConnected--;
 
       // Remove this synapse from presynaptic connected synapses.
-      removeSynapseFromPresynapticMap_( synData.presynapticMapIndex_,
+      removeSynapseFromPresynapticMap_( mapIndex_(synapse),
                                         connectedPresyn, connectedPreseg );
 
       // Add this synapse to the presynaptic connected synapses.
-      synData.presynapticMapIndex_ = (Synapse)potentialPresyn.size();
+      setMapIndex_(synapse, (Synapse)potentialPresyn.size());
       potentialPresyn.push_back( synapse );
       potentialPreseg.push_back( segment );
     }
@@ -427,6 +837,7 @@ void Connections::reset() noexcept
 
 vector<SynapseIdx> Connections::computeActivity(const vector<CellIdx> &activePresynapticCells, const bool learn) {
 
+  compactIfNeeded_();
   vector<SynapseIdx> numActiveConnectedSynapsesForSegment(segments_.size(), 0);
   if(learn) iteration_++;
 
@@ -437,6 +848,15 @@ vector<SynapseIdx> Connections::computeActivity(const vector<CellIdx> &activePre
     currentUpdates_.clear();
   }
 
+  if( countActiveParallel_( activePresynapticCells, &numActiveConnectedSynapsesForSegment, nullptr, nullptr )) {
+    return numActiveConnectedSynapsesForSegment;
+  }
+
+  if( frozen_ ) {
+    frozenConnected_.countActive( activePresynapticCells, numActiveConnectedSynapsesForSegment );
+    return numActiveConnectedSynapsesForSegment;
+  }
+
   // Iterate through all connected synapses.
   for (const auto& cell : activePresynapticCells) {
     if (connectedSegmentsForPresynapticCell_.count(cell)) {
@@ -453,6 +873,10 @@ vector<SynapseIdx> Connections::computeActivity(
     vector<SynapseIdx> &numActivePotentialSynapsesForSegment,
     const vector<CellIdx> &activePresynapticCells,
     const bool learn) {
+  if( compactIfNeeded_() ) {
+    // The segments were renumbered, the output vector is all zeros anyway.
+    numActivePotentialSynapsesForSegment.assign( segments_.size(), 0 );
+  }
   NTA_ASSERT(numActivePotentialSynapsesForSegment.size() == segments_.size());
 
   // Iterate through all connected synapses.
@@ -464,6 +888,15 @@ vector<SynapseIdx> Connections::computeActivity(
              numActiveConnectedSynapsesForSegment.end(),
              numActivePotentialSynapsesForSegment.begin());
 
+  if( countActiveParallel_( activePresynapticCells, nullptr, &numActivePotentialSynapsesForSegment, nullptr )) {
+    return numActiveConnectedSynapsesForSegment;
+  }
+
+  if( frozen_ ) {
+    frozenPotential_.countActive( activePresynapticCells, numActivePotentialSynapsesForSegment );
+    return numActiveConnectedSynapsesForSegment;
+  }
+
   for (const auto& cell : activePresynapticCells) {
     if (potentialSegmentsForPresynapticCell_.count(cell)) {
       for(const auto& segment : potentialSegmentsForPresynapticCell_.at(cell)) {
@@ -475,6 +908,638 @@ vector<SynapseIdx> Connections::computeActivity(
 }
 
 
+void Connections::computeConnectedActivity(
+    const vector<CellIdx> &activePresynapticCells,
+    vector<SynapseIdx> &numActiveConnectedSynapsesForSegment) const {
+  numActiveConnectedSynapsesForSegment.assign( segments_.size(), 0 );
+
+  if( frozen_ ) {
+    frozenConnected_.countActive( activePresynapticCells, numActiveConnectedSynapsesForSegment );
+    return;
+  }
+
+  for( const auto cell : activePresynapticCells ) {
+    const auto connectedSegments = connectedSegmentsForPresynapticCell_.find( cell );
+    if( connectedSegments != connectedSegmentsForPresynapticCell_.end() ) {
+      for( const auto segment : connectedSegments->second ) {
+        ++numActiveConnectedSynapsesForSegment[segment];
+      }
+    }
+  }
+}
+
+
+void Connections::computeActivity(
+    const vector<CellIdx> &activePresynapticCells,
+    const bool learn,
+    vector<SynapseIdx> &numActiveConnectedSynapsesForSegment,
+    vector<SynapseIdx> &numActivePotentialSynapsesForSegment,
+    vector<Segment>    &touchedSegments) {
+  auto &connected = numActiveConnectedSynapsesForSegment;
+  auto &potential = numActivePotentialSynapsesForSegment;
+
+  if( compactIfNeeded_() ) {
+    // The touched segments were renumbered, start from scratch.
+    connected.assign( segments_.size(), 0 );
+    potential.assign( segments_.size(), 0 );
+  }
+  else {
+    for( const auto segment : touchedSegments ) {
+      connected[segment] = 0;
+      potential[segment] = 0;
+    }
+    connected.resize( segments_.size(), 0 );
+    potential.resize( segments_.size(), 0 );
+  }
+  touchedSegments.clear();
+
+  if(learn) iteration_++;
+
+  if( timeseries_ ) { // see the dense computeActivity
+    previousUpdates_.swap( currentUpdates_ );
+    currentUpdates_.clear();
+  }
+
+  // The potential counts include the connected synapses, so every touched
+  // segment has a nonzero potential count.
+  const auto countPotential = [&](const Segment segment) {
+    if( potential[segment]++ == 0 ) {
+      touchedSegments.push_back( segment );
+    }
+  };
+  const auto countConnected = [&](const Segment segment) {
+    ++connected[segment];
+    countPotential( segment );
+  };
+
+  if( countActiveParallel_( activePresynapticCells, &connected, &potential, &touchedSegments )) {
+    return;
+  }
+
+  if( frozen_ ) {
+    frozenConnected_.forEachSegment( activePresynapticCells, countConnected );
+    frozenPotential_.forEachSegment( activePresynapticCells, countPotential );
+    return;
+  }
+
+  for( const auto cell : activePresynapticCells ) {
+    const auto connectedSegments = connectedSegmentsForPresynapticCell_.find( cell );
+    if( connectedSegments != connectedSegmentsForPresynapticCell_.end() ) {
+      for( const auto segment : connectedSegments->second ) {
+        countConnected( segment );
+      }
+    }
+    const auto potentialSegments = potentialSegmentsForPresynapticCell_.find( cell );
+    if( potentialSegments != potentialSegmentsForPresynapticCell_.end() ) {
+      for( const auto segment : potentialSegments->second ) {
+        countPotential( segment );
+      }
+    }
+  }
+}
+
+
+void Connections::setNumThreads(const UInt numThreads) {
+  numThreads_ = numThreads > 0u ? numThreads : std::max( 1u, std::thread::hardware_concurrency() );
+  workers_    = Workers_();
+}
+
+
+bool Connections::countActiveParallel_(const vector<CellIdx> &activePresynapticCells,
+                                       vector<SynapseIdx> *connected,
+                                       vector<SynapseIdx> *potential,
+                                       vector<Segment>    *touched) {
+  // Below this many active cells per thread, waking the threads costs more
+  // than it saves.
+  const size_t minCellsPerThread = 64u;
+  const UInt numParts = static_cast<UInt>( std::min<size_t>( numThreads_,
+                            activePresynapticCells.size() / minCellsPerThread ));
+  if( numParts <= 1u ) return false;
+
+  if( workers_.pool == nullptr ) {
+    workers_.pool.reset( new ThreadPool( numThreads_ ));
+  }
+  ThreadPool &pool = *workers_.pool;
+  auto &partials = workers_.partials;
+  if( partials.size() < numParts ) {
+    partials.resize( numParts );
+  }
+
+  // Call f(segment) for every synapse in the presynaptic map from the active
+  // cells of the part.
+  const auto forEachSegment = [&](const UInt part, const bool connectedMap, const auto &f) {
+    const FrozenMap_ &frozen = connectedMap ? frozenConnected_ : frozenPotential_;
+    const auto &presynapticMap = connectedMap ? connectedSegmentsForPresynapticCell_
+                                              : potentialSegmentsForPresynapticCell_;
+    const size_t begin = activePresynapticCells.size() * part / numParts;
+    const size_t end   = activePresynapticCells.size() * (part + 1u) / numParts;
+    for( size_t i = begin; i < end; i++ ) {
+      const CellIdx cell = activePresynapticCells[i];
+      if( frozen_ ) {
+        frozen.forCell( cell, f );
+        continue;
+      }
+      const auto segments = presynapticMap.find( cell );
+      if( segments != presynapticMap.end() ) {
+        for( const auto segment : segments->second ) {
+          f( segment );
+        }
+      }
+    }
+  };
+
+  if( touched == nullptr ) {
+    // Dense counts of one presynaptic map.  The first part is counted into
+    // the output, the others into dense accumulators, which are added to the
+    // output in parallel over ranges of segments.
+    NTA_ASSERT( (connected == nullptr) != (potential == nullptr) );
+    vector<SynapseIdx> &counts = connected != nullptr ? *connected : *potential;
+    pool.parallelFor( numParts, [&](const UInt part) {
+      vector<SynapseIdx> &partCounts = part == 0u ? counts : partials[part].dense;
+      if( part > 0u ) {
+        partCounts.assign( counts.size(), 0u );
+      }
+      forEachSegment( part, connected != nullptr, [&](const Segment segment) {
+        ++partCounts[segment];
+      });
+    });
+    pool.parallelFor( numParts, [&](const UInt part) {
+      const size_t begin = counts.size() * part / numParts;
+      const size_t end   = counts.size() * (part + 1u) / numParts;
+      for( UInt other = 1u; other < numParts; other++ ) {
+        const vector<SynapseIdx> &otherCounts = partials[other].dense;
+        for( size_t segment = begin; segment < end; segment++ ) {
+          counts[segment] += otherCounts[segment];
+        }
+      }
+    });
+    return true;
+  }
+
+  // Sparse counts, as in the sparse computeActivity.  Every part counts into
+  // its own accumulators, which are zero except for the part's touched
+  // segments.  These are added up in order and cleared for the next call.
+  NTA_ASSERT( connected != nullptr and potential != nullptr );
+  pool.parallelFor( numParts, [&](const UInt part) {
+    PartialCounts_ &partial = partials[part];
+    partial.connected.resize( segments_.size(), 0u );
+    partial.potential.resize( segments_.size(), 0u );
+    const auto countPotential = [&](const Segment segment) {
+      if( partial.potential[segment]++ == 0u ) {
+        partial.touched.push_back( segment );
+      }
+    };
+    const auto countConnected = [&](const Segment segment) {
+      ++partial.connected[segment];
+      countPotential( segment );
+    };
+    forEachSegment( part, true,  countConnected );
+    forEachSegment( part, false, countPotential );
+  });
+  for( UInt part = 0u; part < numParts; part++ ) {
+    PartialCounts_ &partial = partials[part];
+    for( const auto segment : partial.touched ) {
+      if( (*potential)[segment] == 0u ) {
+        touched->push_back( segment );
+      }
+      (*connected)[segment] += partial.connected[segment];
+      (*potential)[segment] += partial.potential[segment];
+      partial.connected[segment] = 0u;
+      partial.potential[segment] = 0u;
+    }
+    partial.touched.clear();
+  }
+  return true;
+}
+
+
+void Connections::FrozenMap_::build(
+    const std::unordered_map<CellIdx, vector<Segment>, identity> &map) {
+  CellIdx numPresynapticCells = 0;
+  size_t  numSynapses = 0;
+  for( const auto &presyn : map ) {
+    numPresynapticCells = std::max<CellIdx>( numPresynapticCells, presyn.first + 1u );
+    numSynapses += presyn.second.size();
+  }
+
+  offsetsStorage.assign( numPresynapticCells + 1u, 0u );
+  for( const auto &presyn : map ) {
+    offsetsStorage[presyn.first + 1u] = static_cast<Synapse>( presyn.second.size() );
+  }
+  std::partial_sum( offsetsStorage.begin(), offsetsStorage.end(), offsetsStorage.begin() );
+
+  segmentsStorage.resize( numSynapses );
+  for( const auto &presyn : map ) {
+    std::copy( presyn.second.begin(), presyn.second.end(),
+               segmentsStorage.begin() + offsetsStorage[presyn.first] );
+  }
+  view( offsetsStorage.data(), offsetsStorage.size(),
+        segmentsStorage.data(), segmentsStorage.size() );
+}
+
+
+void Connections::FrozenMap_::view(const Synapse *offsets, const size_t numOffsets,
+                                   const Segment *segments, const size_t numSegments) {
+  this->offsets     = offsets;
+  this->numOffsets  = numOffsets;
+  this->segments    = segments;
+  this->numSegments = numSegments;
+}
+
+
+Connections::FrozenMap_ &Connections::FrozenMap_::operator=(const FrozenMap_ &other) {
+  if( this == &other ) return *this;
+  offsetsStorage  = other.offsetsStorage;
+  segmentsStorage = other.segmentsStorage;
+  if( other.offsets == other.offsetsStorage.data() ) {
+    view( offsetsStorage.data(), offsetsStorage.size(),
+          segmentsStorage.data(), segmentsStorage.size() );
+  }
+  else {
+    view( other.offsets, other.numOffsets, other.segments, other.numSegments );
+  }
+  return *this;
+}
+
+
+void Connections::FrozenMap_::clear() {
+  offsetsStorage.clear();
+  offsetsStorage.shrink_to_fit();
+  segmentsStorage.clear();
+  segmentsStorage.shrink_to_fit();
+  view( nullptr, 0u, nullptr, 0u );
+}
+
+
+void Connections::FrozenMap_::countActive(
+    const vector<CellIdx> &activePresynapticCells,
+    vector<SynapseIdx> &numActiveSynapsesForSegment) const {
+  forEachSegment( activePresynapticCells, [&](const Segment segment) {
+    ++numActiveSynapsesForSegment[segment];
+  });
+}
+
+
+void Connections::freeze() {
+  // The snapshot is dropped whenever the structure changes, so an existing
+  // one is up to date.  A mapped snapshot can not be rebuilt at all, the
+  // segment maps of a mapped Connections are empty.
+  if( frozen_ ) return;
+  frozenConnected_.build( connectedSegmentsForPresynapticCell_ );
+  frozenPotential_.build( potentialSegmentsForPresynapticCell_ );
+  frozen_ = true;
+}
+
+
+void Connections::unfreeze() {
+  if( not frozen_ ) return;
+  checkWritable_();
+  frozen_ = false;
+  frozenConnected_.clear();
+  frozenPotential_.clear();
+}
+
+
+void Connections::checkWritable_() const {
+  NTA_CHECK( mapped_ == nullptr )
+    << "Connections are read-only, they are mapped from the file "
+    << mapped_->getPath() << " by loadFrozen()";
+}
+
+
+void Connections::unmap_() {
+  if( mapped_ == nullptr ) return;
+  mapped_.reset();
+  frozen_ = false;
+  frozenConnected_.clear();
+  frozenPotential_.clear();
+}
+
+
+namespace {
+  // Layout of the file written by Connections::saveFrozen(): this header,
+  // followed by the arrays in the order of their counts below, each of them
+  // padded to a multiple of 8 bytes.
+  struct FrozenHeader {
+    char   magic[8];
+    UInt32 byteOrder;
+    UInt32 version;
+    UInt64 numCells;
+    UInt64 numSegments;          // segment cells, ids, last used, numConnected
+    UInt64 numPotentialOffsets;
+    UInt64 numPotentialSegments;
+    UInt64 numConnectedOffsets;
+    UInt64 numConnectedSegments;
+    Real32 connectedThreshold;
+    UInt32 iteration;
+    UInt32 nextSegmentOrdinal;
+    UInt32 nextSynapseOrdinal;
+  };
+  static_assert( sizeof(FrozenHeader) % 8u == 0u, "FrozenHeader must keep the arrays aligned" );
+
+  const char   FROZEN_MAGIC[8]   = {'H', 'T', 'M', 'C', 'O', 'N', 'N', '1'};
+  const UInt32 FROZEN_BYTE_ORDER = 0x01020304u;
+  const UInt32 FROZEN_VERSION    = 1u;
+
+  size_t paddedSize(const size_t bytes) { return (bytes + 7u) & ~size_t(7u); }
+
+  template<typename T>
+  void writeArray(std::ostream &out, const T *data, const size_t count) {
+    static const char padding[8] = {};
+    const size_t bytes = count * sizeof(T);
+    out.write( reinterpret_cast<const char*>( data ), bytes );
+    out.write( padding, paddedSize( bytes ) - bytes );
+  }
+} // end anonymous namespace
+
+
+void Connections::saveFrozen(std::ostream &outStream) const {
+  // Renumber the remaining segments, as compact() does.
+  const Segment removedSegment = std::numeric_limits<Segment>::max();
+  vector<Segment> segmentMap( segments_.size(), removedSegment );
+  for( const auto &cellData : cells_ ) {
+    for( const auto segment : cellData.segments ) {
+      segmentMap[segment] = 0u;
+    }
+  }
+  vector<CellIdx>    segmentCells;
+  vector<UInt32>     segmentIds;
+  vector<UInt32>     segmentLastUsed;
+  vector<SynapseIdx> segmentNumConnected;
+  for( size_t segment = 0u; segment < segments_.size(); segment++ ) {
+    if( segmentMap[segment] == removedSegment ) continue;
+    segmentMap[segment] = static_cast<Segment>( segmentCells.size() );
+    const SegmentData &segmentData = segments_[segment];
+    segmentCells.push_back( segmentData.cell );
+    segmentIds.push_back( segmentData.id );
+    segmentLastUsed.push_back( segmentData.lastUsed );
+    segmentNumConnected.push_back( segmentData.numConnected );
+  }
+
+  // The CSR snapshots, with the new segment numbers.
+  const auto snapshot = [&](const FrozenMap_ &frozen,
+      const std::unordered_map<CellIdx, vector<Segment>, identity> &map) {
+    FrozenMap_ csr;
+    if( frozen_ ) {
+      csr.offsetsStorage.assign( frozen.offsets, frozen.offsets + frozen.numOffsets );
+      csr.segmentsStorage.assign( frozen.segments, frozen.segments + frozen.numSegments );
+    }
+    else {
+      csr.build( map );
+    }
+    for( auto &segment : csr.segmentsStorage ) {
+      segment = segmentMap[segment];
+    }
+    return csr;
+  };
+  const FrozenMap_ potential = snapshot( frozenPotential_, potentialSegmentsForPresynapticCell_ );
+  const FrozenMap_ connected = snapshot( frozenConnected_, connectedSegmentsForPresynapticCell_ );
+
+  FrozenHeader header = {};
+  std::memcpy( header.magic, FROZEN_MAGIC, sizeof(header.magic) );
+  header.byteOrder            = FROZEN_BYTE_ORDER;
+  header.version              = FROZEN_VERSION;
+  header.numCells             = cells_.size();
+  header.numSegments          = segmentCells.size();
+  header.numPotentialOffsets  = potential.offsetsStorage.size();
+  header.numPotentialSegments = potential.segmentsStorage.size();
+  header.numConnectedOffsets  = connected.offsetsStorage.size();
+  header.numConnectedSegments = connected.segmentsStorage.size();
+  header.connectedThreshold   = connectedThreshold_;
+  header.iteration            = iteration_;
+  header.nextSegmentOrdinal   = nextSegmentOrdinal_;
+  header.nextSynapseOrdinal   = nextSynapseOrdinal_;
+
+  writeArray( outStream, &header, 1u );
+  writeArray( outStream, segmentCells.data(),        segmentCells.size() );
+  writeArray( outStream, segmentIds.data(),          segmentIds.size() );
+  writeArray( outStream, segmentLastUsed.data(),     segmentLastUsed.size() );
+  writeArray( outStream, segmentNumConnected.data(), segmentNumConnected.size() );
+  writeArray( outStream, potential.offsetsStorage.data(),  potential.offsetsStorage.size() );
+  writeArray( outStream, potential.segmentsStorage.data(), potential.segmentsStorage.size() );
+  writeArray( outStream, connected.offsetsStorage.data(),  connected.offsetsStorage.size() );
+  writeArray( outStream, connected.segmentsStorage.data(), connected.segmentsStorage.size() );
+  NTA_CHECK( outStream.good() ) << "Connections::saveFrozen: failed to write the model";
+}
+
+
+void Connections::saveFrozen(const string &path) const {
+  std::ofstream out( path, std::ios::binary );
+  NTA_CHECK( out.is_open() ) << "Connections::saveFrozen: can not open " << path;
+  saveFrozen( out );
+}
+
+
+size_t Connections::loadFrozen(const std::shared_ptr<const MappedFile> &file, const size_t offset) {
+  NTA_CHECK( file != nullptr );
+  NTA_CHECK( offset % 8u == 0u and offset <= file->size() )
+    << "Connections::loadFrozen: bad offset " << offset << " in " << file->getPath();
+  const char  *begin = file->data() + offset;
+  const size_t available = file->size() - offset;
+
+  NTA_CHECK( available >= sizeof(FrozenHeader) and
+             std::memcmp( begin, FROZEN_MAGIC, sizeof(FROZEN_MAGIC) ) == 0 )
+    << "Connections::loadFrozen: " << file->getPath() << " is not a frozen Connections model";
+  FrozenHeader header;
+  std::memcpy( &header, begin, sizeof(header) );
+  NTA_CHECK( header.byteOrder == FROZEN_BYTE_ORDER )
+    << "Connections::loadFrozen: " << file->getPath()
+    << " was written on a machine with a different byte order";
+  NTA_CHECK( header.version == FROZEN_VERSION )
+    << "Connections::loadFrozen: unsupported version " << header.version;
+
+  size_t position = sizeof(FrozenHeader);
+  const auto take = [&](const UInt64 count, const size_t elementSize) {
+    const char *array = begin + position;
+    NTA_CHECK( count <= available / elementSize )
+      << "Connections::loadFrozen: " << file->getPath() << " is truncated";
+    position += paddedSize( static_cast<size_t>( count ) * elementSize );
+    NTA_CHECK( position <= available )
+      << "Connections::loadFrozen: " << file->getPath() << " is truncated";
+    return array;
+  };
+  const auto segmentCells        = reinterpret_cast<const CellIdx*>(    take( header.numSegments, sizeof(CellIdx) ));
+  const auto segmentIds          = reinterpret_cast<const UInt32*>(     take( header.numSegments, sizeof(UInt32) ));
+  const auto segmentLastUsed     = reinterpret_cast<const UInt32*>(     take( header.numSegments, sizeof(UInt32) ));
+  const auto segmentNumConnected = reinterpret_cast<const SynapseIdx*>( take( header.numSegments, sizeof(SynapseIdx) ));
+  const auto potentialOffsets    = reinterpret_cast<const Synapse*>(    take( header.numPotentialOffsets, sizeof(Synapse) ));
+  const auto potentialSegments   = reinterpret_cast<const Segment*>(    take( header.numPotentialSegments, sizeof(Segment) ));
+  const auto connectedOffsets    = reinterpret_cast<const Synapse*>(    take( header.numConnectedOffsets, sizeof(Synapse) ));
+  const auto connectedSegments   = reinterpret_cast<const Segment*>(    take( header.numConnectedSegments, sizeof(Segment) ));
+
+  // The segments are not validated, that would read the whole file.
+  const auto checkOffsets = [&](const Synapse *offsets, const UInt64 numOffsets, const UInt64 numSegments) {
+    if( numOffsets == 0u ) {
+      NTA_CHECK( numSegments == 0u ) << "Connections::loadFrozen: corrupt CSR offsets";
+      return;
+    }
+    NTA_CHECK( numOffsets <= header.numCells + 1u and offsets[0] == 0u and
+               offsets[numOffsets - 1u] == numSegments and
+               std::is_sorted( offsets, offsets + numOffsets ))
+      << "Connections::loadFrozen: corrupt CSR offsets";
+  };
+  checkOffsets( potentialOffsets, header.numPotentialOffsets, header.numPotentialSegments );
+  checkOffsets( connectedOffsets, header.numConnectedOffsets, header.numConnectedSegments );
+  for( UInt64 segment = 0u; segment < header.numSegments; segment++ ) {
+    NTA_CHECK( segmentCells[segment] < header.numCells )
+      << "Connections::loadFrozen: corrupt segment " << segment;
+  }
+  // Replace the current model.
+  initialize( static_cast<CellIdx>( header.numCells ), maxPermanence );
+  connectedThreshold_ = header.connectedThreshold;
+  iteration_          = header.iteration;
+  nextSegmentOrdinal_ = header.nextSegmentOrdinal;
+  nextSynapseOrdinal_ = header.nextSynapseOrdinal;
+  destroyedSegments_  = 0u;
+  destroyedSynapses_  = 0u;
+  synapses_.shrink_to_fit();
+  previousUpdates_.clear();
+  currentUpdates_.clear();
+
+  segments_.reserve( static_cast<size_t>( header.numSegments ));
+  for( UInt64 segment = 0u; segment < header.numSegments; segment++ ) {
+    const CellIdx cell = segmentCells[segment];
+    segments_.emplace_back( cell, segmentIds[segment], segmentLastUsed[segment] );
+    segments_.back().numConnected = segmentNumConnected[segment];
+    cells_[cell].segments.push_back( static_cast<Segment>( segment ));
+  }
+
+  frozenPotential_.view( potentialOffsets, static_cast<size_t>( header.numPotentialOffsets ),
+                         potentialSegments, static_cast<size_t>( header.numPotentialSegments ));
+  frozenConnected_.view( connectedOffsets, static_cast<size_t>( header.numConnectedOffsets ),
+                         connectedSegments, static_cast<size_t>( header.numConnectedSegments ));
+  frozen_ = true;
+  mapped_ = file;
+  return position;
+}
+
+
+void Connections::loadFrozen(const string &path) {
+  loadFrozen( std::make_shared<const MappedFile>( path ));
+}
+
+void Connections::compact() {
+  if( destroyedSegments_ == 0u and destroyedSynapses_ == 0u ) return;
+  checkWritable_();
+
+  const Segment removedSegment = std::numeric_limits<Segment>::max();
+  const Synapse removedSynapse = std::numeric_limits<Synapse>::max();
+
+  // Find the new index of every remaining segment & synapse.  The indices are
+  // assigned in increasing order of the old indices, so the relative order of
+  // the segments and synapses does not change.
+  vector<Segment> segmentMap( segments_.size(), removedSegment );
+  for( const auto &cellData : cells_ ) {
+    for( const auto segment : cellData.segments ) {
+      segmentMap[segment] = 0u;
+    }
+  }
+  vector<Synapse> synapseMap( numSynapseRecords_(), removedSynapse );
+  vector<SegmentData> segments;
+  segments.reserve( segments_.size() - destroyedSegments_ );
+  for( size_t segment = 0u; segment < segments_.size(); segment++ ) {
+    if( segmentMap[segment] == removedSegment ) continue;
+    segmentMap[segment] = static_cast<Segment>( segments.size() );
+    segments.push_back( std::move(segments_[segment]) );
+    for( const auto synapse : segments.back().synapses ) {
+      synapseMap[synapse] = 0u;
+    }
+  }
+  Synapse numSynapses = 0u;
+  for( auto &synapse : synapseMap ) {
+    if( synapse != removedSynapse ) synapse = numSynapses++;
+  }
+  // Both storages of the synapses have a segment field.
+  const auto compactSynapses = [&]( auto &records ) {
+    std::remove_reference_t<decltype(records)> kept;
+    kept.reserve( numSynapses );
+    for( size_t synapse = 0u; synapse < records.size(); synapse++ ) {
+      if( synapseMap[synapse] == removedSynapse ) continue;
+      kept.push_back( records[synapse] );
+      kept.back().segment = segmentMap[kept.back().segment];
+    }
+    records.swap( kept );
+  };
+
+  // Rewrite all references to the old indices.
+  for( auto &segmentData : segments ) {
+    for( auto &synapse : segmentData.synapses ) {
+      synapse = synapseMap[synapse];
+    }
+  }
+  for( auto &cellData : cells_ ) {
+    for( auto &segment : cellData.segments ) {
+      segment = segmentMap[segment];
+    }
+  }
+  // The positions in the presynaptic maps do not change, so the
+  // SynapseData.presynapticMapIndex_ stay valid.
+  for( auto *presynapticMap : {&potentialSynapsesForPresynapticCell_,
+                               &connectedSynapsesForPresynapticCell_} ) {
+    for( auto &presyn : *presynapticMap ) {
+      for( auto &synapse : presyn.second ) {
+        synapse = synapseMap[synapse];
+      }
+    }
+  }
+  for( auto *presynapticMap : {&potentialSegmentsForPresynapticCell_,
+                               &connectedSegmentsForPresynapticCell_} ) {
+    for( auto &presyn : *presynapticMap ) {
+      for( auto &segment : presyn.second ) {
+        segment = segmentMap[segment];
+      }
+    }
+  }
+  for( auto *updates : {&previousUpdates_, &currentUpdates_} ) {
+    vector<Permanence> compacted( numSynapses, minPermanence );
+    for( size_t synapse = 0u; synapse < updates->size(); synapse++ ) {
+      if( synapseMap[synapse] != removedSynapse ) {
+        compacted[synapseMap[synapse]] = (*updates)[synapse];
+      }
+    }
+    if( not updates->empty() ) updates->swap( compacted );
+  }
+
+  NTA_ASSERT( segments.size() == segments_.size() - destroyedSegments_ );
+  NTA_ASSERT( numSynapses == numSynapseRecords_() - destroyedSynapses_ );
+  segments_.swap( segments );
+  if( permanenceBits_ == 0u ) {
+    compactSynapses( synapses_ );
+  } else {
+    compactSynapses( packedSynapses_ );
+  }
+  destroyedSegments_ = 0u;
+  destroyedSynapses_ = 0u;
+
+  if( frozen_ ) {
+    unfreeze();
+    freeze();
+  }
+
+  for (auto h : eventHandlers_) {
+    h.second->onCompact(segmentMap, synapseMap);
+  }
+}
+
+
+void Connections::setCompactionThreshold(const Real threshold) {
+  NTA_CHECK( threshold >= 0.0f and threshold < 1.0f )
+    << "Compaction threshold must be in range [0, 1), got " << threshold;
+  compactionThreshold_ = threshold;
+}
+
+
+bool Connections::compactIfNeeded_() {
+  if( compactionThreshold_ <= 0.0f ) return false;
+  if( destroyedSegments_ <= compactionThreshold_ * segments_.size() and
+      destroyedSynapses_ <= compactionThreshold_ * numSynapseRecords_() ) {
+    return false;
+  }
+  compact();
+  return true;
+}
+
+
 void Connections::adaptSegment(const Segment segment, 
                                const SDR &inputs,
                                const Permanence increment,
@@ -482,27 +1547,55 @@ void Connections::adaptSegment(const Segment segment,
 			       const bool pruneZeroSynapses, 
 			       const UInt segmentThreshold)
 {
+  checkWritable_();
   const auto &inputArray = inputs.getDense();
 
   if( timeseries_ ) {
-    previousUpdates_.resize( synapses_.size(), minPermanence );
-    currentUpdates_.resize(  synapses_.size(), minPermanence );
+    previousUpdates_.resize( numSynapseRecords_(), minPermanence );
+    currentUpdates_.resize(  numSynapseRecords_(), minPermanence );
   }
 
+  // Gather the segment's synapses into a segment-local structure of arrays:
+  // the presynaptic cells and permanences, each stored contiguously.
+  const auto &synapses = segments_[segment].synapses;
+  const size_t numSynapses = synapses.size();
+  auto &presynapticCells = adaptPresynapticCells_;
+  auto &permanences      = adaptPermanences_;
+  auto &updated          = adaptUpdated_;
+  presynapticCells.resize( numSynapses );
+  permanences.resize( numSynapses );
+  updated.resize( numSynapses );
+  for(size_t i = 0; i < numSynapses; i++) {
+    presynapticCells[i] = presynapticCell_(synapses[i]);
+    permanences[i]      = permanence_(synapses[i]);
+  }
+
+  // Compute all of the new permanences.  This loop has no branches and no
+  // indirections other than the input lookup, so it can be vectorized.
+  for(size_t i = 0; i < numSynapses; i++) {
+    const Permanence update = inputArray[presynapticCells[i]] ? increment : -decrement;
+    const Permanence permanence = permanences[i] + update;
+    updated[i] = std::min( std::max( permanence, minPermanence ), maxPermanence );
+  }
+  if( permanenceBits_ != 0u ) {
+    for(size_t i = 0; i < numSynapses; i++) {
+      updated[i] = quantize_( updated[i] );
+    }
+  }
+
+  // Write back the new permanences.  The synapses which become connected or
+  // disconnected are collected, and the presynaptic maps are updated for all
+  // of them at the end.
   vector<Synapse> destroyLater;
-  for(const auto synapse: synapsesForSegment(segment)) {
-      const SynapseData &synapseData = dataForSynapse(synapse);
-
-      Permanence update;
-      if( inputArray[synapseData.presynapticCell] ) {
-        update = increment;
-      } else {
-        update = -decrement;
-      }
+  auto &transitions = adaptTransitions_;
+  transitions.clear();
+  for(size_t i = 0; i < numSynapses; i++) {
+    const Synapse synapse = synapses[i];
+    const Permanence update = inputArray[presynapticCells[i]] ? increment : -decrement;
 
     //prune permanences that reached zero
-    if (pruneZeroSynapses and 
-        synapseData.permanence + update < htm::minPermanence + htm::Epsilon) { //new value will disconnect the synapse
+    if (pruneZeroSynapses and
+        permanences[i] + update < htm::minPermanence + htm::Epsilon) { //new value will disconnect the synapse
       destroyLater.push_back(synapse);
       prunedSyns_++; //for statistics
       continue;
@@ -510,14 +1603,22 @@ void Connections::adaptSegment(const Segment segment,
 
     //update synapse, but for TS only if changed
     if(timeseries_) {
-      if( update != previousUpdates_[synapse] ) {
-        updateSynapsePermanence(synapse, synapseData.permanence + update);
-      }
+      const bool changed = update != previousUpdates_[synapse];
       currentUpdates_[ synapse ] = update;
+      if( not changed ) continue;
+    }
+    if( (permanences[i] >= connectedThreshold_) != (updated[i] >= connectedThreshold_) ) {
+      transitions.push_back( i );
     } else {
-      updateSynapsePermanence(synapse, synapseData.permanence + update);
+      setPermanence_(synapse, updated[i]);
     }
   }
+  for(const auto i : transitions) {
+    updateSynapsePermanence(synapses[i], updated[i]);
+  }
+  for (auto h : eventHandlers_) {
+    h.second->onUpdatePermanences(segment);
+  }
 
   //destroy synapses accumulated for pruning
   for(const auto pruneSyn : destroyLater) {
@@ -580,11 +1681,11 @@ void Connections::raisePermanencesToThreshold(
   auto minPermSynPtr = synapses.begin() + threshold - 1;
 
   const auto permanencesGreater = [&](const Synapse &A, const Synapse &B)
-    { return synapses_[A].permanence > synapses_[B].permanence; };
+    { return permanence_(A) > permanence_(B); };
   // Do a partial sort, it's faster than a full sort.
   std::nth_element(synapses.begin(), minPermSynPtr, synapses.end(), permanencesGreater);
 
-  const Real increment = connectedThreshold_ - synapses_[ *minPermSynPtr ].permanence;
+  const Real increment = connectedThreshold_ - permanence_( *minPermSynPtr );
   if( increment <= 0 ) // If minPermSynPtr is already connected then ...
     return;            // Enough synapses are already connected.
 
@@ -633,7 +1734,7 @@ void Connections::synapseCompetition(
 
   vector<Permanence> permanences; permanences.reserve( segData.synapses.size() );
   for( Synapse syn : segData.synapses )
-    permanences.push_back( synapses_[syn].permanence );
+    permanences.push_back( permanence_(syn) );
 
   // Do a partial sort, it's faster than a full sort.
   auto minPermPtr = permanences.begin() + (segData.synapses.size() - 1 - desiredConnected);
@@ -649,7 +1750,7 @@ void Connections::synapseCompetition(
 void Connections::bumpSegment(const Segment segment, const Permanence delta) {
   // TODO: vectorize?
   for( const auto syn : synapsesForSegment(segment) ) {
-    updateSynapsePermanence(syn, synapses_[syn].permanence + delta);
+    updateSynapsePermanence(syn, permanence_(syn) + delta);
   }
 }
 
@@ -771,7 +1872,9 @@ bool Connections::operator==(const Connections &o) const {
   NTA_CHECK (segments_ == o.segments_ ) << "Connections equals: segments_";
   NTA_CHECK (destroyedSegments_ == o.destroyedSegments_ ) << "Connections equals: destroyedSegments_";
 
+  NTA_CHECK (permanenceBits_ == o.permanenceBits_ ) << "Connections equals: permanenceBits_";
   NTA_CHECK (synapses_ == o.synapses_ ) << "Connections equals: synapses_";
+  NTA_CHECK (packedSynapses_ == o.packedSynapses_ ) << "Connections equals: packedSynapses_";
   NTA_CHECK (destroyedSynapses_ == o.destroyedSynapses_ ) << "Connections equals: destroyedSynapses_";
 
 
@@ -22,8 +22,11 @@
 #ifndef NTA_CONNECTIONS_HPP
 #define NTA_CONNECTIONS_HPP
 
+#include <cmath>
 #include <limits>
 #include <map>
+#include <memory>
+#include <string>
 #include <unordered_map>
 #include <set>
 #include <utility>
@@ -33,6 +36,8 @@
 #include <htm/types/Types.hpp>
 #include <htm/types/Serializable.hpp>
 #include <htm/types/Sdr.hpp>
+#include <htm/os/MappedFile.hpp>
+#include <htm/utils/ThreadPool.hpp>
 
 namespace htm {
 
@@ -54,13 +59,17 @@ constexpr const Permanence maxPermanence = 1.0f;
  * @b Description
  * The SynapseData contains the underlying data for a synapse.
  *
+ * SynapseData, SegmentData and CellData are only serialized as part of the
+ * Connections, so they do not derive from Serializable.  This keeps them free
+ * of a vtable pointer, which would be the largest field of every synapse.
+ *
  * @param presynapticCellIdx
  * Cell that this synapse gets input from.
  *
  * @param permanence
  * Permanence of synapse.
  */
-struct SynapseData: public Serializable {
+struct SynapseData {
   CellIdx presynapticCell;
   Permanence permanence;
   Segment segment;
@@ -70,7 +79,6 @@ struct SynapseData: public Serializable {
   SynapseData() {}
 
   //Serialization
-  CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const {
     ar(CEREAL_NVP(permanence),
@@ -117,7 +125,7 @@ struct SynapseData: public Serializable {
  * @param cell
  * The cell that this segment is on.
  */
-struct SegmentData: public Serializable {
+struct SegmentData {
   SegmentData(const CellIdx cell, Segment id, UInt32 lastUsed = 0) : cell(cell), numConnected(0), lastUsed(lastUsed), id(id) {} //default constructor
 
   std::vector<Synapse> synapses;
@@ -128,7 +136,6 @@ struct SegmentData: public Serializable {
 
   //Serialize
   SegmentData() {}; //empty constructor for serialization, do not use
-  CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const {
     ar(CEREAL_NVP(synapses),
@@ -172,11 +179,10 @@ struct SegmentData: public Serializable {
  * Segments on this cell.
  *
  */
-struct CellData : public Serializable {
+struct CellData {
   std::vector<Segment> segments;
 
   //Serialization
-  CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const {
     ar(CEREAL_NVP(segments)
@@ -236,6 +242,24 @@ public:
    */
   virtual void onUpdateSynapsePermanence(Synapse synapse,
                                          Permanence permanence) {}
+
+  /**
+   * Called after the permanences of the segment's synapses changed, by
+   * adaptSegment() or updateSynapsePermanence().  Unlike
+   * onUpdateSynapsePermanence, this is also called for the changes which do
+   * not cross the connected threshold.
+   */
+  virtual void onUpdatePermanences(Segment segment) {}
+
+  /**
+   * Called after the segments and synapses were renumbered by compact().
+   *
+   * @param segmentMap  segmentMap[oldSegment] is the new index of the segment.
+   * @param synapseMap  synapseMap[oldSynapse] is the new index of the synapse.
+   * Destroyed segments and synapses map to the max() of their data-type.
+   */
+  virtual void onCompact(const std::vector<Segment> &segmentMap,
+                         const std::vector<Synapse> &synapseMap) {}
 };
 
 /**
@@ -291,10 +315,19 @@ public:
    * This change allows it to work with timeseries data which moves very slowly,
    * instead of the usual HTM inputs which reliably change every cycle.  See
    * also (Kropff & Treves, 2007. http://dx.doi.org/10.2976/1.2793335).
+   *
+   * @param permanenceBits - Optional, default 0.  Storage of the synapses.
+   * 0 stores every permanence as a Real32 in a SynapseData (20 bytes per
+   * synapse).  8 or 16 quantizes the permanences to that many bits, and
+   * packs every synapse into 12 bytes.  Quantized permanences are rounded to
+   * the nearest multiple of 1 / (2^permanenceBits - 1), so updates smaller
+   * than half of that step are lost.  In the quantized modes at most
+   * 2^(32 - permanenceBits) - 1 synapses can share a presynaptic cell.
    */
   Connections(const CellIdx numCells, 
 	      const Permanence connectedThreshold = 0.5f,
-              const bool timeseries = false);
+              const bool timeseries = false,
+              const UInt permanenceBits = 0u);
 
   virtual ~Connections() {} 
 
@@ -305,10 +338,12 @@ public:
    * @param connectedThreshold Permanence threshold for synapses connecting or
    *                           disconnecting.
    * @param timeseries         See constructor.
+   * @param permanenceBits     See constructor.
    */
   void initialize(const CellIdx numCells, 
 		  const Permanence connectedThreshold = 0.5f,
-                  const bool timeseries = false);
+                  const bool timeseries = false,
+                  const UInt permanenceBits = 0u);
 
   /**
    * Creates a segment on the specified cell.
@@ -358,6 +393,45 @@ public:
                         const CellIdx presynapticCell,
                         Permanence permanence);
 
+  /**
+   * Creates synapses on the specified segment to many presynaptic cells.
+   *
+   * This has the same effect as calling `createSynapse()` for each of the
+   * presynapticCells in order, until maxNewSynapses new synapses have been
+   * created.  Cells which are already synapsed on by the segment (or which
+   * occur twice in presynapticCells) do not create a new synapse, see Note 1 of
+   * `createSynapse()`.
+   *
+   * createSynapse() scans the whole segment for a duplicate synapse, which makes
+   * growing many synapses quadratic in the size of the segment.  This method
+   * looks the presynaptic cells up in a sorted index of the segment instead.
+   *
+   * @param segment          Segment to create synapses on.
+   * @param presynapticCells Cells to synapse on.
+   * @param permanence       Initial permanence of the new synapses.
+   * @param maxNewSynapses   (optional) Stop after creating this many new synapses.
+   *
+   * @return Number of new synapses which were created.
+   */
+  size_t createSynapses(const Segment segment,
+                        const std::vector<CellIdx> &presynapticCells,
+                        Permanence permanence,
+                        size_t maxNewSynapses = std::numeric_limits<size_t>::max());
+
+  /**
+   * Same as createSynapses() above, with an initial permanence for each of the
+   * presynapticCells.
+   *
+   * @param segment          Segment to create synapses on.
+   * @param presynapticCells Cells to synapse on.
+   * @param permanences      Initial permanences, one per presynaptic cell.
+   *
+   * @return Number of new synapses which were created.
+   */
+  size_t createSynapses(const Segment segment,
+                        const std::vector<CellIdx> &presynapticCells,
+                        const std::vector<Permanence> &permanences);
+
   /**
    * Destroys segment.
    *
@@ -434,7 +508,7 @@ public:
    * @retval Segment that this synapse is on.
    */
   Segment segmentForSynapse(const Synapse synapse) const {
-    return synapses_[synapse].segment;
+    return synapseSegment_(synapse);
   }
 
   /**
@@ -458,11 +532,14 @@ public:
    *
    * @param synapse Synapse to get data for.
    *
-   * @retval Synapse data.
+   * @retval Synapse data.  This is a copy, because the quantized storage
+   * (see the constructor) does not keep SynapseData.  Its id orders the
+   * synapses of a segment, but in the quantized storage it is the synapse
+   * index rather than the creation ordinal.
    */
-  inline const SynapseData& dataForSynapse(const Synapse synapse) const {
+  inline const SynapseData dataForSynapse(const Synapse synapse) const {
     NTA_CHECK(synapseExists_(synapse, true));
-    return synapses_[synapse];
+    return synapseData_(synapse);
   }
 
   /**
@@ -516,7 +593,9 @@ public:
    *
    * The output vectors aren't grown or cleared. They must be
    * preinitialized with the length returned by
-   * getSegmentFlatVectorLength().
+   * getSegmentFlatVectorLength().  Except when the Connections are compacted
+   * automatically, see setCompactionThreshold(), then the vector
+   * numActivePotentialSynapsesForSegment is zeroed and re-sized.
    *
    * @param (optional) numActivePotentialSynapsesForSegment
    * An output vector for active potential synapse counts per segment.
@@ -538,6 +617,162 @@ public:
   std::vector<SynapseIdx> computeActivity(const std::vector<CellIdx> &activePresynapticCells, 
 		                          const bool learn = true);
 
+  /**
+   * Read-only variant of computeActivity, which counts only the active
+   * connected synapses.  It does none of the bookkeeping (iteration counter,
+   * timeseries updates, automatic compaction), so it is equivalent to
+   * computeActivity(activePresynapticCells, learn=false) on Connections
+   * without timeseries, and it can be called concurrently from many threads.
+   *
+   * @param activePresynapticCells Active cells in the input.
+   * @param numActiveConnectedSynapsesForSegment Output, it is resized to
+   *        segmentFlatListLength() and overwritten.
+   */
+  void computeConnectedActivity(const std::vector<CellIdx> &activePresynapticCells,
+                                std::vector<SynapseIdx> &numActiveConnectedSynapsesForSegment) const;
+
+  /**
+   * Sparse variant of computeActivity, its cost scales with the activity
+   * instead of with the number of segments.
+   *
+   * The count vectors are scratch buffers which are re-used from call to
+   * call.  Only the counts of the segments in touchedSegments are nonzero, so
+   * instead of clearing the whole buffers, this method resets only the
+   * segments which were touched by the previous call.  The buffers are grown
+   * to segmentFlatListLength() as needed.
+   *
+   * Pass in the same three vectors every time.  They must be empty at the
+   * first call, and after the Connections were compacted by anything other
+   * than this method (ie. by compact() or by the other computeActivity).
+   *
+   * @param activePresynapticCells Active cells in the input.
+   * @param learn Enable learning updates, see the other computeActivity.
+   * @param numActiveConnectedSynapsesForSegment Output, active connected
+   *        synapse counts per segment.
+   * @param numActivePotentialSynapsesForSegment Output, active potential
+   *        synapse counts per segment.
+   * @param touchedSegments Output, the segments with at least one active
+   *        potential synapse, in no particular order.  All other segments
+   *        have zero counts.
+   */
+  void computeActivity(const std::vector<CellIdx> &activePresynapticCells,
+                       const bool learn,
+                       std::vector<SynapseIdx> &numActiveConnectedSynapsesForSegment,
+                       std::vector<SynapseIdx> &numActivePotentialSynapsesForSegment,
+                       std::vector<Segment>    &touchedSegments);
+
+  /**
+   * Compile the presynaptic maps into a read-only snapshot in compressed
+   * sparse row (CSR) format: for each presynaptic cell, a contiguous range of
+   * the segments it connects to.  While frozen, computeActivity() uses this
+   * snapshot instead of the hash maps, which has a much better cache
+   * behavior.  This is intended for models which are only used for inference
+   * (learn = false).
+   *
+   * The snapshot is dropped automatically when the structure changes, ie.
+   * when a synapse is created, destroyed, or becomes (dis)connected.  The
+   * results of computeActivity() are the same, frozen or not.
+   *
+   * The snapshot is not serialized.  Freezing Connections which are already
+   * frozen, including ones mapped by loadFrozen(), does nothing.
+   */
+  void freeze();
+
+  /**
+   * Drop the snapshot made by freeze().
+   */
+  void unfreeze();
+
+  /**
+   * @returns whether computeActivity() currently uses the CSR snapshot.
+   */
+  bool isFrozen() const noexcept { return frozen_; }
+
+  /**
+   * Write a frozen model to a flat file, which loadFrozen() maps into memory
+   * instead of deserializing it.  The file holds the segments and the CSR
+   * snapshot of freeze(), but not the synapses themselves, so the loaded
+   * Connections can only be used for inference (learn = false).
+   *
+   * The destroyed segments are left out and the remaining segments are
+   * renumbered in order, as by compact().  The file uses the byte order of
+   * this machine.  This does not modify the Connections.
+   */
+  void saveFrozen(std::ostream &outStream) const;
+  void saveFrozen(const std::string &path) const;
+
+  /**
+   * Replace the Connections with a model written by saveFrozen().  The CSR
+   * snapshot is used in place, without copying it, so the processes which load
+   * the same file share its pages and only the pages which are used are read.
+   * The cells and segments are copied to the heap.
+   *
+   * The loaded Connections are frozen and read-only: the methods which change
+   * the segments or synapses throw, and so does save().  The synapses are not
+   * available (numSynapses() is 0).  initialize() or load() release the file.
+   *
+   * The file is trusted: only its header and the CSR offsets are validated.
+   *
+   * @param file    The mapped file.
+   * @param offset  Position of the model in the file, a multiple of 8 bytes.
+   * @returns the size of the model in bytes.
+   */
+  size_t loadFrozen(const std::shared_ptr<const MappedFile> &file, size_t offset = 0u);
+  void loadFrozen(const std::string &path);
+
+  /**
+   * @returns whether the Connections are a read-only model mapped from a file,
+   * see loadFrozen().
+   */
+  bool isMapped() const noexcept { return mapped_ != nullptr; }
+
+  /**
+   * Garbage collect the destroyed segments and synapses.
+   *
+   * destroySegment() and destroySynapse() leave the data of the removed
+   * segment / synapse in place, so segmentFlatListLength() and the memory
+   * usage keep growing while segments are being replaced.  This method
+   * renumbers the remaining segments and synapses into contiguous ranges,
+   * keeping their relative order, and releases the unused memory.
+   *
+   * All Segment and Synapse indices obtained before this call are
+   * invalidated.  Subscribed event handlers are notified with the mapping
+   * from the old to the new indices, see ConnectionsEventHandler::onCompact.
+   */
+  void compact();
+
+  /**
+   * Enable automatic compaction.  If the fraction of destroyed segments or of
+   * destroyed synapses exceeds the threshold then computeActivity() calls
+   * compact() before it computes anything.  The vectors returned by
+   * computeActivity() are therefore always sized for the compacted
+   * Connections, but Segment indices held by the caller across a call to
+   * computeActivity() may be invalidated.
+   *
+   * @param threshold  Fraction in range [0, 1).  Zero disables the automatic
+   * compaction, this is the default.  The threshold is not serialized.
+   */
+  void setCompactionThreshold(const Real threshold);
+  Real getCompactionThreshold() const noexcept { return compactionThreshold_; }
+
+  /**
+   * Use several threads in computeActivity().  The active presynaptic cells
+   * are split into contiguous parts, which are counted into per-thread
+   * accumulators, and the accumulators are then added up.  The counts are
+   * exactly the same as with a single thread, only the order of the
+   * touchedSegments may differ.
+   *
+   * This pays off for dense inputs with many synapses per presynaptic cell;
+   * calls with few active cells are always computed by the calling thread.
+   *
+   * @param numThreads  Total number of threads, including the calling thread.
+   * One is the default, zero means all hardware threads.  The number of
+   * threads is not serialized, and copies of the Connections do not share the
+   * threads.
+   */
+  void setNumThreads(const UInt numThreads);
+  UInt getNumThreads() const noexcept { return numThreads_; }
+
   /**
    * The primary method in charge of learning.   Adapts the permanence values of
    * the synapses based on the input SDR.  Learning is applied to a single
@@ -639,11 +874,23 @@ public:
   CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const {
+    checkWritable_();
+    if( permanenceBits_ != 0u ) {
+      // The quantized storage is marked by a negative number of bits in the
+      // place of the connectedThreshold_, which is never below -Epsilon.
+      // Archives of the Real32 storage are unchanged.
+      const Permanence permanenceBits = -static_cast<Permanence>( permanenceBits_ );
+      ar(CEREAL_NVP(permanenceBits));
+    }
     ar(CEREAL_NVP(connectedThreshold_));
     ar(CEREAL_NVP(iteration_));
     ar(CEREAL_NVP(cells_));
     ar(CEREAL_NVP(segments_));
-    ar(CEREAL_NVP(synapses_));
+    if( permanenceBits_ == 0u ) {
+      ar(CEREAL_NVP(synapses_));
+    } else {
+      ar(CEREAL_NVP(packedSynapses_));
+    }
 
     ar(CEREAL_NVP(destroyedSynapses_));
     ar(CEREAL_NVP(destroyedSegments_));
@@ -666,13 +913,32 @@ public:
 
   template<class Archive>
   void load_ar(Archive & ar) {
-    ar(CEREAL_NVP(connectedThreshold_));
+    endDeltas();
+    unmap_();
+    unfreeze();
+    Permanence first;
+    ar( first );
+    if( first > -1.0f ) {
+      permanenceBits_     = 0u;
+      connectedThreshold_ = first;
+    } else {
+      permanenceBits_ = static_cast<UInt32>( -first );
+      NTA_CHECK( permanenceBits_ == 8u or permanenceBits_ == 16u )
+        << "Connections: unknown permanence storage " << -first;
+      ar(CEREAL_NVP(connectedThreshold_));
+    }
     ar(CEREAL_NVP(iteration_));
     //!initialize(numCells, connectedThreshold_); //initialize Connections //Note: we actually don't call Connections
     //initialize() as all the members are de/serialized. 
     ar(CEREAL_NVP(cells_));
     ar(CEREAL_NVP(segments_));
-    ar(CEREAL_NVP(synapses_));
+    synapses_.clear();
+    packedSynapses_.clear();
+    if( permanenceBits_ == 0u ) {
+      ar(CEREAL_NVP(synapses_));
+    } else {
+      ar(CEREAL_NVP(packedSynapses_));
+    }
 
     ar(CEREAL_NVP(destroyedSynapses_));
     ar(CEREAL_NVP(destroyedSegments_));
@@ -702,6 +968,14 @@ public:
 
   constexpr Permanence getConnectedThreshold() const noexcept { return connectedThreshold_; }
 
+  /**
+   * Gets the storage of the permanences, see the constructor.
+   *
+   * @retval 0 for Real32 permanences, else the number of bits of the
+   * quantized permanences.
+   */
+  UInt getPermanenceBits() const noexcept { return permanenceBits_; }
+
   /**
    * Gets the number of segments.
    *
@@ -727,8 +1001,8 @@ public:
    * @retval Number of synapses.
    */
   size_t numSynapses() const {
-    NTA_ASSERT(synapses_.size() >= destroyedSynapses_);
-    return synapses_.size() - destroyedSynapses_;
+    NTA_ASSERT(numSynapseRecords_() >= destroyedSynapses_);
+    return numSynapseRecords_() - destroyedSynapses_;
   }
 
   /**
@@ -770,6 +1044,41 @@ public:
    */
   void unsubscribe(UInt32 token);
 
+  /**
+   * Delta checkpoints, for models which are saved periodically while they
+   * learn.  A full snapshot by save() writes all of the synapses, while a
+   * delta only holds the segments, synapses and presynaptic cells which
+   * changed since the previous checkpoint.
+   *
+   * Call beginDeltas() right after saving the full snapshot, the base.  From
+   * then on the changes are recorded by a ConnectionsEventHandler.  Each call
+   * to saveDelta() writes the changes since the previous checkpoint, and
+   * starts the next delta.  To restore the model, load() the base and then
+   * loadDelta() all of the deltas in order.
+   *
+   * Besides the changed segments, every delta holds the lastUsed iteration of
+   * all segments and, with timeseries, the permanence updates of all synapses.
+   * If the Connections were compacted since the previous checkpoint, which
+   * renumbers everything, saveDelta() writes a full snapshot instead.
+   *
+   * load() and initialize() stop the recording.
+   */
+  void beginDeltas();
+  void endDeltas();
+  bool isRecordingDeltas() const noexcept { return deltas_.active; }
+
+  /**
+   * Write the changes since the previous checkpoint, see beginDeltas().
+   */
+  void saveDelta(std::ostream &outStream);
+
+  /**
+   * Apply a delta written by saveDelta().  The Connections must be in the
+   * state of the checkpoint before the delta, ie. the base or the previous
+   * delta.  This stops the recording of deltas.
+   */
+  void loadDelta(std::istream &inStream);
+
 protected:
   /**
    * Check whether this segment still exists on its cell.
@@ -798,6 +1107,24 @@ protected:
    */
   bool synapseExists_(const Synapse synapse, bool fast = false) const;
 
+  /**
+   * Creates a synapse on the segment, without checking for an existing synapse
+   * to the same presynaptic cell.  See createSynapse().
+   */
+  Synapse createSynapse_(const Segment segment,
+                         const CellIdx presynapticCell,
+                         Permanence permanence);
+
+  /**
+   * Implements both createSynapses().  The permanence of presynapticCells[i]
+   * is permanences[i], or sharedPermanence if permanences is nullptr.
+   */
+  size_t createSynapses_(const Segment segment,
+                         const std::vector<CellIdx> &presynapticCells,
+                         const Permanence *permanences,
+                         Permanence sharedPermanence,
+                         size_t maxNewSynapses);
+
   /**
    * Remove a synapse from presynaptic maps.
    *
@@ -822,6 +1149,13 @@ protected:
    */
   void pruneLRUSegment_(const CellIdx& cell);
 
+  /**
+   * Call compact() if the compaction threshold is exceeded.
+   *
+   * @retval True if the Connections were compacted.
+   */
+  bool compactIfNeeded_();
+
 private:
   std::vector<CellData>    cells_;
   std::vector<SegmentData> segments_;
@@ -831,6 +1165,88 @@ private:
   Permanence               connectedThreshold_; //TODO make const
   UInt32 iteration_ = 0;
 
+  // A synapse of the quantized storage, see the permanenceBits of the
+  // constructor.  The low permanenceBits_ bits of `packed` are the quantized
+  // permanence, the high bits are the presynapticMapIndex_.  The id is not
+  // stored, the index of the synapse orders the synapses in the same way.
+  struct PackedSynapse_ {
+    CellIdx presynapticCell = 0u;
+    Segment segment         = 0u;
+    UInt32  packed          = 0u;
+
+    template<class Archive>
+    void save_ar(Archive & ar) const {
+      ar(CEREAL_NVP(presynapticCell), CEREAL_NVP(segment), CEREAL_NVP(packed));
+    }
+    template<class Archive>
+    void load_ar(Archive & ar) {
+      ar( presynapticCell, segment, packed );
+    }
+    bool operator==(const PackedSynapse_ &o) const {
+      return presynapticCell == o.presynapticCell and segment == o.segment and packed == o.packed;
+    }
+  };
+  // Only one of synapses_ and packedSynapses_ is used, depending on the
+  // permanenceBits_.
+  UInt32                      permanenceBits_ = 0u;
+  std::vector<PackedSynapse_> packedSynapses_;
+
+  // Access to the synapses in either storage.  The quantized permanences are
+  // read as multiples of 1 / permanenceLevels_().
+  size_t numSynapseRecords_() const {
+    return permanenceBits_ == 0u ? synapses_.size() : packedSynapses_.size();
+  }
+  UInt32 permanenceLevels_() const { return (1u << permanenceBits_) - 1u; }
+  // The presynapticMapIndex_ of a destroyed synapse in the quantized storage.
+  UInt32 removedMapIndex_() const { return 0xFFFFFFFFu >> permanenceBits_; }
+  CellIdx presynapticCell_(const Synapse synapse) const {
+    return permanenceBits_ == 0u ? synapses_[synapse].presynapticCell
+                                 : packedSynapses_[synapse].presynapticCell;
+  }
+  Segment synapseSegment_(const Synapse synapse) const {
+    return permanenceBits_ == 0u ? synapses_[synapse].segment
+                                 : packedSynapses_[synapse].segment;
+  }
+  Synapse synapseOrdinal_(const Synapse synapse) const {
+    return permanenceBits_ == 0u ? synapses_[synapse].id : synapse;
+  }
+  Synapse mapIndex_(const Synapse synapse) const {
+    return permanenceBits_ == 0u ? synapses_[synapse].presynapticMapIndex_
+                                 : packedSynapses_[synapse].packed >> permanenceBits_;
+  }
+  Permanence permanence_(const Synapse synapse) const {
+    if( permanenceBits_ == 0u ) return synapses_[synapse].permanence;
+    return static_cast<Permanence>( packedSynapses_[synapse].packed & permanenceLevels_() )
+         / static_cast<Permanence>( permanenceLevels_() );
+  }
+  // Round the permanence, which must be in [minPermanence, maxPermanence],
+  // to the value which the storage keeps.
+  Permanence quantize_(const Permanence permanence) const {
+    if( permanenceBits_ == 0u ) return permanence;
+    return static_cast<Permanence>( permanenceLevel_( permanence ))
+         / static_cast<Permanence>( permanenceLevels_() );
+  }
+  UInt32 permanenceLevel_(const Permanence permanence) const {
+    NTA_ASSERT( permanence >= minPermanence and permanence <= maxPermanence );
+    return static_cast<UInt32>( std::lround( permanence * permanenceLevels_() ));
+  }
+  void setPermanence_(const Synapse synapse, const Permanence permanence) {
+    if( permanenceBits_ == 0u ) {
+      synapses_[synapse].permanence = permanence;
+      return;
+    }
+    auto &packed = packedSynapses_[synapse].packed;
+    packed = (packed & ~permanenceLevels_()) | permanenceLevel_( permanence );
+  }
+  bool synapseRemoved_(const Synapse synapse) const {
+    return permanenceBits_ == 0u ? synapses_[synapse].permanence == -1
+                                 : mapIndex_( synapse ) == removedMapIndex_();
+  }
+  void setMapIndex_(const Synapse synapse, const Synapse index);
+  void markRemoved_(const Synapse synapse);
+  SynapseData synapseData_(const Synapse synapse) const;
+  void setSynapseData_(const Synapse synapse, const SynapseData &data);
+
   // Extra bookkeeping for faster computing of segment activity.
  
   struct identity { constexpr size_t operator()( const CellIdx t ) const noexcept { return t; };   };	//TODO in c++20 use std::identity 
@@ -840,6 +1256,87 @@ private:
   std::unordered_map<CellIdx, std::vector<Segment>, identity> potentialSegmentsForPresynapticCell_;
   std::unordered_map<CellIdx, std::vector<Segment>, identity> connectedSegmentsForPresynapticCell_;
 
+  // Read-only CSR snapshot of a presynaptic segments map, see freeze().
+  // The segments of presynaptic cell c are segments[ offsets[c] .. offsets[c+1] ).
+  // The arrays are either owned (build) or point into a mapped file (view).
+  struct FrozenMap_ {
+    std::vector<Synapse> offsetsStorage;
+    std::vector<Segment> segmentsStorage;
+    const Synapse *offsets  = nullptr;
+    const Segment *segments = nullptr;
+    size_t numOffsets  = 0u;
+    size_t numSegments = 0u;
+
+    // A copy of an owned snapshot points at its own arrays, a copy of a
+    // mapped one at the same file, which the Connections share.
+    FrozenMap_() = default;
+    FrozenMap_(const FrozenMap_ &other) { *this = other; }
+    FrozenMap_(FrozenMap_ &&) = default;
+    FrozenMap_ &operator=(const FrozenMap_ &other);
+    FrozenMap_ &operator=(FrozenMap_ &&) = default;
+
+    void build(const std::unordered_map<CellIdx, std::vector<Segment>, identity> &map);
+    void view(const Synapse *offsets, size_t numOffsets,
+              const Segment *segments, size_t numSegments);
+    void clear();
+    void countActive(const std::vector<CellIdx> &activePresynapticCells,
+                     std::vector<SynapseIdx> &numActiveSynapsesForSegment) const;
+
+    // Call f(segment) for every synapse from the presynaptic cell.
+    template<typename F>
+    void forCell(const CellIdx cell, F &&f) const {
+      if( static_cast<size_t>( cell ) + 1u >= numOffsets ) return;
+      const Segment *end = segments + offsets[cell + 1u];
+      for( const Segment *seg = segments + offsets[cell]; seg != end; ++seg ) {
+        f( *seg );
+      }
+    }
+
+    // Call f(segment) for every synapse from the active presynaptic cells.
+    template<typename F>
+    void forEachSegment(const std::vector<CellIdx> &activePresynapticCells, F &&f) const {
+      for( const auto cell : activePresynapticCells ) {
+        forCell( cell, f );
+      }
+    }
+  };
+  bool       frozen_ = false;
+  FrozenMap_ frozenPotential_;
+  FrozenMap_ frozenConnected_;
+
+  // The file which holds the frozen snapshot, see loadFrozen().  While it is
+  // set the Connections are read-only.
+  std::shared_ptr<const MappedFile> mapped_;
+  void checkWritable_() const;
+  void unmap_();
+
+  Real compactionThreshold_ = 0.0f; // see setCompactionThreshold()
+
+  // Parallel computeActivity, see setNumThreads().  Every part of the active
+  // cells is counted into its own accumulators: dense ones for the dense
+  // outputs, or sparse ones, which only have nonzero counts for the touched
+  // segments and are cleared again after these are added up.
+  struct PartialCounts_ {
+    std::vector<SynapseIdx> dense;
+    std::vector<SynapseIdx> connected;
+    std::vector<SynapseIdx> potential;
+    std::vector<Segment>    touched;
+  };
+  // The worker threads are created on demand and are not copied.
+  struct Workers_ {
+    std::unique_ptr<ThreadPool> pool;
+    std::vector<PartialCounts_> partials;
+    Workers_() = default;
+    Workers_(const Workers_ &) {}
+    Workers_ &operator=(const Workers_ &) { pool.reset(); partials.clear(); return *this; }
+  };
+  UInt     numThreads_ = 1u;
+  Workers_ workers_;
+  bool countActiveParallel_(const std::vector<CellIdx> &activePresynapticCells,
+                            std::vector<SynapseIdx> *connected,
+                            std::vector<SynapseIdx> *potential,
+                            std::vector<Segment>    *touched);
+
   Segment nextSegmentOrdinal_ = 0;
   Synapse nextSynapseOrdinal_ = 0;
 
@@ -849,6 +1346,17 @@ private:
   std::vector<Permanence> previousUpdates_;
   std::vector<Permanence> currentUpdates_;
 
+  // Scratch space for adaptSegment, which holds the segment's synapses in a
+  // structure of arrays.  These are not serialized.
+  std::vector<CellIdx>    adaptPresynapticCells_;
+  std::vector<Permanence> adaptPermanences_;
+  std::vector<Permanence> adaptUpdated_;
+  std::vector<size_t>     adaptTransitions_;
+
+  // Scratch space for createSynapses, the (presynaptic cell, synapse) pairs of
+  // the segment sorted by presynaptic cell.  This is not serialized.
+  std::vector<std::pair<CellIdx, Synapse>> growIndex_;
+
   //for prune statistics
   Synapse prunedSyns_ = 0; //how many synapses have been removed?
   Segment prunedSegs_ = 0;
@@ -856,6 +1364,25 @@ private:
   //for listeners //TODO listeners are not serialized, nor included in equals ==
   UInt32 nextEventToken_;
   std::map<UInt32, ConnectionsEventHandler *> eventHandlers_;
+
+  // The event handler which records the changes for saveDelta().  It is
+  // shared with copies of the Connections, which keep the event handlers of
+  // the original, but copies do not record.
+  class DeltaRecorder_;
+  struct DeltaRecording_ {
+    std::shared_ptr<DeltaRecorder_> recorder;
+    UInt32 token  = 0u;
+    bool   active = false;
+    DeltaRecording_() = default;
+    DeltaRecording_(const DeltaRecording_ &other) : recorder(other.recorder) {}
+    DeltaRecording_ &operator=(const DeltaRecording_ &other) {
+      recorder = other.recorder;
+      active   = false;
+      return *this;
+    }
+  };
+  DeltaRecording_ deltas_;
+  void restartDeltas_();
 }; // end class Connections
 
 } // end namespace htm
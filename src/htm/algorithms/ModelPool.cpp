@@ -0,0 +1,131 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Implementation of the ModelPool class
+ */
+
+#include <algorithm>
+#include <sstream>
+
+#include <htm/algorithms/ModelPool.hpp>
+#include <htm/utils/Log.hpp>
+
+using namespace std;
+using namespace htm;
+
+
+ModelPool::ModelPool(UInt numModels,
+                     const SpatialPooler &sp,
+                     const TemporalMemory &tm,
+                     const vector<UInt> &steps,
+                     Real alpha,
+                     UInt numThreads)
+  : inputSize_( sp.getNumInputs() ),
+    steps_( steps ),
+    likelihood_( max( numModels, 1u ) ),
+    pool_( numThreads )
+{
+  NTA_CHECK( numModels > 0u ) << "ModelPool needs at least one model.";
+  NTA_CHECK( sp.getNumColumns() * tm.getCellsPerColumn() == tm.numberOfCells() )
+    << "ModelPool: TemporalMemory columns must match the SpatialPooler columns.";
+  sort( steps_.begin(), steps_.end() );
+
+  // The SP & TM are cloned using their serialization, because the
+  // TemporalMemory is not copy constructible.
+  stringstream spState( ios_base::in | ios_base::out | ios_base::binary );
+  stringstream tmState( ios_base::in | ios_base::out | ios_base::binary );
+  sp.save( spState );
+  tm.save( tmState );
+
+  models_.resize( numModels );
+  pool_.parallelFor( numModels, [&](UInt i) {
+    auto m = make_unique<Model>();
+    stringstream spIn( spState.str(), ios_base::in | ios_base::binary );
+    stringstream tmIn( tmState.str(), ios_base::in | ios_base::binary );
+    m->sp.load( spIn );
+    m->tm.load( tmIn );
+    if( not steps_.empty() ) {
+      m->predictor.initialize( steps_, alpha );
+    }
+    m->input.initialize(   sp.getInputDimensions() );
+    m->columns.initialize( sp.getColumnDimensions() );
+    m->cells.initialize({ static_cast<UInt>(tm.numberOfCells()) });
+    models_[i] = move( m );
+  });
+}
+
+
+void ModelPool::computeModel_(UInt i, const Byte *inputs, const UInt *classifications,
+                              bool learn, Real *anomaly, Int *predictions)
+{
+  Model &m = *models_[i];
+  m.input.setDense( inputs + static_cast<size_t>(i) * inputSize_ );
+  m.sp.compute( m.input, learn, m.columns );
+  m.tm.compute( m.columns, learn );
+
+  anomaly[i] = m.tm.anomaly;
+
+  if( not steps_.empty() ) {
+    m.tm.getActiveCells( m.cells );
+    Int *row = predictions + static_cast<size_t>(i) * steps_.size();
+    // A step's Classifier only learns once it has seen a record that many
+    // steps back, until then its PDF is not meaningful.
+    for( size_t s = 0u; s < steps_.size(); s++ ) {
+      if( m.predictor.hasLearned( steps_[s] ) ) {
+        const PDF pdf = m.predictor.infer( m.cells, steps_[s] );
+        row[s] = pdf.empty() ? -1 : static_cast<Int>( argmax( pdf ) );
+      }
+      else {
+        row[s] = -1;
+      }
+    }
+    if( learn and classifications != nullptr ) {
+      m.predictor.learn( m.recordNum, m.cells, { classifications[i] } );
+    }
+  }
+  m.recordNum++;
+}
+
+
+void ModelPool::compute(const Byte *inputs,
+                        const UInt *classifications,
+                        bool        learn,
+                        Real       *anomaly,
+                        Real       *likelihood,
+                        Int        *predictions)
+{
+  NTA_CHECK( inputs != nullptr and anomaly != nullptr and likelihood != nullptr );
+  NTA_CHECK( steps_.empty() or predictions != nullptr )
+    << "ModelPool::compute: missing output array for the predictions.";
+
+  pool_.parallelFor( size(), [&](UInt i) {
+    computeModel_( i, inputs, classifications, learn, anomaly, predictions );
+  });
+  likelihood_.compute( anomaly, nullptr, likelihood );
+}
+
+
+void ModelPool::reset() {
+  for( auto &m : models_ ) {
+    m->tm.reset();
+    if( not steps_.empty() ) {
+      m->predictor.reset();
+    }
+  }
+  likelihood_.reset();
+}
@@ -0,0 +1,159 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Definitions for the ModelPool class
+ */
+
+#ifndef NTA_MODEL_POOL_HPP
+#define NTA_MODEL_POOL_HPP
+
+#include <memory>
+#include <vector>
+
+#include <htm/algorithms/AnomalyLikelihood.hpp>
+#include <htm/algorithms/SDRClassifier.hpp>
+#include <htm/algorithms/SpatialPooler.hpp>
+#include <htm/algorithms/TemporalMemory.hpp>
+#include <htm/types/Sdr.hpp>
+#include <htm/types/Types.hpp>
+#include <htm/utils/ThreadPool.hpp>
+
+namespace htm {
+
+/**
+ * ModelPool: owns many small, independent SP + TM + Predictor models and
+ * advances all of them by one timestep in a single call.
+ *
+ * This is intended for the "one model per metric" use case (see hotgym.py),
+ * where there are thousands of small models and the per-record overhead of
+ * calling each model separately dominates the run time.  The models are
+ * stepped in parallel by an internal ThreadPool.
+ *
+ * All models are clones of the given prototype SpatialPooler and
+ * TemporalMemory, so they start in an identical state.  Each model also has
+ * its own AnomalyLikelihood and, if any prediction steps are given, its own
+ * Predictor.
+ *
+ * Example Usage:
+ *    SpatialPooler  sp({ 1000 }, { 1638 }, ... );
+ *    TemporalMemory tm({ 1638 }, 13, ... );
+ *    ModelPool pool( 20000, sp, tm, { 1 } );
+ *
+ *    // One row of encoded input per model.
+ *    vector<Byte>  inputs( pool.size() * pool.getInputSize() );
+ *    vector<UInt>  buckets( pool.size() );  // Optional, trains the Predictors
+ *    vector<Real>  anomaly( pool.size() ), likelihood( pool.size() );
+ *    vector<Int>   predictions( pool.size() * pool.getSteps().size() );
+ *
+ *    pool.compute( inputs.data(), buckets.data(), true,
+ *                  anomaly.data(), likelihood.data(), predictions.data() );
+ */
+class ModelPool {
+public:
+  /**
+   * @param numModels - Number of independent models in the pool.
+   * @param sp - Prototype SpatialPooler, every model starts as a copy of it.
+   * @param tm - Prototype TemporalMemory, every model starts as a copy of it.
+   *             Its columns must match the SpatialPooler's columns.
+   * @param steps - Prediction steps of the Predictors. If empty then no
+   *                Predictors are used.
+   * @param alpha - Learning rate of the Predictors, see Predictor.
+   * @param numThreads - Number of threads used to step the models,
+   *                     0 (default) means all hardware threads.
+   */
+  ModelPool(UInt numModels,
+            const SpatialPooler     &sp,
+            const TemporalMemory    &tm,
+            const std::vector<UInt> &steps      = {1u},
+            Real                     alpha      = 0.001f,
+            UInt                     numThreads = 0u);
+
+  /**
+   * Advance all models by one timestep.
+   *
+   * @param inputs - Dense, row major matrix of shape (size(), getInputSize()).
+   *                 Row i is the encoded input of model i.
+   * @param classifications - Optional (may be nullptr), one bucket index per
+   *                 model. Used to train the Predictors when learn is true.
+   * @param learn - Whether the models learn from this timestep.
+   *
+   * @param anomaly - Output, size(). The raw anomaly score (TM.anomaly).
+   * @param likelihood - Output, size(). The anomaly likelihood.
+   * @param predictions - Output, shape (size(), getSteps().size()).  The most
+   *                 likely bucket index for each prediction step, or -1 while the
+   *                 Predictor has not learned that step yet, see
+   *                 Predictor::hasLearned.  May be
+   *                 nullptr if getSteps() is empty.
+   */
+  void compute(const Byte *inputs,
+               const UInt *classifications,
+               bool        learn,
+               Real       *anomaly,
+               Real       *likelihood,
+               Int        *predictions);
+
+  /**
+   * Reset the sequence state of all models, see TM.reset & Predictor.reset.
+   * The anomaly likelihood also starts over, with its learning period.
+   */
+  void reset();
+
+  /**
+   * @returns number of models in the pool.
+   */
+  UInt size() const { return static_cast<UInt>(models_.size()); }
+
+  /**
+   * @returns number of input bits per model, ie row length of compute's input.
+   */
+  UInt getInputSize() const { return inputSize_; }
+
+  const std::vector<UInt> &getSteps() const { return steps_; }
+
+  UInt getNumThreads() const { return pool_.size(); }
+
+  /**
+   * Access the individual models, eg. for inspection or serialization.
+   */
+  SpatialPooler  &getSpatialPooler(UInt model)  { return models_.at(model)->sp; }
+  TemporalMemory &getTemporalMemory(UInt model) { return models_.at(model)->tm; }
+  Predictor      &getPredictor(UInt model)      { return models_.at(model)->predictor; }
+
+private:
+  struct Model {
+    SpatialPooler     sp;
+    TemporalMemory    tm;
+    Predictor         predictor;
+    SDR               input;
+    SDR               columns;
+    SDR               cells;
+    UInt              recordNum  = 0u;
+  };
+
+  void computeModel_(UInt model, const Byte *inputs, const UInt *classifications,
+                     bool learn, Real *anomaly, Int *predictions);
+
+  UInt inputSize_;
+  std::vector<UInt> steps_;
+  std::vector<std::unique_ptr<Model>> models_;
+  MultiMetricAnomalyLikelihood likelihood_;
+  ThreadPool pool_;
+};
+
+} // end namespace htm
+#endif // NTA_MODEL_POOL_HPP
@@ -16,6 +16,7 @@
  * along with this program.  If not, see http://www.gnu.org/licenses.
  * --------------------------------------------------------------------- */
 
+#include <algorithm> // copy_n, max_element
 #include <cmath> // exp
 #include <numeric> // accumulate
 
@@ -31,16 +32,69 @@ UInt htm::argmax( const PDF & data )
 
 /******************************************************************************/
 
-Classifier::Classifier(const Real alpha)
-  { initialize( alpha ); }
+Classifier::Classifier(const Real alpha, const bool float32)
+  { initialize( alpha, float32 ); }
 
-void Classifier::initialize(const Real alpha)
+void Classifier::initialize(const Real alpha, const bool float32)
 {
   NTA_CHECK(alpha > 0.0f);
   alpha_ = alpha;
   dimensions_ = 0;
   numCategories_ = 0u;
-  weights_.clear();
+  float32_ = float32;
+  stride_ = 0u;
+  weights64_.clear();
+  weights32_.clear();
+}
+
+
+namespace {
+  // Accumulate the rows of the active input bits.  The inner loop runs over
+  // contiguous memory, so the compiler can vectorize it.
+  template<typename Weight>
+  void accumulateRows(const vector<Weight> &weights, const size_t stride,
+                      const SDR_sparse_t &pattern, PDF &sums) {
+    const size_t numCategories = sums.size();
+    Real64 *sum = sums.data();
+    for( const auto bit : pattern ) {
+      const Weight *row = weights.data() + bit * stride;
+      for( size_t i = 0u; i < numCategories; i++ ) {
+        sum[i] += row[i];
+      }
+    }
+  }
+
+  template<typename Weight>
+  void updateRows(vector<Weight> &weights, const size_t stride,
+                  const SDR_sparse_t &pattern, const Real64 alpha,
+                  const vector<Real64> &error, const size_t numCategories) {
+    const Real64 *err = error.data();
+    for( const auto bit : pattern ) {
+      Weight *row = weights.data() + bit * stride;
+      for( size_t i = 0u; i < numCategories; i++ ) {
+        row[i] += static_cast<Weight>( alpha * err[i] );
+      }
+    }
+  }
+
+  // The sparse patterns of the batch methods do not carry their size.
+  void checkBits(const SDR_sparse_t &pattern, const UInt size) {
+    for( const auto bit : pattern ) {
+      NTA_CHECK( bit < size ) << "Classifier: input bit " << bit << " is out of bounds, size " << size;
+    }
+  }
+
+  // Re-layout the rows to a larger stride, the new categories are zero.
+  template<typename Weight>
+  void growRows(vector<Weight> &weights, const size_t numRows,
+                const size_t oldStride, const size_t newStride) {
+    vector<Weight> grown( numRows * newStride, 0 );
+    for( size_t row = 0u; row < numRows; row++ ) {
+      std::copy_n( weights.begin() + row * oldStride, oldStride,
+                   grown.begin() + row * newStride );
+    }
+    weights.swap( grown );
+  }
 }
 
 
@@ -53,14 +107,30 @@ PDF Classifier::infer(const SDR & pattern) const {
     return PDF(numCategories_, std::nan("")); //empty array []
   }
   NTA_ASSERT(pattern.size == dimensions_) << "Input SDR does not match previously seen size!";
+  return infer_( pattern.getSparse() );
+}
+
 
+vector<PDF> Classifier::inferBatch(const vector<SDR_sparse_t> &patterns) const {
+  if (dimensions_ == 0) {
+    NTA_WARN << "Classifier: must call `learn` before `infer`.";
+    return vector<PDF>( patterns.size(), PDF(numCategories_, std::nan("")) );
+  }
+  vector<PDF> result;
+  result.reserve( patterns.size() );
+  for( const auto &pattern : patterns ) {
+    checkBits( pattern, dimensions_ );
+    result.push_back( infer_( pattern ) );
+  }
+  return result;
+}
+
+
+PDF Classifier::infer_(const SDR_sparse_t &pattern) const {
   // Accumulate feed forward input.
   PDF probabilities( numCategories_, 0.0f );
-  for( const auto bit : pattern.getSparse() ) {
-    for( size_t i = 0; i < numCategories_; i++ ) {
-      probabilities[i] += weights_[bit][i];
-    }
-  }
+  if( float32_ ) accumulateRows( weights32_, stride_, pattern, probabilities );
+  else           accumulateRows( weights64_, stride_, pattern, probabilities );
 
   // Convert from accumulated votes to probability density function.
   softmax( probabilities.begin(), probabilities.end() );
@@ -69,45 +139,69 @@ PDF Classifier::infer(const SDR & pattern) const {
 
 
 void Classifier::learn(const SDR &pattern, const vector<UInt> &categoryIdxList)
+{
+  NTA_CHECK(pattern.size > 0) << "No Data passed to Classifier. Pattern is empty.";
+  learn_( static_cast<UInt>(pattern.size), pattern.getSparse(), categoryIdxList );
+}
+
+
+void Classifier::learnBatch(const UInt inputSize,
+                            const vector<SDR_sparse_t> &patterns,
+                            const vector<vector<UInt>> &categoryIdxLists)
+{
+  NTA_CHECK(inputSize > 0) << "No Data passed to Classifier. Pattern is empty.";
+  NTA_CHECK(patterns.size() == categoryIdxLists.size())
+    << "Classifier: need one list of categories per pattern.";
+  for( size_t i = 0u; i < patterns.size(); i++ ) {
+    NTA_CHECK( dimensions_ == 0 or inputSize == dimensions_ )
+      << "Input SDR does not match previously seen size!";
+    checkBits( patterns[i], inputSize );
+    learn_( inputSize, patterns[i], categoryIdxLists[i] );
+  }
+}
+
+
+void Classifier::learn_(const UInt inputSize, const SDR_sparse_t &pattern, const vector<UInt> &categoryIdxList)
 {
   // If this is the first time the Classifier is being used, weights are empty, 
   // so we set the dimensions to that of the input `pattern`
   if( dimensions_ == 0 ) {
-    dimensions_ = pattern.size;
-    while( weights_.size() < pattern.size ) {
-      const auto initialEmptyWeights = PDF( numCategories_, 0.0f );
-      weights_.push_back( initialEmptyWeights );
-    }
+    dimensions_ = inputSize;
+    if( float32_ ) weights32_.assign( (size_t)dimensions_ * stride_, 0.0f );
+    else           weights64_.assign( (size_t)dimensions_ * stride_, 0.0 );
   }
-  NTA_CHECK(pattern.size > 0) << "No Data passed to Classifier. Pattern is empty.";
-  NTA_ASSERT(pattern.size == dimensions_) << "Input SDR does not match previously seen size!";
+  NTA_ASSERT(inputSize == dimensions_) << "Input SDR does not match previously seen size!";
 
   // Check if this is a new category & resize the weights table to hold it.
   const auto maxCategoryIdx = *max_element(categoryIdxList.cbegin(), categoryIdxList.cend());
   if( maxCategoryIdx >= numCategories_ ) {
+    reserveCategories_( maxCategoryIdx + 1u );
     numCategories_ = maxCategoryIdx + 1;
-    for( auto & vec : weights_ ) {
-      while( vec.size() < numCategories_ ) {
-        vec.push_back( 0.0f );
-      }
-    }
   }
 
   // Compute errors and update weights.
   const auto& error = calculateError_(categoryIdxList, pattern);
-  for( const auto& bit : pattern.getSparse() ) {
-    for(size_t i = 0u; i < numCategories_; i++) {
-      weights_[bit][i] += alpha_ * error[i];
-    }
-  }
+  if( float32_ ) updateRows( weights32_, stride_, pattern, alpha_, error, numCategories_ );
+  else           updateRows( weights64_, stride_, pattern, alpha_, error, numCategories_ );
+}
+
+
+void Classifier::reserveCategories_(const UInt numCategories) {
+  if( numCategories <= stride_ ) return;
+  // Grow geometrically, so that adding categories one by one takes amortized
+  // constant time.
+  const UInt newStride = std::max( numCategories, stride_ + stride_ / 2u );
+  if( float32_ ) growRows( weights32_, dimensions_, stride_, newStride );
+  else           growRows( weights64_, dimensions_, stride_, newStride );
+  stride_ = newStride;
 }
 
 
 // Helper function to compute the error signal in learning.
 std::vector<Real64> Classifier::calculateError_(const std::vector<UInt> &categoryIdxList, 
-		                                const SDR &pattern) const {
+		                                const SDR_sparse_t &pattern) const {
   // compute predicted likelihoods
-  auto likelihoods = infer(pattern);
+  auto likelihoods = infer_(pattern);
 
   // Compute target likelihoods
   PDF targetDistribution(numCategories_ + 1u, 0.0f);
@@ -143,11 +237,11 @@ bool Classifier::operator==(const Classifier &other) const {
   if (alpha_ != other.alpha_) return false;
   if (dimensions_ != other.dimensions_) return false; 
   if (numCategories_ != other.numCategories_) return false;
-  if (weights_.size() != other.weights_.size()) return false;
-  for (size_t i = 0; i < weights_.size();  i++) {
-    if (weights_[i].size() != other.weights_[i].size()) return false;
-    for (size_t j = 0; j < weights_[i].size(); j++) {
-      if (weights_[i][j] != other.weights_[i][j]) return false;
+  if (float32_ != other.float32_) return false;
+  // The stride may differ, compare only the categories in use.
+  for (UInt bit = 0; bit < dimensions_; bit++) {
+    for (UInt i = 0; i < numCategories_; i++) {
+      if (getWeight_(bit, i) != other.getWeight_(bit, i)) return false;
     }
   }
   return true;
@@ -190,6 +284,20 @@ Predictions Predictor::infer(const SDR &pattern) const {
 }
 
 
+PDF Predictor::infer(const SDR &pattern, const UInt step) const {
+  const auto classifier = classifiers_.find( step );
+  NTA_CHECK( classifier != classifiers_.end() ) << "Predictor: unknown prediction step " << step;
+  return classifier->second.infer( pattern );
+}
+
+
+bool Predictor::hasLearned(const UInt step) const {
+  const auto classifier = classifiers_.find( step );
+  NTA_CHECK( classifier != classifiers_.end() ) << "Predictor: unknown prediction step " << step;
+  return classifier->second.hasLearned();
+}
+
+
 void Predictor::learn(const UInt recordNum, //TODO make recordNum optional, autoincrement as steps 
 		      const SDR &pattern,
                       const std::vector<UInt> &bucketIdxList)
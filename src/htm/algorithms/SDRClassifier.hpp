@@ -114,13 +114,17 @@ public:
    *                Note: when SDRs are formed correctly, the classification task 
    *                for this class is quite easy, so you likely will never need to 
    *                optimize this parameter. 
+   * @param float32 - Store the weights in single precision (float32) instead of
+   *                double precision.  This halves the memory usage and the
+   *                memory bandwidth of infer & learn, at the cost of precision.
+   *                The summation and the PDFs are always in double precision.
    */
-  Classifier(Real alpha = 0.001f );
+  Classifier(Real alpha = 0.001f, bool float32 = false );
 
   /**
    * For use when deserializing.
    */
-  void initialize(Real alpha);
+  void initialize(Real alpha, bool float32 = false);
 
   /**
    * Compute the likelihoods for each category / bucket.
@@ -140,42 +144,137 @@ public:
    */
   void learn(const SDR & pattern, const std::vector<UInt> & categoryIdxList);
 
+  /**
+   * Compute the likelihoods for many patterns at once.
+   *
+   * @param patterns: The active input bits of each pattern, as sparse indices.
+   * @returns: One PDF per pattern, see infer().
+   */
+  std::vector<PDF> inferBatch(const std::vector<SDR_sparse_t> &patterns) const;
+
+  /**
+   * Learn from many examples at once.  This is the same as calling learn() for
+   * each pattern, in order.
+   *
+   * @param inputSize: The size of the input SDRs.
+   * @param patterns: The active input bits of each pattern, as sparse indices.
+   * @param categoryIdxLists: The categories of each pattern.
+   */
+  void learnBatch(UInt inputSize,
+                  const std::vector<SDR_sparse_t> &patterns,
+                  const std::vector<std::vector<UInt>> &categoryIdxLists);
+
+  /**
+   * @returns: Whether the weights are stored in single precision.
+   */
+  bool isFloat32() const noexcept { return float32_; }
+
+  /**
+   * @returns: Whether learn() has been called, ie whether infer() returns a
+   *           meaningful PDF.
+   */
+  bool hasLearned() const noexcept { return dimensions_ != 0u; }
+
   CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const
   {
-    ar(cereal::make_nvp("alpha",         alpha_),
+    // The weights are saved as a 2D table of doubles, regardless of float32.
+    std::vector<std::vector<Real64>> weights( dimensions_ );
+    for( UInt bit = 0u; bit < dimensions_; bit++ ) {
+      weights[bit].resize( numCategories_ );
+      for( UInt i = 0u; i < numCategories_; i++ ) {
+        weights[bit][i] = getWeight_( bit, i );
+      }
+    }
+    const Real version = -static_cast<Real>( SERIALIZED_VERSION );
+    ar(cereal::make_nvp("version",       version),
+       cereal::make_nvp("alpha",         alpha_),
        cereal::make_nvp("dimensions",    dimensions_),
        cereal::make_nvp("numCategories", numCategories_),
-       cereal::make_nvp("weights",       weights_));
+       cereal::make_nvp("weights",       weights),
+       cereal::make_nvp("float32",       float32_));
   }
 
   template<class Archive>
   void load_ar(Archive & ar) {
-    ar(cereal::make_nvp("alpha", alpha_), 
-       cereal::make_nvp("dimensions", dimensions_),
-       cereal::make_nvp("numCategories", numCategories_), 
-       cereal::make_nvp("weights", weights_));
+    // Archives written before the float32 option start with alpha, which is
+    // positive.  Later archives start with the negated format version.
+    Real first;
+    ar( first );
+    if( first > 0.0f ) {
+      alpha_   = first;
+      float32_ = false;
+    }
+    else {
+      NTA_CHECK( -first <= static_cast<Real>( SERIALIZED_VERSION ) )
+        << "Classifier: unknown serialized format version " << -first;
+      ar(cereal::make_nvp("alpha", alpha_));
+    }
+    std::vector<std::vector<Real64>> weights;
+    ar(cereal::make_nvp("dimensions", dimensions_),
+       cereal::make_nvp("numCategories", numCategories_),
+       cereal::make_nvp("weights", weights));
+    if( first <= 0.0f ) {
+      ar(cereal::make_nvp("float32", float32_));
+    }
+    stride_ = numCategories_;
+    weights64_.clear();
+    weights32_.clear();
+    if( float32_ ) weights32_.resize( (size_t)dimensions_ * stride_ );
+    else           weights64_.resize( (size_t)dimensions_ * stride_ );
+    for( UInt bit = 0u; bit < dimensions_; bit++ ) {
+      for( UInt i = 0u; i < numCategories_; i++ ) {
+        setWeight_( bit, i, weights[bit][i] );
+      }
+    }
   }
 
   bool operator==(const Classifier &other) const;
   bool operator!=(const Classifier &other) const { return !operator==(other); }
 
 private:
+  // Version 1 is the format without the float32 flag, which had no version.
+  static const UInt SERIALIZED_VERSION = 2u;
+
   Real alpha_;
   UInt dimensions_;
   UInt numCategories_;
+  bool float32_;
 
   /**
-   * 2D map used to store the data.
-   * Use as: weights_[ input-bit ][ category-index ]
-   * Real64 (not just Real) so the computations do not lose precision.
+   * The weight matrix, stored row-major in one contiguous array so that the
+   * inner loops over the categories run over contiguous memory.
+   * Use as: weights[ input-bit * stride_ + category-index ]
+   * The rows have room for stride_ >= numCategories_ categories, so that new
+   * categories can be added without moving the data every time.
+   * Only one of these arrays is used, depending on float32_.  By default the
+   * weights are Real64 (not just Real) so the computations do not lose
+   * precision.
    */
-  std::vector<std::vector<Real64>> weights_;
+  UInt stride_;
+  std::vector<Real64> weights64_;
+  std::vector<Real32> weights32_;
+
+  Real64 getWeight_(UInt bit, UInt category) const {
+    const size_t idx = (size_t)bit * stride_ + category;
+    return float32_ ? weights32_[idx] : weights64_[idx];
+  }
+  void setWeight_(UInt bit, UInt category, Real64 weight) {
+    const size_t idx = (size_t)bit * stride_ + category;
+    if( float32_ ) weights32_[idx] = static_cast<Real32>( weight );
+    else           weights64_[idx] = weight;
+  }
+
+  // Make room for at least numCategories categories.
+  void reserveCategories_(UInt numCategories);
+
+  PDF  infer_(const SDR_sparse_t &pattern) const;
+  void learn_(UInt inputSize, const SDR_sparse_t &pattern, const std::vector<UInt> &categoryIdxList);
 
   // Helper function to compute the error signal for learning.
   std::vector<Real64> calculateError_(const std::vector<UInt> &bucketIdxList,
-                                      const SDR &pattern) const;
+                                      const SDR_sparse_t &pattern) const;
 };
 
 /**
@@ -268,6 +367,24 @@ public:
    */
   Predictions infer(const SDR &pattern) const;
 
+  /**
+   * Compute the likelihoods of a single prediction step.
+   *
+   * @param pattern: The active input SDR.
+   * @param step: One of the prediction steps.
+   *
+   * @returns: The PDF of the step, see Classifier::infer().
+   */
+  PDF infer(const SDR &pattern, UInt step) const;
+
+  /**
+   * @param step: One of the prediction steps.
+   *
+   * @returns: Whether the Classifier of the step has learned yet.  This takes
+   *           at least step + 1 records after the Predictor is created.
+   */
+  bool hasLearned(UInt step) const;
+
   /**
    * Learn from example data.
    *
@@ -23,10 +23,12 @@
 #include <algorithm>
 #include <iterator> //begin()
 #include <cmath> //fmod
+#include <limits>
 
 #include <htm/algorithms/SpatialPooler.hpp>
 #include <htm/utils/Topology.hpp>
 #include <htm/utils/VectorHelpers.hpp>
+#include <htm/utils/ThreadPool.hpp>
 
 using namespace std;
 using namespace htm;
@@ -76,7 +78,8 @@ SpatialPooler::SpatialPooler(
     Real localAreaDensity, UInt numActiveColumnsPerInhArea,
     UInt stimulusThreshold, Real synPermInactiveDec, Real synPermActiveInc,
     Real synPermConnected, Real minPctOverlapDutyCycles, UInt dutyCyclePeriod,
-    Real boostStrength, Int seed, UInt spVerbosity, bool wrapAround)
+    Real boostStrength, Int seed, UInt spVerbosity, bool wrapAround,
+    UInt initThreads)
     : SpatialPooler::SpatialPooler()
 {
   // The current version number for serialzation.
@@ -98,7 +101,8 @@ SpatialPooler::SpatialPooler(
              boostStrength,
              seed,
              spVerbosity,
-             wrapAround);
+             wrapAround,
+             initThreads);
 }
 
 vector<UInt> SpatialPooler::getColumnDimensions() const {
@@ -158,6 +162,35 @@ void SpatialPooler::setStimulusThreshold(UInt stimulusThreshold) {
   stimulusThreshold_ = stimulusThreshold;
 }
 
+UInt SpatialPooler::getNumThreads() const { return connections_.getNumThreads(); }
+
+void SpatialPooler::setNumThreads(UInt numThreads) {
+  connections_.setNumThreads(numThreads);
+}
+
+void SpatialPooler::beginDeltas() { connections_.beginDeltas(); }
+
+void SpatialPooler::endDeltas() { connections_.endDeltas(); }
+
+bool SpatialPooler::isRecordingDeltas() const { return connections_.isRecordingDeltas(); }
+
+void SpatialPooler::saveDelta(std::ostream &outStream) {
+  // The per-column state is small compared to the synapses, so it is
+  // written in full.
+  connections_.saveDelta(outStream);
+  cereal::BinaryOutputArchive ar(outStream);
+  saveState_(ar);
+  ar(rng_);
+}
+
+void SpatialPooler::loadDelta(std::istream &inStream) {
+  connections_.loadDelta(inStream);
+  cereal::BinaryInputArchive ar(inStream);
+  loadState_(ar);
+  ar(rng_);
+  initializeEphemeral_();
+}
+
 UInt SpatialPooler::getInhibitionRadius() const { return inhibitionRadius_; }
 
 void SpatialPooler::setInhibitionRadius(UInt inhibitionRadius) {
@@ -255,19 +288,27 @@ void SpatialPooler::setBoostFactors(Real boostFactors[]) {
 }
 
 void SpatialPooler::getOverlapDutyCycles(Real overlapDutyCycles[]) const {
-  copy(overlapDutyCycles_.begin(), overlapDutyCycles_.end(), overlapDutyCycles);
+  for(UInt i = 0; i < numColumns_; i++) {
+    overlapDutyCycles[i] = static_cast<Real>(
+        overlapDutyCycles_[i] * (dutyCycleClock_ / dutyCycleStamps_[i]));
+  }
 }
 
 void SpatialPooler::setOverlapDutyCycles(const Real overlapDutyCycles[]) {
+  decayDutyCycles_();
   overlapDutyCycles_.assign(&overlapDutyCycles[0],
                             &overlapDutyCycles[numColumns_]);
 }
 
 void SpatialPooler::getActiveDutyCycles(Real activeDutyCycles[]) const {
-  copy(activeDutyCycles_.begin(), activeDutyCycles_.end(), activeDutyCycles);
+  for(UInt i = 0; i < numColumns_; i++) {
+    activeDutyCycles[i] = static_cast<Real>(
+        activeDutyCycles_[i] * (dutyCycleClock_ / dutyCycleStamps_[i]));
+  }
 }
 
 void SpatialPooler::setActiveDutyCycles(const Real activeDutyCycles[]) {
+  decayDutyCycles_();
   activeDutyCycles_.assign(&activeDutyCycles[0],
                            &activeDutyCycles[numColumns_]);
 }
@@ -301,12 +342,13 @@ void SpatialPooler::setPotential(UInt column, const UInt potential[]) {
     connections_.destroySynapse( synapses[0] );
 
   // Replace with new synapse.
-  vector<UInt> potentialDenseVec( potential, potential + numInputs_ );
-  const auto &perm = initPermanence_( potentialDenseVec, initConnectedPct_ );
+  vector<UInt> potentialSparse;
   for(UInt i = 0; i < numInputs_; i++) {
     if( potential[i] )
-      connections_.createSynapse( column, i, perm[i] );
+      potentialSparse.push_back( i );
   }
+  const auto &perm = initPermanenceSparse_( potentialSparse, initConnectedPct_, rng_ );
+  connections_.createSynapses( column, potentialSparse, perm );
 }
 
 vector<Real> SpatialPooler::getPermanence(const UInt column, 
@@ -383,7 +425,8 @@ void SpatialPooler::initialize(
     Real boostStrength, 
     Int seed, 
     UInt spVerbosity, 
-    bool wrapAround) {
+    bool wrapAround,
+    UInt initThreads) {
 
   numInputs_ = 1u;
   inputDimensions_.clear();
@@ -437,24 +480,53 @@ void SpatialPooler::initialize(
   overlapDutyCycles_.assign(numColumns_, 0); //TODO make all these sparse or rm to reduce footprint
   activeDutyCycles_.assign(numColumns_, 0);
   minOverlapDutyCycles_.assign(numColumns_, 0.0);
+  dutyCycleStamps_.assign(numColumns_, 1.0);
+  dutyCycleClock_ = 1.0;
   boostFactors_.assign(numColumns_, 1.0); //1 is neutral value for boosting
   boostedOverlaps_.resize(numColumns_);
 
   inhibitionRadius_ = 0;
+  clearNeighborhoods_();
 
   connections_.initialize(numColumns_, synPermConnected_);
-  for (Size i = 0; i < numColumns_; ++i) {
-    connections_.createSegment( static_cast<CellIdx>(i) , 1 /* max segments per cell is fixed for SP to 1 */);
-
-    // Note: initMapPotential_ & initPermanence_ return dense arrays.
-    vector<UInt> potential = initMapPotential_((UInt)i, wrapAround_);
-    vector<Real> perm = initPermanence_(potential, initConnectedPct_);
-    for(size_t presyn = 0; presyn < numInputs_; presyn++) {
-      if( potential[presyn] )
-        connections_.createSynapse( static_cast<Segment>(i), presyn, perm[presyn] );
-    }
+  const auto initColumn = [&](const UInt column, const vector<UInt> &potential, const vector<Real> &perm) {
+    connections_.createSegment( static_cast<CellIdx>(column), 1 /* max segments per cell is fixed for SP to 1 */);
+    // The potential pool is sorted and unique, so the synapses are created in
+    // bulk rather than one createSynapse() duplicate scan at a time.
+    connections_.createSynapses( static_cast<Segment>(column), potential, perm );
+    connections_.raisePermanencesToThreshold( (Segment)column, stimulusThreshold_ );
+  };
 
-    connections_.raisePermanencesToThreshold( (Segment)i, stimulusThreshold_ );
+  if( initThreads == 1u ) {
+    for (UInt i = 0; i < numColumns_; ++i) {
+      const auto potential = initMapPotentialSparse_(i, wrapAround_, rng_);
+      const auto perm      = initPermanenceSparse_(potential, initConnectedPct_, rng_);
+      initColumn(i, potential, perm);
+    }
+  }
+  else {
+    // Every column draws from its own random number generator, so the columns
+    // can be sampled in any order.  Connections is not thread safe, so the
+    // synapses are created afterwards, one block of columns at a time.
+    vector<UInt64> seeds( numColumns_ );
+    for(auto &columnSeed : seeds) {
+      columnSeed = 1u + rng_.getUInt32(); // Random treats seed 0 as "unseeded".
+    }
+    ThreadPool pool( initThreads );
+    const UInt blockSize = std::min<UInt>( numColumns_, 64u * pool.size() );
+    vector<vector<UInt>> potentials( blockSize );
+    vector<vector<Real>> perms( blockSize );
+    for(UInt begin = 0; begin < numColumns_; begin += blockSize) {
+      const UInt count = std::min<UInt>( blockSize, numColumns_ - begin );
+      pool.parallelFor( count, [&](const UInt i) {
+        Random rng( seeds[begin + i] );
+        potentials[i] = initMapPotentialSparse_(begin + i, wrapAround_, rng);
+        perms[i]      = initPermanenceSparse_(potentials[i], initConnectedPct_, rng);
+      });
+      for(UInt i = 0; i < count; i++) {
+        initColumn(begin + i, potentials[i], perms[i]);
+      }
+    }
   }
 
   updateInhibitionRadius_();
@@ -467,14 +539,16 @@ void SpatialPooler::initialize(
 
 
 const vector<SynapseIdx> SpatialPooler::compute(const SDR &input, const bool learn, SDR &active) {
-  input.reshape(  inputDimensions_ );
-  active.reshape( columnDimensions_ );
+  // Only reshape when needed, so that an already shaped input SDR is strictly read-only here.
+  if( input.dimensions  != inputDimensions_ )  input.reshape(  inputDimensions_ );
+  if( active.dimensions != columnDimensions_ ) active.reshape( columnDimensions_ );
   updateBookeepingVars_(learn);
 
   const auto& overlaps = connections_.computeActivity(input.getSparse(), learn);
 
   boostOverlaps_(overlaps, boostedOverlaps_);
 
+  updateNeighborhoods_();
   auto &activeVector = active.getSparse();
   inhibitColumns_(boostedOverlaps_, activeVector);
   // Notify the active SDR that its internal data vector has changed.  Always
@@ -498,6 +572,51 @@ const vector<SynapseIdx> SpatialPooler::compute(const SDR &input, const bool lea
 }
 
 
+vector<SDR_sparse_t> SpatialPooler::computeBatch(const Byte *inputs, const UInt numInputs,
+                                                 const bool learn, const UInt numThreads) {
+  vector<SDR_sparse_t> activeColumns( numInputs );
+  const auto row = [&](const UInt i) { return inputs + (size_t)i * numInputs_; };
+
+  if( learn ) {
+    SDR input( inputDimensions_ );
+    SDR active( columnDimensions_ );
+    for(UInt i = 0; i < numInputs; i++) {
+      input.setDense( row(i) );
+      compute( input, true, active );
+      activeColumns[i] = active.getSparse();
+    }
+    return activeColumns;
+  }
+
+  // Inference does not change the SP, except for the iteration counter.
+  iterationNum_ += numInputs;
+  updateNeighborhoods_();
+
+  ThreadPool pool( numThreads );
+  const UInt numChunks = std::min<UInt>( pool.size(), numInputs );
+  pool.parallelFor( numChunks, [&](const UInt chunk) {
+    // Each thread has its own buffers and computes a contiguous range of rows.
+    vector<CellIdx>    sparse;
+    vector<SynapseIdx> overlaps;
+    vector<Real>       boostedOverlaps( numColumns_ );
+    const UInt begin = (UInt)((size_t)numInputs * chunk       / numChunks);
+    const UInt end   = (UInt)((size_t)numInputs * (chunk + 1) / numChunks);
+    for(UInt i = begin; i < end; i++) {
+      const Byte *dense = row(i);
+      sparse.clear();
+      for(UInt bit = 0; bit < numInputs_; bit++) {
+        if( dense[bit] ) sparse.push_back( bit );
+      }
+      connections_.computeConnectedActivity( sparse, overlaps );
+      boostOverlaps_( overlaps, boostedOverlaps );
+      inhibitColumns_( boostedOverlaps, activeColumns[i] );
+      std::sort( activeColumns[i].begin(), activeColumns[i].end() );
+    }
+  });
+  return activeColumns;
+}
+
+
 void SpatialPooler::boostOverlaps_(const vector<SynapseIdx> &overlaps, //TODO use Eigen sparse vector here
                                    vector<Real> &boosted) const {
   if(boostStrength_ < htm::Epsilon) { //boost ~ 0.0, we can skip these computations, just copy the data
@@ -530,6 +649,13 @@ UInt SpatialPooler::initMapColumn_(UInt column) const {
 
 
 vector<UInt> SpatialPooler::initMapPotential_(UInt column, bool wrapAround) {
+  const auto selectedInputs = initMapPotentialSparse_(column, wrapAround, rng_);
+  const vector<UInt> potential = VectorHelpers::sparseToBinary<UInt>(selectedInputs, numInputs_);
+  return potential;
+}
+
+
+vector<UInt> SpatialPooler::initMapPotentialSparse_(UInt column, bool wrapAround, Random &rng) const {
   NTA_ASSERT(column < numColumns_);
   const UInt centerInput = initMapColumn_(column);
 
@@ -545,9 +671,9 @@ vector<UInt> SpatialPooler::initMapPotential_(UInt column, bool wrapAround) {
   }
 
   const UInt numPotential = (UInt)round(columnInputs.size() * potentialPct_);
-  const auto selectedInputs = rng_.sample<UInt>(columnInputs, numPotential);
-  const vector<UInt> potential = VectorHelpers::sparseToBinary<UInt>(selectedInputs, numInputs_);
-  return potential;
+  auto selectedInputs = rng.sample<UInt>(columnInputs, numPotential);
+  std::sort(selectedInputs.begin(), selectedInputs.end());
+  return selectedInputs;
 }
 
 
@@ -580,6 +706,22 @@ vector<Real> SpatialPooler::initPermanence_(const vector<UInt> &potential, //TOD
 }
 
 
+vector<Real> SpatialPooler::initPermanenceSparse_(const vector<UInt> &potential,
+                                                  Real connectedPct, Random &rng) const {
+  vector<Real> perm;
+  perm.reserve(potential.size());
+  for (size_t i = 0; i < potential.size(); i++) {
+    NTA_ASSERT(i == 0 || potential[i - 1] < potential[i]);
+    if (rng.getReal64() <= connectedPct) {
+      perm.push_back(rng.realRange(synPermConnected_, maxPermanence));
+    } else {
+      perm.push_back(rng.realRange(minPermanence, synPermConnected_));
+    }
+  }
+  return perm;
+}
+
+
 void SpatialPooler::updateInhibitionRadius_() {
   if (globalInhibition_) {
     inhibitionRadius_ =
@@ -601,6 +743,7 @@ void SpatialPooler::updateInhibitionRadius_() {
 
 
 void SpatialPooler::updateMinDutyCycles_() {
+  decayDutyCycles_();
   if (globalInhibition_ ||
       inhibitionRadius_ >=
           *max_element(columnDimensions_.begin(), columnDimensions_.end())) {
@@ -643,21 +786,56 @@ void SpatialPooler::updateMinDutyCyclesLocal_() {
 
 void SpatialPooler::updateDutyCycles_(const vector<SynapseIdx> &overlaps,
                                       SDR &active) {
+  NTA_ASSERT(overlaps.size() == numColumns_);
+  NTA_ASSERT(active.size == numColumns_);
+  const UInt period = std::min(dutyCyclePeriod_, iterationNum_);
+  NTA_ASSERT(period > 0);
 
-  // Turn the overlaps array into an SDR. Convert directly to flat-sparse to
-  // avoid copies and  type convertions.
-  SDR newOverlap({ numColumns_ });
-  auto &overlapsSparseVec = newOverlap.getSparse();
-  for (size_t i = 0; i < numColumns_; i++) {
-    if( overlaps[i] != 0 )
-      overlapsSparseVec.push_back( i );
+  // Same moving average as updateDutyCyclesHelper_, but the decay of all
+  // columns is deferred, see decayDutyCycles_().
+  const Real decay = (period - 1) / static_cast<Real>(period);
+  if (decay == 0.0f) {
+    // The period is 1, the duty cycles are replaced by the new values.
+    fill(overlapDutyCycles_.begin(), overlapDutyCycles_.end(), 0.0f);
+    fill(activeDutyCycles_.begin(),  activeDutyCycles_.end(),  0.0f);
+    fill(dutyCycleStamps_.begin(),   dutyCycleStamps_.end(),   1.0);
+    dutyCycleClock_ = 1.0;
+  } else {
+    dutyCycleClock_ *= decay;
+    if (dutyCycleClock_ < MIN_DUTY_CYCLE_CLOCK) {
+      decayDutyCycles_();
+    }
   }
-  newOverlap.setSparse( overlapsSparseVec );
 
-  const UInt period = std::min(dutyCyclePeriod_, iterationNum_);
+  const Real increment = 1.0f / period;  // All non-zero values are 1.
+  for (UInt i = 0; i < numColumns_; i++) {
+    if (overlaps[i] != 0) {
+      decayDutyCycle_(i);
+      overlapDutyCycles_[i] += increment;
+    }
+  }
+  for (const auto column : active.getSparse()) {
+    decayDutyCycle_(column);
+    activeDutyCycles_[column] += increment;
+  }
+}
 
-  updateDutyCyclesHelper_(overlapDutyCycles_, newOverlap, period);
-  updateDutyCyclesHelper_(activeDutyCycles_, active, period);
+
+void SpatialPooler::decayDutyCycle_(const UInt column) {
+  const Real64 decay = dutyCycleClock_ / dutyCycleStamps_[column];
+  overlapDutyCycles_[column] = static_cast<Real>(overlapDutyCycles_[column] * decay);
+  activeDutyCycles_[column]  = static_cast<Real>(activeDutyCycles_[column] * decay);
+  dutyCycleStamps_[column]   = dutyCycleClock_;
+}
+
+
+void SpatialPooler::decayDutyCycles_() {
+  for (UInt i = 0; i < numColumns_; i++) {
+    decayDutyCycle_(i);
+  }
+  // Renormalize, all columns are now up to date.
+  fill(dutyCycleStamps_.begin(), dutyCycleStamps_.end(), 1.0);
+  dutyCycleClock_ = 1.0;
 }
 
 
@@ -717,8 +895,10 @@ void SpatialPooler::adaptSynapses_(const SDR &input,
 
 
 void SpatialPooler::bumpUpWeakColumns_() {
+  // Compares the lazily decayed overlap duty cycles to the minimum, without
+  // dividing by the time stamps.
   for (size_t i = 0; i < numColumns_; i++) {
-    if (overlapDutyCycles_[i] >= minOverlapDutyCycles_[i]) {
+    if (overlapDutyCycles_[i] * dutyCycleClock_ >= minOverlapDutyCycles_[i] * dutyCycleStamps_[i]) {
       continue;
     }
     connections_.bumpSegment( static_cast<Segment>(i), synPermBelowStimulusInc_ );
@@ -749,6 +929,10 @@ void SpatialPooler::updateDutyCyclesHelper_(vector<Real> &dutyCycles,
 
 
 void SpatialPooler::updateBoostFactors_() {
+  if (boostStrength_ < htm::Epsilon) { //boosting is disabled, boostOverlaps_ ignores the boost factors
+    return;
+  }
+  decayDutyCycles_();
   if (globalInhibition_) {
     updateBoostFactorsGlobal_();
   } else {
@@ -879,6 +1063,56 @@ void SpatialPooler::inhibitColumnsGlobal_(const vector<Real> &overlaps,
 }
 
 
+void SpatialPooler::initializeEphemeral_() {
+  boostedOverlaps_.resize(numColumns_);
+  clearNeighborhoods_();
+}
+
+void SpatialPooler::clearNeighborhoods_() {
+  neighborhoodsRadius_     = std::numeric_limits<UInt>::max();
+  neighborhoodsWrapAround_ = false;
+  neighborsBegin_.clear();
+  neighbors_.clear();
+}
+
+
+void SpatialPooler::updateNeighborhoods_() {
+  const bool isLocal = !globalInhibition_ &&
+      inhibitionRadius_ <= *max_element(columnDimensions_.begin(), columnDimensions_.end());
+  if (!isLocal || (neighborhoodsRadius_ == inhibitionRadius_ &&
+                   neighborhoodsWrapAround_ == wrapAround_)) {
+    return;
+  }
+  clearNeighborhoods_();
+
+  size_t size = 1u;
+  for (const auto dim : columnDimensions_) {
+    size *= min<size_t>(2 * inhibitionRadius_ + 1, dim);
+  }
+  if (size * numColumns_ > MAX_NEIGHBORHOODS_SIZE) {
+    return;
+  }
+
+  neighborsBegin_.reserve(numColumns_ + 1);
+  neighbors_.reserve(size * numColumns_);
+  neighborsBegin_.push_back(0u);
+  for (UInt column = 0; column < numColumns_; column++) {
+    if (wrapAround_) {
+      for (const auto neighbor : WrappingNeighborhood(column, inhibitionRadius_, columnDimensions_)) {
+        if (neighbor != column) neighbors_.push_back(neighbor);
+      }
+    } else {
+      for (const auto neighbor : Neighborhood(column, inhibitionRadius_, columnDimensions_)) {
+        if (neighbor != column) neighbors_.push_back(neighbor);
+      }
+    }
+    neighborsBegin_.push_back(static_cast<UInt>(neighbors_.size()));
+  }
+  neighborhoodsRadius_     = inhibitionRadius_;
+  neighborhoodsWrapAround_ = wrapAround_;
+}
+
+
 void SpatialPooler::inhibitColumnsLocal_(const vector<Real> &overlaps,
                                          Real density,
                                          vector<UInt> &activeColumns) const {
@@ -888,6 +1122,35 @@ void SpatialPooler::inhibitColumnsLocal_(const vector<Real> &overlaps,
   // selected are treated as "bigger".
   vector<bool> activeColumnsDense(numColumns_, false);
 
+  if (neighborhoodsRadius_ == inhibitionRadius_ && neighborhoodsWrapAround_ == wrapAround_) {
+    // Fast path, using the cached neighborhoods.  The size of the neighborhood
+    // is known in advance, so each column stops looking at its neighbors as
+    // soon as it has lost the competition.
+    for (UInt column = 0; column < numColumns_; column++) {
+      const Real overlap = overlaps[column];
+      if (overlap < stimulusThreshold_) {
+        continue;
+      }
+      const auto begin = neighbors_.cbegin() + neighborsBegin_[column];
+      const auto end   = neighbors_.cbegin() + neighborsBegin_[column + 1];
+      const UInt numNeighbors = static_cast<UInt>(end - begin);
+      const UInt numActive = (UInt)(0.5f + (density * (numNeighbors + 1)));
+
+      UInt numBigger = 0;
+      for (auto neighbor = begin; neighbor != end && numBigger < numActive; ++neighbor) {
+        const Real difference = overlaps[*neighbor] - overlap;
+        if (difference > 0 || (difference == 0 && activeColumnsDense[*neighbor])) {
+          numBigger++;
+        }
+      }
+      if (numBigger < numActive) {
+        activeColumns.push_back(column);
+        activeColumnsDense[column] = true;
+      }
+    }
+    return;
+  }
+
   for (size_t column = 0; column < numColumns_; column++) {
     if (overlaps[column] < stimulusThreshold_) {
       continue;
@@ -909,8 +1172,7 @@ void SpatialPooler::inhibitColumnsLocal_(const vector<Real> &overlaps,
          numNeighbors = predN;
          const UInt numActive_wrap = static_cast<UInt>(0.5f + (density * (numNeighbors + 1)));
 
-        for(const auto neighbor: WrappingNeighborhood(column, inhibitionRadius_,columnDimensions_)) { //TODO if we don't change inh radius (changes only every isUpdateRound()),
-		// then these values can be cached -> faster local inh
+        for(const auto neighbor: WrappingNeighborhood(column, inhibitionRadius_,columnDimensions_)) {
           if (neighbor == column) {
             continue;
           }
@@ -1043,6 +1305,8 @@ bool SpatialPooler::operator==(const SpatialPooler& o) const{
   if (overlapDutyCycles_    != o.overlapDutyCycles_) return false;
   if (activeDutyCycles_     != o.activeDutyCycles_) return false;
   if (minOverlapDutyCycles_ != o.minOverlapDutyCycles_) return false;
+  if (dutyCycleStamps_      != o.dutyCycleStamps_) return false;
+  if (dutyCycleClock_       != o.dutyCycleClock_) return false;
 
   // compare connections
   if (connections_ != o.connections_) return false;
@@ -25,6 +25,7 @@
 #include <iostream>
 #include <vector>
 #include <iomanip> // std::setprecision
+#include <limits>
 #include <htm/algorithms/Connections.hpp>
 #include <htm/types/Types.hpp>
 #include <htm/types/Serializable.hpp>
@@ -77,7 +78,8 @@ public:
     Real boostStrength = 0.0f,
     Int seed = 1, 
     UInt spVerbosity = 0u, 
-    bool wrapAround = true);
+    bool wrapAround = true,
+    UInt initThreads = 1u);
 
   virtual ~SpatialPooler() {}
 
@@ -210,6 +212,16 @@ public:
         at the beginning and end of an input dimension are considered
         neighbors for the purpose of mapping inputs to columns.
 
+  @param initThreads Number of threads used to sample the potential pools
+        and initial permanences of the columns.  The default (1) draws them
+        all from the SP's random number generator, one column after
+        another.  Any other value draws each column from its own random
+        number generator, seeded from the SP's one, and samples the columns
+        in parallel.  The result is deterministic once the seed is set, and
+        does not depend on the number of threads (but it is different from
+        the result with initThreads = 1).  Zero means one thread per
+        hardware thread.
+
    */
   virtual void
   initialize(const vector<UInt>& inputDimensions, 
@@ -223,7 +235,8 @@ public:
              Real synPermInactiveDec = 0.01f, Real synPermActiveInc = 0.1f,
              Real synPermConnected = 0.1f, Real minPctOverlapDutyCycles = 0.001f,
              UInt dutyCyclePeriod = 1000u, Real boostStrength = 0.0f,
-             Int seed = 1, UInt spVerbosity = 0u, bool wrapAround = true);
+             Int seed = 1, UInt spVerbosity = 0u, bool wrapAround = true,
+             UInt initThreads = 1u);
 
 
   /**
@@ -260,6 +273,32 @@ public:
   virtual const vector<SynapseIdx> compute(const SDR &input, const bool learn, SDR &active);
 
 
+  /**
+  Compute a batch of inputs, which are given as the rows of a dense matrix.
+  This is intended for evaluating a trained SpatialPooler on a dataset, it
+  avoids making an SDR for every input.
+
+  With learn = false the inputs are independent of each other, so they are
+  split between numThreads threads.  The results are identical to calling
+  compute(input, false, active) for each row in order.  With learn = true the
+  rows are computed in order, one after the other, by the calling thread.
+
+  @param inputs Row-major matrix of numInputs rows by getNumInputs() columns.
+        Nonzero values are active input bits.
+
+  @param numInputs Number of rows in inputs.
+
+  @param learn Whether to learn, see compute().
+
+  @param numThreads Number of threads to use when learn = false.  Zero means
+        use all hardware threads.
+
+  @return The active columns for each input, as sorted sparse indices.
+   */
+  vector<SDR_sparse_t> computeBatch(const Byte *inputs, const UInt numInputs,
+                                    const bool learn = false, const UInt numThreads = 0u);
+
+
   /**
    * Get the version number of this spatial pooler.
 
@@ -277,75 +316,32 @@ public:
   // FOR Cereal Serialization
   template<class Archive>
   void save_ar(Archive& ar) const {
-    ar(CEREAL_NVP(inputDimensions_),
-       CEREAL_NVP(columnDimensions_));
-    ar(CEREAL_NVP(numInputs_),
-       CEREAL_NVP(numColumns_),
-       CEREAL_NVP(potentialRadius_),
-       CEREAL_NVP(potentialPct_),
-       CEREAL_NVP(initConnectedPct_),
-       CEREAL_NVP(globalInhibition_),
-       CEREAL_NVP(numActiveColumnsPerInhArea_),
-       CEREAL_NVP(localAreaDensity_),
-       CEREAL_NVP(stimulusThreshold_),
-       CEREAL_NVP(inhibitionRadius_),
-       CEREAL_NVP(dutyCyclePeriod_),
-       CEREAL_NVP(boostStrength_),
-       CEREAL_NVP(iterationNum_),
-       CEREAL_NVP(iterationLearnNum_),
-       CEREAL_NVP(spVerbosity_),
-       CEREAL_NVP(updatePeriod_),
-       CEREAL_NVP(synPermInactiveDec_),
-       CEREAL_NVP(synPermActiveInc_),
-       CEREAL_NVP(synPermBelowStimulusInc_),
-       CEREAL_NVP(synPermConnected_),
-       CEREAL_NVP(minPctOverlapDutyCycles_),
-       CEREAL_NVP(wrapAround_));
-    ar(CEREAL_NVP(boostFactors_));
-    ar(CEREAL_NVP(overlapDutyCycles_));
-    ar(CEREAL_NVP(activeDutyCycles_));
-    ar(CEREAL_NVP(minOverlapDutyCycles_));
+    saveState_(ar);
     ar(CEREAL_NVP(connections_));
     ar(CEREAL_NVP(rng_));
   }
   // FOR Cereal Deserialization
   template<class Archive>
   void load_ar(Archive& ar) {
-    ar(CEREAL_NVP(inputDimensions_),
-       CEREAL_NVP(columnDimensions_));
-    ar(CEREAL_NVP(numInputs_),
-       CEREAL_NVP(numColumns_),
-       CEREAL_NVP(potentialRadius_),
-       CEREAL_NVP(potentialPct_),
-       CEREAL_NVP(initConnectedPct_),
-       CEREAL_NVP(globalInhibition_),
-       CEREAL_NVP(numActiveColumnsPerInhArea_),
-       CEREAL_NVP(localAreaDensity_),
-       CEREAL_NVP(stimulusThreshold_),
-       CEREAL_NVP(inhibitionRadius_),
-       CEREAL_NVP(dutyCyclePeriod_),
-       CEREAL_NVP(boostStrength_),
-       CEREAL_NVP(iterationNum_),
-       CEREAL_NVP(iterationLearnNum_),
-       CEREAL_NVP(spVerbosity_),
-       CEREAL_NVP(updatePeriod_),
-       CEREAL_NVP(synPermInactiveDec_),
-       CEREAL_NVP(synPermActiveInc_),
-       CEREAL_NVP(synPermBelowStimulusInc_),
-       CEREAL_NVP(synPermConnected_),
-       CEREAL_NVP(minPctOverlapDutyCycles_),
-       CEREAL_NVP(wrapAround_));
-    ar(CEREAL_NVP(boostFactors_));
-    ar(CEREAL_NVP(overlapDutyCycles_));
-    ar(CEREAL_NVP(activeDutyCycles_));
-    ar(CEREAL_NVP(minOverlapDutyCycles_));
+    loadState_(ar);
     ar(CEREAL_NVP(connections_));
     ar(CEREAL_NVP(rng_));
-
-    // initialize ephemeral members
-    boostedOverlaps_.resize(numColumns_);
+    initializeEphemeral_();
   }
 
+  /**
+  Delta checkpoints, see Connections::beginDeltas().  After beginDeltas(),
+  each call to saveDelta() writes what changed since the previous checkpoint,
+  which is the synapses the spatial pooler learned plus the duty cycles and
+  other per-column state.  loadDelta() applies such a delta to a spatial
+  pooler which is in the state of the previous checkpoint, in order.
+   */
+  void beginDeltas();
+  void endDeltas();
+  bool isRecordingDeltas() const;
+  void saveDelta(std::ostream &outStream);
+  void loadDelta(std::istream &inStream);
+
   /**
   Returns the dimensions of the columns in the region.
 
@@ -460,6 +456,23 @@ public:
   */
   void setStimulusThreshold(UInt stimulusThreshold);
 
+  /**
+  Returns the number of threads which compute the overlaps.
+
+  @returns number of threads, including the calling thread.
+  */
+  UInt getNumThreads() const;
+
+  /**
+  Sets the number of threads which compute the overlaps in compute(), see
+  Connections::setNumThreads().  The results do not depend on it.  This is not
+  serialized.
+
+  @param numThreads number of threads, 1 (default) computes everything in the
+  calling thread, 0 means all hardware threads.
+  */
+  void setNumThreads(UInt numThreads);
+
   /**
   Returns the inhibition radius.
 
@@ -838,6 +851,14 @@ public:
   */
   vector<UInt> initMapPotential_(UInt column, bool wrapAround);
 
+  /**
+    Sparse version of initMapPotential_: returns the sorted indices of the
+    input bits in the potential pool of the column, drawn from the given
+    random number generator.  It does the same draws as initMapPotential_, so
+    initMapPotential_ is sparseToBinary(initMapPotentialSparse_(..., rng_)).
+  */
+  vector<UInt> initMapPotentialSparse_(UInt column, bool wrapAround, Random &rng) const;
+
   /**
   Returns a randomly generated permanence value for a synapses that is
   initialized in a connected state.
@@ -878,6 +899,13 @@ public:
   */
   vector<Real> initPermanence_(const vector<UInt> &potential, Real connectedPct);
 
+  /**
+    Sparse version of initPermanence_: returns the initial permanence of each
+    of the given (sorted) potential input bits, drawn from the given random
+    number generator in the same order as initPermanence_ does.
+  */
+  vector<Real> initPermanenceSparse_(const vector<UInt> &potential, Real connectedPct, Random &rng) const;
+
   void clip_(vector<Real> &perm) const;
 
   /**
@@ -950,6 +978,21 @@ public:
   void inhibitColumnsLocal_(const vector<Real> &overlaps, Real density,
                             vector<UInt> &activeColumns) const;
 
+  /**
+     Builds the table of every column's neighbors for the local inhibition,
+     unless it is already up to date.
+
+     The neighborhoods only depend on the inhibitionRadius_ and wrapAround_,
+     which change rarely, so the local inhibition can use this table instead
+     of iterating a Neighborhood for every column on every compute. Because
+     inhibitColumnsLocal_ is const, and is called concurrently by
+     computeBatch, the table is only built by the (non const) compute methods.
+     The local inhibition falls back to the Neighborhood iterators while the
+     table is stale, or if it would exceed MAX_NEIGHBORHOODS_SIZE entries.
+  */
+  void updateNeighborhoods_();
+  void clearNeighborhoods_();
+
   /**
       The primary method in charge of learning.
 
@@ -1080,6 +1123,19 @@ public:
   */
   void updateDutyCycles_(const vector<SynapseIdx> &overlaps, SDR &active);
 
+  /**
+  The duty cycles are decayed lazily: updateDutyCycles_ only advances a global
+  clock (the product of all decay factors so far) and touches the columns which
+  had a non-zero overlap or were active.  The decay of every other column is
+  applied in closed form when its duty cycles are needed, from the ratio of the
+  clock to the column's last update time.
+
+  decayDutyCycle_ brings the duty cycles of one column up to date.
+  decayDutyCycles_ brings all of them up to date and resets the clock.
+  */
+  void decayDutyCycle_(const UInt column);
+  void decayDutyCycles_();
+
   /**
     Update the boost factors for all columns. The boost factors are used to
     increase the overlap of inactive columns to improve their chances of
@@ -1164,6 +1220,96 @@ public:
 
 
 protected:
+  template<class Archive>
+  void saveState_(Archive& ar) const {
+    ar(CEREAL_NVP(inputDimensions_),
+       CEREAL_NVP(columnDimensions_));
+    const Int version = -static_cast<Int>(SERIALIZED_VERSION);
+    ar(cereal::make_nvp("version", version));
+    ar(CEREAL_NVP(numInputs_),
+       CEREAL_NVP(numColumns_),
+       CEREAL_NVP(potentialRadius_),
+       CEREAL_NVP(potentialPct_),
+       CEREAL_NVP(initConnectedPct_),
+       CEREAL_NVP(globalInhibition_),
+       CEREAL_NVP(numActiveColumnsPerInhArea_),
+       CEREAL_NVP(localAreaDensity_),
+       CEREAL_NVP(stimulusThreshold_),
+       CEREAL_NVP(inhibitionRadius_),
+       CEREAL_NVP(dutyCyclePeriod_),
+       CEREAL_NVP(boostStrength_),
+       CEREAL_NVP(iterationNum_),
+       CEREAL_NVP(iterationLearnNum_),
+       CEREAL_NVP(spVerbosity_),
+       CEREAL_NVP(updatePeriod_),
+       CEREAL_NVP(synPermInactiveDec_),
+       CEREAL_NVP(synPermActiveInc_),
+       CEREAL_NVP(synPermBelowStimulusInc_),
+       CEREAL_NVP(synPermConnected_),
+       CEREAL_NVP(minPctOverlapDutyCycles_),
+       CEREAL_NVP(wrapAround_));
+    ar(CEREAL_NVP(boostFactors_));
+    ar(CEREAL_NVP(overlapDutyCycles_));
+    ar(CEREAL_NVP(activeDutyCycles_));
+    ar(CEREAL_NVP(minOverlapDutyCycles_));
+    ar(CEREAL_NVP(dutyCycleStamps_),
+       CEREAL_NVP(dutyCycleClock_));
+  }
+  template<class Archive>
+  void loadState_(Archive& ar) {
+    ar(CEREAL_NVP(inputDimensions_),
+       CEREAL_NVP(columnDimensions_));
+    // Archives written before the lazy duty cycles continue with numInputs_,
+    // which is not negative.  Later archives continue with the negated format
+    // version.
+    Int first;
+    ar(first);
+    if (first >= 0) {
+      numInputs_ = static_cast<UInt>(first);
+    } else {
+      NTA_CHECK(-first <= static_cast<Int>(SERIALIZED_VERSION))
+        << "SpatialPooler: unknown serialized format version " << -first;
+      ar(CEREAL_NVP(numInputs_));
+    }
+    ar(CEREAL_NVP(numColumns_),
+       CEREAL_NVP(potentialRadius_),
+       CEREAL_NVP(potentialPct_),
+       CEREAL_NVP(initConnectedPct_),
+       CEREAL_NVP(globalInhibition_),
+       CEREAL_NVP(numActiveColumnsPerInhArea_),
+       CEREAL_NVP(localAreaDensity_),
+       CEREAL_NVP(stimulusThreshold_),
+       CEREAL_NVP(inhibitionRadius_),
+       CEREAL_NVP(dutyCyclePeriod_),
+       CEREAL_NVP(boostStrength_),
+       CEREAL_NVP(iterationNum_),
+       CEREAL_NVP(iterationLearnNum_),
+       CEREAL_NVP(spVerbosity_),
+       CEREAL_NVP(updatePeriod_),
+       CEREAL_NVP(synPermInactiveDec_),
+       CEREAL_NVP(synPermActiveInc_),
+       CEREAL_NVP(synPermBelowStimulusInc_),
+       CEREAL_NVP(synPermConnected_),
+       CEREAL_NVP(minPctOverlapDutyCycles_),
+       CEREAL_NVP(wrapAround_));
+    ar(CEREAL_NVP(boostFactors_));
+    ar(CEREAL_NVP(overlapDutyCycles_));
+    ar(CEREAL_NVP(activeDutyCycles_));
+    ar(CEREAL_NVP(minOverlapDutyCycles_));
+    if (first < 0) {
+      ar(CEREAL_NVP(dutyCycleStamps_),
+         CEREAL_NVP(dutyCycleClock_));
+    } else {
+      // The stored duty cycles are current.
+      dutyCycleStamps_.assign(numColumns_, 1.0);
+      dutyCycleClock_ = 1.0;
+    }
+  }
+  void initializeEphemeral_();
+
+  // Version 1 is the format without the duty cycle stamps, which had no version.
+  static const UInt SERIALIZED_VERSION = 2u;
+
   UInt numInputs_;
   UInt numColumns_;
   vector<UInt> columnDimensions_;
@@ -1196,6 +1342,16 @@ protected:
   vector<Real> minOverlapDutyCycles_;
   vector<Real> minActiveDutyCycles_;
 
+  /*
+   * The duty cycles decay lazily, see decayDutyCycles_().  The overlap and
+   * active duty cycles of column c are stored as of the time
+   * dutyCycleStamps_[c], where time is measured by dutyCycleClock_: the product
+   * of all decay factors applied since the last renormalization.
+   */
+  const Real64 MIN_DUTY_CYCLE_CLOCK = 1e-100;
+  vector<Real64> dutyCycleStamps_;
+  Real64 dutyCycleClock_;
+
   Real minPctOverlapDutyCycles_;
 
   /*
@@ -1207,6 +1363,18 @@ protected:
 
   vector<Real> boostedOverlaps_;
 
+  /*
+   * Cached local inhibition neighborhoods, see updateNeighborhoods_().  The
+   * neighbors of column c (excluding c itself) are
+   * neighbors_[ neighborsBegin_[c] : neighborsBegin_[c + 1] ].
+   * These are not serialized.
+   */
+  const size_t MAX_NEIGHBORHOODS_SIZE = 1u << 24u;
+  UInt neighborhoodsRadius_ = std::numeric_limits<UInt>::max();
+  bool neighborhoodsWrapAround_ = false;
+  vector<UInt> neighborsBegin_;
+  vector<CellIdx> neighbors_;
+
 
   UInt version_;
   Random rng_;
@@ -31,9 +31,11 @@
 #include <algorithm> //is_sorted
 #include <climits>
 #include <cstring>
+#include <fstream>
 #include <iomanip>
 #include <iostream>
 #include <iterator>
+#include <sstream>
 #include <string>
 #include <vector>
 #include <set>
@@ -68,13 +70,15 @@ TemporalMemory::TemporalMemory(
     SynapseIdx maxSynapsesPerSegment, 
     bool checkInputs, 
     UInt externalPredictiveInputs,
-    ANMode anomalyMode) {
+    ANMode anomalyMode,
+    UInt permanenceBits) {
 
   initialize(columnDimensions, cellsPerColumn, activationThreshold,
              initialPermanence, connectedPermanence, minThreshold,
              maxNewSynapseCount, permanenceIncrement, permanenceDecrement,
              predictedSegmentDecrement, seed, maxSegmentsPerCell,
-             maxSynapsesPerSegment, checkInputs, externalPredictiveInputs, anomalyMode);
+             maxSynapsesPerSegment, checkInputs, externalPredictiveInputs, anomalyMode,
+             permanenceBits);
 }
 
 TemporalMemory::~TemporalMemory() {}
@@ -95,7 +99,8 @@ void TemporalMemory::initialize(
     SynapseIdx maxSynapsesPerSegment, 
     bool checkInputs, 
     UInt externalPredictiveInputs,
-    ANMode anomalyMode) {
+    ANMode anomalyMode,
+    UInt permanenceBits) {
 
   // Validate all input parameters
   NTA_CHECK(columnDimensions.size() > 0) << "Number of column dimensions must be greater than 0";
@@ -130,7 +135,8 @@ void TemporalMemory::initialize(
   externalPredictiveInputs_ = externalPredictiveInputs;
 
   // Initialize member variables
-  connections_ = Connections(static_cast<CellIdx>(numberOfColumns() * cellsPerColumn_), connectedPermanence_);
+  connections_ = Connections(static_cast<CellIdx>(numberOfColumns() * cellsPerColumn_), connectedPermanence_,
+                             false, permanenceBits);
   rng_ = Random(seed);
 
   maxSegmentsPerCell_ = maxSegmentsPerCell;
@@ -138,25 +144,39 @@ void TemporalMemory::initialize(
 
   tmAnomaly_.mode_ = anomalyMode;
 
+  initializeScratch_();
   reset();
 }
 
+void TemporalMemory::initializeScratch_() {
+  prevActiveCells_.initialize({static_cast<UInt>(numberOfCells() + externalPredictiveInputs_)});
+  noExternalInputs_.initialize({externalPredictiveInputs_});
+}
+
 CellIdx TemporalMemory::getLeastUsedCell_(const CellIdx column) {
   if(cellsPerColumn_ == 1) return column;
 
-  vector<CellIdx> cells = cellsForColumn(column);
-
   //TODO: decide if we need to choose randomly from the "least used" cells, or if 1st is fine. 
-  //In that case the line below is not needed, and this method can become const, deterministic results in tests need to be updated
-  //un/comment line below: 
-  rng_.shuffle(cells.begin(), cells.end()); //as min_element selects 1st minimal element, and we want to randomly choose 1 from the minimals.
-
-  const auto compareByNumSegments = [&](const CellIdx a, const CellIdx b) {
-    if(connections.numSegments(a) == connections.numSegments(b)) 
-      return a < b; //TODO rm? 
-    else return connections.numSegments(a) < connections.numSegments(b);
-  };
-  return *std::min_element(cells.begin(), cells.end(), compareByNumSegments);
+  //The cells used to be shuffled before searching for the least used one, but the ties are broken
+  //by the cell index, so the shuffle never changed the result.  It did advance rng_, which is kept
+  //here so that the results (and tests) remain the same.
+  for(CellIdx i = cellsPerColumn_ - 1u; i > 0u; --i) {
+    rng_.getUInt32(i + 1u);
+  }
+
+  // The cells of a column are contiguous, find the first one with the fewest segments.
+  const CellIdx start = cellsPerColumn_ * column;
+  const CellIdx end   = start + cellsPerColumn_;
+  CellIdx leastUsedCell = start;
+  size_t  minSegments   = connections.numSegments(start);
+  for(CellIdx cell = start + 1u; cell < end and minSegments > 0u; cell++) {
+    const size_t numSegments = connections.numSegments(cell);
+    if(numSegments < minSegments) {
+      minSegments   = numSegments;
+      leastUsedCell = cell;
+    }
+  }
+  return leastUsedCell;
 }
 
 
@@ -165,7 +185,8 @@ void TemporalMemory::growSynapses_(
                          const SynapseIdx nDesiredNewSynapses,
                          const vector<CellIdx> &prevWinnerCells) {
   
-  vector<CellIdx> candidates(prevWinnerCells.begin(), prevWinnerCells.end());
+  auto &candidates = growCandidates_;
+  candidates.assign(prevWinnerCells.begin(), prevWinnerCells.end());
   NTA_ASSERT(std::is_sorted(candidates.begin(), candidates.end()));
 
   //figure the number of new synapses to grow
@@ -180,12 +201,8 @@ void TemporalMemory::growSynapses_(
 
   // Pick nActual cells randomly.
   rng_.shuffle(candidates.begin(), candidates.end());
-  const size_t nDesired = connections.numSynapses(segment) + nActualWithMax; //num synapses on seg after this function (+-), see #COND
-  for (const auto syn : candidates) {
-    // #COND: this loop finishes two folds: a) we ran out of candidates (above), b) we grew the desired number of new synapses (below)
-    if(connections.numSynapses(segment) == nDesired) break;
-    connections_.createSynapse(segment, syn, initialPermanence_); //TODO createSynapse consider creating a vector of new synapses at once?
-  }
+  // Stops when either a) we ran out of candidates, or b) we grew the desired number of new synapses.
+  connections_.createSynapses(segment, candidates, initialPermanence_, nActualWithMax);
 }
 
 
@@ -230,8 +247,10 @@ void TemporalMemory::burstColumn_(
             const bool learn) {
 
   // Calculate the active cells: active become ALL the cells in this mini-column
-  const auto newCells = cellsForColumn(column);
-  activeCells_.insert(activeCells_.end(), newCells.begin(), newCells.end());
+  const CellIdx start = cellsPerColumn_ * column;
+  for(CellIdx cell = start; cell < start + cellsPerColumn_; cell++) {
+    activeCells_.push_back(cell);
+  }
 
   const auto bestMatchingSegment =
       std::max_element(columnMatchingSegmentsBegin, columnMatchingSegmentsEnd,
@@ -243,7 +262,7 @@ void TemporalMemory::burstColumn_(
   const CellIdx winnerCell =
       (bestMatchingSegment != columnMatchingSegmentsEnd)
           ? connections.cellForSegment(*bestMatchingSegment)
-          : getLeastUsedCell_(column); //TODO replace (with random?) this is extremely costly, removing makes TM 6x faster!
+          : getLeastUsedCell_(column);
 
   winnerCells_.push_back(winnerCell);
 
@@ -302,11 +321,15 @@ void TemporalMemory::activateCells(const SDR &activeColumns, const bool learn) {
     }
     auto &sparse = activeColumns.getSparse();
 
-  SDR prevActiveCells({static_cast<CellIdx>(numberOfCells() + externalPredictiveInputs_)});
-  prevActiveCells.setSparse(activeCells_);
+  // Swap the buffers of the previous and the current time step, which keeps
+  // their capacity.
+  const SDR &prevActiveCells = prevActiveCells_;
+  prevActiveCells_.setSparse(activeCells_);
   activeCells_.clear();
 
-  const vector<CellIdx> prevWinnerCells = std::move(winnerCells_);
+  const vector<CellIdx> &prevWinnerCells = prevWinnerCells_;
+  prevWinnerCells_.swap(winnerCells_);
+  winnerCells_.clear();
 
   //maps segment S to a new segment that is at start of a column where
   //S belongs. 
@@ -402,17 +425,17 @@ void TemporalMemory::activateDendrites(const bool learn,
       winnerCells_.push_back( static_cast<CellIdx>(winner + numberOfCells()) );
   }
 
-  const size_t length = connections.segmentFlatListLength();
-
-  numActivePotentialSynapsesForSegment_.assign(length, 0);
-  numActiveConnectedSynapsesForSegment_ = connections_.computeActivity(
-                              numActivePotentialSynapsesForSegment_,
-                              activeCells_,
-			      learn);
+  // Only the segments with active synapses are visited, and only the counts
+  // of the segments touched in the previous cycle are reset.
+  connections_.computeActivity(activeCells_,
+                               learn,
+                               numActiveConnectedSynapsesForSegment_,
+                               numActivePotentialSynapsesForSegment_,
+                               touchedSegments_);
 
   // Active segments, connected synapses.
   activeSegments_.clear();
-  for (size_t segment = 0; segment < numActiveConnectedSynapsesForSegment_.size(); segment++) {
+  for (const auto segment : touchedSegments_) {
     if (numActiveConnectedSynapsesForSegment_[segment] >= activationThreshold_) { //TODO move to SegmentData.numConnected?
       activeSegments_.push_back(segment);
     }
@@ -428,7 +451,7 @@ void TemporalMemory::activateDendrites(const bool learn,
 
   // Matching segments, potential synapses.
   matchingSegments_.clear();
-  for (size_t segment = 0; segment < numActivePotentialSynapsesForSegment_.size(); segment++) {
+  for (const auto segment : touchedSegments_) {
     if (numActivePotentialSynapsesForSegment_[segment] >= minThreshold_) {
       matchingSegments_.push_back(segment);
     }
@@ -456,33 +479,48 @@ void TemporalMemory::calculateAnomalyScore_(const SDR &activeColumns){
   // Update Anomaly Metric.  The anomaly is the percent of active columns that
   // were not predicted. 
   // Must be computed here, between `activateDendrites()` and `activateCells()`.
-  switch(tmAnomaly_.mode_) {
+  if(tmAnomaly_.mode_ == ANMode::DISABLED) {
+    tmAnomaly_.anomaly_ = 0.5f;
+    return;
+  }
 
-	case ANMode::DISABLED: {
-	  tmAnomaly_.anomaly_ = 0.5f;
-			   } break;
+  // Same as computeRawAnomalyScore(activeColumns, cellsToColumns(getPredictiveCells())),
+  // without building the SDRs.  Both the active columns and the columns of the
+  // active segments (sorted by cell) are in ascending order, count the overlap.
+  const auto &active = activeColumns.getSparse();
+  Real raw = 0.0f;
+  if( not active.empty() ) {
+    UInt predicted = 0u;
+    auto col = active.cbegin();
+    for(const auto segment : activeSegments_) {
+      const UInt column = columnForCell(connections.cellForSegment(segment));
+      while(col != active.cend() and *col < column) ++col;
+      if(col == active.cend()) break;
+      if(*col == column) {
+        predicted++;
+        ++col;
+      }
+    }
+    raw = static_cast<Real>(static_cast<UInt>(active.size()) - predicted) / static_cast<Real>(active.size());
+  }
+
+  switch(tmAnomaly_.mode_) {
 
 	case ANMode::RAW: {
-	  tmAnomaly_.anomaly_ = computeRawAnomalyScore(
-							 activeColumns,
-							 cellsToColumns( getPredictiveCells() ));
+	  tmAnomaly_.anomaly_ = raw;
 			  } break;
 
 	case ANMode::LIKELIHOOD: {
-	  const Real raw = computeRawAnomalyScore(
-						 activeColumns,
-						 cellsToColumns( getPredictiveCells() ));
 	  tmAnomaly_.anomaly_ = tmAnomaly_.anomalyLikelihood_.anomalyProbability(raw);
 				 } break;
 
 	case ANMode::LOGLIKELIHOOD: {
-	  const Real raw = computeRawAnomalyScore(
-						 activeColumns,
-						 cellsToColumns( getPredictiveCells() ));
 	  const Real like = tmAnomaly_.anomalyLikelihood_.anomalyProbability(raw);
 	  const Real log  = tmAnomaly_.anomalyLikelihood_.computeLogLikelihood(like);
 	  tmAnomaly_.anomaly_ = log;
 				} break;
+
+	default: break;
   // TODO: Update mean & standard deviation of anomaly here.
   };
   NTA_ASSERT(tmAnomaly_.anomaly_ >= 0.0f and tmAnomaly_.anomaly_ <= 1.0f) << "TM.anomaly is out-of-bounds!";
@@ -491,9 +529,70 @@ void TemporalMemory::calculateAnomalyScore_(const SDR &activeColumns){
 }
 
 void TemporalMemory::compute(const SDR &activeColumns, const bool learn) {
-  SDR externalPredictiveInputsActive({ externalPredictiveInputs_ });
-  SDR externalPredictiveInputsWinners({ externalPredictiveInputs_ });
-  compute( activeColumns, learn, externalPredictiveInputsActive, externalPredictiveInputsWinners );
+  compute( activeColumns, learn, noExternalInputs_, noExternalInputs_ );
+}
+
+namespace {
+  // File layout of TemporalMemory::saveFrozen(): the magic, the size of the
+  // parameters, the parameters (cereal binary), and the frozen Connections at
+  // the next multiple of 8 bytes.
+  const char FROZEN_TM_MAGIC[8] = {'H', 'T', 'M', 'T', 'M', '0', '0', '1'};
+  const size_t FROZEN_TM_HEADER = sizeof(FROZEN_TM_MAGIC) + sizeof(UInt64);
+}
+
+void TemporalMemory::saveFrozen(const string &path) const {
+  stringstream params;
+  {
+    cereal::BinaryOutputArchive ar(params);
+    ar(numColumns_, cellsPerColumn_, activationThreshold_, initialPermanence_,
+       connectedPermanence_, minThreshold_, maxNewSynapseCount_, checkInputs_,
+       permanenceIncrement_, permanenceDecrement_, predictedSegmentDecrement_,
+       externalPredictiveInputs_, maxSegmentsPerCell_, maxSynapsesPerSegment_,
+       rng_, columnDimensions_, tmAnomaly_.mode_, tmAnomaly_.anomalyLikelihood_);
+  }
+  const string paramsData = params.str();
+  const UInt64 paramsSize = paramsData.size();
+  const size_t end = FROZEN_TM_HEADER + paramsData.size();
+  const char padding[8] = {};
+
+  ofstream out(path, ios::binary);
+  NTA_CHECK(out.is_open()) << "TemporalMemory::saveFrozen: can not open " << path;
+  out.write(FROZEN_TM_MAGIC, sizeof(FROZEN_TM_MAGIC));
+  out.write(reinterpret_cast<const char*>(&paramsSize), sizeof(paramsSize));
+  out.write(paramsData.data(), paramsData.size());
+  out.write(padding, (8u - end % 8u) % 8u);
+  connections_.saveFrozen(out);
+}
+
+void TemporalMemory::loadFrozen(const string &path) {
+  const auto file = make_shared<const MappedFile>(path);
+  NTA_CHECK(file->size() >= FROZEN_TM_HEADER and
+            memcmp(file->data(), FROZEN_TM_MAGIC, sizeof(FROZEN_TM_MAGIC)) == 0)
+    << "TemporalMemory::loadFrozen: " << path << " is not a frozen TemporalMemory model";
+  UInt64 paramsSize;
+  memcpy(&paramsSize, file->data() + sizeof(FROZEN_TM_MAGIC), sizeof(paramsSize));
+  NTA_CHECK(paramsSize <= file->size() - FROZEN_TM_HEADER)
+    << "TemporalMemory::loadFrozen: " << path << " is truncated";
+
+  stringstream params(string(file->data() + FROZEN_TM_HEADER, static_cast<size_t>(paramsSize)));
+  {
+    cereal::BinaryInputArchive ar(params);
+    ar(numColumns_, cellsPerColumn_, activationThreshold_, initialPermanence_,
+       connectedPermanence_, minThreshold_, maxNewSynapseCount_, checkInputs_,
+       permanenceIncrement_, permanenceDecrement_, predictedSegmentDecrement_,
+       externalPredictiveInputs_, maxSegmentsPerCell_, maxSynapsesPerSegment_,
+       rng_, columnDimensions_, tmAnomaly_.mode_, tmAnomaly_.anomalyLikelihood_);
+  }
+  const size_t end = FROZEN_TM_HEADER + static_cast<size_t>(paramsSize);
+  connections_.loadFrozen(file, end + (8u - end % 8u) % 8u);
+  NTA_CHECK(connections_.numCells() == static_cast<size_t>(numColumns_) * cellsPerColumn_)
+    << "TemporalMemory::loadFrozen: the Connections do not match the parameters";
+
+  numActiveConnectedSynapsesForSegment_.assign(connections_.segmentFlatListLength(), 0);
+  numActivePotentialSynapsesForSegment_.assign(connections_.segmentFlatListLength(), 0);
+  touchedSegments_.clear();
+  reset();
+  initializeScratch_();
 }
 
 void TemporalMemory::reset(void) {
@@ -551,30 +650,35 @@ vector<CellIdx> TemporalMemory::getActiveCells() const { return activeCells_; }
 void TemporalMemory::getActiveCells(SDR &activeCells) const
 {
   NTA_CHECK( activeCells.size == numberOfCells() );
-  activeCells.setSparse( getActiveCells() );
+  activeCells.setSparse( activeCells_ );
 }
 
 
 SDR TemporalMemory::getPredictiveCells() const {
-
-  NTA_CHECK( segmentsValid_ )
-    << "Call TM.activateDendrites() before TM.getPredictiveCells()!";
-
   auto correctDims = getColumnDimensions();
   correctDims.push_back(static_cast<CellIdx>(getCellsPerColumn()));
   SDR predictive(correctDims);
+  getPredictiveCells(predictive);
+  return predictive;
+}
+
+void TemporalMemory::getPredictiveCells(SDR &predictiveCells) const {
 
-  std::set<CellIdx> uniqueCells;
-  //uniqueCells.reserve(activeSegments_.size());
+  NTA_CHECK( segmentsValid_ )
+    << "Call TM.activateDendrites() before TM.getPredictiveCells()!";
+  NTA_CHECK( predictiveCells.size == numberOfCells() );
 
+  // The active segments are sorted by cell, so the unique cells are the ones
+  // which differ from their predecessor.
+  auto &sparse = predictiveCells.getSparse();
+  sparse.clear();
   for (const auto segment : activeSegments_) {
     const CellIdx cell = connections.cellForSegment(segment);
-    uniqueCells.insert(cell); //set keeps the cells unique
+    if (sparse.empty() or sparse.back() != cell) {
+      sparse.push_back(cell);
+    }
   }
-
-  vector<CellIdx> predictiveCells(uniqueCells.begin(), uniqueCells.end());
-  predictive.setSparse(predictiveCells);
-  return predictive;
+  predictiveCells.setSparse(sparse);
 }
 
 
@@ -583,7 +687,7 @@ vector<CellIdx> TemporalMemory::getWinnerCells() const { return winnerCells_; }
 void TemporalMemory::getWinnerCells(SDR &winnerCells) const
 {
   NTA_CHECK( winnerCells.size == numberOfCells() );
-  winnerCells.setSparse( getWinnerCells() );
+  winnerCells.setSparse( winnerCells_ );
 }
 
 vector<Segment> TemporalMemory::getActiveSegments() const
@@ -676,6 +780,43 @@ SynapseIdx TemporalMemory::getMaxSynapsesPerSegment() const {
   return maxSynapsesPerSegment_;
 }
 
+void TemporalMemory::setNumThreads(UInt numThreads) {
+  connections_.setNumThreads(numThreads);
+}
+
+UInt TemporalMemory::getNumThreads() const {
+  return connections_.getNumThreads();
+}
+
+void TemporalMemory::setCompactionThreshold(Real threshold) {
+  connections_.setCompactionThreshold(threshold);
+}
+
+Real TemporalMemory::getCompactionThreshold() const {
+  return connections_.getCompactionThreshold();
+}
+
+void TemporalMemory::beginDeltas() { connections_.beginDeltas(); }
+
+void TemporalMemory::endDeltas() { connections_.endDeltas(); }
+
+bool TemporalMemory::isRecordingDeltas() const { return connections_.isRecordingDeltas(); }
+
+void TemporalMemory::saveDelta(std::ostream &outStream) {
+  // The active cells & segments are written in full, they are small.
+  connections_.saveDelta(outStream);
+  cereal::BinaryOutputArchive ar(outStream);
+  saveParameters_(ar);
+  saveSegments_(ar);
+}
+
+void TemporalMemory::loadDelta(std::istream &inStream) {
+  connections_.loadDelta(inStream);
+  cereal::BinaryInputArchive ar(inStream);
+  loadParameters_(ar);
+  loadSegments_(ar);
+}
+
 UInt TemporalMemory::version() const { return TM_VERSION; }
 
 
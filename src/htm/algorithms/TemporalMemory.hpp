@@ -131,6 +131,11 @@ public:
    *
    * @param anomalyMode (optional, default `ANMode::RAW`)from enum ANMode, how is 
    * `TM.anomaly` computed. Options ANMode {DISABLED, RAW, LIKELIHOOD, LOGLIKELIHOOD}
+   *
+   * @param permanenceBits (optional, default 0) Storage of the synapses, see
+   * the Connections constructor.  8 or 16 quantizes the permanences to that
+   * many bits and packs the synapses, for large models.  The storage is saved
+   * with the model.
    * 
    */
   TemporalMemory(
@@ -149,7 +154,8 @@ public:
       SynapseIdx      maxSynapsesPerSegment       = 255,
       bool            checkInputs                 = true,
       UInt            externalPredictiveInputs    = 0,
-      ANMode	      anomalyMode 		  = ANMode::RAW
+      ANMode	      anomalyMode 		  = ANMode::RAW,
+      UInt            permanenceBits              = 0
       );
 
   virtual void
@@ -169,7 +175,8 @@ public:
     SynapseIdx    maxSynapsesPerSegment       = 255,
     bool          checkInputs                 = true,
     UInt          externalPredictiveInputs    = 0,
-    ANMode        anomalyMode                 = ANMode::RAW
+    ANMode        anomalyMode                 = ANMode::RAW,
+    UInt          permanenceBits              = 0
     );
 
   virtual ~TemporalMemory();
@@ -231,9 +238,7 @@ public:
                          const SDR &externalPredictiveInputsWinners);
 
   inline void activateDendrites(const bool learn = true) {
-    const SDR externalPredictiveInputsActive(std::vector<UInt>{ externalPredictiveInputs });
-    const SDR externalPredictiveInputsWinners(std::vector<UInt>{externalPredictiveInputs });
-    activateDendrites(learn, externalPredictiveInputsActive, externalPredictiveInputsWinners);
+    activateDendrites(learn, noExternalInputs_, noExternalInputs_);
   }
 
   /**
@@ -327,6 +332,14 @@ public:
    */
   SDR getPredictiveCells() const;
 
+  /**
+   * Same as getPredictiveCells(), but writes into the given SDR, which can be
+   * reused for every time step.
+   *
+   * @param predictiveCells Output SDR, its size must be the number of cells.
+   */
+  void getPredictiveCells(SDR &predictiveCells) const;
+
   /**
    * Returns the indices of the winner cells.
    *
@@ -443,6 +456,43 @@ public:
    */
   SynapseIdx getMaxSynapsesPerSegment() const;
 
+  /**
+   * Sets the number of threads which compute the segment activity, see
+   * Connections::setNumThreads().  The results do not depend on it.  This is
+   * not serialized.
+   *
+   * @param numThreads Number of threads, 1 (default) computes everything in
+   * the calling thread, 0 means all hardware threads.
+   */
+  void setNumThreads(UInt numThreads);
+  UInt getNumThreads() const;
+
+  /**
+   * Garbage collect the destroyed segments and synapses automatically, see
+   * Connections::setCompactionThreshold().  It pays off when segments are
+   * often replaced because of maxSegmentsPerCell.  Compaction renumbers the
+   * segments, so Segment indices obtained before a compute() are invalidated.
+   * This is not serialized.
+   *
+   * @param threshold Fraction of destroyed segments (or synapses) at which the
+   * Connections are compacted, 0 (default) disables it, 0.5 is a good value.
+   */
+  void setCompactionThreshold(Real threshold);
+  Real getCompactionThreshold() const;
+
+  /**
+   * Save / load a frozen model for inference, which is memory-mapped instead
+   * of deserialized, see Connections::saveFrozen() and loadFrozen().  The
+   * file holds the parameters and the Connections, but not the current state:
+   * the loaded model starts out as after reset().
+   *
+   * The loaded TemporalMemory is read-only: compute() must be called with
+   * learn = false.  The synapses are shared with the other processes which
+   * load the same file.
+   */
+  void saveFrozen(const std::string &path) const;
+  void loadFrozen(const std::string &path);
+
   /**
    * Save (serialize) / Load (deserialize) the current state of the spatial pooler
    * to the specified stream.
@@ -472,6 +522,111 @@ public:
   CerealAdapter;
   template<class Archive>
   void save_ar(Archive & ar) const {
+    saveParameters_(ar);
+    ar(CEREAL_NVP(connections_));
+    saveSegments_(ar);
+  }
+  template<class Archive>
+  void load_ar(Archive & ar) {
+    loadParameters_(ar);
+    ar(CEREAL_NVP(connections_));
+    loadSegments_(ar);
+  }
+
+  /**
+   * Delta checkpoints, see Connections::beginDeltas().  After beginDeltas(),
+   * each call to saveDelta() writes what changed since the previous
+   * checkpoint: the synapses which were learned, plus the current state of
+   * the cells.  loadDelta() applies such a delta to a TemporalMemory which is
+   * in the state of the previous checkpoint, in order.
+   */
+  void beginDeltas();
+  void endDeltas();
+  bool isRecordingDeltas() const;
+  void saveDelta(std::ostream &outStream);
+  void loadDelta(std::istream &inStream);
+
+  virtual bool operator==(const TemporalMemory &other) const;
+  inline bool operator!=(const TemporalMemory &other) const { return not this->operator==(other); }
+
+  //----------------------------------------------------------------------
+  // Debugging helpers
+  //----------------------------------------------------------------------
+
+  /**
+   * Print diagnostic info
+   */
+  friend std::ostream& operator<< (std::ostream& stream, const TemporalMemory& self);
+
+  /**
+   * Print the main TM creation parameters
+   */
+  void printParameters(std::ostream& out=std::cout) const;
+
+  /**
+   * Returns the index of the (mini-)column that a cell belongs to.
+   * 
+   * Mini columns are an organizational unit in TM, 
+   * each mini column consists for cellsPerColumns cells. 
+   * There's no topology between cells within a mini-column, cells
+   * are organized as a flat array 
+   * `col{i} = [cell{i*CPS}, cell{i*CPS +1}, ..., cell{i*CPS + CPS-1}], 
+   * where CPS stands for cellsPerColumn`
+   *
+   * @param cell Cell index
+   *
+   * @return (int) Column index
+   */
+  UInt columnForCell(const CellIdx cell) const;
+
+  /**
+   *  cellsToColumns
+   *  converts active cells to columnar representation, 
+   *  see columnForCell() for details.
+   *
+   *  @param const SDR& cells - input cells, size must be a multiple of cellsPerColumn; ie. 
+   *    all SDRs obtained from TM's get*Cells(SDR) are valid. 
+   *    The SDR cells dimensions must be: {TM.getColumnDimensions, TM.getCellsPerColumn()}
+   *
+   *  @return SDR cols - which is size of TM's getColumnDimensions()
+   *
+   */
+  SDR cellsToColumns(const SDR& cells) const;
+private:
+  void punishPredictedColumn_(vector<Segment>::const_iterator columnMatchingSegmentsBegin, 
+		              vector<Segment>::const_iterator columnMatchingSegmentsEnd, 
+			      const SDR& prevActiveCells);
+
+  void activatePredictedColumn_(vector<Segment>::const_iterator columnActiveSegmentsBegin,
+		                vector<Segment>::const_iterator columnActiveSegmentsEnd,
+				const SDR &prevActiveCells,
+				const vector<CellIdx> &prevWinnerCells,
+				const bool learn);
+
+  void burstColumn_(const UInt column,
+		                    vector<Segment>::const_iterator columnMatchingSegmentsBegin,
+				    vector<Segment>::const_iterator columnMatchingSegmentsEnd,
+				    const SDR &prevActiveCells,
+				    const vector<CellIdx> &prevWinnerCells,
+				    const bool learn);
+
+  void growSynapses_(const Segment& segment,
+		     const SynapseIdx nDesiredNewSynapses,
+		     const vector<CellIdx> &prevWinnerCells);
+
+  CellIdx getLeastUsedCell_(const CellIdx column);
+
+  void calculateAnomalyScore_(const SDR &activeColumns);
+
+  /**
+   * Size the scratch space of compute() for the current parameters.
+   */
+  void initializeScratch_();
+
+protected:
+  // The parts of save_ar() / load_ar() before and after the Connections.
+  template<class Archive>
+  void saveParameters_(Archive & ar) const {
     ar(CEREAL_NVP(numColumns_),
        CEREAL_NVP(cellsPerColumn_),
        CEREAL_NVP(activationThreshold_),
@@ -493,9 +648,10 @@ public:
        CEREAL_NVP(segmentsValid_),
        CEREAL_NVP(tmAnomaly_.anomaly_),
        CEREAL_NVP(tmAnomaly_.mode_),
-       CEREAL_NVP(tmAnomaly_.anomalyLikelihood_),
-       CEREAL_NVP(connections_));
-    
+       CEREAL_NVP(tmAnomaly_.anomalyLikelihood_));
+  }
+  template<class Archive>
+  void saveSegments_(Archive & ar) const {
     size_t activeSize = activeSegments_.size();
     ar(CEREAL_NVP(activeSize));
 
@@ -531,10 +687,9 @@ public:
         ar(c);
       }
     }
-
   }
   template<class Archive>
-  void load_ar(Archive & ar) {
+  void loadParameters_(Archive & ar) {
     ar(CEREAL_NVP(numColumns_),
        CEREAL_NVP(cellsPerColumn_),
        CEREAL_NVP(activationThreshold_),
@@ -556,13 +711,18 @@ public:
        CEREAL_NVP(segmentsValid_),
        CEREAL_NVP(tmAnomaly_.anomaly_),
        CEREAL_NVP(tmAnomaly_.mode_),
-       CEREAL_NVP(tmAnomaly_.anomalyLikelihood_),
-       CEREAL_NVP(connections_));
-    
+       CEREAL_NVP(tmAnomaly_.anomalyLikelihood_));
+  }
+  template<class Archive>
+  void loadSegments_(Archive & ar) {
+    // Only the counts of the active & matching segments are stored.
+    numActiveConnectedSynapsesForSegment_.assign(connections.segmentFlatListLength(), 0);
+    numActivePotentialSynapsesForSegment_.assign(connections.segmentFlatListLength(), 0);
+    activeSegments_.clear();
+    matchingSegments_.clear();
     size_t activeSize;
     ar(CEREAL_NVP(activeSize));
     if (activeSize > 0) {
-      numActiveConnectedSynapsesForSegment_.assign(connections.segmentFlatListLength(), 0);
       cereal::size_type numActiveSegments;
       ar(cereal::make_size_tag(numActiveSegments));
       activeSegments_.resize(static_cast<size_t>(numActiveSegments));
@@ -577,7 +737,6 @@ public:
     size_t matchSize;
     ar(CEREAL_NVP(matchSize));
     if (matchSize > 0) {
-      numActivePotentialSynapsesForSegment_.assign(connections.segmentFlatListLength(), 0);
       cereal::size_type numMatchingSegments;
       ar(cereal::make_size_tag(numMatchingSegments));
       matchingSegments_.resize(static_cast<size_t>(numMatchingSegments));
@@ -589,82 +748,12 @@ public:
         numActivePotentialSynapsesForSegment_[segment] = c.syn;
       }
     }
+    touchedSegments_ = activeSegments_;
+    touchedSegments_.insert(touchedSegments_.end(), matchingSegments_.begin(), matchingSegments_.end());
+    initializeScratch_();
   }
 
 
-  virtual bool operator==(const TemporalMemory &other) const;
-  inline bool operator!=(const TemporalMemory &other) const { return not this->operator==(other); }
-
-  //----------------------------------------------------------------------
-  // Debugging helpers
-  //----------------------------------------------------------------------
-
-  /**
-   * Print diagnostic info
-   */
-  friend std::ostream& operator<< (std::ostream& stream, const TemporalMemory& self);
-
-  /**
-   * Print the main TM creation parameters
-   */
-  void printParameters(std::ostream& out=std::cout) const;
-
-  /**
-   * Returns the index of the (mini-)column that a cell belongs to.
-   * 
-   * Mini columns are an organizational unit in TM, 
-   * each mini column consists for cellsPerColumns cells. 
-   * There's no topology between cells within a mini-column, cells
-   * are organized as a flat array 
-   * `col{i} = [cell{i*CPS}, cell{i*CPS +1}, ..., cell{i*CPS + CPS-1}], 
-   * where CPS stands for cellsPerColumn`
-   *
-   * @param cell Cell index
-   *
-   * @return (int) Column index
-   */
-  UInt columnForCell(const CellIdx cell) const;
-
-  /**
-   *  cellsToColumns
-   *  converts active cells to columnar representation, 
-   *  see columnForCell() for details.
-   *
-   *  @param const SDR& cells - input cells, size must be a multiple of cellsPerColumn; ie. 
-   *    all SDRs obtained from TM's get*Cells(SDR) are valid. 
-   *    The SDR cells dimensions must be: {TM.getColumnDimensions, TM.getCellsPerColumn()}
-   *
-   *  @return SDR cols - which is size of TM's getColumnDimensions()
-   *
-   */
-  SDR cellsToColumns(const SDR& cells) const;
-private:
-  void punishPredictedColumn_(vector<Segment>::const_iterator columnMatchingSegmentsBegin, 
-		              vector<Segment>::const_iterator columnMatchingSegmentsEnd, 
-			      const SDR& prevActiveCells);
-
-  void activatePredictedColumn_(vector<Segment>::const_iterator columnActiveSegmentsBegin,
-		                vector<Segment>::const_iterator columnActiveSegmentsEnd,
-				const SDR &prevActiveCells,
-				const vector<CellIdx> &prevWinnerCells,
-				const bool learn);
-
-  void burstColumn_(const UInt column,
-		                    vector<Segment>::const_iterator columnMatchingSegmentsBegin,
-				    vector<Segment>::const_iterator columnMatchingSegmentsEnd,
-				    const SDR &prevActiveCells,
-				    const vector<CellIdx> &prevWinnerCells,
-				    const bool learn);
-
-  void growSynapses_(const Segment& segment,
-		     const SynapseIdx nDesiredNewSynapses,
-		     const vector<CellIdx> &prevWinnerCells);
-
-  CellIdx getLeastUsedCell_(const CellIdx column);
-
-  void calculateAnomalyScore_(const SDR &activeColumns);
-
-protected:
   //all these could be const
   CellIdx numColumns_;
   vector<CellIdx> columnDimensions_;
@@ -690,6 +779,13 @@ private:
   vector<Segment> matchingSegments_;
   vector<SynapseIdx> numActiveConnectedSynapsesForSegment_;
   vector<SynapseIdx> numActivePotentialSynapsesForSegment_;
+  vector<Segment> touchedSegments_; // segments with nonzero counts, see Connections::computeActivity
+
+  // Scratch space, so that a time step does not allocate memory.  These are not serialized.
+  SDR prevActiveCells_;
+  SDR noExternalInputs_;  // empty SDR of the external predictive inputs
+  vector<CellIdx> prevWinnerCells_;
+  vector<CellIdx> growCandidates_;
 
   Random rng_;
 
@@ -18,6 +18,7 @@
 /** @file
  * Implementation of the Link class
  */
+#include <algorithm> // fill
 #include <cstring> // memcpy,memset
 #include <htm/engine/Input.hpp>
 #include <htm/engine/Link.hpp>
@@ -95,6 +96,11 @@ void Link::initialize(size_t destinationOffset, bool is_FanIn) {
  
   destOffset_ = destinationOffset;
   is_FanIn_ = is_FanIn;
+  copiedDest_ = nullptr;
+  // Python regions write their SDR outputs through the dense buffer, so the
+  // sparse format cached by the SDR must be refreshed before it is read.
+  const Region *srcRegion = src_->getRegion();
+  srcWritesDense_ = srcRegion != nullptr && srcRegion->getType().compare(0, 3, "py.") == 0;
 
   // ---
   // Initialize the propagation delay buffer
@@ -111,6 +117,7 @@ void Link::initialize(size_t destinationOffset, bool is_FanIn) {
       delayedbuffer.zeroBuffer();
       propagationDelayBuffer_.push_back(delayedbuffer);
     }
+    propagationDelayHead_ = 0;
   }
 
   initialized_ = true;
@@ -175,6 +182,18 @@ Input* Link::getDest() const {
 
 
 void Link::compute() {
+  if (!profilingEnabled_) {
+    compute_();
+    return;
+  }
+  const auto start = TimingStats::Clock::now();
+  compute_();
+  computeStats_.add(start);
+  if (profilingTrace_)
+    profilingTrace_->add(profilingName_, "link", start);
+}
+
+void Link::compute_() {
   NTA_CHECK(initialized_);
 
   if (propagationDelay_) {
@@ -184,7 +203,7 @@ void Link::compute() {
 
   // Copy data from source to destination. For delayed links, will copy from
   // head of circular queue; otherwise directly from source.
-  const Array &src = propagationDelay_ ? propagationDelayBuffer_.front() : src_->getData();
+  const Array &src = propagationDelay_ ? delayedBuffer_(0) : src_->getData();
   Array &dest = dest_->getData();
 
   NTA_DEBUG << "compute Link: copying " << getMoniker()
@@ -198,7 +217,14 @@ void Link::compute() {
 
   if (src.getType() == dest.getType() && !is_FanIn_ && propagationDelay_==0) {
     dest = src;   // Performs a shallow copy. Data not copied but passed in shared_ptr.
+  } else if (src.getType() == NTA_BasicType_SDR && dest.getType() == NTA_BasicType_SDR
+             && (propagationDelay_ || !srcWritesDense_)) {
+    // Fan-in or delayed SDRs: only the active bits are copied, at the offset.
+    // The C++ regions write their SDR outputs through the SDR, not the dense
+    // buffer, and the delay buffers are written by this link.
+    copySparse_(src.getSDRNoRefresh(), dest.getSDR());
   } else {
+    bytesCopied_ += src.getCount() * BasicType::getSize(dest.getType());
     // we must perform a deep copy with possible type conversion.
     // It is copied into the destination Input
     // buffer at the specified offset so an Input with multiple incoming links
@@ -207,19 +233,71 @@ void Link::compute() {
   }
 }
 
+void Link::copySparse_(const SDR &src, SDR &dest) {
+  SDR_dense_t &dense = dest.getDense();
+  if (copiedDest_ == &dest) {
+    // Clear the bits which were set by the previous compute().
+    for (const auto idx : copiedSparse_)
+      dense[idx] = 0;
+  } else {
+    // A new destination buffer, which may hold anything in this link's range.
+    std::fill(dense.begin() + destOffset_, dense.begin() + destOffset_ + src.size, (Byte)0);
+    copiedDest_ = &dest;
+    bytesCopied_ += src.size;
+  }
+  bytesCopied_ += copiedSparse_.size();
+  copiedSparse_.clear();
+  for (const auto idx : src.getSparse()) {
+    copiedSparse_.push_back(static_cast<UInt>(destOffset_) + idx);
+    dense[destOffset_ + idx] = 1;
+  }
+  bytesCopied_ += copiedSparse_.size();
+  dest.setDense(dense);
+}
+
 void Link::shiftBufferedData() {
+  if (!profilingEnabled_) {
+    shiftBufferedData_();
+    return;
+  }
+  const auto start = TimingStats::Clock::now();
+  shiftBufferedData_();
+  shiftStats_.add(start);
+  if (profilingTrace_ && propagationDelay_)
+    profilingTrace_->add(profilingName_, "shift", start);
+}
+
+void Link::resetProfiling() {
+  computeStats_.reset();
+  shiftStats_.reset();
+  bytesCopied_ = 0u;
+}
+
+void Link::shiftBufferedData_() {
   if (propagationDelay_) {   // Source buffering is not used in 0-delay links
     Array& from = src_->getData();
     NTA_CHECK(propagationDelayBuffer_.size() == (propagationDelay_));
 
-    // push a copy of the source Output buffer on the back of the queue.
-    // This must be a deep copy.
-    Array a = from.copy();
-    propagationDelayBuffer_.push_back(a);
+    // The head of the queue has been copied to the destination, so its
+    // buffer is reused for a copy of the source Output buffer, which becomes
+    // the back of the queue.  This must be a deep copy.
+    Array &to = propagationDelayBuffer_[propagationDelayHead_];
+    if (from.getType() == NTA_BasicType_SDR && to.getType() == NTA_BasicType_SDR) {
+      to.getSDRNoRefresh().setSDR(srcWritesDense_ ? from.getSDR() : from.getSDRNoRefresh());
+      bytesCopied_ += from.getSDRNoRefresh().getSparse().size() * sizeof(ElemSparse);
+    } else if (from.getType() == to.getType() && from.getCount() == to.getCount()
+               && from.getType() != NTA_BasicType_Str) {
+      std::memcpy(to.getBuffer(), from.getBuffer(),
+                  from.getCount() * BasicType::getSize(from.getType()));
+      bytesCopied_ += from.getCount() * BasicType::getSize(from.getType());
+    } else {
+      to = from.copy();
+      bytesCopied_ += from.getCount() * BasicType::getSize(from.getType());
+    }
 
-    // Pop the head of the queue
-    // The top of the queue now becomes the value to copy to destination.
-    propagationDelayBuffer_.pop_front();
+    // The next buffer becomes the head of the queue, the value to copy to
+    // the destination.
+    propagationDelayHead_ = (propagationDelayHead_ + 1) % propagationDelay_;
   }
 }
 
@@ -240,14 +318,25 @@ std::deque<Array> Link::preSerialize() const {
       const Array& s = src_->getData();
       srcCount = s.getCount();
     }
-    Array a = dest_->getData().subset(destOffset_, srcCount);
-    delay.push_back(a); // our part of the current Dest Input buffer.
-
-    for (auto itr = propagationDelayBuffer_.begin();
-          itr != propagationDelayBuffer_.end(); itr++) {
-      if (itr + 1 == propagationDelayBuffer_.end())
-        break; // skip the last buffer. Its the current output.
-      delay.push_back(*itr);
+    const Array &d = dest_->getData();
+    if (d.getType() == NTA_BasicType_SDR) {
+      // subset() is not valid for an SDR, take our part of the active bits.
+      SDR part(propagationDelayBuffer_.front().getSDRNoRefresh().dimensions);
+      SDR_sparse_t sparse;
+      for (const auto idx : d.getSDR().getSparse()) {
+        if (idx >= destOffset_ && idx < destOffset_ + srcCount)
+          sparse.push_back(idx - static_cast<UInt>(destOffset_));
+      }
+      part.setSparse(sparse);
+      delay.push_back(Array(part));
+    } else {
+      Array a = d.subset(destOffset_, srcCount);
+      delay.push_back(a); // our part of the current Dest Input buffer.
+    }
+
+    // skip the last buffer. Its the current output.
+    for (size_t i = 0; i + 1 < propagationDelayBuffer_.size(); i++) {
+      delay.push_back(delayedBuffer_(i));
     } // end for
   }
   return delay;
@@ -284,8 +373,8 @@ std::ostream &operator<<(std::ostream &f, const Link &link) {
   f << "  propagationDelay: " << link.getPropagationDelay()<< ",\n";
   if (link.getPropagationDelay() > 0) {
   	f <<   "   [\n";
-	  for (auto buf : link.propagationDelayBuffer_) {
-		  f << "    " << buf << "\n";
+	  for (size_t i = 0; i < link.propagationDelayBuffer_.size(); i++) {
+		  f << "    " << link.delayedBuffer_(i) << "\n";
 	  }
 	  f <<   "   ]\n";
   }
@@ -24,7 +24,9 @@
 
 #include <string>
 #include <deque>
+#include <vector>
 
+#include <htm/engine/Profiling.hpp>
 #include <htm/ntypes/Array.hpp>
 #include <htm/ntypes/Dimensions.hpp>
 #include <htm/types/Types.hpp>
@@ -441,6 +443,23 @@ public:
    */
   void shiftBufferedData();
 
+  /**
+   * Profiling of compute() and shiftBufferedData(), and of the bytes they
+   * write. Network::enableProfiling() enables it on all links.
+   */
+  void enableProfiling() { profilingEnabled_ = true; }
+  void disableProfiling() { profilingEnabled_ = false; }
+  void resetProfiling();
+  const TimingStats &getComputeStats() const { return computeStats_; }
+  const TimingStats &getShiftStats() const { return shiftStats_; }
+
+  /**
+   * The bytes written into the destination Input and into the delay buffer.
+   * A shallow copy does not write anything, a sparse copy writes the bytes
+   * which change.
+   */
+  UInt64 getBytesCopied() const { return bytesCopied_; }
+
   /**
    * Convert the Link to a human-readable string.
    *
@@ -483,6 +502,7 @@ public:
   // FOR Cereal Deserialization
   template<class Archive>
   void load_ar(Archive& ar) {
+    std::deque<Array> delay;
     ar(cereal::make_nvp("srcRegionName", srcRegionName_),
        cereal::make_nvp("srcOutputName", srcOutputName_),
        cereal::make_nvp("destRegionName", destRegionName_),
@@ -490,8 +510,11 @@ public:
        cereal::make_nvp("destOffset", destOffset_),
        cereal::make_nvp("is_FanIn", is_FanIn_),
        cereal::make_nvp("propagationDelay", propagationDelay_),
-       cereal::make_nvp("propagationDelayBuffer", propagationDelayBuffer_));
+       cereal::make_nvp("propagationDelayBuffer", delay));
+    propagationDelayBuffer_.assign(delay.begin(), delay.end());
+    propagationDelayHead_ = 0;
     initialized_ = false;
+    copiedDest_ = nullptr;
   }
 
 private:
@@ -506,6 +529,9 @@ private:
 
   std::deque<Array> preSerialize() const;
 
+  // Copies the active bits of an SDR into its part of the SDR Input.
+  void copySparse_(const SDR &src, SDR &dest);
+
 
   std::string srcRegionName_;
   std::string destRegionName_;
@@ -526,13 +552,39 @@ private:
   size_t destOffset_;
   bool is_FanIn_;
 
-  // Queue buffer for delayed source data buffering
-  std::deque<Array> propagationDelayBuffer_;
+  // The bits which copySparse_() set in the destination SDR, so that the next
+  // compute() only clears those instead of the whole range.
+  std::vector<UInt> copiedSparse_;
+  const SDR *copiedDest_ = nullptr;
+
+  // The source region writes its SDR output through the dense buffer (Python
+  // regions), so the SDR must be read with a refresh.  Set by initialize().
+  bool srcWritesDense_ = false;
+
+  // Queue buffer for delayed source data buffering.  This is a ring of
+  // preallocated buffers, propagationDelayHead_ is the front of the queue.
+  std::vector<Array> propagationDelayBuffer_;
+  size_t propagationDelayHead_ = 0;
+  const Array &delayedBuffer_(size_t i) const {
+    return propagationDelayBuffer_[(propagationDelayHead_ + i) % propagationDelayBuffer_.size()];
+  }
   // Number of delay slots
   size_t propagationDelay_;
 
   // link must be initialized before it can compute()
   bool initialized_;
+
+  void compute_();
+  void shiftBufferedData_();
+
+  // Profiling, see enableProfiling().
+  bool profilingEnabled_ = false;
+  TimingStats computeStats_;
+  TimingStats shiftStats_;
+  UInt64 bytesCopied_ = 0u;
+  // Set by Network::enableProfiling() when it records a trace.
+  ProfilingTrace *profilingTrace_ = nullptr;
+  const std::string *profilingName_ = nullptr;
 };
 
 } // namespace htm
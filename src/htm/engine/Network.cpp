@@ -56,6 +56,13 @@ Network::Network(Network &&n) noexcept {
   phaseInfo_ = std::move(n.phaseInfo_);
   callbacks_ = n.callbacks_;
   iteration_ = n.iteration_;
+  numThreads_ = n.numThreads_;
+  threadPool_ = std::move(n.threadPool_);
+  profilingEnabled_ = n.profilingEnabled_;
+  iterationStats_ = n.iterationStats_;
+  phaseStats_ = std::move(n.phaseStats_);
+  callbackStats_ = n.callbackStats_;
+  profilingTrace_ = std::move(n.profilingTrace_);
 }
 
 Network::Network(const std::string& filename) {
@@ -69,6 +76,8 @@ void Network::commonInit() {
   iteration_ = 0;
   minEnabledPhase_ = 0;
   maxEnabledPhase_ = 0;
+  numThreads_ = 1;
+  profilingEnabled_ = false;
 }
 
 Network::~Network() {
@@ -412,21 +421,47 @@ void Network::run(int n) {
   NTA_CHECK(maxEnabledPhase_ < phaseInfo_.size())
       << "maxphase: " << maxEnabledPhase_ << " size: " << phaseInfo_.size();
 
+  if (profilingEnabled_ && phaseStats_.size() < phaseInfo_.size())
+    phaseStats_.resize(phaseInfo_.size());
+
   for (int iter = 0; iter < n; iter++) {
     iteration_++;
+    const auto iterationStart = profilingEnabled_ ? TimingStats::Clock::now()
+                                                  : TimingStats::Clock::time_point();
 
     // compute on all enabled regions in phase order
     for (UInt32 phase = minEnabledPhase_; phase <= maxEnabledPhase_; phase++) {
-      for (auto r : phaseInfo_[phase]) {
-        r->prepareInputs();
-        r->compute();
+      if (phaseInfo_[phase].empty())
+        continue;
+      const auto phaseStart = profilingEnabled_ ? TimingStats::Clock::now()
+                                                : TimingStats::Clock::time_point();
+      if (threadPool_ && phaseInfo_[phase].size() > 1) {
+        runPhaseParallel_(phaseInfo_[phase]);
+      } else {
+        for (auto r : phaseInfo_[phase]) {
+          r->prepareInputs();
+          r->compute();
+        }
+      }
+      if (profilingEnabled_) {
+        phaseStats_[phase].add(phaseStart);
+        if (profilingTrace_)
+          profilingTrace_->add(profilingTrace_->intern("phase " + std::to_string(phase)),
+                               "phase", phaseStart);
       }
     }
 
     // invoke callbacks
     for (UInt32 i = 0; i < callbacks_.getCount(); i++) {
       const std::pair<std::string, callbackItem> &callback = callbacks_.getByIndex(i);
+      const auto callbackStart = profilingEnabled_ ? TimingStats::Clock::now()
+                                                   : TimingStats::Clock::time_point();
       callback.second.first(this, iteration_, callback.second.second);
+      if (profilingEnabled_) {
+        callbackStats_.add(callbackStart);
+        if (profilingTrace_)
+          profilingTrace_->add(profilingTrace_->intern(callback.first), "callback", callbackStart);
+      }
     }
 
     // Refresh all links in the network at the end of every timestamp so that
@@ -441,11 +476,84 @@ void Network::run(int n) {
       }
     }
 
+    if (profilingEnabled_) {
+      iterationStats_.add(iterationStart);
+      if (profilingTrace_)
+        profilingTrace_->add(profilingTrace_->intern("iteration"), "run", iterationStart);
+    }
   } // End of outer run-loop
 
   return;
 }
 
+void Network::setNumThreads(UInt32 numThreads) {
+  if (numThreads == 0)
+    numThreads = std::max(1u, std::thread::hardware_concurrency());
+  numThreads_ = numThreads;
+  if (numThreads_ > 1)
+    threadPool_.reset(new ThreadPool(numThreads_));
+  else
+    threadPool_.reset();
+}
+
+std::vector<std::vector<Region *>>
+Network::computeWaves_(const std::set<Region *> &phase) const {
+  // A region must run after every region of this phase which precedes it in
+  // the sequential order and which it is linked with, in either direction.
+  // It reads the output of an earlier source, and a later source must not
+  // overwrite the output it reads before it is done. Delayed links read a
+  // buffered copy and do not create a dependency.
+  std::map<const Region *, size_t> wave;
+  std::vector<std::vector<Region *>> waves;
+  for (auto r : phase) {
+    size_t w = 0;
+    for (auto other : phase) {
+      if (other == r)
+        break; // only regions earlier in the sequential order
+      bool linked = false;
+      for (const auto &input : r->getInputs()) {
+        for (const auto &link : input.second->getLinks()) {
+          if (link->getPropagationDelay() == 0 && link->getSrc()->getRegion() == other)
+            linked = true;
+        }
+      }
+      for (const auto &input : other->getInputs()) {
+        for (const auto &link : input.second->getLinks()) {
+          if (link->getPropagationDelay() == 0 && link->getSrc()->getRegion() == r)
+            linked = true;
+        }
+      }
+      if (linked)
+        w = std::max(w, wave[other] + 1);
+    }
+    wave[r] = w;
+    if (waves.size() <= w)
+      waves.resize(w + 1);
+    waves[w].push_back(r);
+  }
+  return waves;
+}
+
+void Network::runPhaseParallel_(const std::set<Region *> &phase) {
+  for (const auto &regions : computeWaves_(phase)) {
+    // Inputs are prepared sequentially, this only copies (or shares) the
+    // source buffers, and makes the region's inputs private to its compute.
+    std::vector<Region *> cppRegions;
+    std::vector<Region *> pyRegions;
+    for (auto r : regions) {
+      r->prepareInputs();
+      if (r->getType().compare(0, 3, "py.") == 0)
+        pyRegions.push_back(r); // needs the python GIL, owned by this thread.
+      else
+        cppRegions.push_back(r);
+    }
+    threadPool_->parallelFor(static_cast<UInt>(cppRegions.size()),
+                             [&](UInt i) { cppRegions[i]->compute(); });
+    for (auto r : pyRegions)
+      r->compute();
+  }
+}
+
 void Network::initialize() {
 
   /*
@@ -485,6 +593,9 @@ void Network::initialize() {
    * Mark network as initialized.
    */
   initialized_ = true;
+
+  if (profilingEnabled_)
+    applyProfiling_();
 }
 
 const Collection<std::shared_ptr<Region>> Network::getRegions() const { 
@@ -573,6 +684,7 @@ void Network::post_load(std::vector<std::shared_ptr<Link>>& links) {
                      alink->getDestInputName(),
                      alink->getPropagationDelay());
       l->propagationDelayBuffer_ = alink->propagationDelayBuffer_;
+      l->propagationDelayHead_ = alink->propagationDelayHead_;
     }
     post_load();
 }
@@ -680,17 +792,42 @@ void Network::phasesFromString(const std::string& phaseString) {
 }
 
 
-void Network::enableProfiling() {
+void Network::enableProfiling(size_t maxTraceEvents) {
+  profilingEnabled_ = true;
+  if (maxTraceEvents > 0u)
+    profilingTrace_.reset(new ProfilingTrace(maxTraceEvents));
+  else
+    profilingTrace_.reset();
+  applyProfiling_();
+}
+
+void Network::applyProfiling_() {
+  ProfilingTrace *trace = profilingTrace_.get();
   for (auto p: regions_) {
     std::shared_ptr<Region> r = p.second;
     r->enableProfiling();
+    r->profilingTrace_ = trace;
+    r->profilingName_ = trace ? trace->intern(r->getName()) : nullptr;
+    for (const auto &inputTuple : r->getInputs()) {
+      for (const auto pLink : inputTuple.second->getLinks()) {
+        pLink->enableProfiling();
+        pLink->profilingTrace_ = trace;
+        pLink->profilingName_ = trace ? trace->intern(pLink->getMoniker()) : nullptr;
+      }
+    }
   }
 }
 
 void Network::disableProfiling() {
+  profilingEnabled_ = false;
   for (auto p: regions_) {
     std::shared_ptr<Region> r = p.second;
     r->disableProfiling();
+    for (const auto &inputTuple : r->getInputs()) {
+      for (const auto pLink : inputTuple.second->getLinks()) {
+        pLink->disableProfiling();
+      }
+    }
   }
 }
 
@@ -698,7 +835,82 @@ void Network::resetProfiling() {
   for (auto p: regions_) {
     std::shared_ptr<Region>  r = p.second;
     r->resetProfiling();
+    for (const auto &inputTuple : r->getInputs()) {
+      for (const auto pLink : inputTuple.second->getLinks()) {
+        pLink->resetProfiling();
+      }
+    }
   }
+  iterationStats_.reset();
+  phaseStats_.clear();
+  callbackStats_.reset();
+  if (profilingTrace_)
+    profilingTrace_->clear();
+}
+
+std::string Network::getProfilingReport() const {
+  std::stringstream f;
+  f << "{\"iterations\": ";
+  iterationStats_.toJSON(f);
+
+  f << ",\n\"phases\": {";
+  bool first = true;
+  for (size_t phase = 0; phase < phaseStats_.size(); phase++) {
+    if (phaseStats_[phase].getCount() == 0u)
+      continue;
+    f << (first ? "" : ", ") << "\"" << phase << "\": ";
+    phaseStats_[phase].toJSON(f);
+    first = false;
+  }
+  f << "},\n\"callbacks\": ";
+  callbackStats_.toJSON(f);
+
+  f << ",\n\"regions\": {";
+  first = true;
+  for (auto p: regions_) {
+    const std::shared_ptr<Region> r = p.second;
+    f << (first ? "\n" : ",\n");
+    writeJSONString(f, r->getName());
+    f << ": {\"type\": ";
+    writeJSONString(f, r->getType());
+    f << ", \"prepareInputs\": ";
+    r->getPrepareInputsStats().toJSON(f);
+    f << ", \"compute\": ";
+    r->getComputeStats().toJSON(f);
+    f << "}";
+    first = false;
+  }
+
+  f << "},\n\"links\": [";
+  first = true;
+  for (auto p: regions_) {
+    const std::shared_ptr<Region> r = p.second;
+    for (const auto &inputTuple : r->getInputs()) {
+      for (const auto pLink : inputTuple.second->getLinks()) {
+        f << (first ? "\n" : ",\n") << "{\"name\": ";
+        writeJSONString(f, pLink->getMoniker());
+        f << ", \"propagationDelay\": " << pLink->getPropagationDelay();
+        f << ", \"bytesCopied\": " << pLink->getBytesCopied();
+        f << ", \"compute\": ";
+        pLink->getComputeStats().toJSON(f);
+        f << ", \"shift\": ";
+        pLink->getShiftStats().toJSON(f);
+        f << "}";
+        first = false;
+      }
+    }
+  }
+  f << "]}";
+  return f.str();
+}
+
+std::string Network::getProfilingTrace() const {
+  std::stringstream f;
+  if (profilingTrace_)
+    profilingTrace_->toJSON(f);
+  else
+    f << "{\"traceEvents\": []}";
+  return f.str();
 }
 
   /*
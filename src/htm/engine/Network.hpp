@@ -24,6 +24,7 @@
 
 #include <iostream>
 #include <map>
+#include <memory>
 #include <set>
 #include <string>
 #include <vector>
@@ -35,6 +36,7 @@
 #include <htm/types/Serializable.hpp>
 #include <htm/types/Types.hpp>
 #include <htm/utils/Log.hpp>
+#include <htm/utils/ThreadPool.hpp>
 
 namespace htm {
 
@@ -372,6 +374,29 @@ public:
    */
   void run(int n);
 
+  /**
+   * Set the number of threads used by run().
+   *
+   * With more than one thread, the regions of each phase which do not depend
+   * on each other are computed concurrently.  A region depends on the regions
+   * of the same phase it is linked with (in either direction, except through
+   * delayed links).  Dependent regions are still computed in the sequential
+   * order, so the results are identical to a single threaded run.
+   *
+   * Python regions always run on the thread which called run().
+   * The built-in C++ regions only access their own data and are safe to run
+   * concurrently; custom C++ regions must not share state between instances.
+   *
+   * @param numThreads  1 (default) runs all regions sequentially,
+   *                    0 means use all hardware threads.
+   */
+  void setNumThreads(UInt32 numThreads);
+
+  /**
+   * @returns the number of threads used by run(), see setNumThreads().
+   */
+  UInt32 getNumThreads() const { return numThreads_; }
+
   /**
    * The type of run callback function.
    *
@@ -405,9 +430,15 @@ public:
    */
 
   /**
-   * Start profiling for all regions of this network.
+   * Start profiling for all regions and links of this network, and for the
+   * phases and callbacks of run().  Regions and links which are added later
+   * are profiled from the next initialize().
+   *
+   * @param maxTraceEvents If not 0, also record the timed events of each
+   *        region, link, phase and callback, up to this number of events,
+   *        see getProfilingTrace().
    */
-  void enableProfiling();
+  void enableProfiling(size_t maxTraceEvents = 0u);
 
   /**
    * Stop profiling for all regions of this network.
@@ -418,6 +449,23 @@ public:
    * Reset profiling timers for all regions of this network.
    */
   void resetProfiling();
+
+  /**
+   * Get the profiling statistics as a JSON object with the number of
+   * iterations and the durations of the iterations, of each phase, of the
+   * callbacks, of prepareInputs() and compute() for each region, and of
+   * compute() and shiftBufferedData() for each link, with the bytes copied
+   * by each link.  Each duration is an object with the count and the total,
+   * mean, min, max, p50, p90 and p99 in seconds.
+   */
+  std::string getProfilingReport() const;
+
+  /**
+   * Get the events recorded since enableProfiling(maxTraceEvents) or
+   * resetProfiling(), in the Chrome trace event format which can be loaded
+   * in chrome://tracing or https://ui.perfetto.dev
+   */
+  std::string getProfilingTrace() const;
 	
   /**
    * Set one of the debug levels: LogLevel_None = 0, LogLevel_Minimal, LogLevel_Normal, LogLevel_Verbose
@@ -492,6 +540,16 @@ private:
   std::string phasesToString() const;
   void phasesFromString(const std::string& phaseString);
 
+  // Split the regions of one phase into waves of regions which can be
+  // computed concurrently. Waves are listed in execution order.
+  std::vector<std::vector<Region *>> computeWaves_(const std::set<Region *> &phase) const;
+
+  // compute one phase using the thread pool
+  void runPhaseParallel_(const std::set<Region *> &phase);
+
+  // enable profiling on the regions and links, see enableProfiling()
+  void applyProfiling_();
+
   bool initialized_;
 	
 	/**
@@ -514,6 +572,17 @@ private:
 
   // number of elapsed iterations
   UInt64 iteration_;
+
+  // parallel execution of run(), see setNumThreads()
+  UInt32 numThreads_;
+  std::unique_ptr<ThreadPool> threadPool_;
+
+  // profiling of run(), see enableProfiling()
+  bool profilingEnabled_;
+  TimingStats iterationStats_;
+  std::vector<TimingStats> phaseStats_;
+  TimingStats callbackStats_;
+  std::unique_ptr<ProfilingTrace> profilingTrace_;
 };
 
 } // namespace htm
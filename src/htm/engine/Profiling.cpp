@@ -0,0 +1,182 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2019, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Implementation of the profiling statistics of a Network.
+ */
+
+#include <algorithm>
+#include <cstdio>
+#include <limits>
+
+#include <htm/engine/Profiling.hpp>
+#include <htm/utils/Log.hpp>
+
+namespace htm {
+
+size_t TimingStats::bucket_(UInt64 ns) {
+  // The first SUB_BUCKETS buckets are exact, then each power of two is split
+  // into SUB_BUCKETS buckets by the bits following the leading one.
+  if (ns < SUB_BUCKETS)
+    return static_cast<size_t>(ns);
+  size_t exponent = 63u;
+  while (!(ns >> exponent))
+    exponent--;
+  const size_t sub = static_cast<size_t>(ns >> (exponent - SUB_BUCKETS_BITS)) & (SUB_BUCKETS - 1u);
+  return (exponent - SUB_BUCKETS_BITS + 1u) * SUB_BUCKETS + sub;
+}
+
+UInt64 TimingStats::bucketStart_(size_t bucket) {
+  if (bucket < SUB_BUCKETS)
+    return bucket;
+  const size_t exponent = bucket / SUB_BUCKETS + SUB_BUCKETS_BITS - 1u;
+  const UInt64 sub = bucket % SUB_BUCKETS;
+  return (UInt64(1u) << exponent) + (sub << (exponent - SUB_BUCKETS_BITS));
+}
+
+void TimingStats::add(UInt64 ns) {
+  count_++;
+  totalNs_ += ns;
+  minNs_ = std::min(minNs_, ns);
+  maxNs_ = std::max(maxNs_, ns);
+  histogram_[bucket_(ns)]++;
+}
+
+void TimingStats::reset() {
+  count_ = 0u;
+  totalNs_ = 0u;
+  minNs_ = std::numeric_limits<UInt64>::max();
+  maxNs_ = 0u;
+  histogram_.fill(0u);
+}
+
+Real64 TimingStats::getPercentile(Real64 percentile) const {
+  NTA_CHECK(percentile >= 0.0 && percentile <= 100.0) << "Percentile out of range: " << percentile;
+  if (count_ == 0u)
+    return 0.0;
+  const UInt64 rank = std::max<UInt64>(1u, static_cast<UInt64>(percentile / 100.0 * count_ + 0.5));
+  UInt64 seen = 0u;
+  for (size_t bucket = 0u; bucket < NUM_BUCKETS; bucket++) {
+    seen += histogram_[bucket];
+    if (seen >= rank) {
+      // The middle of the bucket, within the observed range.
+      const UInt64 begin = bucketStart_(bucket);
+      const UInt64 end = bucket + 1u < NUM_BUCKETS ? bucketStart_(bucket + 1u) : begin;
+      const UInt64 middle = begin + (end - begin) / 2u;
+      return std::min(std::max(middle, minNs_), maxNs_) * 1e-9;
+    }
+  }
+  return getMax();
+}
+
+void TimingStats::toJSON(std::ostream &f) const {
+  char buf[64];
+  auto seconds = [&buf](Real64 value) {
+    std::snprintf(buf, sizeof(buf), "%.9g", value);
+    return buf;
+  };
+  f << "{\"count\": " << count_;
+  f << ", \"total\": " << seconds(getTotal());
+  f << ", \"mean\": " << seconds(getMean());
+  f << ", \"min\": " << seconds(getMin());
+  f << ", \"max\": " << seconds(getMax());
+  f << ", \"p50\": " << seconds(getPercentile(50.0));
+  f << ", \"p90\": " << seconds(getPercentile(90.0));
+  f << ", \"p99\": " << seconds(getPercentile(99.0));
+  f << "}";
+}
+
+
+const std::string *ProfilingTrace::intern(const std::string &name) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  return &*names_.insert(name).first;
+}
+
+void ProfilingTrace::add(const std::string *name, const char *category,
+                         const TimingStats::Clock::time_point &start) {
+  const auto end = TimingStats::Clock::now();
+  std::lock_guard<std::mutex> lock(mutex_);
+  if (events_.size() >= maxEvents_) {
+    dropped_++;
+    return;
+  }
+  auto thread = threads_.find(std::this_thread::get_id());
+  if (thread == threads_.end())
+    thread = threads_.emplace(std::this_thread::get_id(), static_cast<UInt32>(threads_.size())).first;
+  Event event;
+  event.name = name;
+  event.category = category;
+  event.startNs = static_cast<UInt64>(
+      std::chrono::duration_cast<std::chrono::nanoseconds>(start - origin_).count());
+  event.durationNs = static_cast<UInt64>(
+      std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count());
+  event.thread = thread->second;
+  events_.push_back(event);
+}
+
+void ProfilingTrace::clear() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  events_.clear();
+  dropped_ = 0u;
+  origin_ = TimingStats::Clock::now();
+}
+
+size_t ProfilingTrace::size() const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  return events_.size();
+}
+
+void ProfilingTrace::toJSON(std::ostream &f) const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  char buf[64];
+  f << "{\"traceEvents\": [";
+  for (size_t i = 0; i < events_.size(); i++) {
+    const Event &event = events_[i];
+    f << (i ? ",\n" : "\n") << "{\"name\": ";
+    writeJSONString(f, *event.name);
+    f << ", \"cat\": \"" << event.category << "\", \"ph\": \"X\"";
+    // Chrome traces are in microseconds.
+    std::snprintf(buf, sizeof(buf), ", \"ts\": %.3f, \"dur\": %.3f",
+                  event.startNs * 1e-3, event.durationNs * 1e-3);
+    f << buf << ", \"pid\": 0, \"tid\": " << event.thread << "}";
+  }
+  f << "\n], \"displayTimeUnit\": \"ns\", \"otherData\": {\"droppedEvents\": " << dropped_ << "}}";
+}
+
+
+void writeJSONString(std::ostream &f, const std::string &s) {
+  f << '"';
+  for (const char c : s) {
+    switch (c) {
+    case '"':  f << "\\\""; break;
+    case '\\': f << "\\\\"; break;
+    case '\n': f << "\\n"; break;
+    case '\t': f << "\\t"; break;
+    default:
+      if (static_cast<unsigned char>(c) < 0x20) {
+        char buf[8];
+        std::snprintf(buf, sizeof(buf), "\\u%04x", c);
+        f << buf;
+      } else {
+        f << c;
+      }
+    }
+  }
+  f << '"';
+}
+
+} // namespace htm
@@ -0,0 +1,168 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2019, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Interface for the profiling statistics of a Network, see
+ * Network::enableProfiling().
+ */
+
+#ifndef NTA_PROFILING_HPP
+#define NTA_PROFILING_HPP
+
+#include <array>
+#include <chrono>
+#include <map>
+#include <mutex>
+#include <ostream>
+#include <set>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include <htm/types/Types.hpp>
+
+namespace htm {
+
+/**
+ * The durations of one kind of operation: count, total, min, max and a
+ * histogram from which the percentiles are estimated.
+ *
+ * The histogram has 8 buckets for every power of two nanoseconds, so the
+ * percentiles are within about 6% of the exact values.  Adding a duration
+ * does not allocate.
+ */
+class TimingStats {
+public:
+  typedef std::chrono::steady_clock Clock;
+
+  TimingStats() { reset(); }
+
+  /**
+   * Add one duration, in nanoseconds.
+   */
+  void add(UInt64 ns);
+
+  /**
+   * Add the duration from start until now.
+   */
+  void add(const Clock::time_point &start) {
+    add(static_cast<UInt64>(std::chrono::duration_cast<std::chrono::nanoseconds>(
+                              Clock::now() - start).count()));
+  }
+
+  void reset();
+
+  UInt64 getCount() const { return count_; }
+
+  /**
+   * The durations are returned in seconds, like Timer::getElapsed().
+   */
+  Real64 getTotal() const { return totalNs_ * 1e-9; }
+  Real64 getMean() const  { return count_ ? getTotal() / count_ : 0.0; }
+  Real64 getMin() const   { return count_ ? minNs_ * 1e-9 : 0.0; }
+  Real64 getMax() const   { return maxNs_ * 1e-9; }
+
+  /**
+   * @param percentile In the range [0, 100].
+   */
+  Real64 getPercentile(Real64 percentile) const;
+
+  /**
+   * Write the statistics as a JSON object.
+   */
+  void toJSON(std::ostream &f) const;
+
+private:
+  static const size_t SUB_BUCKETS_BITS = 3u;
+  static const size_t SUB_BUCKETS = 1u << SUB_BUCKETS_BITS;
+  static const size_t NUM_BUCKETS = (64u - SUB_BUCKETS_BITS + 1u) * SUB_BUCKETS;
+  static size_t bucket_(UInt64 ns);
+  static UInt64 bucketStart_(size_t bucket);
+
+  UInt64 count_;
+  UInt64 totalNs_;
+  UInt64 minNs_;
+  UInt64 maxNs_;
+  std::array<UInt64, NUM_BUCKETS> histogram_;
+};
+
+
+/**
+ * A bounded list of timed events, which is written in the Chrome trace event
+ * format (chrome://tracing or https://ui.perfetto.dev).  Events are recorded
+ * from several threads when the Network runs in parallel.
+ */
+class ProfilingTrace {
+public:
+  explicit ProfilingTrace(size_t maxEvents) : maxEvents_(maxEvents), dropped_(0u) {
+    events_.reserve(maxEvents);
+    origin_ = TimingStats::Clock::now();
+  }
+
+  /**
+   * The trace's own copy of an event name, which is passed to add().  The
+   * regions and links intern their names once, when profiling is enabled.
+   */
+  const std::string *intern(const std::string &name);
+
+  /**
+   * Record an event which started at start and ends now.
+   *
+   * @param name     A name returned by intern().
+   * @param category A string literal.
+   */
+  void add(const std::string *name, const char *category,
+           const TimingStats::Clock::time_point &start);
+
+  /**
+   * Remove all events, the interned names are kept.
+   */
+  void clear();
+
+  size_t size() const;
+  size_t getDropped() const { return dropped_; }
+
+  /**
+   * Write the events as a Chrome trace JSON object.
+   */
+  void toJSON(std::ostream &f) const;
+
+private:
+  struct Event {
+    const std::string *name;
+    const char *category;
+    UInt64 startNs;
+    UInt64 durationNs;
+    UInt32 thread;
+  };
+  const size_t maxEvents_;
+  size_t dropped_;
+  TimingStats::Clock::time_point origin_;
+  std::vector<Event> events_;
+  std::map<std::thread::id, UInt32> threads_;
+  std::set<std::string> names_;
+  mutable std::mutex mutex_;
+};
+
+/**
+ * Write a string as a JSON string literal.
+ */
+void writeJSONString(std::ostream &f, const std::string &s);
+
+} // namespace htm
+
+#endif // NTA_PROFILING_HPP
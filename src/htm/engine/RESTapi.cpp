@@ -20,8 +20,13 @@
 /** @file
 Implementation of the RESTapi class
 */
+#include <algorithm>
+#include <cstring>
+#include <limits>
+
 #include <htm/engine/RESTapi.hpp>
 #include <htm/engine/Network.hpp>
+#include <htm/engine/Input.hpp>
 
 #define RESOURCE_TIMEOUT 86400    // one day
 
@@ -244,6 +249,272 @@ std::string RESTapi::run_request(const std::string &id, const std::string &itera
   }
 }
 
+namespace {
+// Sequential reader of the binary records of a batch request.
+class BatchReader {
+public:
+  explicit BatchReader(const std::string &data) : data_(data), pos_(0) {}
+
+  void read(void *dest, size_t bytes) {
+    NTA_CHECK(bytes <= data_.size() - pos_) << "Batch data truncated at byte " << pos_;
+    if (bytes > 0)
+      std::memcpy(dest, data_.data() + pos_, bytes);
+    pos_ += bytes;
+  }
+  void skip(size_t bytes) {
+    NTA_CHECK(bytes <= data_.size() - pos_) << "Batch data truncated at byte " << pos_;
+    pos_ += bytes;
+  }
+  UInt32 readCount() {
+    UInt32 count;
+    read(&count, sizeof(count));
+    return count;
+  }
+  size_t position() const { return pos_; }
+  size_t remaining() const { return data_.size() - pos_; }
+  bool atEnd() const { return pos_ == data_.size(); }
+
+private:
+  const std::string &data_;
+  size_t pos_;
+};
+
+static void appendBinary(std::string &out, const void *src, size_t bytes) {
+  out.append(static_cast<const char *>(src), bytes);
+}
+
+static void appendCount(std::string &out, size_t count) {
+  const UInt32 n = static_cast<UInt32>(count);
+  appendBinary(out, &n, sizeof(n));
+}
+
+// Parse a non-negative decimal number of a batch request.
+static UInt32 parseBatchNumber(const std::string &text, const std::string &what) {
+  NTA_CHECK(!text.empty() && text.size() <= 10 &&
+            std::all_of(text.begin(), text.end(), [](char c) { return c >= '0' && c <= '9'; }))
+      << "Expected a number for " << what << ". Found '" << text << "'";
+  const unsigned long long value = std::strtoull(text.c_str(), nullptr, 10);
+  NTA_CHECK(value <= std::numeric_limits<UInt32>::max()) << "The " << what << " " << text << " is too large.";
+  return static_cast<UInt32>(value);
+}
+
+// One field of a batch record or of a batch result.
+struct BatchField {
+  std::shared_ptr<Region> region;
+  std::string name;
+  bool isInput;         // otherwise a scalar parameter (records only)
+  bool sparse;
+  NTA_BasicType type;   // the type of the elements in the request or response
+  Array value;          // reusable buffer of the current record's value
+  SDR_sparse_t indices; // reusable buffer of the current record's sparse indices
+  // The value of each record: the byte offset of its elements in the request
+  // body and their count.  The records are applied straight from the body.
+  std::vector<std::pair<size_t, UInt32>> records;
+};
+
+static BatchField parseBatchField(Network &net, const std::string &spec, bool isRecord) {
+  std::vector<std::string> args = split(spec, ':');
+  NTA_CHECK(!args.empty() && args.size() <= 3)
+      << "Expected syntax <region>.<name>:<type> for batch field. Found " << spec;
+  std::vector<std::string> names = split(args[0], '.');
+  NTA_CHECK(names.size() == 2) << "Expected syntax <region>.<name> for batch field. Found " << spec;
+
+  BatchField f;
+  f.region = net.getRegion(names[0]);
+  f.name = names[1];
+  f.sparse = (args.size() > 1 && args[1] == "sparse");
+  if (!isRecord) {
+    NTA_CHECK(f.region->getOutput(f.name))
+        << "Batch output '" << f.name << "' is not an output of region " << names[0];
+    NTA_CHECK(args.size() == 1 || (f.sparse && args.size() == 2))
+        << "Expected syntax <region>.<output>[:sparse] for batch output. Found " << spec;
+    f.isInput = false;
+    f.type = f.sparse ? NTA_BasicType_UInt32 : f.region->getOutputData(f.name).getType();
+    NTA_CHECK(f.type != NTA_BasicType_Str && f.type != NTA_BasicType_Handle)
+        << "Batch output " << spec << " is not numeric.";
+    if (f.sparse)
+      f.value = Array(NTA_BasicType_SDR);
+    return f;
+  }
+
+  NTA_CHECK(args.size() >= 2 && (f.sparse || args.size() == 2))
+      << "Expected syntax <region>.<name>:<type> or <region>.<input>:sparse[:<size>] for batch input. Found "
+      << spec;
+  std::shared_ptr<Input> in = f.region->getInput(f.name);
+  f.isInput = (in != nullptr);
+  if (f.isInput) {
+    NTA_CHECK(!in->hasIncomingLinks())
+        << "Batch input " << args[0] << " is linked, its links would overwrite the batch data.";
+  } else {
+    NTA_CHECK(f.region->getSpec()->parameters.contains(f.name))
+        << "Batch field '" << f.name << "' is neither an input nor a parameter of region " << names[0];
+  }
+  if (f.sparse) {
+    NTA_CHECK(f.isInput) << "Sparse batch data requires an input, '" << f.name
+                         << "' is not an input of region " << names[0];
+    UInt size = 0u;
+    if (args.size() == 3)
+      size = parseBatchNumber(args[2], "size of sparse batch input " + args[0]);
+    else
+      size = static_cast<UInt>(in->getData().getCount());
+    NTA_CHECK(size > 0u) << "The size of sparse batch input " << spec << " is not known.";
+    f.type = NTA_BasicType_UInt32;
+    f.value = Array(SDR({size}));
+  } else {
+    f.type = BasicType::parse(args[1]);
+    NTA_CHECK(f.type != NTA_BasicType_Str && f.type != NTA_BasicType_Handle)
+        << "Batch input " << spec << " is not numeric.";
+    f.value = Array(f.type);
+  }
+  return f;
+}
+
+// Validate the value of one field of the next record, and remember where it is.
+static void readBatchField(BatchField &f, BatchReader &reader) {
+  const UInt32 count = reader.readCount();
+  const size_t elemSize = f.sparse ? sizeof(UInt32) : BasicType::getSize(f.type);
+  // The count comes from the request, check it against the body before using it.
+  NTA_CHECK(count <= reader.remaining() / elemSize)
+      << "Batch data truncated at byte " << reader.position() << ", batch field " << f.name
+      << " has " << count << " values.";
+  f.records.emplace_back(reader.position(), count);
+  if (f.sparse) {
+    const UInt size = f.value.getSDRNoRefresh().size;
+    UInt32 previous = 0u;
+    for (UInt32 i = 0; i < count; i++) {
+      UInt32 index;
+      reader.read(&index, sizeof(index));
+      NTA_CHECK(index < size) << "Sparse index " << index << " out of range for batch input " << f.name;
+      NTA_CHECK(i == 0 || previous < index)
+          << "Sparse indices of batch input " << f.name << " must be sorted and unique, found "
+          << previous << " before " << index;
+      previous = index;
+    }
+    return;
+  }
+  NTA_CHECK(f.isInput || count == 1u)
+      << "Batch parameter " << f.name << " must be a scalar, found " << count << " values.";
+  reader.skip(count * elemSize);
+}
+
+// Set one field of record i on its region.
+static void setBatchField(BatchField &f, size_t i, const std::string &data) {
+  const size_t offset = f.records[i].first;
+  const UInt32 count  = f.records[i].second;
+  if (f.sparse) {
+    f.indices.resize(count);
+    if (count > 0)
+      std::memcpy(f.indices.data(), data.data() + offset, count * sizeof(UInt32));
+    f.value.getSDRNoRefresh().setSparse(f.indices);
+    f.region->setInputData(f.name, f.value);
+    return;
+  }
+  if (f.value.getCount() != count || !f.value.has_buffer()) {
+    f.value = Array(f.type);
+    f.value.allocateBuffer(count);
+  }
+  if (count > 0)
+    std::memcpy(f.value.getBuffer(), data.data() + offset, count * BasicType::getSize(f.type));
+  if (f.isInput) {
+    f.region->setInputData(f.name, f.value);
+    return;
+  }
+  const char *buf = static_cast<const char *>(f.value.getBuffer());
+  switch (f.type) {
+  case NTA_BasicType_Int32:  f.region->setParameterInt32(f.name, *reinterpret_cast<const Int32 *>(buf)); break;
+  case NTA_BasicType_UInt32: f.region->setParameterUInt32(f.name, *reinterpret_cast<const UInt32 *>(buf)); break;
+  case NTA_BasicType_Int64:  f.region->setParameterInt64(f.name, *reinterpret_cast<const Int64 *>(buf)); break;
+  case NTA_BasicType_UInt64: f.region->setParameterUInt64(f.name, *reinterpret_cast<const UInt64 *>(buf)); break;
+  case NTA_BasicType_Real32: f.region->setParameterReal32(f.name, *reinterpret_cast<const Real32 *>(buf)); break;
+  case NTA_BasicType_Real64: f.region->setParameterReal64(f.name, *reinterpret_cast<const Real64 *>(buf)); break;
+  case NTA_BasicType_Bool:   f.region->setParameterBool(f.name, *reinterpret_cast<const bool *>(buf)); break;
+  default:
+    NTA_THROW << "Batch parameter " << f.name << " of type " << BasicType::getName(f.type) << " is not supported.";
+  }
+}
+
+// Append the current value of an output to the result.
+static void appendBatchField(BatchField &f, std::string &out) {
+  const Array &a = f.region->getOutputData(f.name);
+  if (f.sparse) {
+    const SDR_sparse_t *sparse;
+    if (a.getType() == NTA_BasicType_SDR) {
+      sparse = &a.getSDR().getSparse();
+    } else {
+      a.convertInto(f.value);
+      sparse = &f.value.getSDR().getSparse();
+    }
+    appendCount(out, sparse->size());
+    appendBinary(out, sparse->data(), sparse->size() * sizeof(UInt32));
+  } else {
+    appendCount(out, a.getCount());
+    appendBinary(out, a.getBuffer(), a.getCount() * BasicType::getSize(f.type));
+  }
+}
+} // namespace
+
+std::string RESTapi::batch_run_request(const std::string &id,
+                                       const std::string &records,
+                                       const std::string &inputs,
+                                       const std::string &outputs,
+                                       const std::string &data) {
+  try {
+    auto itr = resource_.find(id);
+    NTA_CHECK(itr != resource_.end()) << "Context for resource '" + id + "' not found.";
+    itr->second.t = time(0);
+    Network &net = *itr->second.net;
+    net.initialize();  // so that the sizes of the inputs and the types of the outputs are known.
+
+    NTA_CHECK(!records.empty()) << "The number of batch records is required.";
+    const size_t n = parseBatchNumber(records, "the number of batch records");
+
+    std::vector<BatchField> in_fields;
+    if (!inputs.empty()) {
+      for (const auto &spec : split(inputs, ','))
+        in_fields.push_back(parseBatchField(net, spec, true));
+    }
+    std::vector<BatchField> out_fields;
+    if (!outputs.empty()) {
+      for (const auto &spec : split(outputs, ','))
+        out_fields.push_back(parseBatchField(net, spec, false));
+    }
+
+    // Read and validate the whole body before the first iteration so that
+    // a malformed request does not leave the network partially advanced.
+    BatchReader reader(data);
+    for (size_t i = 0; i < n; i++) {
+      for (auto &f : in_fields)
+        readBatchField(f, reader);
+    }
+    NTA_CHECK(reader.atEnd()) << "Batch data has more than " << n << " records.";
+
+    std::string response;
+    appendCount(response, n);
+    appendCount(response, out_fields.size());
+    for (const auto &f : out_fields) {
+      const std::string type = BasicType::getName(f.type);
+      appendCount(response, type.size());
+      response += type;
+    }
+
+    for (size_t i = 0; i < n; i++) {
+      try {
+        for (auto &f : in_fields)
+          setBatchField(f, i, data);
+        net.run(1);
+      } catch (Exception &e) {
+        NTA_THROW << "Batch record " << i << " failed, " << i << " of " << n
+                  << " records were applied: " << e.getMessage();
+      }
+      for (auto &f : out_fields)
+        appendBatchField(f, response);
+    }
+    return response;
+  } catch (Exception &e) {
+    return std::string("ERROR: ") + e.getMessage();
+  }
+}
+
 std::string RESTapi::command_request(const std::string& id, 
                                      const std::string& region_name,
                                      const std::string& command) {
@@ -322,8 +322,54 @@ public:
    * @retval            If success returns "OK".
    *                    Otherwise returns error message starting with "ERROR: ".
    */
-  std::string run_request(const std::string &id, 
+  std::string run_request(const std::string &id,
                           const std::string &iterations);
+  /**
+   * @b Description:
+   * Handler for a POST "batch" request message.
+   * This will feed a block of records into the Network, one record per
+   * iteration, and return the requested outputs of every iteration.
+   * The records and the result are binary (little-endian as on the server)
+   * so the per-record JSON encoding and HTTP round trips of the PUT input,
+   * run and GET output requests are avoided.
+   *
+   * @param id  Identifier for the resource context (a Network class instance).
+   *            Client should pass the id returned by the previous "configure"
+   *            request message.
+   *
+   * @param records  The number of records in data; one iteration is run per record.
+   *
+   * @param inputs   A comma separated list of the fields of a record, each
+   *                 "<region>.<name>:<type>" where <type> is a basic type name
+   *                 such as "Real32" or "SDR" (dense, one byte per bit), or
+   *                 "<region>.<input>:sparse[:<size>]" for the sorted, unique
+   *                 indices of the active bits of an SDR.  The size may be
+   *                 omitted if the input already has a size.  Inputs must not be
+   *                 linked.  If <name> is not an input of the region it is taken
+   *                 to be a scalar ReadWrite parameter, for example
+   *                 "encoder.sensedValue:Real64".
+   *
+   * @param outputs  A comma separated list of "<region>.<output>" or
+   *                 "<region>.<output>:sparse" to return after each iteration.
+   *
+   * @param data     The records.  For each record, for each field in order,
+   *                 a UInt32 count followed by count elements of the field's
+   *                 type (UInt32 indices if sparse).
+   *
+   * @retval         If success returns the binary result:  UInt32 records,
+   *                 UInt32 number of outputs, then for each output a UInt32
+   *                 length and the name of its type ("UInt32" if sparse),
+   *                 then for each record, for each output, a UInt32 count
+   *                 followed by count elements.
+   *                 Otherwise returns error message starting with "ERROR: ".
+   *                 The data is validated before the first iteration; if an
+   *                 iteration fails the message tells how many records were applied.
+   */
+  std::string batch_run_request(const std::string &id,
+                                const std::string &records,
+                                const std::string &inputs,
+                                const std::string &outputs,
+                                const std::string &data);
 
   /**
    * @b Description:
@@ -191,15 +191,20 @@ void Region::compute() {
     NTA_THROW << "Region " << getName()
               << " unable to compute because not initialized";
 
-  if (profilingEnabled_)
-    computeTimer_.start();
+  if (!profilingEnabled_) {
+    impl_->compute();
+    return;
+  }
 
-  impl_->compute();
+  computeTimer_.start();
+  const auto start = TimingStats::Clock::now();
 
-  if (profilingEnabled_)
-    computeTimer_.stop();
+  impl_->compute();
 
-  return;
+  computeStats_.add(start);
+  if (profilingTrace_)
+    profilingTrace_->add(profilingName_, "compute", start);
+  computeTimer_.stop();
 }
 
 /**
@@ -313,6 +318,8 @@ void Region::disableProfiling() { profilingEnabled_ = false; }
 void Region::resetProfiling() {
   computeTimer_.reset();
   executeTimer_.reset();
+  computeStats_.reset();
+  prepareInputsStats_.reset();
 }
 
 const Timer &Region::getComputeTimer() const { return computeTimer_; }
@@ -457,10 +464,18 @@ void Region::setInputData(const std::string &inputName, const Array& data) {
 }
 
 void Region::prepareInputs() {
+  const auto start = profilingEnabled_ ? TimingStats::Clock::now() : TimingStats::Clock::time_point();
+
   // Ask each input to prepare itself
   for (InputMap::const_iterator i = inputs_.begin(); i != inputs_.end(); i++) {
     i->second->prepare();
   }
+
+  if (profilingEnabled_) {
+    prepareInputsStats_.add(start);
+    if (profilingTrace_)
+      profilingTrace_->add(profilingName_, "prepareInputs", start);
+  }
 }
 
 
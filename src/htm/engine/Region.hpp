@@ -34,6 +34,7 @@
 // objects are returned by value.
 #include <htm/engine/Spec.hpp>
 #include <htm/ntypes/Dimensions.hpp>
+#include <htm/engine/Profiling.hpp>
 #include <htm/os/Timer.hpp>
 #include <htm/types/Serializable.hpp>
 #include <htm/types/Types.hpp>
@@ -401,6 +402,17 @@ public:
    */
   const Timer &getExecuteTimer() const;
 
+  /**
+   * Get the durations of the compute operation, with percentiles.
+   */
+  const TimingStats &getComputeStats() const { return computeStats_; }
+
+  /**
+   * Get the durations of prepareInputs(), which includes the compute of all
+   * the links into this region.
+   */
+  const TimingStats &getPrepareInputsStats() const { return prepareInputsStats_; }
+
   bool operator==(const Region &other) const;
   inline bool operator!=(const Region &other) const {
     return !operator==(other);
@@ -571,6 +583,11 @@ private:
   bool profilingEnabled_;
   Timer computeTimer_;
   Timer executeTimer_;
+  TimingStats computeStats_;
+  TimingStats prepareInputsStats_;
+  // Set by Network::enableProfiling() when it records a trace.
+  ProfilingTrace *profilingTrace_ = nullptr;
+  const std::string *profilingName_ = nullptr;
 };
 
 } // namespace htm
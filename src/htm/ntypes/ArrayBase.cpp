@@ -210,6 +210,19 @@ const SDR& ArrayBase::getSDR() const {
   return sdr;
 }
 
+SDR& ArrayBase::getSDRNoRefresh() {
+  NTA_CHECK(type_ == NTA_BasicType_SDR) << "Does not contain an SDR object";
+  if (buffer_ == nullptr)
+    NTA_THROW << "getSDRNoRefresh: SDR pointer is null";
+  return *(reinterpret_cast<SDR *>(buffer_.get()));
+}
+const SDR& ArrayBase::getSDRNoRefresh() const {
+  NTA_CHECK(type_ == NTA_BasicType_SDR) << "Does not contain an SDR object";
+  if (buffer_ == nullptr)
+    NTA_THROW << "getSDRNoRefresh: SDR pointer is null";
+  return *(reinterpret_cast<const SDR *>(buffer_.get()));
+}
+
 /**
  * number of elements of the given type in the buffer.
  */
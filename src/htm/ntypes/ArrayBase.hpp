@@ -124,6 +124,16 @@ namespace htm
     SDR& getSDR();
     const SDR& getSDR() const;
 
+    /**
+     * Returns a reference to the underlining SDR, without the cache refresh
+     * which getSDR() does.  This keeps the sparse format of the SDR, so reading
+     * it costs only the active bits.  Changes made through a pointer from
+     * getBuffer() after the SDR was last read are not seen, use getSDR() for
+     * buffers which are written that way.
+     */
+    SDR& getSDRNoRefresh();
+    const SDR& getSDRNoRefresh() const;
+
     /**
      * number of elements of given type in the buffer
      */
@@ -0,0 +1,91 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Implementation of MappedFile
+ */
+
+#include <htm/os/MappedFile.hpp>
+#include <htm/utils/Log.hpp>
+
+#if defined(NTA_OS_WINDOWS)
+  #include <windows.h>
+#else
+  #include <fcntl.h>
+  #include <sys/mman.h>
+  #include <sys/stat.h>
+  #include <unistd.h>
+#endif
+
+using namespace htm;
+
+#if defined(NTA_OS_WINDOWS)
+
+MappedFile::MappedFile(const std::string &path) : path_(path) {
+  HANDLE file = CreateFileA(path.c_str(), GENERIC_READ, FILE_SHARE_READ, NULL,
+                            OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, NULL);
+  NTA_CHECK(file != INVALID_HANDLE_VALUE) << "MappedFile: can not open " << path;
+  LARGE_INTEGER fileSize;
+  if (!GetFileSizeEx(file, &fileSize)) {
+    CloseHandle(file);
+    NTA_THROW << "MappedFile: can not get the size of " << path;
+  }
+  size_ = static_cast<size_t>(fileSize.QuadPart);
+  if (size_ > 0u) {
+    mapping_ = CreateFileMappingA(file, NULL, PAGE_READONLY, 0, 0, NULL);
+    if (mapping_ != NULL) {
+      data_ = static_cast<const char *>(MapViewOfFile(mapping_, FILE_MAP_READ, 0, 0, 0));
+    }
+  }
+  CloseHandle(file); // the mapping keeps the file open
+  if (size_ > 0u && data_ == nullptr) {
+    if (mapping_ != NULL) CloseHandle(mapping_);
+    NTA_THROW << "MappedFile: can not map " << path;
+  }
+}
+
+MappedFile::~MappedFile() {
+  if (data_ != nullptr) UnmapViewOfFile(data_);
+  if (mapping_ != nullptr) CloseHandle(mapping_);
+}
+
+#else
+
+MappedFile::MappedFile(const std::string &path) : path_(path) {
+  const int fd = open(path.c_str(), O_RDONLY);
+  NTA_CHECK(fd >= 0) << "MappedFile: can not open " << path;
+  struct stat st;
+  if (fstat(fd, &st) != 0) {
+    close(fd);
+    NTA_THROW << "MappedFile: can not get the size of " << path;
+  }
+  size_ = static_cast<size_t>(st.st_size);
+  if (size_ > 0u) {
+    void *ptr = mmap(nullptr, size_, PROT_READ, MAP_SHARED, fd, 0);
+    if (ptr != MAP_FAILED) {
+      data_ = static_cast<const char *>(ptr);
+    }
+  }
+  close(fd); // the mapping keeps the file open
+  NTA_CHECK(size_ == 0u || data_ != nullptr) << "MappedFile: can not map " << path;
+}
+
+MappedFile::~MappedFile() {
+  if (data_ != nullptr) munmap(const_cast<char *>(data_), size_);
+}
+
+#endif
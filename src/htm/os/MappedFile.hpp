@@ -0,0 +1,79 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Read-only memory mapped file
+ */
+
+#ifndef NTA_MAPPED_FILE_HPP
+#define NTA_MAPPED_FILE_HPP
+
+#include <htm/types/Types.hpp>
+#include <string>
+
+namespace htm {
+
+/**
+ * @Responsibility
+ * Map a whole file into memory, read-only.
+ *
+ * @Description
+ * The pages of the file are shared by all the processes which map the same
+ * file, and they are only read from disk when they are first accessed.  The
+ * mapping stays valid for the lifetime of this object.
+ *
+ * The start of the mapping is aligned to the page size.
+ */
+class MappedFile {
+public:
+  /**
+   * Map the file.
+   *
+   * @param path  Path of the file.
+   * @throws if the file can not be opened or mapped.
+   */
+  explicit MappedFile(const std::string &path);
+
+  ~MappedFile();
+
+  MappedFile(const MappedFile &) = delete;
+  MappedFile &operator=(const MappedFile &) = delete;
+
+  /**
+   * @returns the contents of the file, or nullptr if the file is empty.
+   */
+  const char *data() const noexcept { return data_; }
+
+  /**
+   * @returns the size of the file in bytes.
+   */
+  size_t size() const noexcept { return size_; }
+
+  const std::string &getPath() const noexcept { return path_; }
+
+private:
+  std::string path_;
+  const char *data_ = nullptr;
+  size_t      size_ = 0u;
+#if defined(NTA_OS_WINDOWS)
+  void *mapping_ = nullptr;
+#endif
+};
+
+} // namespace htm
+
+#endif // NTA_MAPPED_FILE_HPP
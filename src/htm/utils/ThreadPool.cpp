@@ -0,0 +1,117 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Implementation of the ThreadPool
+ */
+
+#include <htm/utils/ThreadPool.hpp>
+#include <htm/utils/Log.hpp>
+
+using namespace std;
+using namespace htm;
+
+
+ThreadPool::ThreadPool(UInt numThreads) {
+  if( numThreads == 0u ) {
+    numThreads = std::max( 1u, std::thread::hardware_concurrency() );
+  }
+  // The calling thread is the first of the numThreads.
+  for( UInt i = 1u; i < numThreads; i++ ) {
+    workers_.emplace_back( &ThreadPool::workerLoop_, this );
+  }
+}
+
+
+ThreadPool::~ThreadPool() {
+  {
+    lock_guard<mutex> lock( mutex_ );
+    stop_ = true;
+  }
+  wake_.notify_all();
+  for( auto &w : workers_ ) {
+    w.join();
+  }
+}
+
+
+void ThreadPool::runTasks_() {
+  for( UInt i = next_++; i < count_; i = next_++ ) {
+    try {
+      (*task_)( i );
+    }
+    catch( ... ) {
+      lock_guard<mutex> lock( mutex_ );
+      if( !error_ ) error_ = current_exception();
+    }
+  }
+}
+
+
+void ThreadPool::workerLoop_() {
+  UInt64 seen = 0u;
+  while( true ) {
+    {
+      unique_lock<mutex> lock( mutex_ );
+      wake_.wait( lock, [&]{ return stop_ or generation_ != seen; } );
+      if( stop_ ) return;
+      seen = generation_;
+    }
+    runTasks_();
+    {
+      lock_guard<mutex> lock( mutex_ );
+      busy_--;
+    }
+    done_.notify_one();
+  }
+}
+
+
+void ThreadPool::parallelFor(UInt count, const Task &task) {
+  if( count == 0u ) return;
+  if( workers_.empty() or count == 1u ) {
+    for( UInt i = 0u; i < count; i++ ) {
+      task( i );
+    }
+    return;
+  }
+
+  {
+    lock_guard<mutex> lock( mutex_ );
+    NTA_CHECK( busy_ == 0u ) << "ThreadPool::parallelFor is not reentrant!";
+    task_  = &task;
+    count_ = count;
+    next_  = 0u;
+    busy_  = static_cast<UInt>(workers_.size());
+    error_ = nullptr;
+    generation_++;
+  }
+  wake_.notify_all();
+
+  runTasks_();
+
+  exception_ptr error;
+  {
+    unique_lock<mutex> lock( mutex_ );
+    done_.wait( lock, [&]{ return busy_ == 0u; } );
+    task_ = nullptr;
+    swap( error, error_ );
+  }
+  if( error ) {
+    rethrow_exception( error );
+  }
+}
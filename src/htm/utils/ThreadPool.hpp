@@ -0,0 +1,105 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Definition of the ThreadPool, a small fixed size pool of worker threads.
+ */
+
+#ifndef HTM_UTIL_THREAD_POOL_HPP
+#define HTM_UTIL_THREAD_POOL_HPP
+
+#include <algorithm>
+#include <atomic>
+#include <condition_variable>
+#include <exception>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+#include <htm/types/Types.hpp>
+
+namespace htm {
+
+/**
+ * ThreadPool: a fixed set of worker threads which execute data-parallel loops.
+ *
+ * The pool is meant for "one call advances many independent objects" work,
+ * eg. stepping many models by one timestep. The threads are created once and
+ * sleep between calls, so parallelFor() has a low per call overhead.
+ *
+ * Example Usage:
+ *    ThreadPool pool( 4 );
+ *    pool.parallelFor( models.size(), [&](UInt i) { models[i].compute(); } );
+ *
+ * The calling thread takes part in the work, so a pool of size 1 has no
+ * worker threads and runs everything inline.
+ *
+ * A ThreadPool is not reentrant: do not call parallelFor() concurrently from
+ * several threads, nor from inside a task.
+ */
+class ThreadPool {
+public:
+  using Task = std::function<void(UInt)>;
+
+  /**
+   * @param numThreads - total number of threads used by parallelFor(),
+   *   including the calling thread. 0 (default) means use all hardware threads.
+   */
+  explicit ThreadPool(UInt numThreads = 0u);
+
+  ~ThreadPool();
+
+  ThreadPool(const ThreadPool&) = delete;
+  ThreadPool& operator=(const ThreadPool&) = delete;
+
+  /**
+   * Run task(i) for every i in [0, count). Blocks until all are finished.
+   * Tasks are handed out dynamically, in no particular order.
+   *
+   * If a task throws, the remaining tasks are still executed and the first
+   * exception is re-thrown from here.
+   */
+  void parallelFor(UInt count, const Task &task);
+
+  /**
+   * @returns the number of threads used by parallelFor(), including the
+   * calling thread.
+   */
+  UInt size() const { return static_cast<UInt>(workers_.size()) + 1u; }
+
+private:
+  void workerLoop_();
+  void runTasks_();
+
+  std::vector<std::thread> workers_;
+  std::mutex               mutex_;
+  std::condition_variable  wake_;
+  std::condition_variable  done_;
+
+  // State of the current parallelFor() call, guarded by mutex_ unless atomic.
+  const Task        *task_       = nullptr;
+  UInt               count_      = 0u;
+  std::atomic<UInt>  next_{0u};
+  UInt               busy_       = 0u; // workers still inside runTasks_()
+  UInt64             generation_ = 0u;
+  bool               stop_       = false;
+  std::exception_ptr error_;
+};
+
+} // end namespace htm
+#endif // HTM_UTIL_THREAD_POOL_HPP
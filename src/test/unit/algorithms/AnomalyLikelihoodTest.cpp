@@ -1,14 +1,103 @@
+#include <cmath>
+#include <deque>
+#include <limits>
+#include <numeric>
+#include <random>
 #include <vector>
 #include <sstream>
 
 #include "gtest/gtest.h"
 #include <htm/algorithms/AnomalyLikelihood.hpp>
+#include <htm/utils/MovingAverage.hpp>
+#include <htm/utils/SlidingWindow.hpp>
 
 namespace testing {
 
 using namespace htm;
 
-TEST(DISABLED_AnomalyLikelihood, SelectModeLikelihood)
+/**
+ * Straight port of the python AnomalyLikelihood class, which re-averages the
+ * whole history on every re-estimation.
+ */
+class ReferenceLikelihood {
+public:
+  ReferenceLikelihood(UInt learningPeriod, UInt estimationSamples, UInt historicWindowSize,
+                      UInt reestimationPeriod, UInt aggregationWindow)
+    : learningPeriod(learningPeriod), probationaryPeriod(learningPeriod + estimationSamples),
+      windowSize(historicWindowSize), reestimationPeriod(reestimationPeriod),
+      aggregationWindow(aggregationWindow) {}
+
+  Real64 anomalyProbability(Real64 value, Real64 score) {
+    Real64 likelihood = 0.5;
+    if (iteration >= probationaryPeriod) {
+      if (!hasDistribution || iteration % reestimationPeriod == 0) {
+        estimate();
+      }
+      window.push_back(score);
+      if (window.size() > aggregationWindow) window.pop_front();
+      const Real64 avg = accumulate(window.begin(), window.end(), 0.0) / window.size();
+      const Real64 v = tail(avg);
+      Real64 filtered = v;
+      if (v <= 1.0 - 0.99999 && prev <= 1.0 - 0.99999) filtered = 1.0 - 0.999;
+      prev = v;
+      likelihood = 1.0 - filtered;
+    }
+    history.push_back({value, score});
+    if (history.size() > windowSize) history.pop_front();
+    iteration++;
+    return likelihood;
+  }
+
+private:
+  void estimate() {
+    const UInt shifted = iteration > windowSize ? iteration - windowSize : 0u;
+    const UInt skip = std::min(iteration, learningPeriod > shifted ? learningPeriod - shifted : 0u);
+    std::vector<Real64> averages, values;
+    window.clear();
+    for (const auto &record : history) {
+      window.push_back(record.second);
+      if (window.size() > aggregationWindow) window.pop_front();
+      averages.push_back(accumulate(window.begin(), window.end(), 0.0) / window.size());
+      values.push_back(record.first);
+    }
+    hasDistribution = true;
+    if (averages.size() <= skip) {
+      mean = 0.5; stdev = 1e3;
+    } else {
+      Real64 var;
+      meanVar(averages, skip, mean, var);
+      mean  = std::max(mean, 0.03);
+      stdev = std::sqrt(std::max(var, 0.0003));
+      Real64 valueMean, valueVar;
+      meanVar(values, skip, valueMean, valueVar);
+      if (valueVar < 1.5e-5) stdev = 1e3;
+    }
+    prev = tail(averages.back());
+  }
+
+  static void meanVar(const std::vector<Real64> &data, UInt skip, Real64 &mean, Real64 &var) {
+    const Real64 n = static_cast<Real64>(data.size() - skip);
+    mean = accumulate(data.begin() + skip, data.end(), 0.0) / n;
+    var = 0.0;
+    for (auto it = data.begin() + skip; it != data.end(); ++it) var += (*it - mean) * (*it - mean);
+    var /= n;
+  }
+
+  Real64 tail(Real64 x) const {
+    if (x < mean) x = 2 * mean - x;
+    return 0.5 * std::erfc((x - mean) / stdev / 1.4142);
+  }
+
+  const UInt learningPeriod, probationaryPeriod, windowSize, reestimationPeriod, aggregationWindow;
+  UInt iteration = 0u;
+  bool hasDistribution = false;
+  Real64 mean = 0.5, stdev = 1e3, prev = 1.0;
+  std::deque<std::pair<Real64, Real64>> history;
+  std::deque<Real64> window;
+};
+
+
+TEST(AnomalyLikelihood, SelectModeLikelihood)
 {
   AnomalyLikelihood a;
   int ts = 0; //timestamp
@@ -18,28 +107,216 @@ TEST(DISABLED_AnomalyLikelihood, SelectModeLikelihood)
     ASSERT_FLOAT_EQ(likelihood, 0.5f); //first (<=388) probationaryPeriod rounds likelihood=0.5
   }
 
-  //real likelihood returned here
+  //real likelihood returned here, constant scores are at the mean of the distribution.
   for(int i=0; i< 10; i++) {
     likelihood = a.anomalyProbability(0.33f,  ++ts);
   }
-  ASSERT_FLOAT_EQ(likelihood, 0.1f); //TODO port likelihood tests here
+  ASSERT_NEAR(likelihood, 0.5f, 1e-5);
+
+  // An abrupt change in the anomaly score is.
+  for(int i=0; i< 10; i++) {
+    likelihood = a.anomalyProbability(1.0f,  ++ts);
+  }
+  ASSERT_GT(likelihood, 0.99f);
 };
 
-TEST(DISABLED_AnomalyLikelihood, SerializationLikelihood)
+
+TEST(AnomalyLikelihood, MatchesReference)
+{
+  const UInt learning = 10u, estimation = 20u, window = 50u, period = 7u, aggregation = 5u;
+  AnomalyLikelihood a(learning, estimation, window, period, aggregation);
+  ReferenceLikelihood ref(learning, estimation, window, period, aggregation);
+
+  std::mt19937 rng(42);
+  std::uniform_real_distribution<Real> uniform(0.0f, 1.0f);
+  for(UInt i = 0; i < 500u; i++) {
+    // Mix of noisy and calm scores, and a stretch of flat metric values.
+    const Real score = (i / 60u) % 2u ? uniform(rng) : uniform(rng) * 0.1f;
+    const Real value = (i >= 200u && i < 300u) ? 3.0f : uniform(rng) * 100.0f;
+    ASSERT_NEAR(a.anomalyProbability(score, -1, value), ref.anomalyProbability(value, score), 1e-5)
+      << "record " << i;
+  }
+}
+
+
+TEST(AnomalyLikelihood, LongStreamMatchesReference)
 {
+  // Many re-estimations over full histories.  The metric values move between
+  // levels far apart, and stay flat at some of them, so that any error which
+  // accumulates in the statistics of the history shows up.
   AnomalyLikelihood a;
-  int ts = 0; //timestamp
-  Real likelihood = 0;
-  for(int i=0; i< 400; i++) {
-    likelihood = a.anomalyProbability(0.33f,  ++ts);
+  ReferenceLikelihood ref(288u, 100u, 8640u, 100u, 10u);
+
+  std::mt19937 rng(11);
+  std::uniform_real_distribution<Real> uniform(0.0f, 1.0f);
+  for(UInt i = 0; i < 100000u; i++) {
+    const Real score = (i / 5000u) % 2u ? uniform(rng) : uniform(rng) * 0.2f;
+    const UInt phase = (i / 20000u) % 3u;
+    const Real value = phase == 0u ? uniform(rng) * 100.0f :
+                       phase == 1u ? 1e7f : 1e7f + std::floor(uniform(rng) * 4.0f);
+    ASSERT_NEAR(a.anomalyProbability(score, -1, value), ref.anomalyProbability(value, score), 1e-5)
+      << "record " << i;
+  }
+}
+
+
+TEST(AnomalyLikelihood, Reset)
+{
+  MultiMetricAnomalyLikelihood a(3u, 10u, 20u, 50u, 7u, 5u);
+  const MultiMetricAnomalyLikelihood fresh(a);
+  std::mt19937 rng(3);
+  std::uniform_real_distribution<Real> uniform(0.0f, 1.0f);
+  const auto run = [&]() {
+    std::vector<Real> likelihoods;
+    for(UInt i = 0; i < 100u; i++) {
+      const auto l = a.compute({uniform(rng), uniform(rng), uniform(rng)});
+      likelihoods.insert(likelihoods.end(), l.begin(), l.end());
+    }
+    return likelihoods;
+  };
+  const auto before = rng;
+  const auto first = run();
+  ASSERT_NE(a, fresh);
+  a.reset();
+  ASSERT_EQ(a, fresh);
+  rng = before;
+  ASSERT_EQ(first, run());
+}
+
+
+TEST(AnomalyLikelihood, MultiMetric)
+{
+  const UInt numMetrics = 7u;
+  MultiMetricAnomalyLikelihood multi(numMetrics, 10u, 20u, 50u, 7u, 5u);
+  std::vector<AnomalyLikelihood> singles(numMetrics, AnomalyLikelihood(10u, 20u, 50u, 7u, 5u));
+  ASSERT_EQ(multi.size(), numMetrics);
+
+  std::mt19937 rng(7);
+  std::uniform_real_distribution<Real> uniform(0.0f, 1.0f);
+  std::vector<Real> scores(numMetrics), values(numMetrics);
+  for(UInt i = 0; i < 200u; i++) {
+    for(UInt m = 0; m < numMetrics; m++) {
+      scores[m] = uniform(rng) * (m + 1u) / numMetrics;
+      values[m] = m % 2u ? uniform(rng) : std::numeric_limits<Real>::quiet_NaN();
+    }
+    const auto likelihoods = multi.compute(scores, values);
+    for(UInt m = 0; m < numMetrics; m++) {
+      ASSERT_EQ(likelihoods[m], singles[m].anomalyProbability(scores[m], -1, values[m]));
+    }
   }
-  EXPECT_FLOAT_EQ(likelihood, 0.0f);
-  
+  ASSERT_EQ(multi.getIteration(), 200u);
+  EXPECT_ANY_THROW(multi.compute(std::vector<Real>(numMetrics + 1u)));
+}
+
+
+TEST(AnomalyLikelihood, SerializationLikelihood)
+{
+  AnomalyLikelihood a(10u, 20u, 50u, 7u, 5u);
+  for(int i=0; i< 100; i++) {
+    a.anomalyProbability(0.33f + (i % 3) * 0.1f);
+  }
+
   AnomalyLikelihood b;
   std::stringstream ss;
   a.save(ss);
   b.load(ss);
   EXPECT_EQ(a, b);
+  EXPECT_EQ(b.getHistoricWindowSize(), 50u);
+  for(int i=0; i< 100; i++) {
+    ASSERT_EQ(a.anomalyProbability(0.5f), b.anomalyProbability(0.5f));
+  }
+  EXPECT_EQ(a, b);
+}
+
+
+// The AnomalyLikelihood archive as it was written before the multi-metric
+// implementation, with the default parameters.
+struct BaselineLikelihood {
+  std::string distributionName;
+  Real mean;
+  Real variance;
+  Real stdev;
+  std::vector<Real> scores;
+
+  template<class Archive>
+  void save_ar(Archive & ar) const {
+    MovingAverage averagedAnomaly(10u);
+    SlidingWindow<Real> likelihoods(8640u), rawScores(8640u), averages(8640u);
+    for(const Real score : scores) {
+      rawScores.append(score);
+      averages.append(averagedAnomaly.compute(score));
+      likelihoods.append(0.5f);
+    }
+    const std::string name("AnomalyLikelhood");
+    const UInt iteration = static_cast<UInt>(scores.size());
+    const int timestamp = -1;
+    ar(cereal::make_nvp("name",                     name),
+       cereal::make_nvp("distribution_.name",       distributionName),
+       cereal::make_nvp("distribution_.mean",       mean),
+       cereal::make_nvp("distribution_.variance",   variance),
+       cereal::make_nvp("distribution_.stdev",      stdev),
+       cereal::make_nvp("iteration_",               iteration),
+       cereal::make_nvp("lastTimestamp_",           timestamp),
+       cereal::make_nvp("initialTimestamp_",        timestamp),
+       cereal::make_nvp("averagedAnomaly_",         averagedAnomaly),
+       cereal::make_nvp("runningLikelihoods_",      likelihoods),
+       cereal::make_nvp("runningRawAnomalyScores_", rawScores),
+       cereal::make_nvp("runningAverageAnomalies_", averages));
+  }
+};
+
+TEST(AnomalyLikelihood, LoadBaselineFormat)
+{
+  std::mt19937 rng(7);
+  std::uniform_real_distribution<Real> uniform(0.0f, 1.0f);
+  BaselineLikelihood baseline{"normal", 0.4f, 0.0001f, 0.01f, {}};
+  AnomalyLikelihood expected;
+  for(UInt i = 0; i < 450u; i++) {
+    baseline.scores.push_back(uniform(rng) * 0.2f + 0.3f);
+    expected.anomalyProbability(baseline.scores.back());
+  }
+  std::stringstream ss;
+  {
+    cereal::BinaryOutputArchive ar( ss );
+    ar( baseline );
+  }
+  AnomalyLikelihood loaded;
+  loaded.load(ss);
+  ASSERT_EQ(loaded.getIteration(), 450u);
+
+  // The next records use the saved distribution, until it is re-estimated
+  // from the history.
+  Real64 average = 0.0;
+  for(UInt i = 441u; i < 450u; i++) average += baseline.scores[i];
+  average = (average + 0.9) / 10.0;
+  const Real64 tail = 0.5 * std::erfc((average - 0.4) / 0.01 / 1.4142);
+  EXPECT_NEAR(loaded.anomalyProbability(0.9f), 1.0 - tail, 1e-6);
+  expected.anomalyProbability(0.9f);
+  for(UInt i = 451u; i < 500u; i++) {
+    const Real score = uniform(rng) * 0.2f + 0.3f;
+    loaded.anomalyProbability(score);
+    expected.anomalyProbability(score);
+  }
+  for(UInt i = 500u; i < 1000u; i++) {
+    const Real score = uniform(rng) * 0.2f + 0.3f;
+    ASSERT_NEAR(loaded.anomalyProbability(score), expected.anomalyProbability(score), 1e-5) << "record " << i;
+  }
+
+  // Saved again, it is in the current format.
+  std::stringstream ss2;
+  loaded.save(ss2);
+  AnomalyLikelihood reloaded;
+  reloaded.load(ss2);
+  EXPECT_EQ(loaded, reloaded);
+
+  // The archive is of a single metric.
+  std::stringstream ss3;
+  {
+    cereal::BinaryOutputArchive ar( ss3 );
+    ar( baseline );
+  }
+  MultiMetricAnomalyLikelihood multi(2u);
+  EXPECT_ANY_THROW(multi.load(ss3));
 }
 
 }
@@ -23,6 +23,8 @@
 
 #include <fstream>
 #include <iostream>
+#include <map>
+#include <sstream>
 
 #include <htm/algorithms/SpatialPooler.hpp>
 #include <htm/algorithms/TemporalMemory.hpp>
@@ -103,6 +105,36 @@ float runTemporalMemoryTest(UInt numColumns, UInt w,   int numSequences, //TODO
 
 
 
+/**
+ * Temporal Memory on random, unrelated inputs, so that almost every active
+ * column bursts and picks its least used cell as the winner.
+ */
+float runBurstingTemporalMemoryTest(UInt numColumns, UInt w, UInt steps, string label) {
+  Timer timer(true);
+  TemporalMemory tm;
+  tm.initialize( {numColumns} );
+  SDR sdr({numColumns});
+  const Real sparsity = w / static_cast<Real>(numColumns);
+
+  // learn
+  for (UInt i = 0; i < steps; i++) {
+    sdr.randomize(sparsity, rng);
+    tm.compute(sdr, true);
+  }
+  cout << (float)timer.getElapsed() << " in " << label << ": learn"  << endl;
+
+  // infer
+  for (UInt i = 0; i < steps; i++) {
+    sdr.randomize(sparsity, rng);
+    tm.compute(sdr, false);
+  }
+  cout << (float)timer.getElapsed() << " in " << label << ": learn + infer"  << endl;
+  timer.stop();
+  return (float)timer.getElapsed();
+}
+
+
+
 float runSpatialPoolerTest(
                   UInt   numInputs,
                   Real   inputSparsity,
@@ -189,6 +221,70 @@ TEST(ConnectionsPerformanceTest, testTMLarge) {
   UNUSED(tim);
 }
 
+/**
+ * Tests Temporal Memory on a high-burst workload.
+ */
+TEST(ConnectionsPerformanceTest, testTMBursting) {
+  auto tim = runBurstingTemporalMemoryTest(COLS, W, EPOCHS * SEQ, "temporal memory (bursting)");
+#ifdef NDEBUG
+  ASSERT_LE(tim, 3.0f*Timer::getSpeed());
+#endif
+  UNUSED(tim);
+}
+
+/**
+ * Compares the quantized permanences of the Connections with the Real32
+ * ones: the anomaly of the Temporal Memory on learned sequences, and the size
+ * of the saved Connections.
+ */
+TEST(ConnectionsPerformanceTest, testTMQuantizedPermanences) {
+  vector<vector<SDR>> sequences;
+  for (UInt i = 0; i < SEQ; i++) {
+    vector<SDR> sequence;
+    for (UInt j = 0; j < 10u; j++) {
+      SDR sdr({COLS});
+      sdr.randomize(W / static_cast<Real>(COLS), rng);
+      sequence.push_back(sdr);
+    }
+    sequences.push_back(sequence);
+  }
+
+  map<UInt, Real>   anomaly;
+  map<UInt, size_t> bytes;
+  for (const UInt bits : {0u, 16u, 8u}) {
+    TemporalMemory tm({COLS}, 32, 13, 0.21f, 0.5f, 10, 20, 0.1f, 0.1f, 0.0f, 42, 255, 255, true, 0u,
+                      TemporalMemory::ANMode::RAW, bits);
+    for (UInt epoch = 0; epoch < EPOCHS; epoch++) {
+      for (const auto &sequence : sequences) {
+        for (const auto &sdr : sequence) tm.compute(sdr, true);
+        tm.reset();
+      }
+    }
+    Real sum = 0.0f;
+    UInt steps = 0u;
+    for (const auto &sequence : sequences) {
+      for (const auto &sdr : sequence) {
+        tm.compute(sdr, false);
+        sum += tm.anomaly;
+        steps++;
+      }
+      tm.reset();
+    }
+    anomaly[bits] = sum / steps;
+    stringstream ss;
+    tm.connections.save(ss);
+    bytes[bits] = ss.str().size();
+    cout << "permanenceBits " << bits << ": mean anomaly " << anomaly[bits]
+         << ", " << tm.connections.numSynapses() << " synapses saved in " << bytes[bits]
+         << " bytes (" << bytes[bits] / static_cast<Real>(tm.connections.numSynapses())
+         << " per synapse)" << endl;
+  }
+  ASSERT_NEAR(anomaly[0u], anomaly[16u], 0.02f);
+  ASSERT_NEAR(anomaly[0u], anomaly[8u], 0.05f);
+  ASSERT_LT(bytes[16u], bytes[0u]);
+  ASSERT_LT(bytes[8u], bytes[0u]);
+}
+
 /**
  * Tests typical usage of Connections with Spatial Pooler.
  */
@@ -23,6 +23,7 @@
 #include <fstream>
 #include <iostream>
 #include <htm/algorithms/Connections.hpp>
+#include <htm/utils/Random.hpp>
 
 using namespace std;
 using namespace htm;
@@ -124,6 +125,13 @@ TEST(ConnectionsTest, testCreateSynapse) {
 }
 
 
+/**
+ * The synapse records are stored without padding or a vtable pointer, as they
+ * make up most of the memory of a large model.
+ */
+static_assert(sizeof(SynapseData) == 5u * sizeof(UInt32), "SynapseData is not packed");
+static_assert(sizeof(CellData) == sizeof(vector<Segment>), "CellData is not packed");
+
 TEST(ConnectionsTest, testCreateSynapseAvoidDuplicitPresynapticConnections) {
   Connections connections(1024);
   UInt32 cell = 10;
@@ -136,6 +144,75 @@ TEST(ConnectionsTest, testCreateSynapseAvoidDuplicitPresynapticConnections) {
   ASSERT_EQ(connections.synapsesForSegment(segment).size(), numSynapses) << "Duplicit synapses should not be created!";
 }
 
+/**
+ * Creates synapses in bulk, and checks that this is the same as calling
+ * createSynapse for each presynaptic cell.
+ */
+TEST(ConnectionsTest, testCreateSynapses) {
+  Connections bulk(1024, 0.5f);
+  Connections single(1024, 0.5f);
+  Random rng(42);
+  for(UInt i = 0; i < 20u; i++) {
+    const CellIdx cell = rng.getUInt32(1024u);
+    const Segment s1 = bulk.createSegment(cell);
+    const Segment s2 = single.createSegment(cell);
+    ASSERT_EQ(s1, s2);
+    for(UInt round = 0; round < 3u; round++) {
+      // Random candidates, with duplicates among themselves and on the segment.
+      vector<CellIdx> candidates;
+      for(UInt c = 0; c < 100u; c++) {
+        candidates.push_back(rng.getUInt32(200u));
+      }
+      const Permanence permanence = static_cast<Permanence>(rng.getReal64());
+      const size_t maxNew = (i % 2u) ? 30u : std::numeric_limits<size_t>::max();
+
+      const size_t numNew = bulk.createSynapses(s1, candidates, permanence, maxNew);
+
+      const size_t before = single.numSynapses(s2);
+      for(const auto presyn : candidates) {
+        if(single.numSynapses(s2) - before == maxNew) break;
+        single.createSynapse(s2, presyn, permanence);
+      }
+      ASSERT_EQ(numNew, single.numSynapses(s2) - before);
+      ASSERT_LE(numNew, maxNew);
+    }
+  }
+  ASSERT_EQ(bulk, single);
+  ASSERT_EQ(bulk.createSynapses(0, {}, 0.5f), 0u);
+}
+
+/**
+ * createSynapses with one permanence per cell is the same as calling
+ * createSynapse for each cell.
+ */
+TEST(ConnectionsTest, testCreateSynapsesPermanences) {
+  Connections bulk(1024, 0.5f);
+  Connections single(1024, 0.5f);
+  Random rng(42);
+  for(UInt i = 0; i < 20u; i++) {
+    const CellIdx cell = rng.getUInt32(1024u);
+    const Segment s1 = bulk.createSegment(cell);
+    const Segment s2 = single.createSegment(cell);
+    for(UInt round = 0; round < 2u; round++) {
+      vector<CellIdx>    candidates;
+      vector<Permanence> permanences;
+      for(UInt c = 0; c < 100u; c++) {
+        candidates.push_back(rng.getUInt32(200u));
+        permanences.push_back(static_cast<Permanence>(rng.getReal64()));
+      }
+      const size_t numNew = bulk.createSynapses(s1, candidates, permanences);
+
+      const size_t before = single.numSynapses(s2);
+      for(size_t c = 0; c < candidates.size(); c++) {
+        single.createSynapse(s2, candidates[c], permanences[c]);
+      }
+      ASSERT_EQ(numNew, single.numSynapses(s2) - before);
+    }
+  }
+  ASSERT_EQ(bulk, single);
+  EXPECT_ANY_THROW(bulk.createSynapses(0, {1u, 2u}, vector<Permanence>{0.5f}));
+}
+
 /**
  * Creates a segment, destroys it, and makes sure it got destroyed along with
  * all of its synapses.
@@ -357,6 +434,397 @@ TEST(ConnectionsTest, testComputeActivity) {
   ASSERT_EQ(3ul, numActivePotentialSynapsesForSegment[segment2_1]);
 }
 
+/**
+ * A frozen (CSR) Connections computes the same activity, and is invalidated
+ * by structural changes.
+ */
+TEST(ConnectionsTest, testFreeze) {
+  Connections connections(1024);
+  setupSampleConnections(connections);
+  const vector<UInt32> input = {50, 52, 53, 80, 81, 82, 150, 151, 1000};
+
+  const auto compute = [&](vector<SynapseIdx> &potential) {
+    potential.assign(connections.segmentFlatListLength(), 0);
+    return connections.computeActivity(potential, input, false);
+  };
+
+  vector<SynapseIdx> potential, frozenPotential;
+  const auto connected = compute(potential);
+
+  ASSERT_FALSE(connections.isFrozen());
+  connections.freeze();
+  ASSERT_TRUE(connections.isFrozen());
+  ASSERT_EQ(connected, compute(frozenPotential));
+  ASSERT_EQ(potential, frozenPotential);
+  ASSERT_EQ(connected, connections.computeActivity(input, false));
+
+  // Permanence changes which do not (dis)connect a synapse keep the snapshot.
+  const Segment segment = connections.segmentsForCell(10)[0];
+  const Synapse synapse = connections.synapsesForSegment(segment)[1];
+  connections.updateSynapsePermanence(synapse, 0.16f);
+  ASSERT_TRUE(connections.isFrozen());
+
+  // Connecting a synapse drops the snapshot, the results follow the change.
+  connections.updateSynapsePermanence(synapse, 0.9f);
+  ASSERT_FALSE(connections.isFrozen());
+  auto changed = compute(potential);
+  ASSERT_EQ(connected[segment] + 1u, changed[segment]);
+  connections.freeze();
+  ASSERT_EQ(changed, compute(frozenPotential));
+  ASSERT_EQ(potential, frozenPotential);
+
+  // So do new & destroyed synapses.
+  connections.createSynapse(segment, 53, 0.9f);
+  ASSERT_FALSE(connections.isFrozen());
+  connections.freeze();
+  connections.destroySynapse(synapse);
+  ASSERT_FALSE(connections.isFrozen());
+  changed = compute(potential);
+  connections.freeze();
+  ASSERT_EQ(changed, compute(frozenPotential));
+  ASSERT_EQ(potential, frozenPotential);
+
+  connections.unfreeze();
+  ASSERT_FALSE(connections.isFrozen());
+}
+
+/**
+ * Copies of a frozen Connections do not refer to the original's snapshot.
+ */
+TEST(ConnectionsTest, testCopyFrozen) {
+  auto original = std::make_unique<Connections>(1024);
+  setupSampleConnections(*original);
+  const vector<UInt32> input = {50, 52, 53, 80, 81, 82, 150, 151, 1000};
+  vector<SynapseIdx> potential(original->segmentFlatListLength(), 0);
+  const auto connected = original->computeActivity(potential, input, false);
+  original->freeze();
+
+  Connections copy(*original);
+  Connections assigned;
+  assigned = *original;
+  original.reset();
+
+  for(auto *connections : {&copy, &assigned}) {
+    ASSERT_TRUE(connections->isFrozen());
+    vector<SynapseIdx> copyPotential(connections->segmentFlatListLength(), 0);
+    ASSERT_EQ(connected, connections->computeActivity(copyPotential, input, false));
+    ASSERT_EQ(potential, copyPotential);
+  }
+
+  // A copy of a mapped snapshot shares the file.
+  const char *filename = "ConnectionsCopyFrozen.tmp";
+  copy.saveFrozen(filename);
+  auto mapped = std::make_unique<Connections>();
+  mapped->loadFrozen(filename);
+  Connections mappedCopy(*mapped);
+  mapped.reset();
+  ASSERT_TRUE(mappedCopy.isMapped());
+  vector<SynapseIdx> mappedPotential(mappedCopy.segmentFlatListLength(), 0);
+  ASSERT_EQ(connected, mappedCopy.computeActivity(mappedPotential, input, false));
+  ASSERT_EQ(potential, mappedPotential);
+  mappedCopy = Connections();
+  ASSERT_EQ(0, ::remove(filename));
+}
+
+TEST(ConnectionsTest, testSaveFrozen) {
+  Connections connections(1024);
+  setupSampleConnections(connections);
+  connections.destroySegment(connections.getSegment(10, 0));
+  const vector<UInt32> input = {50, 52, 53, 80, 81, 82, 150, 151, 1000};
+  const char *filename = "ConnectionsFrozen.tmp";
+  connections.saveFrozen(filename);
+
+  Connections mapped;
+  mapped.loadFrozen(filename);
+  ASSERT_TRUE(mapped.isMapped());
+  ASSERT_TRUE(mapped.isFrozen());
+
+  // The destroyed segment is left out, like compact() does.
+  connections.compact();
+  ASSERT_EQ(connections.numCells(), mapped.numCells());
+  ASSERT_EQ(connections.numSegments(), mapped.numSegments());
+  ASSERT_EQ(0u, mapped.numSynapses());
+  for(CellIdx cell = 0; cell < connections.numCells(); cell++) {
+    ASSERT_EQ(connections.segmentsForCell(cell), mapped.segmentsForCell(cell));
+  }
+
+  vector<SynapseIdx> potential(connections.segmentFlatListLength(), 0);
+  vector<SynapseIdx> mappedPotential(mapped.segmentFlatListLength(), 0);
+  ASSERT_EQ(connections.computeActivity(potential, input, false),
+            mapped.computeActivity(mappedPotential, input, false));
+  ASSERT_EQ(potential, mappedPotential);
+
+  // The mapped Connections are read-only.
+  EXPECT_ANY_THROW(mapped.createSegment(10));
+  EXPECT_ANY_THROW(mapped.destroySegment(0));
+  EXPECT_ANY_THROW(mapped.unfreeze());
+
+  // Freezing again keeps the mapped snapshot.
+  mapped.freeze();
+  ASSERT_TRUE(mapped.isMapped());
+  vector<SynapseIdx> expected(connections.segmentFlatListLength(), 0);
+  vector<SynapseIdx> refrozen(mapped.segmentFlatListLength(), 0);
+  ASSERT_EQ(connections.computeActivity(expected, input, false),
+            mapped.computeActivity(refrozen, input, false));
+  ASSERT_EQ(expected, refrozen);
+  stringstream ss;
+  EXPECT_ANY_THROW(mapped.save(ss));
+
+  // Which does not stick after loading another model.
+  ss.str("");
+  connections.save(ss);
+  mapped.load(ss);
+  ASSERT_FALSE(mapped.isMapped());
+  ASSERT_EQ(connections, mapped);
+
+  ASSERT_EQ(0, ::remove(filename));
+}
+
+TEST(ConnectionsTest, testNumThreads) {
+  Connections connections(1024, 0.5f);
+  Random rng(42);
+  for(UInt i = 0; i < 300u; i++) {
+    const Segment segment = connections.createSegment(rng.getUInt32(1024));
+    for(UInt j = 0; j < 100u; j++) {
+      connections.createSynapse(segment, rng.getUInt32(1024), rng.getReal64() < 0.5 ? 0.6f : 0.3f);
+    }
+  }
+  Connections parallel = connections;
+  parallel.setNumThreads(3u);
+  ASSERT_EQ(3u, parallel.getNumThreads());
+
+  vector<CellIdx> input;
+  for(CellIdx cell = 0; cell < 1024; cell += 3) input.push_back(cell);
+
+  for(const bool frozen : {false, true}) {
+    if(frozen) {
+      connections.freeze();
+      parallel.freeze();
+    }
+    vector<SynapseIdx> potential(connections.segmentFlatListLength(), 0);
+    vector<SynapseIdx> parallelPotential(parallel.segmentFlatListLength(), 0);
+    ASSERT_EQ(connections.computeActivity(potential, input, false),
+              parallel.computeActivity(parallelPotential, input, false));
+    ASSERT_EQ(potential, parallelPotential);
+
+    // The sparse variant, called twice to check that the scratch is cleared.
+    vector<SynapseIdx> connected, parallelConnected;
+    vector<Segment> touched, parallelTouched;
+    potential.clear();
+    parallelPotential.clear();
+    for(UInt i = 0; i < 2u; i++) {
+      input.push_back(1000 + i);
+      connections.computeActivity(input, false, connected, potential, touched);
+      parallel.computeActivity(input, false, parallelConnected, parallelPotential, parallelTouched);
+      ASSERT_EQ(connected, parallelConnected);
+      ASSERT_EQ(potential, parallelPotential);
+      std::sort(touched.begin(), touched.end());
+      std::sort(parallelTouched.begin(), parallelTouched.end());
+      ASSERT_EQ(touched, parallelTouched);
+    }
+  }
+
+  // Copies do not share the threads.
+  Connections copy = parallel;
+  ASSERT_EQ(3u, copy.getNumThreads());
+  ASSERT_EQ(connections.computeActivity(input, false), copy.computeActivity(input, false));
+}
+
+TEST(ConnectionsTest, testSaveDelta) {
+  Connections connections(1024, 0.5f);
+  Random rng(42);
+  for(UInt i = 0; i < 100u; i++) {
+    const Segment segment = connections.createSegment(rng.getUInt32(1024));
+    for(UInt j = 0; j < 20u; j++) {
+      connections.createSynapse(segment, rng.getUInt32(1024), (Permanence)rng.getReal64());
+    }
+  }
+  stringstream base;
+  connections.save(base);
+  Connections replica;
+  replica.load(base);
+  ASSERT_FALSE(connections.isRecordingDeltas());
+  stringstream ss;
+  EXPECT_ANY_THROW(connections.saveDelta(ss));
+  connections.beginDeltas();
+  ASSERT_TRUE(connections.isRecordingDeltas());
+
+  for(UInt step = 0; step < 5u; step++) {
+    vector<CellIdx> active;
+    for(UInt i = 0; i < 50u; i++) active.push_back(rng.getUInt32(1024));
+    std::sort(active.begin(), active.end());
+    active.erase(std::unique(active.begin(), active.end()), active.end());
+    SDR input({1024});
+    input.setSparse(active);
+    connections.computeActivity(active, true);
+    // Learn, prune, grow and destroy.
+    for(Segment segment = 0; segment < 20u; segment++) {
+      connections.adaptSegment(rng.getUInt32(connections.segmentFlatListLength()),
+                               input, 0.1f, 0.1f, true);
+    }
+    const Segment segment = connections.createSegment(rng.getUInt32(1024));
+    connections.createSynapse(segment, rng.getUInt32(1024), 0.6f);
+    connections.destroySegment(rng.getUInt32(connections.segmentFlatListLength() - 1u));
+    if(step == 3u) {
+      // Compaction renumbers everything, so that delta is a full snapshot.
+      connections.compact();
+    }
+
+    ss.str("");
+    connections.saveDelta(ss);
+    const auto deltaSize = ss.str().size();
+    replica.loadDelta(ss);
+    ASSERT_EQ(connections, replica) << "step " << step;
+    stringstream full;
+    connections.save(full);
+    if(step != 3u) {
+      ASSERT_LT(deltaSize, full.str().size() / 2u);
+    }
+    vector<SynapseIdx> potential(connections.segmentFlatListLength(), 0);
+    vector<SynapseIdx> replicaPotential(replica.segmentFlatListLength(), 0);
+    ASSERT_EQ(connections.computeActivity(potential, active, false),
+              replica.computeActivity(replicaPotential, active, false));
+    ASSERT_EQ(potential, replicaPotential);
+  }
+
+  // The deltas must be applied in order.
+  connections.createSegment(0);
+  ss.str("");
+  connections.saveDelta(ss);
+  connections.createSegment(0);
+  stringstream skipped;
+  connections.saveDelta(skipped);
+  EXPECT_ANY_THROW(replica.loadDelta(skipped));
+
+  connections.endDeltas();
+  ASSERT_FALSE(connections.isRecordingDeltas());
+}
+
+TEST(ConnectionsTest, testCompact) {
+  Connections connections(1024);
+  setupSampleConnections(connections);
+  const vector<UInt32> input = {50, 52, 53, 80, 81, 82, 150, 151};
+
+  // Make some garbage: a whole segment, and a single synapse.
+  const Segment segment1_1 = connections.getSegment(10, 0);
+  const Segment segment2_2 = connections.getSegment(20, 1);
+  connections.destroySegment(segment1_1);
+  connections.destroySynapse(connections.synapsesForSegment(segment2_2)[0]);
+  ASSERT_EQ(4ul, connections.segmentFlatListLength());
+
+  // Remember the activity, per (cell, segment idx on cell).
+  const auto activity = [&]() {
+    vector<SynapseIdx> potential(connections.segmentFlatListLength(), 0);
+    const auto connected = connections.computeActivity(potential, input, false);
+    vector<std::pair<SynapseIdx, SynapseIdx>> result;
+    for(const CellIdx cell : {10u, 20u, 30u}) {
+      for(const Segment segment : connections.segmentsForCell(cell)) {
+        result.emplace_back(connected[segment], potential[segment]);
+      }
+    }
+    return result;
+  };
+  const auto before   = activity();
+  const auto synapses = connections.numSynapses();
+  connections.freeze();
+
+  connections.compact();
+  ASSERT_EQ(3ul, connections.numSegments());
+  ASSERT_EQ(3ul, connections.segmentFlatListLength());
+  ASSERT_EQ(synapses, connections.numSynapses());
+  ASSERT_TRUE(connections.isFrozen());
+  ASSERT_EQ(before, activity());
+  connections.unfreeze();
+  ASSERT_EQ(before, activity());
+
+  // The segments are renumbered, but keep their order.
+  ASSERT_EQ(0u, connections.getSegment(20, 0));
+  ASSERT_EQ(1u, connections.getSegment(20, 1));
+  ASSERT_EQ(2u, connections.getSegment(30, 0));
+  for(Segment segment = 0u; segment < connections.segmentFlatListLength(); segment++) {
+    for(const Synapse synapse : connections.synapsesForSegment(segment)) {
+      ASSERT_EQ(segment, connections.segmentForSynapse(synapse));
+    }
+  }
+
+  // The compacted Connections keep working.
+  connections.destroySynapse(connections.synapsesForSegment(1u)[0]);
+  connections.createSynapse(connections.getSegment(30, 0), 80, 0.9f);
+  connections.compact();
+  connections.compact(); // no-op
+  ASSERT_EQ(synapses, connections.numSynapses());
+}
+
+TEST(ConnectionsTest, testCompactionThreshold) {
+  for (const UInt permanenceBits : {0u, 8u}) {
+    Connections connections(1024, 0.5f, false, permanenceBits);
+    setupSampleConnections(connections);
+    const vector<UInt32> input = {50, 52, 53, 80, 81, 82, 150, 151};
+    ASSERT_EQ(0.0f, connections.getCompactionThreshold());
+    EXPECT_ANY_THROW(connections.setCompactionThreshold(1.0f));
+    EXPECT_ANY_THROW(connections.setCompactionThreshold(-0.1f));
+
+    connections.destroySegment(connections.getSegment(10, 0));
+    connections.computeActivity(input, false);
+    ASSERT_EQ(4ul, connections.segmentFlatListLength()); // disabled
+
+    connections.setCompactionThreshold(0.5f);
+    connections.computeActivity(input, false);
+    ASSERT_EQ(4ul, connections.segmentFlatListLength()); // 1 of 4 destroyed
+
+    connections.destroySegment(connections.getSegment(30, 0));
+    connections.destroySegment(connections.getSegment(20, 0));
+    vector<SynapseIdx> potential(connections.segmentFlatListLength(), 0);
+    const auto connected = connections.computeActivity(potential, input, false);
+    ASSERT_EQ(1ul, connections.segmentFlatListLength());
+    ASSERT_EQ(1ul, connected.size());
+    ASSERT_EQ(1ul, potential.size());
+    ASSERT_EQ(1u, connected[0]);
+    ASSERT_EQ(3u, potential[0]);
+  }
+}
+
+TEST(ConnectionsTest, testComputeActivitySparse) {
+  Connections connections(1024);
+  setupSampleConnections(connections);
+  connections.setCompactionThreshold(0.3f);
+
+  vector<SynapseIdx> connected, potential;
+  vector<Segment> touched;
+  const auto check = [&](const vector<UInt32> &input) {
+    // Note: the sparse call goes first, because it may compact the Connections.
+    connections.computeActivity(input, false, connected, potential, touched);
+    vector<SynapseIdx> densePotential(connections.segmentFlatListLength(), 0);
+    const auto denseConnected = connections.computeActivity(densePotential, input, false);
+    ASSERT_EQ(denseConnected, connected);
+    ASSERT_EQ(densePotential, potential);
+
+    vector<Segment> expected;
+    for(Segment segment = 0u; segment < densePotential.size(); segment++) {
+      if(densePotential[segment] > 0u) expected.push_back(segment);
+    }
+    std::sort(touched.begin(), touched.end());
+    ASSERT_EQ(expected, touched);
+  };
+
+  check({50, 52, 53, 80, 81, 82, 150, 151});
+  check({150});
+  check({});
+  connections.freeze();
+  check({50, 51, 53});
+  connections.unfreeze();
+
+  // Grow, and then compact automatically.
+  const Segment segment = connections.createSegment(40);
+  connections.createSynapse(segment, 81, 0.9f);
+  check({80, 81});
+  connections.destroySegment(connections.getSegment(10, 0));
+  connections.destroySegment(connections.getSegment(30, 0));
+  check({50, 81, 150});
+  ASSERT_EQ(3ul, connections.segmentFlatListLength());
+  check({50, 53, 80});
+}
+
 TEST(ConnectionsTest, testAdaptSynapses) {
   UInt numCells = 4;
   // NOTE: One segment per cell.
@@ -412,6 +880,42 @@ TEST(ConnectionsTest, testAdaptSynapses) {
   }
 }
 
+TEST(ConnectionsTest, testAdaptSynapsesTransitions) {
+  // Many synapses cross the connected threshold, check that the connected
+  // counts and the presynaptic maps follow the permanences.
+  const UInt numCells = 20u, numInputs = 100u;
+  Connections con(numCells, 0.5f);
+  Random rng(42);
+  for (UInt cell = 0; cell < numCells; cell++) {
+    const Segment seg = con.createSegment(cell);
+    for (UInt inp = cell % 2u; inp < numInputs; inp += 2u) {
+      con.createSynapse(seg, inp, 0.45f + 0.1f * (Real)rng.getReal64());
+    }
+  }
+
+  SDR input({numInputs});
+  for (UInt iteration = 0; iteration < 20u; iteration++) {
+    input.randomize(0.5f, rng);
+    for (UInt cell = iteration % 3u; cell < numCells; cell += 3u) {
+      con.adaptSegment(cell, input, 0.03f, 0.02f);
+    }
+
+    vector<SynapseIdx> expected(numCells, 0);
+    for (Segment seg = 0; seg < numCells; seg++) {
+      SynapseIdx numConnected = 0;
+      for (const auto syn : con.synapsesForSegment(seg)) {
+        const auto &synData = con.dataForSynapse(syn);
+        if (synData.permanence >= con.getConnectedThreshold()) {
+          numConnected++;
+          if (input.getDense()[synData.presynapticCell]) expected[seg]++;
+        }
+      }
+      ASSERT_EQ(numConnected, con.dataForSegment(seg).numConnected);
+    }
+    ASSERT_EQ(expected, con.computeActivity(input.getSparse(), false));
+  }
+}
+
 TEST(ConnectionsTest, testRaisePermanencesToThreshold) {
   UInt stimulusThreshold = 3;
   Real synPermConnected = 0.1f;
@@ -684,7 +1188,7 @@ public:
   TestConnectionsEventHandler()
       : didCreateSegment(false), didDestroySegment(false),
         didCreateSynapse(false), didDestroySynapse(false),
-        didUpdateSynapsePermanence(false) {}
+        didUpdateSynapsePermanence(false), didCompact(false) {}
 
   virtual ~TestConnectionsEventHandler() {
     TEST_EVENT_HANDLER_DESTRUCTED = true;
@@ -703,11 +1207,17 @@ public:
     didUpdateSynapsePermanence = true;
   }
 
+  virtual void onCompact(const vector<Segment> &segmentMap,
+                         const vector<Synapse> &synapseMap) {
+    didCompact = true;
+  }
+
   bool didCreateSegment;
   bool didDestroySegment;
   bool didCreateSynapse;
   bool didDestroySynapse;
   bool didUpdateSynapsePermanence;
+  bool didCompact;
 };
 
 /**
@@ -739,6 +1249,10 @@ TEST(ConnectionsTest, subscribe) {
   connections.destroySegment(segment);
   EXPECT_TRUE(handler->didDestroySegment);
 
+  ASSERT_FALSE(handler->didCompact);
+  connections.compact();
+  EXPECT_TRUE(handler->didCompact);
+
   connections.unsubscribe(token);
 }
 
@@ -802,6 +1316,108 @@ TEST(ConnectionsTest, testSaveLoad) {
   ASSERT_EQ(c1, c2);
 }
 
+TEST(ConnectionsTest, testQuantizedPermanences) {
+  EXPECT_ANY_THROW(Connections(1024, 0.5f, false, 12u));
+  EXPECT_ANY_THROW(Connections(1024, 0.0f, false, 8u));
+  ASSERT_EQ(0u, Connections(1024).getPermanenceBits());
+  const vector<UInt32> input = {50, 52, 53, 80, 81, 82, 150, 151};
+
+  for(const UInt bits : {8u, 16u}) {
+    Connections connections(1024, 0.5f, false, bits), reference(1024, 0.5f);
+    ASSERT_EQ(bits, connections.getPermanenceBits());
+    const Permanence step = 1.0f / static_cast<Permanence>((1u << bits) - 1u);
+    setupSampleConnections(connections);
+    setupSampleConnections(reference);
+
+    // The quantized permanences are the nearest multiples of the step, so
+    // the synapses connect as in the Real32 storage.
+    const auto check = [&]() {
+      ASSERT_EQ(reference.numSynapses(), connections.numSynapses());
+      for(Segment segment = 0u; segment < connections.segmentFlatListLength(); segment++) {
+        const auto &synapses = connections.synapsesForSegment(segment);
+        ASSERT_EQ(reference.synapsesForSegment(segment).size(), synapses.size());
+        for(size_t i = 0u; i < synapses.size(); i++) {
+          const auto synData = connections.dataForSynapse(synapses[i]);
+          const auto refData = reference.dataForSynapse(reference.synapsesForSegment(segment)[i]);
+          ASSERT_EQ(refData.presynapticCell, synData.presynapticCell);
+          ASSERT_EQ(segment, synData.segment);
+          ASSERT_NEAR(refData.permanence, synData.permanence, step / 2.0f + 1e-6f);
+          ASSERT_FLOAT_EQ(std::round(synData.permanence / step) * step, synData.permanence);
+        }
+      }
+      vector<SynapseIdx> potential(connections.segmentFlatListLength(), 0);
+      vector<SynapseIdx> refPotential(reference.segmentFlatListLength(), 0);
+      ASSERT_EQ(reference.computeActivity(refPotential, input, false),
+                connections.computeActivity(potential, input, false));
+      ASSERT_EQ(refPotential, potential);
+    };
+    check();
+
+    // Updates smaller than half of a step are lost.
+    const Synapse synapse = connections.synapsesForSegment(connections.getSegment(10, 0))[1];
+    const Permanence before = connections.dataForSynapse(synapse).permanence;
+    connections.updateSynapsePermanence(synapse, before + step / 4.0f);
+    ASSERT_EQ(before, connections.dataForSynapse(synapse).permanence);
+
+    // Learning, across the connected threshold.  The increments are whole
+    // steps, so the rounding errors do not add up.
+    const Permanence increment = std::round(0.1f / step) * step;
+    SDR inputSDR({1024});
+    inputSDR.setSparse(SDR_sparse_t(input));
+    for(UInt i = 0; i < 5u; i++) {
+      for(auto *c : {&connections, &reference}) {
+        c->adaptSegment(c->getSegment(20, 1), inputSDR, increment, increment);
+        c->adaptSegment(c->getSegment(30, 0), inputSDR, increment, increment);
+      }
+      check();
+    }
+
+    // Deltas, destroying and compacting.
+    Connections replica;
+    {
+      stringstream ss;
+      connections.save(ss);
+      replica.load(ss);
+    }
+    ASSERT_EQ(connections, replica);
+    connections.beginDeltas();
+    for(auto *c : {&connections, &reference}) {
+      c->destroySegment(c->getSegment(10, 0));
+      c->destroySynapse(c->synapsesForSegment(c->getSegment(20, 1))[0]);
+      c->createSynapse(c->getSegment(30, 0), 82, 0.7f);
+    }
+    check();
+    {
+      stringstream delta;
+      connections.saveDelta(delta);
+      replica.loadDelta(delta);
+    }
+    ASSERT_EQ(connections, replica);
+    connections.endDeltas();
+    connections.compact();
+    reference.compact();
+    check();
+
+    // The archive keeps the storage, and is smaller than the Real32 one.
+    stringstream ss, refSS;
+    connections.save(ss);
+    reference.save(refSS);
+    ASSERT_LT(ss.str().size(), refSS.str().size());
+    Connections loaded;
+    loaded.load(ss);
+    ASSERT_EQ(bits, loaded.getPermanenceBits());
+    ASSERT_EQ(connections, loaded);
+  }
+
+  // The presynapticMapIndex_ shares the 32 bits with the permanence.
+  Connections connections(1024, 0.5f, false, 16u);
+  for(UInt i = 0; i < 65535u; i++) {
+    connections.createSynapse(connections.createSegment(i % 1024u), 0u, 0.1f);
+  }
+  EXPECT_ANY_THROW(connections.createSynapse(connections.createSegment(0u), 0u, 0.1f));
+  ASSERT_EQ(65535u, connections.numSynapses());
+}
+
 TEST(ConnectionsTest, testCreateSegmentOverflow) {
     const auto LIMIT = std::numeric_limits<Segment>::max();
     if(LIMIT <= 256) { //connections::Segment is too large (likely uint32), so this test would run, but memory 
@@ -0,0 +1,202 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+/** @file
+ * Implementation of unit tests for ModelPool
+ */
+
+#include <vector>
+
+#include <gtest/gtest.h>
+
+#include <htm/algorithms/ModelPool.hpp>
+#include <htm/utils/Random.hpp>
+
+namespace testing {
+
+using namespace std;
+using namespace htm;
+
+static const UInt INPUT_SIZE = 200u;
+static const UInt COLUMNS    = 256u;
+
+static SpatialPooler makeSP() {
+  return SpatialPooler({INPUT_SIZE}, {COLUMNS},
+                       /*potentialRadius*/ INPUT_SIZE, /*potentialPct*/ 0.8f,
+                       /*globalInhibition*/ true, /*localAreaDensity*/ 0.05f);
+}
+
+static TemporalMemory makeTM() {
+  return TemporalMemory({COLUMNS}, /*cellsPerColumn*/ 4, /*activationThreshold*/ 6,
+                        /*initialPermanence*/ 0.21f, /*connectedPermanence*/ 0.5f,
+                        /*minThreshold*/ 4, /*maxNewSynapseCount*/ 10);
+}
+
+// Each model gets its own sequence of random inputs.
+static vector<Byte> makeInputs(UInt numModels, UInt step) {
+  vector<Byte> inputs(numModels * INPUT_SIZE);
+  for(UInt m = 0u; m < numModels; m++) {
+    SDR sdr({INPUT_SIZE});
+    Random rng(m * 1000u + step % 5u); // sequences repeat every 5 steps
+    sdr.randomize(0.1f, rng);
+    copy(sdr.getDense().begin(), sdr.getDense().end(), inputs.begin() + m * INPUT_SIZE);
+  }
+  return inputs;
+}
+
+
+TEST(ModelPoolTest, MatchesStandaloneModel) {
+  const UInt numModels = 5u;
+  SpatialPooler  sp = makeSP();
+  TemporalMemory tm = makeTM();
+  ModelPool pool(numModels, sp, tm, {}, 0.001f, 2u);
+  ASSERT_EQ(pool.size(), numModels);
+  ASSERT_EQ(pool.getInputSize(), INPUT_SIZE);
+  ASSERT_EQ(pool.getNumThreads(), 2u);
+
+  // Model 3 is computed by hand for comparison.
+  SDR input({INPUT_SIZE});
+  SDR columns({COLUMNS});
+  AnomalyLikelihood likelihood;
+
+  vector<Real> anomaly(numModels), anomalyLikelihood(numModels);
+  for(UInt step = 0u; step < 20u; step++) {
+    const auto inputs = makeInputs(numModels, step);
+    pool.compute(inputs.data(), nullptr, true, anomaly.data(), anomalyLikelihood.data(), nullptr);
+
+    input.setDense(inputs.data() + 3u * INPUT_SIZE);
+    sp.compute(input, true, columns);
+    tm.compute(columns, true);
+    ASSERT_EQ(anomaly[3], tm.anomaly) << "step " << step;
+    ASSERT_EQ(anomalyLikelihood[3], likelihood.anomalyProbability(tm.anomaly));
+  }
+  ASSERT_EQ(pool.getSpatialPooler(3u), sp);
+  ASSERT_EQ(pool.getTemporalMemory(3u), tm);
+  ASSERT_NE(pool.getTemporalMemory(2u), tm);
+}
+
+
+TEST(ModelPoolTest, ResetRestartsLikelihood) {
+  ModelPool pool(2u, makeSP(), makeTM(), {}, 0.001f, 1u);
+  vector<Real> anomaly(2u), likelihood(2u);
+  const AnomalyLikelihood fresh;
+  for(UInt step = 0u; step <= fresh.getProbationaryPeriod(); step++) {
+    const auto inputs = makeInputs(2u, step);
+    pool.compute(inputs.data(), nullptr, true, anomaly.data(), likelihood.data(), nullptr);
+  }
+  ASSERT_NE(likelihood[0], fresh.DEFAULT_ANOMALY);
+
+  // The likelihood starts over with its probationary period.
+  pool.reset();
+  const auto inputs = makeInputs(2u, 0u);
+  pool.compute(inputs.data(), nullptr, true, anomaly.data(), likelihood.data(), nullptr);
+  ASSERT_EQ(likelihood[0], fresh.DEFAULT_ANOMALY);
+  ASSERT_EQ(likelihood[1], fresh.DEFAULT_ANOMALY);
+}
+
+
+TEST(ModelPoolTest, ThreadCountDoesNotChangeResults) {
+  const UInt numModels = 8u;
+  ModelPool serial(  numModels, makeSP(), makeTM(), {1u}, 0.001f, 1u);
+  ModelPool parallel(numModels, makeSP(), makeTM(), {1u}, 0.001f, 4u);
+
+  vector<UInt> buckets(numModels);
+  vector<Real> a1(numModels), l1(numModels), a2(numModels), l2(numModels);
+  vector<Int>  p1(numModels), p2(numModels);
+  for(UInt step = 0u; step < 20u; step++) {
+    const auto inputs = makeInputs(numModels, step);
+    for(UInt m = 0u; m < numModels; m++) buckets[m] = (step + m) % 5u;
+    serial.compute(  inputs.data(), buckets.data(), true, a1.data(), l1.data(), p1.data());
+    parallel.compute(inputs.data(), buckets.data(), true, a2.data(), l2.data(), p2.data());
+    ASSERT_EQ(a1, a2);
+    ASSERT_EQ(l1, l2);
+    ASSERT_EQ(p1, p2);
+  }
+}
+
+
+TEST(ModelPoolTest, Predictions) {
+  const UInt numModels = 3u;
+  ModelPool pool(numModels, makeSP(), makeTM(), {1u, 2u});
+  ASSERT_EQ(pool.getSteps(), vector<UInt>({1u, 2u}));
+
+  vector<UInt> buckets(numModels);
+  vector<Real> anomaly(numModels), likelihood(numModels);
+  vector<Int>  predictions(numModels * 2u);
+
+  // Not trained yet.
+  auto inputs = makeInputs(numModels, 0u);
+  pool.compute(inputs.data(), buckets.data(), true, anomaly.data(), likelihood.data(), predictions.data());
+  ASSERT_EQ(predictions, vector<Int>(numModels * 2u, -1));
+
+  // The bucket follows the (repeating) input sequence, offset per model.
+  const auto bucketOf = [](UInt m, UInt step) { return (step % 5u) + 10u * m; };
+  for(UInt step = 1u; step < 100u; step++) {
+    inputs = makeInputs(numModels, step);
+    for(UInt m = 0u; m < numModels; m++) buckets[m] = bucketOf(m, step);
+    pool.compute(inputs.data(), buckets.data(), true, anomaly.data(), likelihood.data(), predictions.data());
+  }
+  const UInt last = 99u;
+  for(UInt m = 0u; m < numModels; m++) {
+    EXPECT_EQ(predictions[m * 2u + 0u], (Int) bucketOf(m, last + 1u)) << "model " << m;
+    EXPECT_EQ(predictions[m * 2u + 1u], (Int) bucketOf(m, last + 2u)) << "model " << m;
+    EXPECT_LT(anomaly[m], 0.5f);
+  }
+}
+
+
+TEST(ModelPoolTest, PredictionsWaitForEachStep) {
+  const UInt numModels = 2u;
+  ModelPool pool(numModels, makeSP(), makeTM(), {1u, 2u});
+  vector<UInt> buckets(numModels, 3u);
+  vector<Real> anomaly(numModels), likelihood(numModels);
+  vector<Int>  predictions(numModels * 2u);
+
+  // Learning every other record only trains the 2 step Classifiers.
+  for(UInt step = 0u; step < 20u; step++) {
+    const auto inputs = makeInputs(numModels, step);
+    pool.compute(inputs.data(), buckets.data(), step % 2u == 0u,
+                 anomaly.data(), likelihood.data(), predictions.data());
+  }
+  for(UInt m = 0u; m < numModels; m++) {
+    ASSERT_FALSE(pool.getPredictor(m).hasLearned(1u));
+    ASSERT_TRUE( pool.getPredictor(m).hasLearned(2u));
+    EXPECT_EQ(predictions[m * 2u + 0u], -1) << "model " << m;
+    EXPECT_EQ(predictions[m * 2u + 1u],  3) << "model " << m;
+  }
+
+  // The Classifiers keep what they learned across a reset.
+  pool.reset();
+  const auto inputs = makeInputs(numModels, 0u);
+  pool.compute(inputs.data(), nullptr, false, anomaly.data(), likelihood.data(), predictions.data());
+  EXPECT_EQ(predictions[1], 3);
+}
+
+
+TEST(ModelPoolTest, Errors) {
+  EXPECT_ANY_THROW( ModelPool(0u, makeSP(), makeTM()) );
+
+  TemporalMemory wrongTM({COLUMNS + 1u});
+  EXPECT_ANY_THROW( ModelPool(1u, makeSP(), wrongTM) );
+
+  ModelPool pool(1u, makeSP(), makeTM(), {1u});
+  vector<Byte> inputs(INPUT_SIZE);
+  Real anomaly, likelihood;
+  EXPECT_ANY_THROW( pool.compute(inputs.data(), nullptr, false, &anomaly, &likelihood, nullptr) );
+}
+
+} // namespace testing
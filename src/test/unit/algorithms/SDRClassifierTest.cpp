@@ -20,6 +20,8 @@
  */
 
 #include <cmath> // isnan
+#include <deque>
+#include <map>
 #include <iostream>
 #include <limits> // numeric_limits
 #include <sstream>
@@ -91,6 +93,31 @@ TEST(SDRClassifierTest, ExampleUsagePredictor)
 }
 
 
+TEST(SDRClassifierTest, PredictorHasLearned)
+{
+  vector<SDR> sequence( 3u, vector<UInt>{ 1000u } );
+  for( SDR & inputData : sequence ) {
+      inputData.randomize( 0.02f );
+  }
+  Predictor pred( vector<UInt>{ 1, 2 } );
+  ASSERT_FALSE( pred.hasLearned( 1 ) );
+  ASSERT_FALSE( pred.hasLearned( 2 ) );
+  EXPECT_ANY_THROW( pred.hasLearned( 3 ) );
+
+  pred.learn( 0, sequence[0], { 4 } );
+  ASSERT_FALSE( pred.hasLearned( 1 ) );
+  pred.learn( 1, sequence[1], { 5 } );
+  ASSERT_TRUE(  pred.hasLearned( 1 ) );
+  ASSERT_FALSE( pred.hasLearned( 2 ) );
+  pred.learn( 2, sequence[2], { 6 } );
+  ASSERT_TRUE(  pred.hasLearned( 2 ) );
+
+  ASSERT_EQ( pred.infer( sequence[0], 1 ), pred.infer( sequence[0] )[1] );
+  ASSERT_EQ( argmax( pred.infer( sequence[0], 2 ) ), 6u );
+  EXPECT_ANY_THROW( pred.infer( sequence[0], 3 ) );
+}
+
+
 TEST(SDRClassifierTest, SingleValue) {
   // Feed the same input 10 times, the corresponding probability should be
   // very high
@@ -225,6 +252,137 @@ TEST(SDRClassifierTest, SaveLoad) {
 }
 
 
+TEST(SDRClassifierTest, Batch) {
+  vector<SDR> inputs( 20u, vector<UInt>{ 100u } );
+  vector<SDR_sparse_t> patterns;
+  vector<vector<UInt>> categories;
+  for(UInt i = 0; i < inputs.size(); i++) {
+    inputs[i].randomize( 0.1f );
+    patterns.push_back( inputs[i].getSparse() );
+    categories.push_back({ i % 7u, i });
+  }
+
+  Classifier sequential( 0.1f );
+  Classifier batch( 0.1f );
+  ASSERT_EQ( batch.inferBatch( patterns ).size(), inputs.size() );
+  for(UInt i = 0; i < inputs.size(); i++) {
+    sequential.learn( inputs[i], categories[i] );
+  }
+  batch.learnBatch( 100u, patterns, categories );
+  ASSERT_EQ( sequential, batch );
+
+  const auto pdfs = batch.inferBatch( patterns );
+  ASSERT_EQ( pdfs.size(), inputs.size() );
+  for(UInt i = 0; i < inputs.size(); i++) {
+    ASSERT_EQ( pdfs[i], sequential.infer( inputs[i] ));
+  }
+
+  EXPECT_ANY_THROW( batch.inferBatch({ { 100u } }) );
+  EXPECT_ANY_THROW( batch.learnBatch( 100u, { { 100u } }, { { 1u } }) );
+  EXPECT_ANY_THROW( batch.learnBatch( 100u, patterns, { { 1u } }) );
+}
+
+
+TEST(SDRClassifierTest, Float32) {
+  Classifier c64( 0.1f );
+  Classifier c32( 0.1f, true );
+  ASSERT_FALSE( c64.isFloat32() );
+  ASSERT_TRUE(  c32.isFloat32() );
+
+  // The categories are added one at a time, which grows the weight matrix.
+  vector<SDR> inputs( 50u, vector<UInt>{ 200u } );
+  for(UInt i = 0; i < inputs.size(); i++) {
+    inputs[i].randomize( 0.05f );
+    for(UInt repeat = 0; repeat < 5u; repeat++) {
+      c64.learn( inputs[i], { i } );
+      c32.learn( inputs[i], { i } );
+    }
+  }
+  for(UInt i = 0; i < inputs.size(); i++) {
+    const auto pdf64 = c64.infer( inputs[i] );
+    const auto pdf32 = c32.infer( inputs[i] );
+    ASSERT_EQ( argmax( pdf64 ), argmax( pdf32 ));
+    for(UInt j = 0; j < pdf64.size(); j++) {
+      ASSERT_NEAR( pdf64[j], pdf32[j], 1e-5 );
+    }
+  }
+
+  // Save and load.
+  stringstream ss;
+  c32.save( ss );
+  Classifier loaded;
+  loaded.load( ss );
+  ASSERT_TRUE( loaded.isFloat32() );
+  ASSERT_EQ( c32, loaded );
+  ASSERT_NE( c64, loaded );
+  loaded.learn( inputs[0], { 60u } );
+  c32.learn( inputs[0], { 60u } );
+  ASSERT_EQ( c32, loaded );
+}
+
+
+// The Classifier archive as it was written before the float32 option existed.
+struct BaselineClassifier {
+  Real alpha;
+  UInt dimensions;
+  UInt numCategories;
+  vector<vector<Real64>> weights;
+
+  template<class Archive>
+  void save_ar(Archive & ar) const {
+    ar(cereal::make_nvp("alpha",         alpha),
+       cereal::make_nvp("dimensions",    dimensions),
+       cereal::make_nvp("numCategories", numCategories),
+       cereal::make_nvp("weights",       weights));
+  }
+};
+
+TEST(SDRClassifierTest, LoadBaselineFormat) {
+  const BaselineClassifier step1{ 0.1f, 4u, 2u, {{1.0, 0.0}, {0.0, 1.0}, {0.0, 0.0}, {2.0, 0.0}} };
+  const BaselineClassifier step2{ 0.2f, 4u, 3u, {{0.0, 0.0, 1.0}, {0.0, 0.0, 0.0}, {0.0, 0.0, 0.0}, {0.0, 0.0, 2.0}} };
+  SDR pattern({ 4u });
+  pattern.setSparse(SDR_sparse_t{ 0u, 3u });
+  const Real64 e3 = std::exp(3.0);
+
+  stringstream ss;
+  {
+    cereal::BinaryOutputArchive ar( ss );
+    ar( step1 );
+  }
+  Classifier c;
+  c.load( ss );
+  ASSERT_FALSE( c.isFloat32() );
+  auto pdf = c.infer( pattern );
+  ASSERT_EQ( pdf.size(), 2u );
+  EXPECT_NEAR( pdf[0], e3 / (e3 + 1.0), 1e-6 );
+
+  // Classifiers inside a Predictor are followed by more data.
+  stringstream ss2;
+  {
+    cereal::BinaryOutputArchive ar( ss2 );
+    const vector<UInt> steps{ 1u, 2u };
+    const deque<SDR>  patternHistory;
+    const deque<UInt> recordNumHistory;
+    const map<UInt, BaselineClassifier> classifiers{ {1u, step1}, {2u, step2} };
+    ar( steps, patternHistory, recordNumHistory, classifiers );
+  }
+  Predictor p;
+  p.load( ss2 );
+  auto predictions = p.infer( pattern );
+  ASSERT_EQ( predictions.size(), 2u );
+  EXPECT_NEAR( predictions[1u][0], e3 / (e3 + 1.0), 1e-6 );
+  ASSERT_EQ( predictions[2u].size(), 3u );
+  EXPECT_NEAR( predictions[2u][2], e3 / (e3 + 2.0), 1e-6 );
+
+  // Saved again, they are in the current format.
+  stringstream ss3;
+  c.save( ss3 );
+  Classifier c2;
+  c2.load( ss3 );
+  ASSERT_EQ( c, c2 );
+}
+
+
 TEST(SDRClassifierTest, testSoftmaxOverflow) {
   PDF values({ numeric_limits<Real>::max() });
   softmax(values.begin(), values.end());
@@ -538,6 +538,41 @@ TEST(SpatialPoolerTest, testUpdateDutyCycles) {
 }
 
 
+TEST(SpatialPoolerTest, testUpdateDutyCyclesLazy) {
+  // The lazily decayed duty cycles follow the eager moving average.
+  const UInt numColumns = 50;
+  SpatialPooler sp({numColumns}, {numColumns});
+  sp.setDutyCyclePeriod(20);
+  vector<Real> overlapDutyCycles(numColumns, 0.0f);
+  vector<Real> activeDutyCycles(numColumns, 0.0f);
+  Random rng(7);
+  SDR active({numColumns});
+  SDR overlapping({numColumns});
+  for (UInt iteration = 1; iteration <= 500; iteration++) {
+    sp.setIterationNum(iteration);
+    active.randomize(0.05f, rng);
+    overlapping.randomize(0.1f, rng);
+    vector<SynapseIdx> overlaps(numColumns, 0);
+    for (const auto column : overlapping.getSparse()) {
+      overlaps[column] = 1 + rng.getUInt32(5);
+    }
+    sp.updateDutyCycles_(overlaps, active);
+
+    const UInt period = std::min(20u, iteration);
+    SpatialPooler::updateDutyCyclesHelper_(overlapDutyCycles, overlapping, period);
+    SpatialPooler::updateDutyCyclesHelper_(activeDutyCycles, active, period);
+
+    vector<Real> overlapResult(numColumns), activeResult(numColumns);
+    sp.getOverlapDutyCycles(overlapResult.data());
+    sp.getActiveDutyCycles(activeResult.data());
+    for (UInt i = 0; i < numColumns; i++) {
+      ASSERT_NEAR(overlapResult[i], overlapDutyCycles[i], 1e-6f);
+      ASSERT_NEAR(activeResult[i], activeDutyCycles[i], 1e-6f);
+    }
+  }
+}
+
+
 TEST(SpatialPoolerTest, testAvgColumnsPerInput) {
   SpatialPooler sp;
   vector<UInt> inputDim, colDim;
@@ -1352,6 +1387,33 @@ TEST(SpatialPoolerTest, testInhibitColumnsLocal) {
   }
 }
 
+TEST(SpatialPoolerTest, testInhibitColumnsLocalCached) {
+  // The cached neighborhoods give the same results as the Neighborhood iterators.
+  Random rng(42);
+  for (const bool wrapAround : {false, true}) {
+    SpatialPooler sp({12, 20}, {12, 20});
+    sp.setGlobalInhibition(false);
+    sp.setWrapAround(wrapAround);
+    sp.setStimulusThreshold(1);
+    for (const UInt radius : {1u, 3u, 8u, 20u}) {
+      sp.setInhibitionRadius(radius);
+      for (const Real density : {0.02f, 0.1f, 0.5f}) {
+        // Few distinct values, to exercise the tie breaking.
+        vector<Real> overlaps(sp.getNumColumns());
+        for (auto &overlap : overlaps) {
+          overlap = static_cast<Real>(rng.getUInt32(6));
+        }
+        vector<UInt> expected, actual;
+        sp.clearNeighborhoods_();
+        sp.inhibitColumnsLocal_(overlaps, density, expected);
+        sp.updateNeighborhoods_();
+        sp.inhibitColumnsLocal_(overlaps, density, actual);
+        ASSERT_EQ(expected, actual) << "radius " << radius << " density " << density;
+      }
+    }
+  }
+}
+
 TEST(SpatialPoolerTest, testIsUpdateRound) {
   SpatialPooler sp;
   sp.setUpdatePeriod(50);
@@ -1479,6 +1541,26 @@ TEST(SpatialPoolerTest, testInitPermanence) {
 }
 
 
+TEST(SpatialPoolerTest, testInitParallel) {
+  // The parallel initialization does not depend on the number of threads.
+  const auto make = [](UInt initThreads) {
+    return SpatialPooler({20, 30}, {10, 15}, 4u, 0.5f, true, 0.1f, 0u, 0u, 0.01f, 0.1f, 0.1f,
+                         0.001f, 1000u, 0.0f, 42, 0u, true, initThreads);
+  };
+  const auto sp2 = make(2u);
+  ASSERT_EQ(sp2, make(0u));
+  ASSERT_EQ(sp2, make(7u));
+  ASSERT_NE(sp2, make(1u));
+
+  const auto numPotential = (UInt)round(9u * 9u * 0.5f);
+  vector<UInt> potential(sp2.getNumInputs());
+  for (UInt column = 0; column < sp2.getNumColumns(); column++) {
+    sp2.getPotential(column, potential.data());
+    ASSERT_EQ(numPotential, std::accumulate(potential.begin(), potential.end(), 0u));
+  }
+}
+
+
 TEST(SpatialPoolerTest, testInitPermConnected) {
   Real synPermConnected = 0.2f;
   Real synPermMax       = 1.0f;
@@ -2052,6 +2134,197 @@ TEST(SpatialPoolerTest, testConstructorVsInitialize) {
 }
 
 
+TEST(SpatialPoolerTest, ComputeBatch) {
+  const UInt numInputs = 50u;
+  for(const bool global : {true, false}) {
+    SpatialPooler sp({10u, 10u}, {20u, 20u},
+                     /*potentialRadius*/ 5u, /*potentialPct*/ 0.5f, global,
+                     /*localAreaDensity*/ 0.1f, /*numActiveColumnsPerInhArea*/ 0u,
+                     /*stimulusThreshold*/ 1u, /*synPermInactiveDec*/ 0.01f,
+                     /*synPermActiveInc*/ 0.1f, /*synPermConnected*/ 0.1f,
+                     /*minPctOverlapDutyCycles*/ 0.001f, /*dutyCyclePeriod*/ 10u,
+                     /*boostStrength*/ 2.0f);
+
+    vector<Byte> inputs(numInputs * sp.getNumInputs());
+    SDR input(sp.getInputDimensions());
+    Random rng(42);
+    for(UInt i = 0; i < numInputs; i++) {
+      input.randomize(0.2f, rng);
+      copy(input.getDense().begin(), input.getDense().end(), inputs.begin() + i * sp.getNumInputs());
+    }
+
+    // Learn, so that the boost factors & permanences are not trivial.
+    SpatialPooler sequential = sp;
+    SDR active(sp.getColumnDimensions());
+    vector<SDR_sparse_t> expected;
+    for(UInt i = 0; i < numInputs; i++) {
+      input.setDense(inputs.data() + i * sp.getNumInputs());
+      sequential.compute(input, true, active);
+      expected.push_back(active.getSparse());
+    }
+    ASSERT_EQ(expected, sp.computeBatch(inputs.data(), numInputs, true));
+    ASSERT_EQ(sequential, sp);
+
+    // Inference, in parallel.
+    expected.clear();
+    for(UInt i = 0; i < numInputs; i++) {
+      input.setDense(inputs.data() + i * sp.getNumInputs());
+      sequential.compute(input, false, active);
+      expected.push_back(active.getSparse());
+    }
+    for(const UInt threads : {1u, 3u}) {
+      SpatialPooler copy = sp;
+      ASSERT_EQ(expected, copy.computeBatch(inputs.data(), numInputs, false, threads));
+      ASSERT_EQ(sequential, copy);
+    }
+    ASSERT_EQ(0u, sp.computeBatch(inputs.data(), 0u).size());
+  }
+}
+
+
+TEST(SpatialPoolerTest, NumThreads) {
+  SpatialPooler sp({28u, 28u}, {32u, 32u},
+                   /*potentialRadius*/ 10u, /*potentialPct*/ 0.5f, /*global*/ true,
+                   /*localAreaDensity*/ 0.05f, /*numActiveColumnsPerInhArea*/ 0u,
+                   /*stimulusThreshold*/ 1u, /*synPermInactiveDec*/ 0.01f,
+                   /*synPermActiveInc*/ 0.1f, /*synPermConnected*/ 0.1f);
+  SpatialPooler parallel = sp;
+  ASSERT_EQ(1u, parallel.getNumThreads());
+  parallel.setNumThreads(4u);
+  ASSERT_EQ(4u, parallel.getNumThreads());
+
+  // Dense inputs, so that the overlaps are computed by several threads.
+  SDR input(sp.getInputDimensions());
+  SDR active(sp.getColumnDimensions()), parallelActive(sp.getColumnDimensions());
+  Random rng(42);
+  for(UInt i = 0; i < 20u; i++) {
+    input.randomize(0.3f, rng);
+    const bool learn = i < 15u;
+    ASSERT_EQ(sp.compute(input, learn, active), parallel.compute(input, learn, parallelActive));
+    ASSERT_EQ(active, parallelActive);
+  }
+  ASSERT_EQ(sp, parallel);
+}
+
+
+TEST(SpatialPoolerTest, SaveDelta) {
+  SpatialPooler sp({28u, 28u}, {16u, 16u},
+                   /*potentialRadius*/ 10u, /*potentialPct*/ 0.5f, /*global*/ true,
+                   /*localAreaDensity*/ 0.05f, /*numActiveColumnsPerInhArea*/ 0u,
+                   /*stimulusThreshold*/ 1u, /*synPermInactiveDec*/ 0.01f,
+                   /*synPermActiveInc*/ 0.1f, /*synPermConnected*/ 0.1f);
+  stringstream base;
+  sp.save(base);
+  SpatialPooler replica;
+  replica.load(base);
+  sp.beginDeltas();
+  ASSERT_TRUE(sp.isRecordingDeltas());
+
+  SDR input(sp.getInputDimensions());
+  SDR active(sp.getColumnDimensions()), replicaActive(sp.getColumnDimensions());
+  Random rng(42);
+  for(UInt checkpoint = 0; checkpoint < 5u; checkpoint++) {
+    for(UInt i = 0; i < 4u; i++) {
+      input.randomize(0.1f, rng);
+      sp.compute(input, true, active);
+    }
+    stringstream delta;
+    sp.saveDelta(delta);
+    replica.loadDelta(delta);
+    ASSERT_EQ(sp, replica);
+  }
+  input.randomize(0.1f, rng);
+  sp.compute(input, true, active);
+  replica.compute(input, true, replicaActive);
+  ASSERT_EQ(active, replicaActive);
+
+  sp.endDeltas();
+  ASSERT_FALSE(sp.isRecordingDeltas());
+}
+
+
+// Writes the SpatialPooler archive as it was before the lazy duty cycles.
+struct BaselineSpatialPooler : public SpatialPooler {
+  using SpatialPooler::SpatialPooler;
+
+  template<class Archive>
+  void saveBaseline(Archive& ar) const {
+    ar(CEREAL_NVP(inputDimensions_),
+       CEREAL_NVP(columnDimensions_));
+    ar(CEREAL_NVP(numInputs_),
+       CEREAL_NVP(numColumns_),
+       CEREAL_NVP(potentialRadius_),
+       CEREAL_NVP(potentialPct_),
+       CEREAL_NVP(initConnectedPct_),
+       CEREAL_NVP(globalInhibition_),
+       CEREAL_NVP(numActiveColumnsPerInhArea_),
+       CEREAL_NVP(localAreaDensity_),
+       CEREAL_NVP(stimulusThreshold_),
+       CEREAL_NVP(inhibitionRadius_),
+       CEREAL_NVP(dutyCyclePeriod_),
+       CEREAL_NVP(boostStrength_),
+       CEREAL_NVP(iterationNum_),
+       CEREAL_NVP(iterationLearnNum_),
+       CEREAL_NVP(spVerbosity_),
+       CEREAL_NVP(updatePeriod_),
+       CEREAL_NVP(synPermInactiveDec_),
+       CEREAL_NVP(synPermActiveInc_),
+       CEREAL_NVP(synPermBelowStimulusInc_),
+       CEREAL_NVP(synPermConnected_),
+       CEREAL_NVP(minPctOverlapDutyCycles_),
+       CEREAL_NVP(wrapAround_));
+    ar(CEREAL_NVP(boostFactors_));
+    ar(CEREAL_NVP(overlapDutyCycles_));
+    ar(CEREAL_NVP(activeDutyCycles_));
+    ar(CEREAL_NVP(minOverlapDutyCycles_));
+    ar(CEREAL_NVP(connections_));
+    ar(CEREAL_NVP(rng_));
+  }
+};
+
+TEST(SpatialPoolerTest, LoadBaselineFormat) {
+  BaselineSpatialPooler sp({100u}, {200u},
+                   /*potentialRadius*/ 16u, /*potentialPct*/ 0.5f, /*global*/ true,
+                   /*localAreaDensity*/ 0.05f, /*numActiveColumnsPerInhArea*/ 0u,
+                   /*stimulusThreshold*/ 0u, /*synPermInactiveDec*/ 0.01f,
+                   /*synPermActiveInc*/ 0.1f, /*synPermConnected*/ 0.1f,
+                   /*minPctOverlapDutyCycles*/ 0.001f, /*dutyCyclePeriod*/ 20u,
+                   /*boostStrength*/ 2.0f);
+  SDR input(sp.getInputDimensions());
+  SDR active(sp.getColumnDimensions()), loadedActive(sp.getColumnDimensions());
+  Random rng(42);
+  for(UInt i = 0; i < 50u; i++) {
+    input.randomize(0.1f, rng);
+    sp.compute(input, true, active);
+  }
+  // The baseline format holds the current duty cycles.
+  sp.decayDutyCycles_();
+
+  stringstream ss;
+  {
+    cereal::BinaryOutputArchive ar(ss);
+    sp.saveBaseline(ar);
+  }
+  SpatialPooler loaded;
+  loaded.load(ss);
+  ASSERT_EQ(static_cast<const SpatialPooler &>(sp), loaded);
+
+  for(UInt i = 0; i < 50u; i++) {
+    input.randomize(0.1f, rng);
+    sp.compute(input, true, active);
+    loaded.compute(input, true, loadedActive);
+    ASSERT_EQ(active, loadedActive) << "step " << i;
+  }
+
+  // Saved again, it is in the current format.
+  stringstream ss2;
+  loaded.save(ss2);
+  SpatialPooler reloaded;
+  reloaded.load(ss2);
+  ASSERT_EQ(loaded, reloaded);
+}
+
+
 TEST(SpatialPoolerTest, ExactOutput) { 
   // Silver is an SDR that is loaded by direct initalization from a vector.
   SDR silver_sdr({ 200 });
@@ -0,0 +1,111 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2015-2016, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+#include "gtest/gtest.h"
+
+/** @file
+ * Counts the heap allocations of the Temporal Memory.
+ *
+ * This file replaces the global operator new, so it is built into its own
+ * executable (allocation_tests) and not into unit_tests.
+ */
+
+#include <atomic>
+#include <cstdlib>
+#include <iostream>
+#include <new>
+
+#include <htm/algorithms/TemporalMemory.hpp>
+#include <htm/utils/Random.hpp>
+
+/**
+ * Count the heap allocations of this program, see testTMAllocations.
+ */
+static std::atomic<size_t> numAllocations(0u);
+
+void *operator new(size_t size) {
+  numAllocations.fetch_add(1u, std::memory_order_relaxed);
+  void *ptr = std::malloc(size == 0u ? 1u : size);
+  if (ptr == nullptr) throw std::bad_alloc();
+  return ptr;
+}
+
+void operator delete(void *ptr) noexcept { std::free(ptr); }
+
+namespace testing {
+
+using namespace std;
+using namespace htm;
+
+#define SEED 42
+
+#if defined( NDEBUG) && !defined(NTA_OS_WINDOWS)
+  const UInt COLS 	= 2048; //standard num of columns in SP/TM
+  const UInt W 		= 50;
+  const UInt SEQ 	= 50; //number of sequences ran in tests
+  const UInt EPOCHS 	= 20; //tests run for epochs times
+#else
+  const UInt COLS 	= 20; //standard num of columns in SP/TM
+  const UInt W 		= 3;
+  const UInt SEQ 	= 25; //number of sequences ran in tests
+  const UInt EPOCHS 	= 4; //only short in debug
+#endif
+
+/**
+ * Counts the heap allocations of the Temporal Memory on a learned sequence.
+ * Once the buffers have grown to their working size, inference must not
+ * allocate any memory.
+ */
+TEST(TMAllocationTest, testTMAllocations) {
+  Random rng(SEED);
+  TemporalMemory tm({COLS});
+  vector<SDR> sequence;
+  for (UInt i = 0; i < SEQ; i++) {
+    SDR sdr({COLS});
+    sdr.randomize(W / static_cast<Real>(COLS), rng);
+    sequence.push_back(sdr);
+  }
+  SDR activeCells({static_cast<UInt>(tm.numberOfCells())});
+  SDR predictiveCells({static_cast<UInt>(tm.numberOfCells())});
+  const auto run = [&](bool learn) {
+    for (const auto &sdr : sequence) {
+      tm.compute(sdr, learn);
+      tm.getActiveCells(activeCells);
+      tm.activateDendrites(learn);
+      tm.getPredictiveCells(predictiveCells);
+    }
+    tm.reset();
+  };
+
+  for (UInt epoch = 0; epoch < EPOCHS; epoch++) {
+    run(true);
+  }
+  size_t before = numAllocations;
+  run(true);
+  cout << (numAllocations - before) << " allocations in " << SEQ << " steps of learning a learned sequence" << endl;
+
+  run(false); // warm up
+  before = numAllocations;
+  for (UInt epoch = 0; epoch < EPOCHS; epoch++) {
+    run(false);
+  }
+  const size_t allocations = numAllocations - before;
+  cout << allocations << " allocations in " << EPOCHS * SEQ << " steps of inference" << endl;
+  ASSERT_EQ(allocations, 0u);
+}
+
+} // namespace testing
@@ -1319,6 +1319,54 @@ TEST(TemporalMemoryTest, ReachSegmentLimitMultipleTimes) {
   EXPECT_EQ(2ul, tm.connections.numSegments());
 }
 
+/**
+ * Compaction is off by default, so segment indices stay valid.  When it is
+ * enabled the destroyed segments are garbage collected and the results
+ * do not change.
+ */
+TEST(TemporalMemoryTest, CompactionIsOptIn) {
+  auto makeTM = []() {
+    return TemporalMemory(
+      /*columnDimensions*/ {32},
+      /*cellsPerColumn*/ 1,
+      /*activationThreshold*/ 2,
+      /*initialPermanence*/ 0.50f,
+      /*connectedPermanence*/ 0.50f,
+      /*minThreshold*/ 1,
+      /*maxNewSynapseCount*/ 3,
+      /*permanenceIncrement*/ 0.02f,
+      /*permanenceDecrement*/ 0.02f,
+      /*predictedSegmentDecrement*/ 0.0f,
+      /*seed*/ 42,
+      /*maxSegmentsPerCell*/ 2);
+  };
+  TemporalMemory plain = makeTM();
+  TemporalMemory compacted = makeTM();
+  EXPECT_EQ(0.0f, plain.getCompactionThreshold());
+  compacted.setCompactionThreshold(0.5f);
+  EXPECT_EQ(0.5f, compacted.getCompactionThreshold());
+
+  Random rng(7);
+  SDR input({32u});
+  for (int i = 0; i < 500; i++) {
+    input.randomize(0.1f, rng);
+    plain.compute(input, true);
+    compacted.compute(input, true);
+    ASSERT_EQ(plain.getActiveCells(), compacted.getActiveCells()) << "iteration " << i;
+    ASSERT_EQ(plain.getWinnerCells(), compacted.getWinnerCells()) << "iteration " << i;
+  }
+  EXPECT_EQ(plain.connections.numSegments(), compacted.connections.numSegments());
+  EXPECT_GT(plain.connections.segmentFlatListLength(), 2 * plain.connections.numSegments());
+  EXPECT_LE(compacted.connections.segmentFlatListLength(), 2 * compacted.connections.numSegments());
+
+  // The setting is not serialized, a loaded TM keeps its own.
+  std::stringstream ss;
+  compacted.save(ss);
+  TemporalMemory loaded;
+  loaded.load(ss);
+  EXPECT_EQ(0.0f, loaded.getCompactionThreshold());
+}
+
 TEST(TemporalMemoryTest, testColumnForCell1D) {
   TemporalMemory tm;
   tm.initialize(vector<UInt>{2048}, 5);
@@ -1566,6 +1614,260 @@ TEST(TemporalMemoryTest, testSaveArLoadAr) {
 }
 
 
+// A Temporal Memory archive written before the multi-metric AnomalyLikelihood
+// (binary, little endian, 64 bit).  It is of
+//   TemporalMemory tm({8}, 1, 1, 0.6f, 0.5f, 1, 2, 0.1f, 0.1f, 0.0f, 42, 8, 8, true, 0u,
+//                     TemporalMemory::ANMode::LIKELIHOOD);
+// after learning 8 steps of the sequence {0, 4}, {1, 5}, {2, 6}, {3, 7}.
+static const unsigned char BASELINE_TM_ARCHIVE[] = {
+  0x08, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01, 0x00, 0x9a, 0x99, 0x19, 0x3f, 0x00, 0x00,
+  0x00, 0x3f, 0x01, 0x00, 0x02, 0x00, 0x01, 0xcd, 0xcc, 0xcc, 0x3d, 0xcd, 0xcc, 0xcc, 0x3d, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x08, 0x00, 0x08, 0x00, 0x2a, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03,
+  0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03,
+  0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x3f, 0x02, 0x00, 0x00, 0x00,
+  0x10, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x41, 0x6e, 0x6f, 0x6d, 0x61, 0x6c, 0x79, 0x4c,
+  0x69, 0x6b, 0x65, 0x6c, 0x68, 0x6f, 0x6f, 0x64, 0x07, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x75, 0x6e, 0x6b, 0x6e, 0x6f, 0x77, 0x6e, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0xff, 0xff, 0xff, 0xff, 0x00, 0x00, 0x00, 0x00, 0x08,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0d, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x53,
+  0x6c, 0x69, 0x64, 0x69, 0x6e, 0x67, 0x57, 0x69, 0x6e, 0x64, 0x6f, 0x77, 0x08, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f,
+  0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x0d, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x53, 0x6c, 0x69, 0x64, 0x69, 0x6e, 0x67, 0x57, 0x69, 0x6e, 0x64, 0x6f, 0x77, 0x08, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x3f, 0x00, 0x00, 0x00, 0x3f, 0x00, 0x00, 0x00,
+  0x3f, 0x00, 0x00, 0x00, 0x3f, 0x00, 0x00, 0x00, 0x3f, 0x00, 0x00, 0x00, 0x3f, 0x00, 0x00, 0x00,
+  0x3f, 0x00, 0x00, 0x00, 0x3f, 0x08, 0x00, 0x00, 0x00, 0x0d, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x53, 0x6c, 0x69, 0x64, 0x69, 0x6e, 0x67, 0x57, 0x69, 0x6e, 0x64, 0x6f, 0x77, 0x08, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00,
+  0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x0d, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x53, 0x6c, 0x69, 0x64, 0x69, 0x6e, 0x67, 0x57, 0x69, 0x6e, 0x64, 0x6f, 0x77, 0x08,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00,
+  0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x00, 0x00, 0x80, 0x3f, 0x55, 0x55, 0x55, 0x3f, 0x6e,
+  0xdb, 0x36, 0x3f, 0x00, 0x00, 0x20, 0x3f, 0x08, 0x00, 0x00, 0x00, 0xde, 0xff, 0xff, 0x3e, 0x08,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x05, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x02, 0x00, 0x06, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00,
+  0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00,
+  0x00, 0x05, 0x00, 0x00, 0x00, 0x02, 0x00, 0x06, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x05, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x07, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00,
+  0x00, 0x02, 0x00, 0x07, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x09, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x08, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x0a, 0x00, 0x00, 0x00, 0x0b, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x02, 0x00, 0x08,
+  0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0c,
+  0x00, 0x00, 0x00, 0x0d, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x06, 0x00, 0x00,
+  0x00, 0x05, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0e, 0x00, 0x00,
+  0x00, 0x0f, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x02, 0x00, 0x07, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x10, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x04,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x34,
+  0x33, 0x33, 0x3f, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x04, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x05,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x34,
+  0x33, 0x33, 0x3f, 0x01, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x05, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x01, 0x00, 0x00, 0x00, 0x03,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x06,
+  0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x34,
+  0x33, 0x33, 0x3f, 0x02, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x09,
+  0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x02, 0x00, 0x00, 0x00, 0x05, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x0a, 0x00, 0x00, 0x00, 0x34, 0x33, 0x33, 0x3f, 0x06, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x0b, 0x00, 0x00, 0x00, 0x9a, 0x99, 0x19, 0x3f, 0x07,
+  0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0c, 0x00, 0x00, 0x00, 0x9a,
+  0x99, 0x19, 0x3f, 0x03, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0d,
+  0x00, 0x00, 0x00, 0x9a, 0x99, 0x19, 0x3f, 0x07, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x0e, 0x00, 0x00, 0x00, 0x9a, 0x99, 0x19, 0x3f, 0x03, 0x00, 0x00, 0x00, 0x07,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x0f, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x07,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0d, 0x00, 0x00, 0x00, 0x0f, 0x00, 0x00, 0x00, 0x07,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0c, 0x00, 0x00, 0x00, 0x0e,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x09,
+  0x00, 0x00, 0x00, 0x0a, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x0b, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x05, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x06,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x07,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x07,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x07,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x04,
+  0x00, 0x00, 0x00, 0x05, 0x00, 0x00, 0x00, 0x06, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x05, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x02,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x03, 0x00, 0x00, 0x00, 0x05,
+  0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x03,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x04, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x08, 0x00, 0x00, 0x00, 0x10,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00,
+  0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x02, 0x00, 0x02, 0x00, 0x00, 0x00,
+  0x00, 0x00, 0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00,
+  0x00, 0x00, 0x02, 0x00, 0x00, 0x00, 0x07, 0x00, 0x00, 0x00, 0x02, 0x00
+};
+
+TEST(TemporalMemoryTest, testLoadBaselineArchive) {
+  stringstream ss(string(reinterpret_cast<const char *>(BASELINE_TM_ARCHIVE),
+                         sizeof(BASELINE_TM_ARCHIVE)));
+  TemporalMemory tm;
+  tm.load(ss);
+  ASSERT_EQ(tm.numberOfColumns(), 8u);
+  ASSERT_EQ(tm.getCellsPerColumn(), 1u);
+  ASSERT_EQ(tm.connections.numSegments(), 8u);
+  ASSERT_EQ(tm.connections.numSynapses(), 16u);
+
+  // The loaded TM continues the sequence.
+  for (UInt step = 0u; step < 4u; step++) {
+    SDR input({8u});
+    input.setSparse(SDR_sparse_t{step, step + 4u});
+    tm.compute(input, false);
+    ASSERT_EQ(tm.getActiveCells(), vector<CellIdx>({step, step + 4u}));
+    tm.activateDendrites(false);
+    ASSERT_EQ(tm.getPredictiveCells().getSparse(),
+              SDR_sparse_t({(step + 1u) % 4u, (step + 1u) % 4u + 4u}));
+    ASSERT_EQ(tm.anomaly, 0.5f); // the likelihood is still in its probationary period
+  }
+
+  // Saved again, it is in the current format.
+  stringstream ss2;
+  tm.save(ss2);
+  TemporalMemory tm2;
+  tm2.load(ss2);
+  ASSERT_EQ(tm, tm2);
+}
+
+
+TEST(TemporalMemoryTest, testSaveFrozen) {
+  TemporalMemory tm1(
+      /*columnDimensions*/ {32},
+      /*cellsPerColumn*/ 4,
+      /*activationThreshold*/ 3,
+      /*initialPermanence*/ 0.21f,
+      /*connectedPermanence*/ 0.50f,
+      /*minThreshold*/ 2,
+      /*maxNewSynapseCount*/ 3,
+      /*permanenceIncrement*/ 0.10f,
+      /*permanenceDecrement*/ 0.10f,
+      /*predictedSegmentDecrement*/ 0.0f,
+      /*seed*/ 42);
+
+  vector<SDR> sequence;
+  for(UInt i = 0; i < 4; i++) {
+    sequence.emplace_back(vector<UInt>{32});
+    sequence.back().setSparse(vector<UInt>{i * 8, i * 8 + 1, i * 8 + 2, i * 8 + 3});
+  }
+  for(UInt epoch = 0; epoch < 10; epoch++) {
+    for(const auto &columns : sequence) tm1.compute(columns, true);
+    tm1.reset();
+  }
+
+  const char *filename = "TemporalMemoryFrozen.tmp";
+  tm1.saveFrozen(filename);
+  TemporalMemory tm2;
+  tm2.loadFrozen(filename);
+  ASSERT_EQ(tm1.numberOfCells(), tm2.numberOfCells());
+  ASSERT_EQ(tm1.connections.numSegments(), tm2.connections.numSegments());
+
+  // Inference gives the same results.
+  SDR predictive1({tm1.numberOfCells()}), predictive2({tm2.numberOfCells()});
+  size_t numPredicted = 0u;
+  for(const auto &columns : sequence) {
+    tm1.compute(columns, false);
+    tm2.compute(columns, false);
+    ASSERT_EQ(tm1.getActiveCells(), tm2.getActiveCells());
+    ASSERT_EQ(tm1.getWinnerCells(), tm2.getWinnerCells());
+    tm1.activateDendrites(false);
+    tm2.activateDendrites(false);
+    tm1.getPredictiveCells(predictive1);
+    tm2.getPredictiveCells(predictive2);
+    ASSERT_EQ(predictive1, predictive2);
+    ASSERT_FLOAT_EQ(tm1.anomaly, tm2.anomaly);
+    numPredicted += predictive2.getSum();
+  }
+  ASSERT_GT(numPredicted, 0u);
+
+  // But it can not learn.
+  tm2.reset();
+  SDR unknown({32});
+  unknown.setSparse(vector<UInt>{4, 12, 20, 28});
+  tm2.compute(unknown, true);
+  EXPECT_ANY_THROW(tm2.compute(sequence[0], true));
+
+  ASSERT_EQ(0, ::remove(filename));
+}
+
+TEST(TemporalMemoryTest, testSaveDelta) {
+  TemporalMemory tm1(
+      /*columnDimensions*/ {32},
+      /*cellsPerColumn*/ 4,
+      /*activationThreshold*/ 3,
+      /*initialPermanence*/ 0.21f,
+      /*connectedPermanence*/ 0.50f,
+      /*minThreshold*/ 2,
+      /*maxNewSynapseCount*/ 3,
+      /*permanenceIncrement*/ 0.10f,
+      /*permanenceDecrement*/ 0.10f,
+      /*predictedSegmentDecrement*/ 0.02f,
+      /*seed*/ 42);
+  stringstream base;
+  tm1.save(base);
+  TemporalMemory tm2;
+  tm2.load(base);
+  tm1.beginDeltas();
+  ASSERT_TRUE(tm1.isRecordingDeltas());
+
+  SDR columns({32});
+  Random rng(42);
+  for(UInt checkpoint = 0; checkpoint < 10; checkpoint++) {
+    for(UInt i = 0; i < 5; i++) {
+      const UInt start = rng.getUInt32(8) * 4;
+      columns.setSparse(vector<UInt>{start, start + 1, start + 2, start + 3});
+      tm1.compute(columns, true);
+    }
+    stringstream delta;
+    tm1.saveDelta(delta);
+    tm2.loadDelta(delta);
+    ASSERT_EQ(tm1, tm2) << "checkpoint " << checkpoint;
+  }
+
+  // The replica continues exactly like the original.
+  for(UInt i = 0; i < 8; i++) {
+    columns.setSparse(vector<UInt>{i * 4, i * 4 + 1, i * 4 + 2, i * 4 + 3});
+    tm1.compute(columns, true);
+    tm2.compute(columns, true);
+    ASSERT_EQ(tm1.getActiveCells(), tm2.getActiveCells());
+  }
+  ASSERT_EQ(tm1, tm2);
+}
+
 /*
  * Test compute( extraActive, extraWinners )
  
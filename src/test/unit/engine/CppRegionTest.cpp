@@ -158,6 +158,42 @@ TEST(CppRegionTest, testCppLinkingSDR) {
 
 
 
+TEST(CppRegionTest, testCppLinkingFanInSDR) {
+  Network net;
+
+  std::shared_ptr<Region> region1 = net.addRegion("region1", "ScalarEncoderRegion", "{n: 20, w: 3}");
+  std::shared_ptr<Region> region2 = net.addRegion("region2", "ScalarEncoderRegion", "{n: 30, w: 5}");
+  std::shared_ptr<Region> region3 = net.addRegion("region3", "SPRegion", "{dim: [20,3]}");
+
+  net.link("region1", "region3");
+  net.link("region2", "region3");
+
+  net.initialize();
+
+  const Array r3InputArray = region3->getInputData("bottomUpIn");
+  ASSERT_EQ(r3InputArray.getType(), NTA_BasicType_SDR);
+  ASSERT_EQ(r3InputArray.getCount(), 50u);
+
+  for (const Real64 value : {0.8, -0.5, 0.1, 0.1, 0.9}) {
+    region1->setParameterReal64("sensedValue", value);
+    region2->setParameterReal64("sensedValue", -value);
+    region1->compute();
+    region2->compute();
+    region3->prepareInputs();
+
+    // The input is the concatenation of the encodings, and the bits of the
+    // previous encodings are cleared.
+    const Array r1OutputArray = region1->getOutputData("encoded");
+    const Array r2OutputArray = region2->getOutputData("encoded");
+    SDR expected({50u});
+    expected.concatenate(r1OutputArray.getSDR(), r2OutputArray.getSDR());
+    ASSERT_EQ(region3->getInputData("bottomUpIn").getSDR().getSparse(), expected.getSparse())
+        << "value " << value;
+    ASSERT_EQ(expected.getSum(), 8u);
+  }
+}
+
+
 TEST(CppRegionTest, testYAML) {
   const char *params = "{count: 42, int32Param: 1234, real64Param: 23.1}";
 
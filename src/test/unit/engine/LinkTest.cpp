@@ -242,6 +242,43 @@ TEST(LinkTest, DelayedLink) {
 
 
 
+TEST(LinkTest, DelayedSDRLink) {
+  // The delay buffers are a ring, which is reused after every delay steps.
+  Network net;
+  std::shared_ptr<Region> region1 = net.addRegion("region1", "ScalarEncoderRegion", "{n: 20, w: 3}");
+  std::shared_ptr<Region> region2 = net.addRegion("region2", "SPRegion", "{dim: [20]}");
+  const size_t delay = 3u;
+  net.link("region1", "region2", "", "", "", "", delay);
+  net.initialize();
+
+  const std::vector<Real64> values = {-0.9, 0.5, 0.1, 0.9, -0.3, 0.7, 0.0, 0.3, -0.6, 0.8};
+  std::vector<SDR_sparse_t> history;
+  std::stringstream ss;
+  for (size_t t = 0; t < values.size(); t++) {
+    region1->setParameterReal64("sensedValue", values[t]);
+    net.run(1);
+    history.push_back(region1->getOutputData("encoded").getSDR().getSparse());
+    const SDR_sparse_t &input = region2->getInputData("bottomUpIn").getSDR().getSparse();
+    if (t < delay)
+      ASSERT_TRUE(input.empty()) << "step " << t;
+    else
+      ASSERT_EQ(input, history[t - delay]) << "step " << t;
+    if (t == 4u)
+      net.save(ss);
+  }
+
+  // The queue survives serialization, in order.
+  Network net2;
+  net2.load(ss);
+  std::shared_ptr<Region> region2b = net2.getRegion("region2");
+  for (size_t t = 5; t < values.size(); t++) {
+    net2.getRegion("region1")->setParameterReal64("sensedValue", values[t]);
+    net2.run(1);
+    ASSERT_EQ(region2b->getInputData("bottomUpIn").getSDR().getSparse(), history[t - delay])
+        << "step " << t;
+  }
+}
+
 TEST(LinkTest, DelayedLinkSerialization) {
   // serialization test of delayed link.
 
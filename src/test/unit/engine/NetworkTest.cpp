@@ -21,6 +21,9 @@
 
 #include "gtest/gtest.h"
 
+#include <algorithm>
+#include <mutex>
+
 #include <htm/engine/Network.hpp>
 #include <htm/engine/Region.hpp>
 #include <htm/engine/Input.hpp>
@@ -471,9 +474,178 @@ TEST(NetworkTest, Callback) {
   EXPECT_STREQ("level3", mydata[5].c_str());
 }
 
+
+static void buildColumns_(Network &net, UInt numColumns) {
+  // Each column is an encoder -> SP -> TM chain.  All encoders run in phase 0,
+  // all SPs in phase 1 and all TMs in phase 2, so each phase has independent regions.
+  std::set<UInt32> phase;
+  for (UInt c = 0; c < numColumns; c++) {
+    const std::string n = std::to_string(c);
+    net.addRegion("encoder" + n, "RDSEEncoderRegion", "{size: 400, seed: " + std::to_string(42 + c) + ", activeBits: 40, radius: 0.1}");
+    net.addRegion("sp" + n, "SPRegion", "{columnCount: 200, globalInhibition: true}");
+    net.addRegion("tm" + n, "TMRegion", "{cellsPerColumn: 4}");
+    net.link("encoder" + n, "sp" + n, "", "", "encoded", "bottomUpIn");
+    net.link("sp" + n, "tm" + n, "", "", "bottomUpOut", "bottomUpIn");
+  }
+  for (UInt c = 0; c < numColumns; c++) {
+    const std::string n = std::to_string(c);
+    phase = {0}; net.setPhases("encoder" + n, phase);
+    phase = {1}; net.setPhases("sp" + n, phase);
+    phase = {2}; net.setPhases("tm" + n, phase);
+  }
+}
+
+TEST(NetworkTest, ParallelRunIsIdentical) {
+  const UInt numColumns = 4;
+  Network serial;
+  Network parallel;
+  buildColumns_(serial, numColumns);
+  buildColumns_(parallel, numColumns);
+  ASSERT_EQ(serial.getNumThreads(), 1u);
+  parallel.setNumThreads(3);
+  ASSERT_EQ(parallel.getNumThreads(), 3u);
+
+  for (UInt i = 0; i < 50; i++) {
+    for (UInt c = 0; c < numColumns; c++) {
+      const std::string encoder = "encoder" + std::to_string(c);
+      const Real64 value = (i * (c + 1)) % 10 / 10.0;
+      serial.getRegion(encoder)->setParameterReal64("sensedValue", value);
+      parallel.getRegion(encoder)->setParameterReal64("sensedValue", value);
+    }
+    serial.run(1);
+    parallel.run(1);
+  }
+
+  for (UInt c = 0; c < numColumns; c++) {
+    for (const std::string name : {"sp", "tm"}) {
+      const std::string region = name + std::to_string(c);
+      EXPECT_EQ(serial.getRegion(region)->getOutputData("bottomUpOut"),
+                parallel.getRegion(region)->getOutputData("bottomUpOut")) << region;
+    }
+  }
+  EXPECT_TRUE(serial == parallel);
+
+  parallel.setNumThreads(1);
+  ASSERT_EQ(parallel.getNumThreads(), 1u);
+  parallel.setNumThreads(0);
+  ASSERT_GE(parallel.getNumThreads(), 1u);
+}
+
+static std::mutex computeHistoryMutex;
+static void recordComputeLocked(const std::string &name) {
+  std::lock_guard<std::mutex> lock(computeHistoryMutex);
+  computeHistory.push_back(name);
+}
+
+static size_t positionOf_(const std::string &name) {
+  return std::find(computeHistory.begin(), computeHistory.end(), name) - computeHistory.begin();
+}
+
+TEST(NetworkTest, ParallelRunKeepsPhaseDependencies) {
+  // A chain of linked regions within one phase must still run in the
+  // sequential order. The unlinked region may run concurrently.
+  Network n;
+  Dimensions d;
+  d.push_back(1);
+  for (const std::string name : {"level1", "level2", "level3", "other"}) {
+    n.addRegion(name, "TestNode", "")->setDimensions(d);
+    std::set<UInt32> phase = {0};
+    n.setPhases(name, phase);
+  }
+  n.link("level1", "level2");
+  n.link("level2", "level3");
+  n.initialize();
+  for (const std::string name : {"level1", "level2", "level3", "other"}) {
+    n.getRegion(name)->setParameterUInt64("computeCallback", (UInt64)recordComputeLocked);
+  }
+
+  computeHistory.clear();
+  n.run(1);
+  const std::vector<std::string> sequential = computeHistory;
+  ASSERT_EQ(sequential.size(), 4u);
+
+  n.setNumThreads(4);
+  for (UInt i = 0; i < 10; i++) {
+    computeHistory.clear();
+    n.run(1);
+    ASSERT_EQ(computeHistory.size(), 4u);
+    for (const auto &pair : std::vector<std::pair<std::string, std::string>>{
+             {"level1", "level2"}, {"level2", "level3"}}) {
+      const bool before = std::find(sequential.begin(), sequential.end(), pair.first) <
+                          std::find(sequential.begin(), sequential.end(), pair.second);
+      EXPECT_EQ(before, positionOf_(pair.first) < positionOf_(pair.second));
+    }
+  }
+}
+
 /**
  * Test operator '=='
  */
+static void profilingCallback_(Network *, UInt64, void *) {}
+
+TEST(NetworkTest, Profiling) {
+  Network net;
+  buildColumns_(net, 2u);
+  net.getCallbacks().add("profilingCallback", Network::callbackItem(profilingCallback_, nullptr));
+
+  net.run(5);
+  std::shared_ptr<Region> sp = net.getRegion("sp0");
+  EXPECT_EQ(sp->getComputeStats().getCount(), 0u) << "No profiling unless enabled";
+  EXPECT_EQ(sp->getPrepareInputsStats().getCount(), 0u);
+
+  net.enableProfiling(1000u);
+  net.run(20);
+  EXPECT_EQ(sp->getComputeStats().getCount(), 20u);
+  EXPECT_EQ(sp->getPrepareInputsStats().getCount(), 20u);
+  EXPECT_GT(sp->getComputeStats().getTotal(), 0.0);
+  EXPECT_LE(sp->getComputeStats().getMin(), sp->getComputeStats().getPercentile(50.0));
+  EXPECT_LE(sp->getComputeStats().getPercentile(50.0), sp->getComputeStats().getPercentile(99.0));
+  EXPECT_LE(sp->getComputeStats().getPercentile(99.0), sp->getComputeStats().getMax());
+  for (const auto link : sp->getInput("bottomUpIn")->getLinks())
+    EXPECT_EQ(link->getComputeStats().getCount(), 20u);
+
+  const std::string report = net.getProfilingReport();
+  VERBOSE << report << std::endl;
+  EXPECT_NE(report.find("\"sp0\": {\"type\": \"SPRegion\""), std::string::npos);
+  EXPECT_NE(report.find("\"name\": \"encoder0.encoded-->sp0.bottomUpIn\""), std::string::npos) << report;
+  EXPECT_NE(report.find("\"callbacks\": {\"count\": 20,"), std::string::npos);
+  EXPECT_NE(report.find("\"iterations\": {\"count\": 20,"), std::string::npos);
+  EXPECT_NE(report.find("\"p99\""), std::string::npos);
+
+  // Each iteration records 6 regions (prepareInputs and compute), 4 links,
+  // 3 phases, 1 callback and the iteration: 21 events.
+  const std::string trace = net.getProfilingTrace();
+  EXPECT_EQ(trace.compare(0, 16, "{\"traceEvents\": "), 0);
+  EXPECT_NE(trace.find("\"name\": \"tm1\", \"cat\": \"compute\", \"ph\": \"X\""), std::string::npos);
+  EXPECT_NE(trace.find("\"droppedEvents\": 0}"), std::string::npos);
+  net.run(40); // the trace is bounded to 1000 events
+  EXPECT_NE(net.getProfilingTrace().find("\"droppedEvents\": 260}"), std::string::npos);
+
+  net.resetProfiling();
+  EXPECT_EQ(sp->getComputeStats().getCount(), 0u);
+  EXPECT_EQ(net.getProfilingTrace().find("\"cat\""), std::string::npos);
+
+  net.disableProfiling();
+  net.run(5);
+  EXPECT_EQ(sp->getComputeStats().getCount(), 0u);
+  EXPECT_NE(net.getProfilingReport().find("\"iterations\": {\"count\": 0,"), std::string::npos);
+}
+
+TEST(NetworkTest, TimingStatsPercentiles) {
+  TimingStats stats;
+  EXPECT_EQ(stats.getPercentile(50.0), 0.0);
+  for (UInt64 ns = 1u; ns <= 10000u; ns++)
+    stats.add(ns * 1000u);
+  EXPECT_EQ(stats.getCount(), 10000u);
+  EXPECT_NEAR(stats.getMin(), 1e-6, 1e-12);
+  EXPECT_NEAR(stats.getMax(), 1e-2, 1e-12);
+  EXPECT_NEAR(stats.getMean(), 5.0005e-3, 1e-9);
+  EXPECT_NEAR(stats.getPercentile(50.0), 5e-3, 5e-3 * 0.07);
+  EXPECT_NEAR(stats.getPercentile(90.0), 9e-3, 9e-3 * 0.07);
+  EXPECT_NEAR(stats.getPercentile(99.0), 9.9e-3, 9.9e-3 * 0.07);
+  EXPECT_ANY_THROW(stats.getPercentile(101.0));
+}
+
 TEST(NetworkTest, testEqualsOperator) {
   Network n1;
   Network n2;
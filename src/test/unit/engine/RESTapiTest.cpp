@@ -30,9 +30,11 @@
 #include <string>
 #include <thread>
 #include <chrono>
+#include <cstring>
 
 #include <httplib.h>
 #include <examples/rest/server_core.hpp>
+#include <htm/utils/Random.hpp>
 
 namespace testing {
 
@@ -225,4 +227,225 @@ TEST(RESTapiTest, test_delete) {
   threadObj.join();          // wait until server thread has stopped.
 }
 
+TEST(RESTapiTest, test_batch) {
+  std::thread threadObj(serverThread);                  // start REST server
+  std::this_thread::sleep_for(std::chrono::seconds(1)); // give server time to start
+
+  // Client thread.
+  const httplib::Params noParams;
+  char message[1000];
+
+  httplib::Client client("127.0.0.1", port);
+  client.set_timeout_sec(30);
+
+  std::string config = R"(
+   {network: [
+       {addRegion: {name: "encoder", type: "RDSEEncoderRegion", params: {size: 1000, sparsity: 0.2, radius: 0.03, seed: 2019, noise: 0.01}}},
+       {addRegion: {name: "sp", type: "SPRegion", params: {columnCount: 2048, globalInhibition: true}}},
+       {addRegion: {name: "tm", type: "TMRegion", params: {cellsPerColumn: 8, orColumnOutputs: true}}},
+       {addLink:   {src: "encoder.encoded", dest: "sp.bottomUpIn"}},
+       {addLink:   {src: "sp.bottomUpOut", dest: "tm.bottomUpIn"}}
+    ]})";
+
+  // Two identical networks, one is run a record at a time and the other in a batch.
+  auto res = client.Post("/network", config, "application/json");
+  ASSERT_TRUE(res && res->status / 100 == 2 && res->body.size() == 5) << "Failed Response to POST /network request.";
+  std::string id1 = res->body.substr(0, 4);
+  res = client.Post("/network", config, "application/json");
+  ASSERT_TRUE(res && res->status / 100 == 2 && res->body.size() == 5) << "Failed Response to POST /network request.";
+  std::string id2 = res->body.substr(0, 4);
+
+  std::string body;
+  std::vector<std::string> expected;
+  Real64 x = 0.0;
+  for (size_t e = 0; e < EPOCHS; e++) {
+    x += 0.01;
+    Real64 s = std::sin(x);
+    UInt32 count = 1u;
+    body.append(reinterpret_cast<const char *>(&count), sizeof(count));
+    body.append(reinterpret_cast<const char *>(&s), sizeof(s));
+
+    snprintf(message, sizeof(message), "/network/%s/region/encoder/param/sensedValue?data=%.17g", id1.c_str(), s);
+    res = client.Put(message, noParams);
+    ASSERT_TRUE(res && res->status / 100 == 2) << " PUT param message failed.";
+    snprintf(message, sizeof(message), "/network/%s/run", id1.c_str());
+    res = client.Get(message);
+    EXPECT_STREQ(trim(res->body).c_str(), "OK") << "Response to GET run";
+    snprintf(message, sizeof(message), "/network/%s/region/sp/output/bottomUpOut", id1.c_str());
+    res = client.Get(message);
+    ASSERT_TRUE(res && res->status / 100 == 2) << " GET output message failed.";
+    expected.push_back(trim(res->body));
+  }
+
+  snprintf(message, sizeof(message),
+           "/network/%s/batch?records=%d&inputs=encoder.sensedValue:Real64&outputs=tm.anomaly,sp.bottomUpOut:sparse",
+           id2.c_str(), EPOCHS);
+  res = client.Post(message, body, "application/octet-stream");
+  ASSERT_TRUE(res && res->status / 100 == 2) << " POST batch message failed.";
+  const std::string &r = res->body;
+  ASSERT_NE(r.compare(0, 6, "ERROR:"), 0) << r;
+
+  size_t pos = 0;
+  auto next = [&]() {
+    UInt32 v = 0u;
+    EXPECT_LE(pos + sizeof(v), r.size()) << "response truncated";
+    if (pos + sizeof(v) <= r.size())
+      std::memcpy(&v, r.data() + pos, sizeof(v));
+    pos += sizeof(v);
+    return v;
+  };
+  ASSERT_EQ(next(), (UInt32)EPOCHS) << "records";
+  ASSERT_EQ(next(), 2u) << "outputs";
+  UInt32 len = next();
+  EXPECT_EQ(r.substr(pos, len), "Real32");
+  pos += len;
+  len = next();
+  EXPECT_EQ(r.substr(pos, len), "UInt32");
+  pos += len;
+  for (size_t e = 0; e < EPOCHS; e++) {
+    ASSERT_EQ(next(), 1u) << "anomaly count";
+    Real32 anomaly;
+    std::memcpy(&anomaly, r.data() + pos, sizeof(anomaly));
+    pos += sizeof(anomaly);
+    EXPECT_EQ(anomaly, 1.0f);
+
+    SDR_sparse_t sparse(next());
+    ASSERT_LE(pos + sparse.size() * sizeof(UInt32), r.size());
+    std::memcpy(sparse.data(), r.data() + pos, sparse.size() * sizeof(UInt32));
+    pos += sparse.size() * sizeof(UInt32);
+    SDR columns({2048u});
+    columns.setSparse(sparse);
+    EXPECT_EQ(Array(columns).toJSON(), expected[e]) << "batch and single runs differ at record " << e;
+  }
+  EXPECT_EQ(pos, r.size());
+
+  // A truncated batch is an error.
+  res = client.Post(message, body.substr(0, body.size() - 1), "application/octet-stream");
+  ASSERT_TRUE(res && res->status / 100 == 2) << " POST batch message failed.";
+  EXPECT_EQ(res->body.compare(0, 6, "ERROR:"), 0);
+
+  // wrap up
+  res = client.Get("/stop"); // stop the server.
+  threadObj.join();          // wait until server thread has stopped.
+}
+
+TEST(RESTapiTest, test_batch_inputs) {
+  std::thread threadObj(serverThread);                  // start REST server
+  std::this_thread::sleep_for(std::chrono::seconds(1)); // give server time to start
+
+  // Client thread.
+  char message[1000];
+  httplib::Client client("127.0.0.1", port);
+  client.set_timeout_sec(30);
+
+  // The classifier reads its unlinked 'pattern' and 'bucket' inputs.
+  std::string config = R"({network: [ {addRegion: {name: "clsr", type: "ClassifierRegion", params: {learn: true}}} ]})";
+  std::string ids[4];
+  for (auto &id : ids) {
+    auto res = client.Post("/network", config, "application/json");
+    ASSERT_TRUE(res && res->status / 100 == 2 && res->body.size() == 5) << "Failed Response to POST /network request.";
+    id = res->body.substr(0, 4);
+  }
+  auto append = [](std::string &body, const void *src, UInt32 count, size_t size) {
+    body.append(reinterpret_cast<const char *>(&count), sizeof(count));
+    body.append(reinterpret_cast<const char *>(src), count * size);
+  };
+  auto batch = [&](const std::string &id, size_t records, const std::string &inputs, const std::string &body) {
+    snprintf(message, sizeof(message), "/network/%s/batch?records=%d&inputs=%s&outputs=clsr.pdf",
+             id.c_str(), (int)records, inputs.c_str());
+    auto res = client.Post(message, body, "application/octet-stream");
+    EXPECT_TRUE(res && res->status / 100 == 2) << " POST batch message failed.";
+    return res ? res->body : std::string("ERROR: no response");
+  };
+  const std::string denseFields = "clsr.pattern:SDR,clsr.bucket:Real64";
+  const std::string sparseFields = "clsr.pattern:sparse:100,clsr.bucket:Real64";
+
+  // The same records, dense and sparse.  ids[0] runs them one record at a time.
+  // The responses start with N, M = 1 and the output type name "Real64".
+  const size_t header = 3 * sizeof(UInt32) + std::string("Real64").size();
+  const size_t records = 20u;
+  std::string dense, sparse, single;
+  Random rng(42);
+  for (size_t e = 0; e < records; e++) {
+    SDR pattern({100u});
+    pattern.randomize(0.1f, rng);
+    const Real64 bucket = static_cast<Real64>(e % 4);
+    std::string d, s;
+    append(d, pattern.getDense().data(), 100u, sizeof(Byte));
+    append(d, &bucket, 1u, sizeof(bucket));
+    append(s, pattern.getSparse().data(), (UInt32)pattern.getSparse().size(), sizeof(UInt32));
+    append(s, &bucket, 1u, sizeof(bucket));
+    dense += d;
+    sparse += s;
+
+    const std::string r = batch(ids[0], 1u, denseFields, d);
+    ASSERT_NE(r.compare(0, 6, "ERROR:"), 0) << r;
+    single += r.substr(header);
+  }
+
+  const std::string rd = batch(ids[1], records, denseFields, dense);
+  ASSERT_NE(rd.compare(0, 6, "ERROR:"), 0) << rd;
+  EXPECT_EQ(rd.substr(header), single) << "dense batch and single record runs differ";
+  const std::string rs = batch(ids[2], records, sparseFields, sparse);
+  ASSERT_NE(rs.compare(0, 6, "ERROR:"), 0) << rs;
+  EXPECT_EQ(rs, rd) << "sparse and dense batches differ";
+
+  // Invalid records are rejected before the first iteration, so ids[3] is
+  // still untrained afterwards and matches the other networks.
+  std::string bad = sparse;
+  const UInt32 outOfRange[] = {3u, 100u};
+  append(bad, outOfRange, 2u, sizeof(UInt32));
+  const Real64 bucket = 0.0;
+  append(bad, &bucket, 1u, sizeof(bucket));
+  std::string r = batch(ids[3], records + 1, sparseFields, bad);
+  EXPECT_NE(r.find("out of range"), std::string::npos) << r;
+
+  bad = sparse;
+  const UInt32 unsorted[] = {5u, 3u};
+  append(bad, unsorted, 2u, sizeof(UInt32));
+  append(bad, &bucket, 1u, sizeof(bucket));
+  r = batch(ids[3], records + 1, sparseFields, bad);
+  EXPECT_NE(r.find("sorted and unique"), std::string::npos) << r;
+
+  // A count which claims more values than the rest of the body holds is
+  // rejected before anything is allocated for it.
+  const UInt32 huge = 4000000000u;
+  for (const auto &fields : {sparseFields, denseFields}) {
+    bad = fields == sparseFields ? sparse : dense;
+    bad.append(reinterpret_cast<const char *>(&huge), sizeof(huge));
+    r = batch(ids[3], records + 1, fields, bad);
+    EXPECT_NE(r.find("truncated"), std::string::npos) << r;
+  }
+
+  snprintf(message, sizeof(message), "/network/%s/batch?records=abc&inputs=%s", ids[3].c_str(), sparseFields.c_str());
+  auto res = client.Post(message, sparse, "application/octet-stream");
+  ASSERT_TRUE(res && res->status / 100 == 2) << " POST batch message failed.";
+  EXPECT_EQ(res->body.compare(0, 6, "ERROR:"), 0) << res->body;
+
+  EXPECT_EQ(batch(ids[3], records, sparseFields, sparse), rd) << "a rejected batch changed the network";
+
+  // Linked inputs, such as sp.bottomUpIn, are overwritten by their links and cannot be batched.
+  config = R"(
+   {network: [
+       {addRegion: {name: "encoder", type: "RDSEEncoderRegion", params: {size: 1000, sparsity: 0.2, radius: 0.03, seed: 2019}}},
+       {addRegion: {name: "sp", type: "SPRegion", params: {columnCount: 2048, globalInhibition: true}}},
+       {addLink:   {src: "encoder.encoded", dest: "sp.bottomUpIn"}}
+    ]})";
+  res = client.Post("/network", config, "application/json");
+  ASSERT_TRUE(res && res->status / 100 == 2 && res->body.size() == 5) << "Failed Response to POST /network request.";
+  const std::string id = res->body.substr(0, 4);
+  std::string body;
+  append(body, outOfRange, 1u, sizeof(UInt32));
+  for (const std::string inputs : {"sp.bottomUpIn:sparse", "sp.bottomUpIn:UInt32"}) {
+    snprintf(message, sizeof(message), "/network/%s/batch?records=1&inputs=%s", id.c_str(), inputs.c_str());
+    res = client.Post(message, body, "application/octet-stream");
+    ASSERT_TRUE(res && res->status / 100 == 2) << " POST batch message failed.";
+    EXPECT_NE(res->body.find("is linked"), std::string::npos) << res->body;
+  }
+
+  // wrap up
+  res = client.Get("/stop"); // stop the server.
+  threadObj.join();          // wait until server thread has stopped.
+}
+
 } // namespace testing
\ No newline at end of file
@@ -0,0 +1,79 @@
+/* ---------------------------------------------------------------------
+ * HTM Community Edition of NuPIC
+ * Copyright (C) 2020, Numenta, Inc.
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU Affero Public License version 3 as
+ * published by the Free Software Foundation.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU Affero Public License for more details.
+ *
+ * You should have received a copy of the GNU Affero Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses.
+ * --------------------------------------------------------------------- */
+
+#include <atomic>
+#include <stdexcept>
+#include <vector>
+
+#include "gtest/gtest.h"
+
+#include "htm/types/Types.hpp"
+#include "htm/utils/ThreadPool.hpp"
+
+namespace testing {
+
+using namespace htm;
+
+TEST(ThreadPoolTest, Size) {
+  ThreadPool single(1u);
+  ASSERT_EQ(single.size(), 1u);
+
+  ThreadPool four(4u);
+  ASSERT_EQ(four.size(), 4u);
+
+  ThreadPool automatic;
+  ASSERT_GE(automatic.size(), 1u);
+}
+
+
+TEST(ThreadPoolTest, ParallelForVisitsEachIndexOnce) {
+  for(const UInt threads : {1u, 2u, 4u}) {
+    ThreadPool pool(threads);
+    // Re-use the pool to check that it works for more than one call.
+    for(const UInt count : {0u, 1u, 7u, 1000u}) {
+      std::vector<std::atomic<UInt>> visits(count);
+      for(auto &v : visits) v = 0u;
+
+      pool.parallelFor(count, [&](UInt i) { visits[i]++; });
+
+      for(UInt i = 0u; i < count; i++) {
+        ASSERT_EQ(visits[i], 1u) << "threads " << threads << " index " << i;
+      }
+    }
+  }
+}
+
+
+TEST(ThreadPoolTest, ParallelForRethrows) {
+  ThreadPool pool(3u);
+  std::atomic<UInt> done(0u);
+  ASSERT_THROW(
+    pool.parallelFor(100u, [&](UInt i) {
+      if(i == 42u) throw std::runtime_error("task failed");
+      done++;
+    }),
+    std::runtime_error);
+  // All other tasks were still executed.
+  ASSERT_EQ(done, 99u);
+
+  // The pool is still usable afterwards.
+  done = 0u;
+  pool.parallelFor(10u, [&](UInt) { done++; });
+  ASSERT_EQ(done, 10u);
+}
+
+} // namespace testing